@@ -7,39 +7,650 @@ Excel帳票生成スクリプト（テンプレート方式）
 """
 
 import sys
+import io
 import json
+import pickle
+import re
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from itertools import chain
+from xml.sax.saxutils import escape
 from openpyxl import load_workbook
 from openpyxl.styles import Font, Alignment
+from openpyxl.utils import get_column_letter, column_index_from_string
+from openpyxl.utils.indexed_list import IndexedList
 from datetime import datetime
 import os
 
-def generate_excel_from_template(template_path, output_path, data):
+# テンプレートの格納ディレクトリ（重機種類ごとのテンプレートも同じディレクトリに置く）
+TEMPLATE_DIR = os.environ.get(
+    'INSPECTION_TEMPLATE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'templates'),
+)
+# 既定のテンプレート（重機種類ごとのテンプレートがない場合に使用）
+DEFAULT_TEMPLATE_NAME = 'inspection_template.xlsx'
+
+# 入力方式
+# openpyxl: テンプレートをワークブックとして複製して入力・保存
+# zip: テンプレートのzipをエントリ単位でコピーし、ワークシートと共有文字列のXMLのみ差し替え
+FILL_OPENPYXL = 'openpyxl'
+FILL_ZIP = 'zip'
+FILL_MODES = (FILL_OPENPYXL, FILL_ZIP)
+DEFAULT_FILL_MODE = os.environ.get('TEMPLATE_FILL_MODE', FILL_OPENPYXL)
+
+# 点検結果の書式
+font_good = Font(color="00AA00", size=14, bold=True)
+font_bad = Font(color="FF0000", size=14, bold=True)
+align_center = Alignment(horizontal='center', vertical='center')
+
+# 点検結果の書式（zip方式でstyles.xmlに追加するXML。openpyxlが書き出す内容と同じ）
+_RESULT_FONT_XML = {
+    True: '<font><b val="1"/><sz val="14"/><color rgb="0000AA00"/></font>',
+    False: '<font><b val="1"/><sz val="14"/><color rgb="00FF0000"/></font>',
+}
+_RESULT_ALIGNMENT_XML = '<alignment horizontal="center" vertical="center"/>'
+
+# zip方式で書き出すエントリの日時（出力を決定的にする）
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+_NS = {
+    'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+}
+_ROW_RE = re.compile(r'<row\b[^>]*?(?:/>|>.*?</row>)', re.S)
+_CELL_RE = re.compile(r'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+_XF_RE = re.compile(r'<xf\b[^>]*?(?:/>|>.*?</xf>)', re.S)
+_REF_RE = re.compile(r'\br="([A-Z]+)(\d+)"')
+_STYLE_RE = re.compile(r'\bs="(\d+)"')
+
+
+# ============================================================
+# テンプレートレジストリ
+# ============================================================
+
+def _normalize_item_name(name):
+    """点検項目名の比較用の正規化（空白を除去）"""
+    return ''.join(str(name or '').split())
+
+
+class ReportTemplate:
+    """
+    読み込み済みのテンプレート
+
+    テンプレートは一度だけ読み込み、日付→列・点検項目→行の対応表を事前に計算する。
+    リクエストごとのワークブックは読み込み済みのワークブックの複製（pickle）から作成する。
+    """
+
+    # 点検結果の先頭列（AM列）と点検項目の行範囲（対応表を作成できない場合の既定値）
+    DEFAULT_FIRST_DAY_COLUMN = 39
+    DEFAULT_ITEM_ROWS = tuple(range(10, 24))
+    DEFAULT_INSPECTOR_ROW = 24
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+
+        wb = load_workbook(path)
+        ws = wb.active
+        self.sheet_title = ws.title
+        self._blob = pickle.dumps(wb, pickle.HIGHEST_PROTOCOL)
+
+        # 結合セル（左上以外）→ 左上のセル
+        self.merged_anchors = {}
+        for mcr in ws.merged_cells.ranges:
+            anchor = mcr.start_cell.coordinate
+            for row, col in mcr.cells:
+                if (row, col) != (mcr.min_row, mcr.min_col):
+                    self.merged_anchors[f'{get_column_letter(col)}{row}'] = anchor
+
+        header_row, self.day_columns = self._find_day_columns(ws)
+        self.inspector_row = self._find_inspector_row(ws, header_row)
+
+        # 点検項目の行（見出し行の次の行から点検者の行の前まで）と項目名→行
+        if header_row:
+            self.item_rows = tuple(range(header_row + 1, self.inspector_row))
+        else:
+            self.item_rows = self.DEFAULT_ITEM_ROWS
+        self.item_name_rows = {}
+        for row in self.item_rows:
+            name = _normalize_item_name(ws.cell(row=row, column=2).value)
+            if name:
+                self.item_name_rows.setdefault(name, row)
+
+        # 点検項目（コード・名前の組）→ {項目コード: 行}
+        self._item_row_maps = {}
+        self._zip_plan = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _find_day_columns(cls, ws):
+        """
+        日付の見出し行（1～31の連番）から日付→列名の対応表を作成
+
+        Returns:
+            (見出し行, {日: 列名})。見出し行がない場合は (None, AM列起点の対応表)
+        """
+        for row in ws.iter_rows(max_row=min(ws.max_row, 40)):
+            days = {}
+            for cell in row:
+                value = cell.value
+                if isinstance(value, int) and not isinstance(value, bool) and 1 <= value <= 31:
+                    days.setdefault(value, cell.column_letter)
+            if len(days) >= 28 and all(day in days for day in range(1, 29)):
+                return row[0].row, days
+        return None, {
+            day: get_column_letter(cls.DEFAULT_FIRST_DAY_COLUMN + day - 1) for day in range(1, 32)
+        }
+
+    def _find_inspector_row(self, ws, header_row):
+        """点検者の行（日付の列の左隣に「点検者」と記載された行）"""
+        first_column = self.day_columns.get(1)
+        if header_row and first_column:
+            label_column = ws[f'{first_column}1'].column - 1
+            for row in range(header_row + 1, min(ws.max_row, header_row + 40) + 1):
+                value = ws.cell(row=row, column=label_column).value
+                if isinstance(value, str) and '点検者' in value:
+                    return row
+        return self.DEFAULT_INSPECTOR_ROW
+
+    def new_workbook(self):
+        """読み込み済みテンプレートの複製を作成"""
+        wb = pickle.loads(self._blob)
+        # IndexedListの索引（dict）はpickleで正しく復元されないため作り直す
+        for value in vars(wb).values():
+            if isinstance(value, IndexedList):
+                value._dict = {item: index for index, item in enumerate(value)}
+        return wb
+
+    def fill_coordinates(self):
+        """入力対象となり得る全セルの座標（ヘッダー・点検者・点検結果）と点検結果のセル"""
+        result_cells = {
+            self.anchor(f'{column}{row}')
+            for column in self.day_columns.values() for row in self.item_rows
+        }
+        cells = {self.anchor(coordinate) for coordinate in _HEADER_CELLS}
+        cells.update(
+            self.anchor(f'{column}{self.inspector_row}') for column in self.day_columns.values()
+        )
+        cells.update(result_cells)
+        return cells, result_cells
+
+    def zip_plan(self):
+        """zip方式の入力に使う差し替え計画（初回のみ作成）"""
+        with self._lock:
+            if self._zip_plan is None:
+                self._zip_plan = _ZipFillPlan(self)
+            return self._zip_plan
+
+    def anchor(self, coordinate):
+        """結合セルの場合は左上のセル（値を書き込めるセル）の座標"""
+        return self.merged_anchors.get(coordinate, coordinate)
+
+    def item_rows_for(self, items, records):
+        """
+        項目コード→行の対応表
+
+        点検項目（items）がある場合は項目名がテンプレートの項目名と一致する行、
+        一致しない場合は並び順の行に対応させる。
+        点検項目がない場合は記録に含まれる項目コードを出現順に並べる。
+        """
+        if items:
+            key = tuple((item.get('code', ''), item.get('name', '')) for item in items)
+        else:
+            codes = {}
+            for record in records:
+                for code in record.get('results', {}):
+                    codes.setdefault(code, None)
+            key = tuple((code, None) for code in codes)
+
+        with self._lock:
+            item_rows = self._item_row_maps.get(key)
+        if item_rows is not None:
+            return item_rows
+
+        item_rows = {}
+        used = set()
+        for code, name in key:
+            row = self.item_name_rows.get(_normalize_item_name(name)) if name else None
+            if row is not None and row not in used:
+                item_rows[code] = row
+                used.add(row)
+        free_rows = iter(row for row in self.item_rows if row not in used)
+        for code, _ in key:
+            if code not in item_rows:
+                row = next(free_rows, None)
+                if row is None:
+                    break
+                item_rows[code] = row
+
+        with self._lock:
+            self._item_row_maps[key] = item_rows
+        return item_rows
+
+
+# ============================================================
+# 入力内容
+# ============================================================
+
+# ヘッダーの入力セル
+_HEADER_CELLS = ('A1', 'A2', 'A5', 'AM4', 'AX4', 'BE4', 'BI4')
+
+
+def _template_writes(template, data):
+    """
+    点検データからテンプレートへの入力内容を作成
+
+    Returns:
+        [(セル番地, 値, 点検結果（良好=True、要修理=False、点検結果以外=None）)]
+        セル番地は結合セルの場合は左上のセル
+    """
+    year = data.get('year', datetime.now().year)
+    month = data.get('month', datetime.now().month)
+    company_name = data.get('company_name', '')
+    prime_contractor_inspector = data.get('prime_contractor_inspector', '')
+    records = data.get('records', [])
+    anchor = template.anchor
+
+    writes = [
+        # タイトル（A1セル）・年月（A2セル）・重機名（A5セル）
+        (anchor('A1'), '日々点検表', None),
+        (anchor('A2'), f'{year}年{month}月', None),
+        (anchor('A5'), data.get('machine_type', ''), None),
+    ]
+    # 所有会社名（AM4セル）
+    if company_name:
+        writes.append((anchor('AM4'), company_name, None))
+    # 元請点検責任者（AX4セル）
+    if prime_contractor_inspector:
+        writes.append((anchor('AX4'), prime_contractor_inspector, None))
+    # 型式（BE4セル）・号機（BI4セル）
+    writes.append((anchor('BE4'), data.get('machine_model', ''), None))
+    writes.append((anchor('BI4'), data.get('machine_unit', ''), None))
+
+    # 点検結果
+    # 日付→列・項目コード→行はテンプレートごとに計算済み
+    item_rows = template.item_rows_for(data.get('items'), records)
+    for record in records:
+        col_name = template.day_columns.get(record.get('day'))
+        if col_name is None:
+            continue
+
+        # 点検者名
+        writes.append((anchor(f'{col_name}{template.inspector_row}'), record.get('inspector_name', ''), None))
+
+        # 点検結果（○、×）
+        for item_code, result in record.get('results', {}).items():
+            row_index = item_rows.get(item_code)
+            if row_index is None:
+                continue
+            is_good = bool(result.get('isGood', True))
+            writes.append((anchor(f'{col_name}{row_index}'), '○' if is_good else '×', is_good))
+    return writes
+
+
+# ============================================================
+# zip方式の入力（XMLの差し替え）
+# ============================================================
+
+def _zip_entry(name):
+    entry = zipfile.ZipInfo(name, date_time=_ZIP_DATE_TIME)
+    entry.compress_type = zipfile.ZIP_DEFLATED
+    return entry
+
+
+def _active_sheet_part(source):
+    """アクティブなワークシートのzip内のパス"""
+    workbook = ET.fromstring(source.read('xl/workbook.xml'))
+    view = workbook.find('main:bookViews/main:workbookView', _NS)
+    active = int(view.get('activeTab', 0)) if view is not None else 0
+    sheet = workbook.findall('main:sheets/main:sheet', _NS)[active]
+    rel_id = sheet.get(f'{{{_NS["r"]}}}id')
+    rels = ET.fromstring(source.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.findall('rel:Relationship', _NS):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            return target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+    raise ValueError(f'ワークシートが見つかりません: {rel_id}')
+
+
+def _split_sheet_data(xml, coordinates):
+    """
+    ワークシートのXMLを入力セルの位置で分割
+
+    入力セルがXMLにない場合（書式もないセル・行）は空のセルとして位置を確保する。
+
+    Returns:
+        (区切り文字列のリスト, 各入力セルの元のXMLのリスト, {セル番地: 番号}, {セル番地: スタイル番号})
+        区切り文字列はセルより1つ多く、交互に連結すると元のXMLになる
+    """
+    targets = {}
+    for coordinate in coordinates:
+        match = re.fullmatch(r'([A-Z]+)(\d+)', coordinate)
+        targets.setdefault(int(match.group(2)), []).append(
+            (column_index_from_string(match.group(1)), coordinate)
+        )
+
+    segments = []
+    originals = []
+    slots = {}
+    styles = {}
+    text = []
+
+    def add_slot(coordinate, original):
+        segments.append(''.join(text))
+        text.clear()
+        slots[coordinate] = len(originals)
+        originals.append(original)
+        style = _STYLE_RE.search(original)
+        styles[coordinate] = int(style.group(1)) if style else 0
+
+    def add_cells(row_xml, row_targets):
+        """行内のセルを走査し、入力セルの位置で区切る"""
+        pending = sorted(row_targets)
+        position = 0
+        for match in _CELL_RE.finditer(row_xml):
+            ref = _REF_RE.search(match.group(0)[:match.group(0).index('>')])
+            if ref is None:
+                raise ValueError('セル番地のないセルを含むテンプレートには対応していません')
+            column = column_index_from_string(ref.group(1))
+            while pending and pending[0][0] < column:
+                text.append(row_xml[position:match.start()])
+                position = match.start()
+                add_slot(pending.pop(0)[1], '')
+            if pending and pending[0][0] == column:
+                text.append(row_xml[position:match.start()])
+                position = match.end()
+                add_slot(pending.pop(0)[1], match.group(0))
+        text.append(row_xml[position:])
+        for _, coordinate in pending:
+            add_slot(coordinate, '')
+
+    start = xml.index('<sheetData')
+    head_end = xml.index('>', start)
+    if xml[head_end - 1] == '/':
+        # 空のワークシート
+        text.append(xml[:start] + '<sheetData>')
+        end = head_end + 1
+        rows = []
+    else:
+        text.append(xml[:head_end + 1])
+        end = xml.index('</sheetData>', head_end)
+        rows = list(_ROW_RE.finditer(xml, head_end + 1, end))
+
+    pending_rows = sorted(targets)
+    position = head_end + 1 if rows else end
+    for match in rows:
+        row_xml = match.group(0)
+        row = int(re.search(r'\br="(\d+)"', row_xml[:row_xml.index('>')]).group(1))
+        while pending_rows and pending_rows[0] < row:
+            # XMLにない行は新しい行として追加
+            missing = pending_rows.pop(0)
+            text.append(xml[position:match.start()] + f'<row r="{missing}">')
+            position = match.start()
+            add_cells('', targets[missing])
+            text.append('</row>')
+        text.append(xml[position:match.start()])
+        position = match.end()
+        if pending_rows and pending_rows[0] == row:
+            pending_rows.pop(0)
+            if row_xml.endswith('/>'):
+                row_xml = row_xml[:-2] + '></row>'
+            head = row_xml.index('>') + 1
+            text.append(row_xml[:head])
+            add_cells(row_xml[head:-len('</row>')], targets[row])
+            text.append('</row>')
+        else:
+            text.append(row_xml)
+    text.append(xml[position:end])
+    for missing in pending_rows:
+        text.append(f'<row r="{missing}">')
+        add_cells('', targets[missing])
+        text.append('</row>')
+    if xml[head_end - 1] == '/':
+        text.append('</sheetData>')
+    text.append(xml[end:])
+    segments.append(''.join(text))
+    return segments, originals, slots, styles
+
+
+def _add_result_styles(styles_xml, base_styles):
+    """
+    点検結果の書式（フォント・中央揃え）を元の書式に重ねたセル書式をstyles.xmlに追加
+
+    Returns:
+        (新しいstyles.xml, {(元のスタイル番号, 良好か): 新しいスタイル番号})
+    """
+    # フォントの追加
+    match = re.search(r'<fonts\b[^>]*?count="(\d+)"[^>]*>', styles_xml)
+    font_count = int(match.group(1))
+    font_ids = {True: font_count, False: font_count + 1}
+    fonts_end = styles_xml.index('</fonts>', match.end())
+    styles_xml = (
+        styles_xml[:match.start()]
+        + match.group(0).replace(f'count="{font_count}"', f'count="{font_count + 2}"')
+        + styles_xml[match.end():fonts_end]
+        + _RESULT_FONT_XML[True] + _RESULT_FONT_XML[False]
+        + styles_xml[fonts_end:]
+    )
+
+    # セル書式の追加
+    match = re.search(r'<cellXfs\b[^>]*?count="(\d+)"[^>]*>', styles_xml)
+    xfs_end = styles_xml.index('</cellXfs>', match.end())
+    xfs = _XF_RE.findall(styles_xml, match.end(), xfs_end)
+    added = []
+    result_styles = {}
+    for base in sorted(base_styles):
+        xf = xfs[base] if base < len(xfs) else xfs[0]
+        head_end = xf.index('>')
+        head = xf[:head_end].rstrip('/')
+        body = '' if xf[head_end - 1] == '/' else xf[head_end + 1:-len('</xf>')]
+        body = re.sub(r'<alignment\b[^>]*?(?:/>|>.*?</alignment>)', '', body, flags=re.S)
+        head = re.sub(r'\s(?:applyFont|applyAlignment)="[^"]*"', '', head)
+        for is_good in (True, False):
+            new_head = re.sub(r'\bfontId="\d+"', f'fontId="{font_ids[is_good]}"', head)
+            if 'fontId=' not in new_head:
+                new_head += f' fontId="{font_ids[is_good]}"'
+            result_styles[(base, is_good)] = len(xfs) + len(added)
+            added.append(f'{new_head} applyFont="1" applyAlignment="1">{_RESULT_ALIGNMENT_XML}{body}</xf>')
+    styles_xml = (
+        styles_xml[:match.start()]
+        + match.group(0).replace(f'count="{match.group(1)}"', f'count="{len(xfs) + len(added)}"')
+        + styles_xml[match.end():xfs_end]
+        + ''.join(added)
+        + styles_xml[xfs_end:]
+    )
+    return styles_xml, result_styles
+
+
+def _shared_string_text(si):
+    """共有文字列の文字列（ふりがなは除く）。書式付き文字列はNone"""
+    if si.find('main:r', _NS) is not None:
+        return None
+    t = si.find('main:t', _NS)
+    return (t.text or '') if t is not None else None
+
+
+class _ZipFillPlan:
+    """
+    zip方式の入力の差し替え計画
+
+    テンプレートの読み込み時に一度だけ作成する:
+    - ワークシートのXMLを入力セルの位置で分割（リクエストごとは連結のみ）
+    - 点検結果の書式を追加したstyles.xml
+    - 差し替えないエントリをコピー済みのzip（リクエストごとはワークシートと共有文字列を追記するのみ）
+    """
+
+    def __init__(self, template):
+        coordinates, result_cells = template.fill_coordinates()
+        with zipfile.ZipFile(template.path) as source:
+            names = set(source.namelist())
+            self.sheet_part = _active_sheet_part(source)
+            sheet_xml = source.read(self.sheet_part).decode('utf-8')
+            self.segments, self.originals, self.slots, self.styles = _split_sheet_data(sheet_xml, coordinates)
+
+            styles_xml, self.result_styles = _add_result_styles(
+                source.read('xl/styles.xml').decode('utf-8'),
+                {self.styles[coordinate] for coordinate in result_cells},
+            )
+
+            # 共有文字列（ない場合はインライン文字列で入力）
+            self.strings_part = 'xl/sharedStrings.xml' if 'xl/sharedStrings.xml' in names else None
+            self.string_indexes = {}
+            if self.strings_part:
+                sst_xml = source.read(self.strings_part).decode('utf-8')
+                items = ET.fromstring(sst_xml).findall('main:si', _NS)
+                for index, si in enumerate(items):
+                    text = _shared_string_text(si)
+                    if text is not None:
+                        self.string_indexes.setdefault(text, index)
+                self.sst_unique = len(items)
+
+                # 開始タグ（count・uniqueCountはリクエストごとに設定）と要素の内容
+                match = re.search(r'<sst\b[^>]*>', sst_xml)
+                count = re.search(r'\bcount="(\d+)"', match.group(0))
+                self.sst_count = int(count.group(1)) if count else len(items)
+                self.sst_head = sst_xml[:match.start()] + re.sub(
+                    r'\s(?:count|uniqueCount)="\d+"', '', match.group(0)
+                ).rstrip('>')
+                self.sst_body = sst_xml[match.end():sst_xml.rindex('</sst>')]
+
+            # 差し替えないエントリ（styles.xmlは差し替え済み）をコピーしたzip
+            replaced = {self.sheet_part, self.strings_part}
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w') as target:
+                for info in source.infolist():
+                    if info.filename in replaced:
+                        continue
+                    data = styles_xml.encode('utf-8') if info.filename == 'xl/styles.xml' else source.read(info)
+                    target.writestr(_zip_entry(info.filename), data)
+            self.prefix = buffer.getvalue()
+
+    def fill(self, writes):
+        """入力内容を差し替えたXLSX（bytes）を作成"""
+        cells = list(self.originals)
+        new_strings = {}
+        for coordinate, value, result in writes:
+            style = self.styles[coordinate]
+            if result is not None:
+                style = self.result_styles[(style, result)]
+            cells[self.slots[coordinate]] = self._cell_xml(coordinate, value, style, new_strings)
+
+        sheet_xml = ''.join(chain.from_iterable(zip(self.segments, cells))) + self.segments[-1]
+
+        buffer = io.BytesIO(self.prefix)
+        with zipfile.ZipFile(buffer, 'a') as target:
+            target.writestr(_zip_entry(self.sheet_part), sheet_xml.encode('utf-8'))
+            if self.strings_part:
+                target.writestr(_zip_entry(self.strings_part), self._shared_strings_xml(new_strings, len(writes)))
+        return buffer.getvalue()
+
+    def _cell_xml(self, coordinate, value, style, new_strings):
+        """セルのXML（openpyxlが書き出す内容と同じ）"""
+        style_attr = f' s="{style}"' if style else ''
+        if value is None or value == '':
+            return f'<c r="{coordinate}"{style_attr}/>'
+        if isinstance(value, bool):
+            return f'<c r="{coordinate}"{style_attr} t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float)):
+            return f'<c r="{coordinate}"{style_attr} t="n"><v>{value}</v></c>'
+        value = str(value)
+        if not self.strings_part:
+            return f'<c r="{coordinate}"{style_attr} t="inlineStr"><is>{_text_xml(value)}</is></c>'
+        index = self.string_indexes.get(value)
+        if index is None:
+            index = new_strings.get(value)
+            if index is None:
+                index = new_strings[value] = self.sst_unique + len(new_strings)
+        return f'<c r="{coordinate}"{style_attr} t="s"><v>{index}</v></c>'
+
+    def _shared_strings_xml(self, new_strings, written):
+        count = self.sst_count + written
+        unique = self.sst_unique + len(new_strings)
+        added = ''.join(f'<si>{_text_xml(text)}</si>' for text in new_strings)
+        return (
+            f'{self.sst_head} count="{count}" uniqueCount="{unique}">'
+            f'{self.sst_body}{added}</sst>'
+        ).encode('utf-8')
+
+
+def _text_xml(text):
+    """文字列の<t>要素（前後の空白を保持）"""
+    if text != text.strip():
+        return f'<t xml:space="preserve">{escape(text)}</t>'
+    return f'<t>{escape(text)}</t>'
+
+
+class TemplateRegistry:
+    """テンプレートのパスごとに読み込み済みテンプレートを保持（更新された場合は読み直す）"""
+
+    def __init__(self, template_dir=TEMPLATE_DIR):
+        self.template_dir = template_dir
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def template_path(self, machine_type=''):
+        """
+        重機種類に対応するテンプレートのパス
+
+        inspection_template_<重機種類>.xlsx があればそれを、なければ既定のテンプレートを使用
+        """
+        if machine_type:
+            base, ext = os.path.splitext(DEFAULT_TEMPLATE_NAME)
+            path = os.path.join(self.template_dir, f'{base}_{machine_type.strip()}{ext}')
+            if os.path.exists(path):
+                return path
+        return os.path.join(self.template_dir, DEFAULT_TEMPLATE_NAME)
+
+    def get(self, template_path):
+        """読み込み済みテンプレートを取得（未読み込み・更新済みの場合は読み込む）"""
+        path = os.path.abspath(template_path)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            template = self._templates.get(path)
+            if template is None or template.mtime != mtime:
+                print(f"📄 テンプレート読み込み: {path}")
+                template = ReportTemplate(path)
+                self._templates[path] = template
+                print(f"✅ テンプレート読み込み完了: {template.sheet_title}")
+        return template
+
+    def preload(self):
+        """テンプレートディレクトリ内の全テンプレートを読み込み（サーバー起動時に呼び出す）"""
+        if not os.path.isdir(self.template_dir):
+            return
+        for name in sorted(os.listdir(self.template_dir)):
+            if name.endswith('.xlsx') and not name.startswith('~$'):
+                self.get(os.path.join(self.template_dir, name))
+
+
+template_registry = TemplateRegistry()
+
+
+def generate_excel_from_template(template_path, output_path, data, mode=None):
     """
     テンプレートExcelを読み込み、点検データを入力
     
     Args:
         template_path: テンプレートExcelファイルのパス
-        output_path: 出力Excelファイルのパス
+                       （Noneの場合は重機種類に対応するテンプレートを使用）
+        output_path: 出力Excelファイルのパス（Noneの場合はメモリ上に生成してbytesを返す）
         data: 点検データ（JSON）
+        mode: 入力方式（'openpyxl' または 'zip'、省略時はDEFAULT_FILL_MODE）
+
+    Returns:
+        output_path（省略した場合はXLSXのbytes）。失敗した場合はNone
     """
     try:
-        print(f"📄 テンプレート読み込み: {template_path}")
-        
-        # テンプレートExcelを読み込み
-        wb = load_workbook(template_path)
-        ws = wb.active
-        
-        print(f"✅ テンプレート読み込み完了")
-        print(f"📊 シート名: {ws.title}")
-        
+        mode = mode or DEFAULT_FILL_MODE
+        if mode not in FILL_MODES:
+            raise ValueError(f'未対応の入力方式です: {mode}')
+
         # データを解析
         machine_type = data.get('machine_type', '')
         machine_model = data.get('machine_model', '')
         machine_unit = data.get('machine_unit', '')
-        site_name = data.get('site_name', '')
-        company_name = data.get('company_name', '')
-        responsible_person = data.get('responsible_person', '')
-        prime_contractor_inspector = data.get('prime_contractor_inspector', '')
         year = data.get('year', datetime.now().year)
         month = data.get('month', datetime.now().month)
         records = data.get('records', [])
@@ -48,87 +659,45 @@ def generate_excel_from_template(template_path, output_path, data):
         print(f"📅 対象月: {year}年{month}月")
         print(f"📝 記録数: {len(records)}件")
         
-        # タイトル（A1セル）を更新
-        ws['A1'] = '日々点検表'
-        
-        # 年月（A2セル）を更新
-        ws['A2'] = f'{year}年{month}月'
-        
-        # 重機名（A5セル）を更新
-        ws['A5'] = machine_type
-        
-        # 所有会社名（AM4セル）を更新
-        if company_name:
-            ws['AM4'] = company_name
-        
-        # 元請点検責任者（AX4セル）を更新
-        if prime_contractor_inspector:
-            ws['AX4'] = prime_contractor_inspector
-        
-        # 型式（BE4セル）を更新
-        ws['BE4'] = machine_model
-        
-        # 号機（BI4セル）を更新
-        ws['BI4'] = machine_unit
+        # 読み込み済みテンプレートを取得
+        if template_path is None:
+            template_path = template_registry.template_path(machine_type)
+        template = template_registry.get(template_path)
         
-        print(f"✅ 基本情報を入力完了")
+        # 入力内容（ヘッダー・点検者・点検結果）
+        writes = _template_writes(template, data)
         
-        # 点検結果を入力
-        # AM列から開始（列インデックス39）
-        # 行10～23が点検項目（行インデックス10～23）
+        if mode == FILL_ZIP:
+            # ワークシートと共有文字列のXMLのみ差し替え
+            content = template.zip_plan().fill(writes)
+            print(f"✅ 点検結果を入力完了")
+            if output_path is None:
+                print(f"💾 生成完了: {len(content)} bytes")
+                return content
+            with open(output_path, 'wb') as f:
+                f.write(content)
+            print(f"💾 保存完了: {output_path}")
+            return output_path
         
-        for record in records:
-            day = record.get('day')
-            inspector_name = record.get('inspector_name', '')
-            results = record.get('results', {})
-            
-            if day is None:
-                continue
-            
-            # 日付に対応する列を計算（AM列=39, AN列=40, ...）
-            col_index = 38 + day  # AM列は38（0-indexed）
-            
-            # 列名を計算（例: AM, AN, AO, ...）
-            col_name = _get_column_name(col_index)
-            
-            # 点検者名を入力（24～26行結合セル）
-            inspector_cell = f'{col_name}24'
-            if inspector_cell in ws.merged_cells:
-                # 結合セルの場合、最初のセルに入力
-                ws[inspector_cell] = inspector_name
-            else:
-                ws[inspector_cell] = inspector_name
-            
-            print(f"  日付{day}日: {inspector_cell} = {inspector_name}")
-            
-            # 点検結果を入力（10～23行）
-            row_index = 10
-            for item_code, result in results.items():
-                if row_index > 23:
-                    break
-                
-                cell_name = f'{col_name}{row_index}'
-                
-                # 結果を入力（○、×、-）
-                is_good = result.get('isGood', True)
-                value = '○' if is_good else '×'
-                
-                ws[cell_name] = value
-                
-                # フォント色を設定
-                if is_good:
-                    ws[cell_name].font = Font(color="00AA00", size=14, bold=True)
-                else:
-                    ws[cell_name].font = Font(color="FF0000", size=14, bold=True)
-                
-                # 中央揃え
-                ws[cell_name].alignment = Alignment(horizontal='center', vertical='center')
-                
-                row_index += 1
+        # 読み込み済みテンプレートを複製して入力
+        wb = template.new_workbook()
+        ws = wb.active
+        for coordinate, value, is_good in writes:
+            cell = ws[coordinate]
+            cell.value = value
+            if is_good is not None:
+                # 点検結果のフォント色・中央揃え
+                cell.font = font_good if is_good else font_bad
+                cell.alignment = align_center
         
         print(f"✅ 点検結果を入力完了")
         
         # ファイルを保存
+        if output_path is None:
+            buffer = io.BytesIO()
+            wb.save(buffer)
+            print(f"💾 生成完了: {buffer.tell()} bytes")
+            return buffer.getvalue()
         wb.save(output_path)
         print(f"💾 保存完了: {output_path}")
         
@@ -140,34 +709,24 @@ def generate_excel_from_template(template_path, output_path, data):
         traceback.print_exc()
         return None
 
-def _get_column_name(col_index):
-    """
-    列インデックスから列名を取得（0-indexed）
-    例: 0='A', 25='Z', 26='AA', 38='AM'
-    """
-    name = ''
-    col_index += 1  # 1-indexedに変換
-    while col_index > 0:
-        col_index -= 1
-        name = chr(col_index % 26 + ord('A')) + name
-        col_index //= 26
-    return name
-
 def main():
     """
     メイン関数
     コマンドライン引数からJSONデータを受け取り、Excel生成
     """
     if len(sys.argv) < 2:
-        print("❌ 使用方法: python generate_excel_from_template.py '<JSON_DATA>'")
+        print("❌ 使用方法: python generate_excel_from_template.py '<JSON_DATA>' [テンプレートパス] [openpyxl|zip]")
         sys.exit(1)
     
     # JSONデータを解析
     json_data = sys.argv[1]
     data = json.loads(json_data)
     
-    # テンプレートパス
-    template_path = '/home/user/uploaded_files/点検表_4ｔ_1号機_2025年12月.xlsx'
+    # テンプレートパス（省略時は重機種類に対応するテンプレート）
+    template_path = sys.argv[2] or None if len(sys.argv) > 2 else None
+    
+    # 入力方式（省略時はDEFAULT_FILL_MODE）
+    mode = sys.argv[3] if len(sys.argv) > 3 else None
     
     # 出力パス
     machine_type = data.get('machine_type', '重機')
@@ -180,7 +739,7 @@ def main():
     output_path = f'/tmp/{output_filename}'
     
     # Excel生成
-    result = generate_excel_from_template(template_path, output_path, data)
+    result = generate_excel_from_template(template_path, output_path, data, mode)
     
     if result:
         print(f"✅ 成功: {result}")
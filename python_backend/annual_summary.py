@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Annual Summary - 年間点検集計
+inspection_recordsをSQLで重機×月（点検項目別は重機×点検項目×月）ごとに集計し、
+集計結果をカーソルから1行ずつXLSXへストリーム書き出しする。
+点検記録・集計結果をまとめてメモリ上に読み込まないため、重機の台数によらずメモリ使用量は一定。
+
+シート:
+    年間集計    重機ごとの月別の点検日数・要修理件数
+    項目別      重機×点検項目ごとの月別の要修理日数・年間の点検日数
+
+点検結果（results）はJSONのため、SQLiteのJSON関数（json_each）で展開して集計する
+（展開・集計は1回のみ行い、結果は一時テーブルに保持して両方のシートで使用する）。
+良否の判定は帳票と同じ（true・1・'1'・'true'を良好、false・0・'0'・'false'を要修理）。
+"""
+
+import re
+
+from openpyxl.utils import get_column_letter
+
+from report_data import _machine_info
+from report_layout import FONT_14_BOLD, FONT_11_BOLD, FONT_10, LEFT_CENTER, CENTER_CENTER, FILL_GRAY
+from xlsx_stream_writer import XlsxStreamWriter
+
+MONTHS = range(1, 13)
+
+# 要修理がある月のセルの塗りつぶし
+FILL_RED = '00FF6B6B'
+THIN_BORDER = ('thin', 'thin', 'thin', 'thin')
+
+_TITLE_STYLE = (FONT_14_BOLD, None, None, LEFT_CENTER)
+_NOTE_STYLE = (FONT_10, None, None, LEFT_CENTER)
+_HEADER_STYLE = (FONT_11_BOLD, FILL_GRAY, THIN_BORDER, CENTER_CENTER)
+_TEXT_STYLE = (FONT_10, None, THIN_BORDER, LEFT_CENTER)
+_NUMBER_STYLE = (FONT_10, None, THIN_BORDER, CENTER_CENTER)
+_FAILURE_STYLE = (FONT_10, FILL_RED, THIN_BORDER, CENTER_CENTER)
+
+# ============================================================
+# SQL
+# ============================================================
+
+# 点検結果の良否（isGoodがあればisGood、なければis_good。オブジェクト以外の結果はNULL）
+_IS_GOOD_SQL = '''
+    CASE WHEN j.type = 'object' THEN
+        CASE WHEN json_type(j.value, '$.isGood') IS NOT NULL
+             THEN json_extract(j.value, '$.isGood')
+             ELSE json_extract(j.value, '$.is_good') END
+    END
+'''
+
+_GOOD_VALUES = "(1, '1', 'true')"
+_BAD_VALUES = "(0, '0', 'false')"
+
+# 集計の一時テーブル（重機×点検項目×月）
+_ITEM_MONTH_TABLE = 'annual_item_months'
+
+# 重機×点検項目×月: 点検日数（良否の記録がある日数）・要修理日数
+# 点検結果のJSONの展開は負荷が大きいため一度だけ行い、結果は一時テーブルに保持する
+# （一時テーブルはSQLiteの一時領域に置かれ、Pythonのメモリ上には読み込まない）
+_ITEM_MONTH_SQL = f'''
+    CREATE TEMP TABLE {_ITEM_MONTH_TABLE} AS
+    WITH results AS (
+        SELECT r.machine_id,
+               CAST(substr(r.inspection_date, 6, 2) AS INTEGER) AS month,
+               substr(r.inspection_date, 1, 10) AS day,
+               j.key AS code,
+               {_IS_GOOD_SQL} AS is_good
+        FROM inspection_records r, json_each(r.results) j
+        WHERE r.inspection_date >= ? AND r.inspection_date < ? {{site_filter}}
+    )
+    SELECT machine_id, code, month,
+           COUNT(DISTINCT CASE WHEN is_good IN {_GOOD_VALUES} OR is_good IN {_BAD_VALUES} THEN day END)
+               AS days_inspected,
+           COUNT(DISTINCT CASE WHEN is_good IN {_BAD_VALUES} THEN day END) AS failure_days
+    FROM results
+    GROUP BY machine_id, code, month
+'''
+
+# 重機×月: 点検日数（記録のある日数）・要修理件数（点検項目ごとの要修理日数の合計）
+_MACHINE_MONTH_SQL = f'''
+    SELECT days.machine_id, m.type, m.model, m.unit_number, days.month, days.days_inspected,
+           COALESCE(failures.failures, 0) AS failures
+    FROM (
+        SELECT r.machine_id,
+               CAST(substr(r.inspection_date, 6, 2) AS INTEGER) AS month,
+               COUNT(DISTINCT substr(r.inspection_date, 1, 10)) AS days_inspected
+        FROM inspection_records r
+        WHERE r.inspection_date >= ? AND r.inspection_date < ? {{site_filter}}
+        GROUP BY r.machine_id, month
+    ) days
+    LEFT JOIN (
+        SELECT machine_id, month, SUM(failure_days) AS failures
+        FROM {_ITEM_MONTH_TABLE}
+        GROUP BY machine_id, month
+    ) failures ON failures.machine_id = days.machine_id AND failures.month = days.month
+    LEFT JOIN machines m ON m.id = days.machine_id
+    ORDER BY days.machine_id, days.month
+'''
+
+_ITEM_ROWS_SQL = f'''
+    SELECT machine_id, code, month, days_inspected, failure_days
+    FROM {_ITEM_MONTH_TABLE}
+    ORDER BY machine_id, code, month
+'''
+
+
+def _query(conn, sql, year, site_name=None):
+    """集計SQLを実行してカーソルを返す（結果はカーソルから1行ずつ読み出す）"""
+    params = [f'{year:04d}-01-01', f'{year + 1:04d}-01-01']
+    site_filter = ''
+    if site_name:
+        site_filter = 'AND r.site_name = ?'
+        params.append(site_name)
+    return conn.execute(sql.format(site_filter=site_filter), params)
+
+
+def _grouped(cursor, key):
+    """ソート済みのカーソルの行をキーが同じ行ごとにまとめて返す（1グループ分のみ保持）"""
+    group_key = None
+    group = []
+    for row in cursor:
+        row_key = key(row)
+        if group and row_key != group_key:
+            yield group_key, group
+            group = []
+        group_key = row_key
+        group.append(row)
+    if group:
+        yield group_key, group
+
+
+# ============================================================
+# シート: 年間集計
+# ============================================================
+
+_MACHINE_COLUMNS = ('重機ID', '機種', '型式', '号機')
+_MACHINE_FIRST_MONTH_COLUMN = len(_MACHINE_COLUMNS) + 1
+
+
+def _title_rows(title, site_name):
+    yield 1, [(1, title, _TITLE_STYLE)]
+    yield 2, [(1, f'現場: {site_name or "全現場"}', _NOTE_STYLE)]
+
+
+def _machine_sheet_rows(conn, year, site_name, counts):
+    """年間集計シートの行（重機1台1行、書き出した重機の台数を counts に加算）"""
+    yield from _title_rows(f'{year}年 年間点検集計（重機別）', site_name)
+
+    # 行4～5: 見出し（月ごとに点検日数・要修理の2列）
+    header = [(col, label, _HEADER_STYLE) for col, label in enumerate(_MACHINE_COLUMNS, start=1)]
+    sub_header = [(col, None, _HEADER_STYLE) for col in range(1, _MACHINE_FIRST_MONTH_COLUMN)]
+    for month in MONTHS:
+        col = _MACHINE_FIRST_MONTH_COLUMN + (month - 1) * 2
+        header += [(col, f'{month}月', _HEADER_STYLE), (col + 1, None, _HEADER_STYLE)]
+        sub_header += [(col, '点検日数', _HEADER_STYLE), (col + 1, '要修理', _HEADER_STYLE)]
+    total_col = _MACHINE_FIRST_MONTH_COLUMN + len(MONTHS) * 2
+    header += [(total_col, '年間', _HEADER_STYLE), (total_col + 1, None, _HEADER_STYLE)]
+    sub_header += [(total_col, '点検日数', _HEADER_STYLE), (total_col + 1, '要修理', _HEADER_STYLE)]
+    yield 4, header
+    yield 5, sub_header
+
+    row = 5
+    cursor = _query(conn, _MACHINE_MONTH_SQL, year, site_name)
+    for machine_id, rows in _grouped(cursor, lambda r: r['machine_id']):
+        first = rows[0]
+        cells = [
+            (1, machine_id, _TEXT_STYLE),
+            (2, first['type'] or '', _TEXT_STYLE),
+            (3, first['model'] or '', _TEXT_STYLE),
+            (4, first['unit_number'] or '', _TEXT_STYLE),
+        ]
+        by_month = {r['month']: r for r in rows}
+        total_days = total_failures = 0
+        for month in MONTHS:
+            col = _MACHINE_FIRST_MONTH_COLUMN + (month - 1) * 2
+            month_row = by_month.get(month)
+            days = month_row['days_inspected'] if month_row else 0
+            failures = month_row['failures'] if month_row else 0
+            total_days += days
+            total_failures += failures
+            cells.append((col, days, _NUMBER_STYLE))
+            cells.append((col + 1, failures, _FAILURE_STYLE if failures else _NUMBER_STYLE))
+        cells.append((total_col, total_days, _NUMBER_STYLE))
+        cells.append((total_col + 1, total_failures, _FAILURE_STYLE if total_failures else _NUMBER_STYLE))
+        row += 1
+        counts['machines'] += 1
+        yield row, cells
+
+
+def _machine_sheet_layout():
+    """年間集計シートの列幅・結合セル"""
+    col_widths = {1: 24, 2: 16, 3: 16, 4: 10}
+    merges = [f'{get_column_letter(col)}4:{get_column_letter(col)}5' for col in range(1, _MACHINE_FIRST_MONTH_COLUMN)]
+    for index in range(len(MONTHS) + 1):
+        col = _MACHINE_FIRST_MONTH_COLUMN + index * 2
+        col_widths[col] = col_widths[col + 1] = 8
+        merges.append(f'{get_column_letter(col)}4:{get_column_letter(col + 1)}4')
+    return col_widths, merges
+
+
+# ============================================================
+# シート: 項目別
+# ============================================================
+
+def _natural_key(code):
+    """項目コードの並び順（数字部分は数値として比較: H2 < H10）"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', code)]
+
+
+_ITEM_COLUMNS = ('重機ID', '型式', '号機', '項目コード', '点検項目')
+_ITEM_FIRST_MONTH_COLUMN = len(_ITEM_COLUMNS) + 1
+
+
+def _item_sheet_rows(conn, year, site_name, counts):
+    """項目別シートの行（重機×点検項目1行、月ごとの要修理日数。集計の一時テーブルから、行数を counts に加算）"""
+    yield from _title_rows(f'{year}年 年間点検集計（点検項目別・要修理日数）', site_name)
+
+    total_col = _ITEM_FIRST_MONTH_COLUMN + len(MONTHS)
+    header = [(col, label, _HEADER_STYLE) for col, label in enumerate(_ITEM_COLUMNS, start=1)]
+    header += [(_ITEM_FIRST_MONTH_COLUMN + month - 1, f'{month}月', _HEADER_STYLE) for month in MONTHS]
+    header += [(total_col, '年間要修理', _HEADER_STYLE), (total_col + 1, '年間点検日数', _HEADER_STYLE)]
+    yield 4, header
+
+    row = 4
+    info_cursor = conn.cursor()
+    cursor = conn.execute(_ITEM_ROWS_SQL)
+    # 重機ごとにまとめ、点検項目の並びは重機の点検項目の順（不明な項目はコード順で末尾）
+    for machine_id, rows in _grouped(cursor, lambda r: r['machine_id']):
+        info = _machine_info(info_cursor, machine_id)
+        items = info.get('items') or []
+        order = {item['code']: index for index, item in enumerate(items)}
+        names = {item['code']: item['name'] for item in items}
+
+        item_rows = {}
+        for r in rows:
+            item_rows.setdefault(r['code'], {})[r['month']] = r
+        for code in sorted(item_rows, key=lambda code: (order.get(code, len(order)), _natural_key(code))):
+            by_month = item_rows[code]
+            cells = [
+                (1, machine_id, _TEXT_STYLE),
+                (2, info.get('machine_model', ''), _TEXT_STYLE),
+                (3, info.get('machine_unit', ''), _TEXT_STYLE),
+                (4, code, _TEXT_STYLE),
+                (5, names.get(code, code), _TEXT_STYLE),
+            ]
+            total_failures = total_days = 0
+            for month in MONTHS:
+                month_row = by_month.get(month)
+                failures = month_row['failure_days'] if month_row else 0
+                total_failures += failures
+                total_days += month_row['days_inspected'] if month_row else 0
+                cells.append((
+                    _ITEM_FIRST_MONTH_COLUMN + month - 1, failures,
+                    _FAILURE_STYLE if failures else _NUMBER_STYLE,
+                ))
+            cells.append((total_col, total_failures, _FAILURE_STYLE if total_failures else _NUMBER_STYLE))
+            cells.append((total_col + 1, total_days, _NUMBER_STYLE))
+            row += 1
+            counts['items'] += 1
+            yield row, cells
+
+
+_ITEM_COLUMN_WIDTHS = {
+    1: 24, 2: 16, 3: 10, 4: 12, 5: 30,
+    **{_ITEM_FIRST_MONTH_COLUMN + month - 1: 7 for month in MONTHS},
+    _ITEM_FIRST_MONTH_COLUMN + len(MONTHS): 12,
+    _ITEM_FIRST_MONTH_COLUMN + len(MONTHS) + 1: 14,
+}
+
+
+# ============================================================
+# 生成
+# ============================================================
+
+def create_annual_summary(conn, year, output, site_name=None):
+    """
+    年間点検集計のワークブックを生成
+
+    Args:
+        conn: データベース接続（row_factory = sqlite3.Row）
+        year: 対象年
+        output: 出力ファイルパスまたは書き込み可能なファイルオブジェクト
+        site_name: 現場名（指定時はその現場の点検記録のみ）
+
+    Returns:
+        {'machines': 重機の台数, 'items': 項目別シートの行数}
+        （件数はシートの行を書き出しながら数えるため、ワークブックを閉じた後に確定した値を返す）
+    """
+    # 行を生成するジェネレーターが書き出した行数を加算する（XlsxStreamWriterを閉じるまでは途中の値）
+    counts = {'machines': 0, 'items': 0}
+    col_widths, merges = _machine_sheet_layout()
+    conn.execute(f'DROP TABLE IF EXISTS temp.{_ITEM_MONTH_TABLE}')
+    _query(conn, _ITEM_MONTH_SQL, year, site_name)
+    try:
+        with XlsxStreamWriter(output) as writer:
+            writer.add_sheet_rows(
+                '年間集計', _machine_sheet_rows(conn, year, site_name, counts),
+                col_widths=col_widths, merges=merges, freeze_rows=5,
+            )
+            writer.add_sheet_rows(
+                '項目別', _item_sheet_rows(conn, year, site_name, counts),
+                col_widths=_ITEM_COLUMN_WIDTHS, freeze_rows=4,
+            )
+    finally:
+        conn.execute(f'DROP TABLE IF EXISTS temp.{_ITEM_MONTH_TABLE}')
+    return counts
+
+
+if __name__ == '__main__':
+    import sqlite3
+    import sys
+
+    if len(sys.argv) < 4:
+        print('Usage: python annual_summary.py <db_path> <year> <output_path> [site_name]')
+        sys.exit(1)
+
+    connection = sqlite3.connect(sys.argv[1])
+    connection.row_factory = sqlite3.Row
+    summary_year = int(sys.argv[2])
+    result = create_annual_summary(connection, summary_year, sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else None)
+    connection.close()
+    print(f"✅ 年間点検集計生成成功: {summary_year}年 重機{result['machines']}台 / {result['items']}項目")
@@ -10,8 +10,14 @@ from flask_cors import CORS
 import sqlite3
 import json
 import os
+from contextlib import closing
 from datetime import datetime
-import threading
+from db_pool import ConnectionPool
+from db_migrations import migrate
+from group_commit import GroupCommitWriter, GroupCommitTimeout
+from record_query import (
+    parse_record_query, query_records, record_to_dict, parse_since, changes_since, current_sequence, merge_sync_records,
+)
 
 app = Flask(__name__)
 CORS(app)
@@ -19,8 +25,9 @@ CORS(app)
 # データベースファイルのパス
 DB_PATH = '/home/user/flutter_app/python_backend/inspection_db.sqlite'
 
-# スレッドセーフなデータベース接続
-db_lock = threading.Lock()
+# データベース接続プール（WALモード、読み取りは並行、書き込みのみ db_lock で直列化）
+db_pool = ConnectionPool(DB_PATH)
+db_lock = db_pool.write_lock
 
 def init_database():
     """データベースの初期化"""
@@ -55,7 +62,22 @@ def init_database():
             )
         ''')
         
+        # マスタデータテーブル（現場名、点検者名、所有会社名）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS master_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data_type TEXT NOT NULL,
+                name TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                sort_order INTEGER DEFAULT 9999,
+                UNIQUE(data_type, name)
+            )
+        ''')
+        
         conn.commit()
+        
+        # スキーマの移行（インデックスなど、適用済みの移行は何もしない）
+        migrate(conn)
         conn.close()
         print('✅ Database initialized')
 
@@ -63,10 +85,11 @@ def init_database():
 init_database()
 
 def get_db():
-    """データベース接続を取得"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """データベース接続をプールから取得（close() でプールに返却）"""
+    return db_pool.get()
+
+# 点検記録の作成・更新（同時に届いた書き込みを1回のトランザクションでコミット）
+record_writer = GroupCommitWriter(get_db, db_lock)
 
 # ============================================================
 # 点検記録API
@@ -74,33 +97,32 @@ def get_db():
 
 @app.route('/api/records', methods=['GET'])
 def get_all_records():
-    """すべての点検記録を取得"""
+    """
+    点検記録を取得（inspection_date, created_at, id の降順）
+    
+    クエリパラメータ（省略可）:
+        machineId / siteName / inspectorName: 完全一致で絞り込み
+        dateFrom: 点検日の開始（inspection_date >= dateFrom）
+        dateTo: 点検日の終了（inspection_date < dateTo）
+        limit: 1ページの件数（指定時はレスポンスの nextCursor で次のページを取得、最後のページはnull）
+        cursor: 前のページの nextCursor
+    
+    パラメータを省略した場合は全件を返す
+    """
     try:
-        with db_lock:
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM inspection_records 
-                ORDER BY inspection_date DESC, created_at DESC
-            ''')
-            rows = cursor.fetchall()
-            conn.close()
+        try:
+            filters, limit, page_cursor = parse_record_query(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        records = []
-        for row in rows:
-            record = {
-                'id': row['id'],
-                'machineId': row['machine_id'],
-                'siteName': row['site_name'],
-                'inspectorName': row['inspector_name'],
-                'inspectionDate': row['inspection_date'],
-                'results': json.loads(row['results']),
-                'createdAt': row['created_at'],
-                'updatedAt': row['updated_at']
-            }
-            records.append(record)
+        with closing(get_db()) as conn:
+            rows, next_cursor = query_records(conn, filters, limit, page_cursor)
         
-        return jsonify({'records': records, 'count': len(records)}), 200
+        records = [record_to_dict(row) for row in rows]
+        response = {'records': records, 'count': len(records)}
+        if limit is not None:
+            response['nextCursor'] = next_cursor
+        return jsonify(response), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -109,28 +131,15 @@ def get_all_records():
 def get_record(record_id):
     """特定の点検記録を取得"""
     try:
-        with db_lock:
-            conn = get_db()
+        with closing(get_db()) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM inspection_records WHERE id = ?', (record_id,))
             row = cursor.fetchone()
-            conn.close()
         
         if not row:
             return jsonify({'error': 'Record not found'}), 404
         
-        record = {
-            'id': row['id'],
-            'machineId': row['machine_id'],
-            'siteName': row['site_name'],
-            'inspectorName': row['inspector_name'],
-            'inspectionDate': row['inspection_date'],
-            'results': json.loads(row['results']),
-            'createdAt': row['created_at'],
-            'updatedAt': row['updated_at']
-        }
-        
-        return jsonify(record), 200
+        return jsonify(record_to_dict(row)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -149,9 +158,7 @@ def create_record():
         
         now = datetime.now().isoformat()
         
-        with db_lock:
-            conn = get_db()
-            cursor = conn.cursor()
+        def insert(cursor):
             cursor.execute('''
                 INSERT INTO inspection_records 
                 (id, machine_id, site_name, inspector_name, inspection_date, results, created_at, updated_at)
@@ -166,13 +173,16 @@ def create_record():
                 now,
                 now
             ))
-            conn.commit()
-            conn.close()
+        
+        record_writer.submit(insert)
         
         return jsonify({'message': 'Record created', 'id': data['id']}), 201
         
     except sqlite3.IntegrityError:
         return jsonify({'error': 'Record already exists'}), 409
+    except GroupCommitTimeout as e:
+        # 書き込みが混み合っている場合は再試行を促す
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -183,15 +193,11 @@ def update_record(record_id):
         data = request.get_json()
         now = datetime.now().isoformat()
         
-        with db_lock:
-            conn = get_db()
-            cursor = conn.cursor()
-            
+        def update(cursor):
             # 既存レコードの確認
             cursor.execute('SELECT * FROM inspection_records WHERE id = ?', (record_id,))
             if not cursor.fetchone():
-                conn.close()
-                return jsonify({'error': 'Record not found'}), 404
+                return False
             
             # 更新
             cursor.execute('''
@@ -208,11 +214,16 @@ def update_record(record_id):
                 now,
                 record_id
             ))
-            conn.commit()
-            conn.close()
+            return True
+        
+        if not record_writer.submit(update):
+            return jsonify({'error': 'Record not found'}), 404
         
         return jsonify({'message': 'Record updated', 'id': record_id}), 200
         
+    except GroupCommitTimeout as e:
+        # 書き込みが混み合っている場合は再試行を促す
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -220,13 +231,12 @@ def update_record(record_id):
 def delete_record(record_id):
     """点検記録を削除"""
     try:
-        with db_lock:
-            conn = get_db()
+        # 書き込み用ロックの中でトランザクションを実行（例外時はロールバック）
+        with closing(get_db()) as conn, db_lock, conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM inspection_records WHERE id = ?', (record_id,))
             deleted_count = cursor.rowcount
             conn.commit()
-            conn.close()
         
         if deleted_count == 0:
             return jsonify({'error': 'Record not found'}), 404
@@ -242,97 +252,60 @@ def delete_record(record_id):
 
 @app.route('/api/sync', methods=['POST'])
 def sync_data():
-    """データ同期（ローカルとクラウドのマージ）"""
+    """
+    データ同期（ローカルとクラウドのマージ）
+    
+    リクエスト:
+        records: 端末の点検記録（baseSeq: 端末が最後に受け取ったその記録の changeSeq、新規の記録は省略）
+        since: 前回の同期で返した cursor（指定時はそれ以降の変更のみを返す、省略時は全件）
+    
+    baseSeq を指定した記録は、サーバー側でその後に変更・削除されていなければ反映し、
+    されていれば競合とする（baseSeq がない場合は従来どおり updatedAt で比較）
+    
+    レスポンス:
+        records: since 以降に作成・更新された点検記録（since 省略時は全件）
+        deleted: since 以降に削除された点検記録のID
+        cursor: 次回の since
+        full: records が全件かどうか
+    """
     try:
         data = request.get_json()
         local_records = data.get('records', [])
+        try:
+            since = parse_since(data['since']) if data.get('since') is not None else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        with db_lock:
-            conn = get_db()
-            cursor = conn.cursor()
-            
-            sync_result = {
-                'created': 0,
-                'updated': 0,
-                'conflicts': 0
-            }
-            
-            for record in local_records:
-                # 既存レコードのチェック
-                cursor.execute('SELECT updated_at FROM inspection_records WHERE id = ?', (record['id'],))
-                row = cursor.fetchone()
-                
-                now = datetime.now().isoformat()
-                
-                if not row:
-                    # 新規作成
-                    cursor.execute('''
-                        INSERT INTO inspection_records 
-                        (id, machine_id, site_name, inspector_name, inspection_date, results, created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        record['id'],
-                        record['machineId'],
-                        record.get('siteName', ''),
-                        record['inspectorName'],
-                        record['inspectionDate'],
-                        json.dumps(record['results'], ensure_ascii=False),
-                        record.get('createdAt', now),
-                        record.get('updatedAt', now)
-                    ))
-                    sync_result['created'] += 1
-                else:
-                    # 更新日時で比較
-                    server_updated_at = row['updated_at']
-                    local_updated_at = record.get('updatedAt', '')
-                    
-                    if local_updated_at > server_updated_at:
-                        # ローカルが新しい場合のみ更新
-                        cursor.execute('''
-                            UPDATE inspection_records 
-                            SET machine_id = ?, site_name = ?, inspector_name = ?, 
-                                inspection_date = ?, results = ?, updated_at = ?
-                            WHERE id = ?
-                        ''', (
-                            record['machineId'],
-                            record.get('siteName', ''),
-                            record['inspectorName'],
-                            record['inspectionDate'],
-                            json.dumps(record['results'], ensure_ascii=False),
-                            local_updated_at,
-                            record['id']
-                        ))
-                        sync_result['updated'] += 1
-                    else:
-                        sync_result['conflicts'] += 1
+        with closing(get_db()) as conn:
+            # 書き込み用ロックの中でトランザクションを実行（例外時はロールバック）
+            try:
+                with db_lock, conn:
+                    cursor = conn.cursor()
+                    sync_result, _ = merge_sync_records(cursor, local_records)
+                    conn.commit()
+            except ValueError as e:
+                # baseSeqが不正（書き込み前に検証するため、何も反映されない）
+                return jsonify({'error': str(e)}), 400
             
-            conn.commit()
-            
-            # 全レコードを返す
-            cursor.execute('SELECT * FROM inspection_records ORDER BY inspection_date DESC')
-            rows = cursor.fetchall()
-            conn.close()
+            # since 以降の変更（省略時は全件）を返す（書き込みのロックは解放済み）
+            if since is None:
+                next_cursor = current_sequence(conn)
+                rows, _ = query_records(conn)
+                deleted, full = [], True
+            else:
+                rows, deleted, next_cursor, full = changes_since(conn, since)
         
-        records = []
-        for row in rows:
-            record = {
-                'id': row['id'],
-                'machineId': row['machine_id'],
-                'siteName': row['site_name'],
-                'inspectorName': row['inspector_name'],
-                'inspectionDate': row['inspection_date'],
-                'results': json.loads(row['results']),
-                'createdAt': row['created_at'],
-                'updatedAt': row['updated_at']
-            }
-            records.append(record)
+        records = [record_to_dict(row) for row in rows]
         
         return jsonify({
             'message': 'Sync completed',
             'result': sync_result,
-            'records': records
+            'records': records,
+            'deleted': deleted,
+            'cursor': next_cursor,
+            'full': full
         }), 200
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
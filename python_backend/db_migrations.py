@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DB Migrations - データベースのスキーマ移行と実行計画の確認
+スキーマの変更をバージョン付きの移行として順に適用する（適用済みのバージョンは PRAGMA user_version に記録）。
+
+- 移行は1つずつトランザクションで適用する（途中で失敗した移行は適用前の状態に戻る）
+- 起動時に init_database から migrate() を呼び出す（適用済みの移行は何もしない）
+- check_query_plans() は主要なクエリの実行計画（EXPLAIN QUERY PLAN）が
+  想定のインデックスを使用しているか確認する（全件スキャンへの退行の検出）
+
+使い方:
+    python db_migrations.py <db_path>            移行を適用し、実行計画を確認（想定と異なる場合は終了コード1）
+    python db_migrations.py <db_path> --check    移行を適用せずに実行計画のみ確認
+"""
+
+import sqlite3
+import sys
+
+
+def _add_master_data_sort_order(cursor):
+    """master_dataに表示順（sort_order）の列を追加（マスタデータAPI・CSV取り込みで使用）"""
+    cursor.execute('PRAGMA table_info(master_data)')
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'sort_order' not in columns:
+        cursor.execute('ALTER TABLE master_data ADD COLUMN sort_order INTEGER DEFAULT 9999')
+
+
+def _create_inspection_record_indexes(cursor):
+    """inspection_recordsの検索用インデックスを作成"""
+    # 重機・日付範囲（帳票の組み立て）
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inspection_records_machine_date
+        ON inspection_records (machine_id, inspection_date)
+    ''')
+    # 点検記録APIのページ分割（inspection_date, created_at, id の降順）
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inspection_records_date_order
+        ON inspection_records (inspection_date, created_at, id)
+    ''')
+    # 現場ごとの帳票・現場の削除
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inspection_records_site_name
+        ON inspection_records (site_name)
+    ''')
+    # 点検者での絞り込み
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inspection_records_inspector_name
+        ON inspection_records (inspector_name)
+    ''')
+    # 更新日時での差分の取得
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inspection_records_updated_at
+        ON inspection_records (updated_at)
+    ''')
+
+
+def _create_master_data_order_index(cursor):
+    """master_dataの種類ごとの表示順のインデックスを作成（一覧取得・sort_orderの最大値）"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_master_data_type_order
+        ON master_data (data_type, sort_order)
+    ''')
+
+
+def _create_change_sequence(cursor):
+    """
+    点検記録の変更番号（change_seq）と削除記録（record_tombstones）を追加（差分同期で使用）
+
+    変更番号はトリガーで採番するため、どの経路の書き込み（API・現場の削除・CSV取り込み）でも付与される
+    """
+    cursor.execute('ALTER TABLE inspection_records ADD COLUMN change_seq INTEGER')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_sequence (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS record_tombstones (
+            id TEXT PRIMARY KEY,
+            change_seq INTEGER NOT NULL,
+            deleted_at TEXT NOT NULL
+        )
+    ''')
+
+    # 既存の点検記録は更新日時の順に採番
+    cursor.execute('SELECT rowid FROM inspection_records ORDER BY updated_at, rowid')
+    rowids = [row[0] for row in cursor.fetchall()]
+    cursor.executemany(
+        'UPDATE inspection_records SET change_seq = ? WHERE rowid = ?',
+        ((seq, rowid) for seq, rowid in enumerate(rowids, start=1))
+    )
+    cursor.execute('INSERT INTO sync_sequence (id, value) VALUES (1, ?)', (len(rowids),))
+
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_inspection_records_change_seq
+        ON inspection_records (change_seq)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_record_tombstones_change_seq
+        ON record_tombstones (change_seq)
+    ''')
+
+    # 作成・更新: 変更番号を採番（同じIDの削除記録は取り消し）
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_inspection_records_insert_seq
+        AFTER INSERT ON inspection_records
+        BEGIN
+            UPDATE sync_sequence SET value = value + 1 WHERE id = 1;
+            UPDATE inspection_records SET change_seq = (SELECT value FROM sync_sequence WHERE id = 1)
+            WHERE rowid = NEW.rowid;
+            DELETE FROM record_tombstones WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_inspection_records_update_seq
+        AFTER UPDATE OF id, machine_id, site_name, inspector_name, inspection_date, results, created_at, updated_at
+        ON inspection_records
+        BEGIN
+            UPDATE sync_sequence SET value = value + 1 WHERE id = 1;
+            UPDATE inspection_records SET change_seq = (SELECT value FROM sync_sequence WHERE id = 1)
+            WHERE rowid = NEW.rowid;
+        END
+    ''')
+    # 削除: 削除記録を残す
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_inspection_records_delete_seq
+        AFTER DELETE ON inspection_records
+        BEGIN
+            UPDATE sync_sequence SET value = value + 1 WHERE id = 1;
+            INSERT OR REPLACE INTO record_tombstones (id, change_seq, deleted_at)
+            VALUES (OLD.id, (SELECT value FROM sync_sequence WHERE id = 1), strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'));
+        END
+    ''')
+
+
+# スキーマの移行（バージョン, 内容, 移行処理）。追加のみ行い、適用済みの移行は変更しないこと
+MIGRATIONS = (
+    (1, 'master_data.sort_order', _add_master_data_sort_order),
+    (2, 'inspection_recordsの検索用インデックス', _create_inspection_record_indexes),
+    (3, 'master_dataの表示順インデックス', _create_master_data_order_index),
+    (4, '点検記録の変更番号・削除記録（差分同期）', _create_change_sequence),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    """適用済みのスキーマのバージョン"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """
+    未適用の移行を順に適用（テーブルは作成済みであること）
+
+    Args:
+        conn: データベース接続（コミット済みの状態で渡す）
+
+    Returns:
+        適用した移行のバージョンのリスト
+    """
+    current = schema_version(conn)
+    applied = []
+    for version, description, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            migration(cursor)
+            # PRAGMAはパラメータを使用できないため整数に変換して埋め込む
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(version)
+        print(f'✅ スキーマ移行: v{version} {description}')
+    return applied
+
+
+# ============================================================
+# 実行計画の確認
+# ============================================================
+
+# (内容, クエリ, パラメータ, 使用を想定するインデックス)
+QUERY_PLAN_CHECKS = (
+    (
+        '重機・対象月の点検記録（帳票の組み立て）',
+        'SELECT * FROM inspection_records WHERE machine_id = ? AND inspection_date >= ? AND inspection_date < ? '
+        'ORDER BY inspection_date, created_at',
+        ('m', '2025-01-01', '2025-02-01'),
+        'idx_inspection_records_machine_date',
+    ),
+    (
+        '現場・対象月の点検記録（現場の一括帳票）',
+        'SELECT * FROM inspection_records WHERE site_name = ? AND inspection_date >= ? AND inspection_date < ? '
+        'ORDER BY machine_id, inspection_date, created_at',
+        ('s', '2025-01-01', '2025-02-01'),
+        'idx_inspection_records_site_name',
+    ),
+    (
+        '現場の点検記録数（現場の削除）',
+        'SELECT COUNT(*) FROM inspection_records WHERE site_name = ?',
+        ('s',),
+        'idx_inspection_records_site_name',
+    ),
+    (
+        '現場の点検記録の削除',
+        'DELETE FROM inspection_records WHERE site_name = ?',
+        ('s',),
+        'idx_inspection_records_site_name',
+    ),
+    (
+        '点検記録の一覧（ページ分割）',
+        'SELECT * FROM inspection_records WHERE (inspection_date, created_at, id) < (?, ?, ?) '
+        'ORDER BY inspection_date DESC, created_at DESC, id DESC LIMIT ?',
+        ('2025-01-01', '2025-01-01', 'id', 100),
+        'idx_inspection_records_date_order',
+    ),
+    (
+        '点検者での絞り込み',
+        'SELECT * FROM inspection_records WHERE inspector_name = ? '
+        'ORDER BY inspection_date DESC, created_at DESC, id DESC LIMIT ?',
+        ('i', 100),
+        'idx_inspection_records_inspector_name',
+    ),
+    (
+        '更新日時以降の点検記録（差分の取得）',
+        'SELECT * FROM inspection_records WHERE updated_at > ? ORDER BY updated_at',
+        ('2025-01-01',),
+        'idx_inspection_records_updated_at',
+    ),
+    (
+        '変更番号以降の点検記録（差分同期）',
+        'SELECT * FROM inspection_records WHERE change_seq > ? AND change_seq <= ? ORDER BY change_seq',
+        (0, 100),
+        'idx_inspection_records_change_seq',
+    ),
+    (
+        '変更番号以降の削除記録（差分同期）',
+        'SELECT id FROM record_tombstones WHERE change_seq > ? AND change_seq <= ? ORDER BY change_seq',
+        (0, 100),
+        'idx_record_tombstones_change_seq',
+    ),
+    (
+        '同期時の既存レコードの確認',
+        'SELECT updated_at, machine_id, inspection_date FROM inspection_records WHERE id = ?',
+        ('id',),
+        'sqlite_autoindex_inspection_records_1',
+    ),
+    (
+        'マスタデータの一覧',
+        "SELECT name FROM master_data WHERE data_type = 'site' ORDER BY sort_order, name",
+        (),
+        'idx_master_data_type_order',
+    ),
+)
+
+
+def query_plan(conn, sql, params=()):
+    """クエリの実行計画（EXPLAIN QUERY PLANのdetail列）のリスト"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+
+
+def schema_copy(conn):
+    """
+    スキーマ（テーブル・インデックス）のみを複製したメモリ上のデータベース
+
+    実行計画の確認用。統計情報（ANALYZE）やデータの偏りに左右されず、インデックスの有無のみで確認できる
+    """
+    copy = sqlite3.connect(':memory:')
+    rows = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY type = 'index'"
+    ).fetchall()
+    for (sql,) in rows:
+        copy.execute(sql)
+    return copy
+
+
+def check_query_plans(conn, checks=QUERY_PLAN_CHECKS):
+    """
+    主要なクエリの実行計画が想定のインデックスを使用しているか確認（schema_copy() の接続で確認すること）
+
+    Returns:
+        想定と異なるクエリの (内容, 実行計画) のリスト（すべて想定どおりの場合は空）
+    """
+    failures = []
+    for description, sql, params, index in checks:
+        plan = query_plan(conn, sql, params)
+        if not any(f'INDEX {index}' in detail for detail in plan):
+            failures.append((description, plan))
+    return failures
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python db_migrations.py <db_path> [--check]')
+        sys.exit(1)
+
+    connection = sqlite3.connect(sys.argv[1])
+    try:
+        if '--check' not in sys.argv[2:]:
+            migrate(connection)
+        failed = check_query_plans(schema_copy(connection))
+    except sqlite3.OperationalError as e:
+        # テーブルはサーバーの起動時（init_database）に作成される
+        print(f'❌ スキーマ移行エラー: {e}')
+        sys.exit(1)
+    print(f'📊 スキーマのバージョン: v{schema_version(connection)} (最新: v{SCHEMA_VERSION})')
+    for description, plan in failed:
+        print(f'❌ インデックスを使用していません: {description}')
+        for detail in plan:
+            print(f'     {detail}')
+    connection.close()
+    print(f'📊 実行計画の確認: {len(QUERY_PLAN_CHECKS) - len(failed)}/{len(QUERY_PLAN_CHECKS)}件が想定どおり')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DB Pool - SQLiteの接続プール（WALモード）
+リクエストごとに接続を開き直さず、開いた接続（プリペアドステートメントのキャッシュを含む）を再利用する。
+
+- 接続はWALモードで開く（読み取りは書き込み中も待たされない）
+- 読み取りはロックなしで並行に実行し、書き込みのみ write_lock で直列化する
+- get() で取り出した接続の close() はプールへの返却（未確定のトランザクションはロールバック）
+- Flaskの開発サーバーはリクエストごとにスレッドを作るため、接続はスレッドではなくプールに保持する
+
+設定（環境変数）:
+    DB_POOL_SIZE          プールに保持する接続数の上限（既定: 8）
+    DB_BUSY_TIMEOUT_MS    ロック待ちのタイムアウト（ミリ秒、既定: 5000）
+    DB_SYNCHRONOUS        PRAGMA synchronous（既定: NORMAL、WALモードではコミット時の整合性は保たれる）
+    DB_CACHE_SIZE_KB      接続ごとのページキャッシュ（KB、既定: 16384）
+    DB_MMAP_SIZE_MB       メモリマップドI/Oの大きさ（MB、既定: 256、0で無効）
+    DB_STATEMENT_CACHE    接続ごとのプリペアドステートメントのキャッシュ数（既定: 256）
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')
+DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 16384))
+DB_MMAP_SIZE_MB = int(os.environ.get('DB_MMAP_SIZE_MB', 256))
+DB_STATEMENT_CACHE = int(os.environ.get('DB_STATEMENT_CACHE', 256))
+
+
+class PooledConnection(sqlite3.Connection):
+    """プールの接続（close() はプールへの返却、返却済みの接続の close() は何もしない）"""
+
+    pool = None
+    checked_out = False
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        elif self.checked_out:
+            self.checked_out = False
+            self.pool.release(self)
+
+
+class ConnectionPool:
+    """SQLiteの接続プール"""
+
+    def __init__(self, db_path, size=DB_POOL_SIZE):
+        """
+        Args:
+            db_path: データベースファイルのパス
+            size: プールに保持する接続数の上限（同時に使用できる接続数の上限ではない）
+        """
+        self.db_path = db_path
+        self.size = size
+        # 書き込み（INSERT / UPDATE / DELETE とそのトランザクション）用のロック
+        self.write_lock = threading.Lock()
+        # 直近に返却された接続から再利用（ページキャッシュが温まっている）
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            factory=PooledConnection,
+            cached_statements=DB_STATEMENT_CACHE,
+            check_same_thread=False,
+        )
+        conn.pool = self
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(f'PRAGMA synchronous = {DB_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE_MB * 1024 * 1024}')
+        conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def get(self):
+        """
+        接続を取り出す（空きがなければ新しく開く）
+
+        使用後は close() でプールに返却する。1つの接続は同時に1スレッドのみで使用すること
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        conn.checked_out = True
+        return conn
+
+    def release(self, conn):
+        """接続をプールに返却（未確定のトランザクションはロールバック、上限を超える分は閉じる）"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            sqlite3.Connection.close(conn)
+            return
+        if self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            sqlite3.Connection.close(conn)
+
+    def close_all(self):
+        """プール内の接続をすべて閉じる"""
+        while True:
+            try:
+                sqlite3.Connection.close(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def stats(self):
+        """接続数（これまでに開いた数・プール内の空き数）"""
+        return {'created': self._created, 'idle': self._idle.qsize()}
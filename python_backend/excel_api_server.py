@@ -7,15 +7,25 @@ FlutterアプリからExcel生成リクエストを受け付けるAPIサーバ
 
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
+import io
 import json
 import os
 import tempfile
-from datetime import datetime
-from excel_generator_advanced import create_inspection_report
+from excel_generator_advanced import (
+    create_inspection_report, preload_report_skeletons,
+    REPORT_ENGINES, DEFAULT_ENGINE, REPORT_STYLINGS, DEFAULT_STYLING,
+)
+from report_cache import ReportCache, report_cache_key, REPORT_CACHE_ENABLED
 
 app = Flask(__name__)
 CORS(app)  # CORS対応
 
+# 帳票スケルトンを事前構築（リクエストごとのレイアウト構築を省略）
+preload_report_skeletons()
+
+# 生成済み帳票のキャッシュ
+report_cache = ReportCache(os.path.join(tempfile.gettempdir(), 'inspection_report_cache')) if REPORT_CACHE_ENABLED else None
+
 @app.route('/api/generate-excel', methods=['POST'])
 def generate_excel():
     """
@@ -44,36 +54,60 @@ def generate_excel():
         if not data:
             return jsonify({'error': 'リクエストボディが空です'}), 400
         
+        # 重機画像はサーバーで設定するもののみ使用（リクエストで指定されたファイルパスは使用しない）
+        data.pop('machine_image', None)
+        
+        # 描画エンジン（?engine=stream でXMLストリームエンジンを使用）
+        engine = request.args.get('engine')
+        if engine and engine not in REPORT_ENGINES:
+            return jsonify({'error': f'未対応の描画エンジンです: {engine}'}), 400
+        
+        # 書式モード（?styling=compact で名前付きスタイル・条件付き書式を使用）
+        styling = request.args.get('styling')
+        if styling and styling not in REPORT_STYLINGS:
+            return jsonify({'error': f'未対応の書式モードです: {styling}'}), 400
+        
         print('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
         print('📊 Excel生成APIリクエスト受信')
         print(f'   重機: {data.get("machine_model")} {data.get("machine_unit")}')
         print(f'   対象月: {data.get("year")}年{data.get("month")}月')
         print('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
         
-        # 一時ファイルパスを生成
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'inspection_report_{timestamp}.xlsx'
-        output_path = os.path.join(tempfile.gettempdir(), filename)
+        # 同じ帳票を取得済みの場合は生成を省略
+        etag = report_cache_key(
+            'create_inspection_report', data, engine or DEFAULT_ENGINE, styling or DEFAULT_STYLING
+        )
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
         
-        # Excel生成
-        create_inspection_report(data, output_path)
+        content = report_cache.get(etag) if report_cache else None
+        if content is not None:
+            print(f'📦 キャッシュ済みの帳票を使用: {etag[:12]}')
+        else:
+            # Excel生成（メモリ上に生成）
+            content = create_inspection_report(data, engine=engine, styling=styling)
+            if report_cache:
+                report_cache.put(etag, content)
         
-        # ファイルが生成されたか確認
-        if not os.path.exists(output_path):
+        # 生成されたか確認
+        if not content:
             return jsonify({'error': 'Excelファイルの生成に失敗しました'}), 500
         
-        print(f'✅ Excel生成成功: {output_path}')
+        print(f'✅ Excel生成成功: {len(content):,} bytes')
         
         # ダウンロード用ファイル名
         machine_info = f"{data.get('machine_model', '重機')}_{data.get('machine_unit', '')}".replace('/', '_')
         download_filename = f"点検表_{machine_info}_{data.get('year')}年{data.get('month')}月.xlsx"
         
-        # Excelファイルを返す
+        # Excelファイルを返す（メモリ上の内容をそのまま送信）
         return send_file(
-            output_path,
+            io.BytesIO(content),
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
-            download_name=download_filename
+            download_name=download_filename,
+            etag=etag
         )
         
     except Exception as e:
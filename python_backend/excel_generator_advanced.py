@@ -3,31 +3,536 @@
 """
 Advanced Excel Generator with Image and Border Support
 画像挿入と罫線をサポートする高度なExcel生成スクリプト
+
+帳票の静的なレイアウト（列幅・行高・結合・固定文言・罫線）はreport_layoutで宣言的に定義し、
+コンパイルした描画プランから重機種別ごとのスケルトンを一度だけ構築してキャッシュし、
+リクエストごとにはスケルトンを複製してから可変部分のみを書き込む。
+
+書式モード（styling）:
+    full      セルごとに書式を設定（⚪×の塗りつぶしを含む）
+    compact   名前付きスタイルを参照し、⚪×は条件付き書式で色付け。
+              値のないセルはフォント・配置を設定せず、書式も値もないセルは書き出さない
+
+⚪×は点検記録を1回走査して作る項目×日の点検結果の行列（result_matrix）から書き込み、
+点検データの include_summary が真の場合は同じ行列から項目ごとの要修理数・点検日数・
+適合率を集計したシート（集計シート）を帳票の次に追加する。
 """
 
+import io
 import sys
 import json
+import threading
+import time
+import zipfile
+from copy import copy
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell.cell import Cell, MergedCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.formatting.rule import CellIsRule
 from openpyxl.drawing.image import Image
 from openpyxl.utils import get_column_letter
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.worksheet.merge import MergedCellRange
+from openpyxl.drawing.spreadsheet_drawing import SpreadsheetDrawing, OneCellAnchor, AnchorMarker
+from openpyxl.drawing.xdr import XDRPositiveSize2D
+from openpyxl.utils.units import pixels_to_EMU
+from openpyxl.worksheet._writer import WorksheetWriter
+from openpyxl.writer.excel import ExcelWriter
 from datetime import datetime
 import os
+from xlsx_stream_writer import (
+    XlsxStreamWriter, DeterministicZipFile, StyleTable, ZIP_DATE_TIME, cell_xml, patch_sheet_cells,
+)
+from machine_images import is_allowed_image_path
+from report_layout import (
+    compile_layout, REPORT_VARIANTS, VARIANT_EXCAVATOR, VARIANT_HAND_GUIDED, VARIANT_GENERAL,
+    MACHINE_IMAGE_AREA, MACHINE_IMAGE_ANCHOR, area_pixels, fit_image, pixel_position,
+)
+
+# ============================================================
+# スタイル定義
+# ============================================================
+
+# フォント
+font_hgmincho_18 = Font(name='HG明朝E', size=18)
+font_hgmincho_18_bold = Font(name='HG明朝E', size=18, bold=True)
+font_hgmincho_14 = Font(name='HG明朝E', size=14)
+font_hgmincho_14_bold = Font(name='HG明朝E', size=14, bold=True)
+font_hgmincho_16_bold_underline = Font(name='HG明朝E', size=16, bold=True, underline='single')
+font_hgmincho_22_bold = Font(name='HG明朝E', size=22, bold=True)
+font_hgmincho_26_bold_italic = Font(name='HG明朝E', size=26, bold=True, italic=True)
+font_hgmincho_16 = Font(name='HG明朝E', size=16)
+font_hgmincho_12 = Font(name='HG明朝E', size=12)
+font_hgmincho_11 = Font(name='HG明朝E', size=11, bold=True)
+font_hgmincho_10 = Font(name='HG明朝E', size=10)
+font_hgmincho_9 = Font(name='HG明朝E', size=9)
+
+# 配置
+align_left_center = Alignment(horizontal='left', vertical='center')
+align_center_center = Alignment(horizontal='center', vertical='center')
+align_left_bottom = Alignment(horizontal='left', vertical='bottom')
+align_center_center_wrap = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+# 背景色
+fill_gray = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
+fill_green = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
+fill_red = PatternFill(start_color='FF6B6B', end_color='FF6B6B', fill_type='solid')
+
+# 罫線
+thin_border = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+top_border = Border(top=Side(style='thin'))
+left_border = Border(left=Side(style='thin'))
+bottom_border = Border(bottom=Side(style='thin'))
+right_border = Border(right=Side(style='thin'))
+
+# ============================================================
+# 書式モード
+# ============================================================
+
+# 書式モード（環境変数 INSPECTION_REPORT_STYLING で既定値を変更可能）
+STYLING_FULL = 'full'
+STYLING_COMPACT = 'compact'
+REPORT_STYLINGS = (STYLING_FULL, STYLING_COMPACT)
+DEFAULT_STYLING = os.environ.get('INSPECTION_REPORT_STYLING', STYLING_FULL)
+
+# compact: ワークブックごとに一度だけ登録する名前付きスタイル (名前, フォント, 配置)
+# 同じフォント・配置のセルはこの名前付きスタイルを参照する
+_COMPACT_NAMED_STYLES = (
+    ('点検結果', font_hgmincho_10, align_center_center),
+    ('点検者', font_hgmincho_10, align_center_center_wrap),
+    ('点検項目', font_hgmincho_14, align_left_center),
+    ('見出し', font_hgmincho_11, align_center_center),
+    ('記入欄', font_hgmincho_16, align_center_center),
+    ('工事名', font_hgmincho_18, align_left_center),
+)
+
+# compact: ⚪×の条件付き書式（AM10:BQ23） (値, 塗りつぶし)
+_RESULT_RANGE = 'AM10:BQ23'
+_RESULT_FORMATS = (('⚪', fill_green), ('×', fill_red))
 
-def create_inspection_report(data, output_path):
+# ============================================================
+# 重機種別ごとのスケルトン（静的レイアウト）キャッシュ
+# ============================================================
+
+# スケルトンからコピーするワークブック共有のスタイル表
+_STYLE_TABLES = (
+    '_fonts', '_fills', '_borders', '_alignments',
+    '_protections', '_number_formats', '_cell_styles',
+)
+
+_skeleton_lock = threading.Lock()
+_skeleton_workbook = None
+_skeleton_sheets = {}
+# compact書式を適用済みのスケルトン
+_compact_skeleton_sheets = {}
+# compact: {(fontId, alignmentId): 名前付きスタイルのxfId}
+_compact_named_ids = {}
+
+
+def get_report_variant(machine_type):
+    """重機種類から帳票バリエーション（関係法令の記載）を判定"""
+    if '油圧ショベル' in machine_type or '油圧ｼｮﾍﾞﾙ' in machine_type:
+        return VARIANT_EXCAVATOR
+    elif 'ハンドガイド式' in machine_type:
+        return VARIANT_HAND_GUIDED
+    # ブルドーザ、不整地運搬車、コンバインドローラー、振動ローラー
+    return VARIANT_GENERAL
+
+
+def preload_report_skeletons():
     """
-    点検帳票を生成
-    
+    全バリエーションのスケルトンを構築してキャッシュ（サーバー起動時に呼び出す）
+
+    全バリエーションを1つのワークブック内に構築するため、スタイル表は
+    全スケルトンで共有され、複製先でもそのまま有効なインデックスとなる。
+    compact書式を適用したスケルトンも同じワークブック内に構築する。
+    """
+    global _skeleton_workbook
+    if _skeleton_workbook is not None:
+        return _skeleton_workbook
+
+    with _skeleton_lock:
+        if _skeleton_workbook is None:
+            wb = Workbook()
+            wb.remove(wb.active)
+            sheets = {}
+            for variant in REPORT_VARIANTS:
+                ws = wb.create_sheet(variant)
+                _build_report_skeleton(ws, variant)
+                sheets[variant] = ws
+
+            # 名前付きスタイルのxfIdは登録順（0はNormal）
+            named_ids = {
+                (wb._fonts.add(font), wb._alignments.add(alignment)): xf_id
+                for xf_id, (_, font, alignment) in enumerate(_COMPACT_NAMED_STYLES, start=1)
+            }
+            compact_sheets = {}
+            for variant in REPORT_VARIANTS:
+                ws = wb.create_sheet(f'{variant}_compact')
+                _copy_skeleton(sheets[variant], ws)
+                _compact_cells(ws, list(ws._cells), named_ids, keep_input_fields=True)
+                compact_sheets[variant] = ws
+
+            _skeleton_sheets.update(sheets)
+            _compact_skeleton_sheets.update(compact_sheets)
+            _compact_named_ids.update(named_ids)
+            _skeleton_workbook = wb
+    return _skeleton_workbook
+
+
+def new_report_workbook():
+    """スケルトンのスタイル表を引き継いだ空のワークブックを作成"""
+    skeleton_wb = preload_report_skeletons()
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name in _STYLE_TABLES:
+        setattr(wb, name, IndexedList(getattr(skeleton_wb, name)))
+    return wb
+
+
+def clone_report_skeleton(wb, variant, title, styling=STYLING_FULL):
+    """
+    キャッシュ済みスケルトンを複製してワークシートを追加
+
+    Args:
+        wb: new_report_workbook()で作成したワークブック
+        variant: 帳票バリエーション（get_report_variant()の戻り値）
+        title: シート名
+        styling: 書式モード（compactの場合はcompact書式を適用済みのスケルトンを複製）
+    """
+    preload_report_skeletons()
+    sheets = _compact_skeleton_sheets if styling == STYLING_COMPACT else _skeleton_sheets
+    ws = wb.create_sheet(title)
+    _copy_skeleton(sheets[variant], ws)
+    return ws
+
+
+def _copy_skeleton(src, ws):
+    """スケルトンのセル・列幅・行高・結合セルを複製"""
+
+    # セル（値・スタイル）の複製
+    cells = ws._cells
+    for (row, col), src_cell in src._cells.items():
+        if isinstance(src_cell, MergedCell):
+            cell = MergedCell(ws, row, col)
+        else:
+            cell = Cell(ws, row=row, column=col)
+            cell._value = src_cell._value
+            cell.data_type = src_cell.data_type
+        if src_cell.has_style:
+            cell._style = copy(src_cell._style)
+        cells[(row, col)] = cell
+
+    # 列幅・行高の複製
+    for attr in ('column_dimensions', 'row_dimensions'):
+        target = getattr(ws, attr)
+        for key, dim in getattr(src, attr).items():
+            target[key] = copy(dim)
+            target[key].worksheet = ws
+
+    # 結合セルの複製（罫線は複製済みのため再計算しない）
+    for mcr in src.merged_cells.ranges:
+        ws.merged_cells.add(MergedCellRange(ws, mcr.coord))
+
+
+def _compact_cells(ws, coords, named_ids, keep_input_fields=False):
+    """
+    指定セルにcompact書式を適用
+
+    値のないセルはフォント・配置を外し（罫線・塗りつぶしは保持）、書式も値もないセルは削除する。
+    名前付きスタイルと同じフォント・配置のセルは名前付きスタイルを参照させる。
+
+    Args:
+        keep_input_fields: 値のない記入欄（結合セル以外）のフォント・配置を残す
+                           （スケルトンでは記入欄の値は後から書き込むため）
+    """
+    for coord in coords:
+        cell = ws._cells[coord]
+        style = cell._style
+        merged = isinstance(cell, MergedCell)
+        if merged or cell._value is None or cell._value == '':
+            if not style or not (style.fillId or style.borderId or (keep_input_fields and not merged)):
+                del ws._cells[coord]
+                continue
+            if merged or not keep_input_fields:
+                style.fontId = 0
+                style.alignmentId = 0
+        if style:
+            style.xfId = named_ids.get((style.fontId, style.alignmentId), 0)
+
+
+def _merge_cells_keeping_style(ws, range_string):
+    """
+    結合前の各セルのスタイルを保持したままセルを結合
+
+    スケルトンでは罫線が設定済みのため、結合時に生成される
+    MergedCellへ元のスタイルを引き継ぐ（ws.merge_cellsによる罫線の再計算は行わない）
+    """
+    mcr = MergedCellRange(ws, range_string)
+    ws.merged_cells.add(mcr)
+    cells = mcr.cells
+    next(cells)  # 左上のセルはそのまま
+    for coord in cells:
+        cell = ws._cells.get(coord)
+        merged = MergedCell(ws, *coord)
+        if cell is not None and cell.has_style:
+            merged._style = cell._style
+        ws._cells[coord] = merged
+
+
+def _openpyxl_font(key):
+    name, size, bold, italic, underline = key
+    return Font(name=name, size=size, bold=bold, italic=italic, underline=underline)
+
+
+def _openpyxl_fill(key):
+    return PatternFill(start_color=key, end_color=key, fill_type='solid')
+
+
+def _openpyxl_border(key):
+    return Border(**{
+        side: Side(style=style)
+        for side, style in zip(('left', 'right', 'top', 'bottom'), key) if style
+    })
+
+
+def _openpyxl_alignment(key):
+    horizontal, vertical, wrap_text = key
+    return Alignment(horizontal=horizontal, vertical=vertical, wrap_text=wrap_text or None)
+
+
+def _build_report_skeleton(ws, variant):
+    """
+    コンパイル済みレイアウト（report_layout）から帳票の静的レイアウトを構築
+
+    各セルの書式はレイアウトのコンパイル時に確定しているため、セルごとに一度だけ設定する
+
+    Args:
+        ws: 構築先のワークシート
+        variant: 帳票バリエーション
+    """
+    layout = compile_layout(variant)
+
+    for col, width in layout['col_widths'].items():
+        ws.column_dimensions[get_column_letter(col)].width = width
+    for row, height in layout['row_heights'].items():
+        ws.row_dimensions[row].height = height
+
+    merged_cells = layout['merged_cells']
+    for (row, col), (value, font, fill, border, alignment) in layout['cells'].items():
+        if (row, col) in merged_cells:
+            cell = MergedCell(ws, row, col)
+        else:
+            cell = Cell(ws, row=row, column=col, value=value)
+        if font is not None:
+            cell.font = _openpyxl_font(font)
+        if fill is not None:
+            cell.fill = _openpyxl_fill(fill)
+        if border is not None:
+            cell.border = _openpyxl_border(border)
+        if alignment is not None:
+            cell.alignment = _openpyxl_alignment(alignment)
+        ws._cells[(row, col)] = cell
+
+    # 結合セル（罫線は設定済みのため再計算しない）
+    for range_string in layout['merges']:
+        ws.merged_cells.add(MergedCellRange(ws, range_string))
+
+
+# ============================================================
+# 可変部分（ヘッダー値・⚪×・点検者）の書き込み内容
+# ============================================================
+
+# 値を変更しない書き込み（スタイルのみ設定）を表す目印
+_UNCHANGED = object()
+
+
+def _report_image(data):
+    """
+    点検データの重機画像（machine_image: 帳票用に縮小済みの画像）
+
+    重機画像の保存先・既定画像のディレクトリ以外のファイルは使用しない（任意のファイルの読み込みを防ぐ）
+
+    Returns:
+        {'path': 画像ファイルのパス, 'width': 幅, 'height': 高さ}、画像がない場合はNone
+    """
+    image = data.get('machine_image')
+    if not isinstance(image, dict) or not isinstance(image.get('path'), str):
+        return None
+    if not is_allowed_image_path(image['path']) or not os.path.isfile(image['path']):
+        return None
+    return image
+
+
+def _image_placement(plan, image):
+    """
+    重機画像の配置（画像エリアに収まる大きさで中央に配置）
+
+    Returns:
+        (列, 行, セルの左端からのx, セルの上端からのy, 幅, 高さ)（位置・大きさはpx）
+    """
+    x, y, width, height = fit_image(
+        area_pixels(plan, MACHINE_IMAGE_AREA), image['width'], image['height']
+    )
+    col, row, x_offset, y_offset = pixel_position(plan, x, y)
+    return col, row, x_offset, y_offset, width, height
+
+
+# ============================================================
+# 点検結果の行列（項目×日）
+# ============================================================
+# 点検記録を1回だけ走査して、項目×日の点検結果（正規化済み）の行列を作る。
+# ⚪×の書き込みと集計シートの統計は同じ行列から求める。
+
+RESULT_NONE = 0     # 記録なし
+RESULT_GOOD = 1     # 良好（⚪）
+RESULT_BAD = 2      # 要修理（×）
+RESULT_UNKNOWN = 3  # 記録はあるが良否が不明（値は書き込まず書式のみ設定）
+
+# is_goodの値 → 点検結果（True、true、1、'1'を良好、False、false、0、'0'を要修理として扱う）
+# True == 1、False == 0 のため、キーTrue・Falseは1・0にも一致する
+_RESULT_STATUS = {
+    True: RESULT_GOOD, 'true': RESULT_GOOD, '1': RESULT_GOOD,
+    False: RESULT_BAD, 'false': RESULT_BAD, '0': RESULT_BAD,
+}
+
+# 点検結果 → (⚪×の値, 塗りつぶし)
+_RESULT_CELLS = {
+    RESULT_GOOD: ('⚪', fill_green),
+    RESULT_BAD: ('×', fill_red),
+    RESULT_UNKNOWN: (_UNCHANGED, None),
+}
+
+# 帳票の点検項目数・日数（行10～23、AM列～BQ列）
+REPORT_ITEM_COUNT = 14
+REPORT_DAY_COUNT = 31
+
+
+def result_matrix(items, records):
+    """
+    点検記録を項目×日の点検結果の行列に変換
+
+    Args:
+        items: 点検項目のリスト（行列の行の順序）
+        records: 点検記録のリスト（同じ日の記録が複数ある場合は後の記録の良否を優先）
+
+    Returns:
+        matrix[項目の並び順][日 - 1] = RESULT_NONE / RESULT_GOOD / RESULT_BAD / RESULT_UNKNOWN
+    """
+    matrix = [[RESULT_NONE] * REPORT_DAY_COUNT for _ in items]
+    # 項目コード → 行列の行（同じコードの項目が複数ある場合はすべての行）
+    rows_by_code = {}
+    for item, row in zip(items, matrix):
+        rows_by_code.setdefault(item.get('code', ''), []).append(row)
+    if not rows_by_code:
+        return matrix
+
+    for record in records:
+        day = int(record.get('day', 0))
+        if not 1 <= day <= REPORT_DAY_COUNT:
+            continue
+        for code, result in record.get('results', {}).items():
+            rows = rows_by_code.get(code)
+            if rows is None:
+                continue
+            try:
+                status = _RESULT_STATUS.get(result.get('is_good'), RESULT_UNKNOWN)
+            except TypeError:
+                # ハッシュ化できない値（リストなど）
+                status = RESULT_UNKNOWN
+            for row in rows:
+                # 良否が不明な記録は、同じ日の先の記録の良否を上書きしない
+                if status != RESULT_UNKNOWN or row[day - 1] == RESULT_NONE:
+                    row[day - 1] = status
+    return matrix
+
+
+def report_matrix(data):
+    """点検データの帳票に載る点検項目（先頭14項目）の点検結果の行列"""
+    return result_matrix(data.get('items', [])[:REPORT_ITEM_COUNT], data.get('records', []))
+
+
+def _compliance(good, bad):
+    """適合率（%、小数第1位まで）。点検結果がない場合はNone"""
+    if good + bad == 0:
+        return None
+    return round(good / (good + bad) * 100, 1)
+
+
+def result_statistics(items, matrix):
+    """
+    点検結果の行列から月間の統計を集計
+
+    Returns:
+        {'days_inspected': 点検日数（良否の記録がある日数）, 'good': 良好の数, 'bad': 要修理の数,
+         'compliance': 適合率（%）,
+         'items': [{'code', 'name', 'days_inspected', 'good', 'bad', 'compliance'}, ...]}
+    """
+    item_statistics = []
+    for item, row in zip(items, matrix):
+        good = row.count(RESULT_GOOD)
+        bad = row.count(RESULT_BAD)
+        item_statistics.append({
+            'code': item.get('code', ''),
+            'name': item.get('name', ''),
+            'days_inspected': good + bad,
+            'good': good,
+            'bad': bad,
+            'compliance': _compliance(good, bad),
+        })
+
+    good = sum(item['good'] for item in item_statistics)
+    bad = sum(item['bad'] for item in item_statistics)
+    days_inspected = sum(
+        1 for day in zip(*matrix) if RESULT_GOOD in day or RESULT_BAD in day
+    )
+    return {
+        'days_inspected': days_inspected,
+        'good': good,
+        'bad': bad,
+        'compliance': _compliance(good, bad),
+        'items': item_statistics,
+    }
+
+
+def _machine_name(machine_type):
+    """
+    重機名部分のみ抽出（括弧の前まで）
+
+    全角括弧と半角括弧の両方に対応
+    例: 「油圧ショベル（PC200）」→「油圧ショベル」
+    例: 「油圧ショベル(PC200)」→「油圧ショベル」
+    """
+    if '（' in machine_type:
+        return machine_type[:machine_type.index('（')]
+    if '(' in machine_type:
+        return machine_type[:machine_type.index('(')]
+    return machine_type
+
+
+def _report_content(data, styling=STYLING_FULL, matrix=None):
+    """
+    点検データから可変部分の書き込み内容を生成（描画エンジン共通）
+
     Args:
         data: 点検データ（JSON形式）
-        output_path: 出力ファイルパス
+        styling: 書式モード（compactの場合、⚪×の塗りつぶしは書き込まない）
+        matrix: 点検結果の行列（report_matrixの戻り値、省略時は点検データから作成）
+
+    Returns:
+        (variant, writes, merges)
+        writes: (row, col, value, font, fill, alignment) のリスト
+                （value=_UNCHANGEDは値を変更しない、スタイルのNoneは変更しない）
+        merges: 追加で結合するセル範囲のリスト
     """
-    
-    # ワークブック作成
-    wb = Workbook()
-    ws = wb.active
-    ws.title = '油圧ｼｮﾍﾞﾙ'
-    
+
     # 基本情報の取得
     machine_type = data.get('machine_type', '油圧ショベル')
     machine_model = data.get('machine_model', '')
@@ -40,7 +545,7 @@ def create_inspection_report(data, output_path):
     year = data.get('year', 2025)
     records = data.get('records', [])
     items = data.get('items', [])
-    
+
     # 型式部分のみ抽出（括弧内の文字）
     # 全角括弧と半角括弧の両方に対応
     # 例: 「油圧ショベル（PC200）」→「PC200」
@@ -54,811 +559,839 @@ def create_inspection_report(data, output_path):
         start_idx = machine_model.index('(') + 1
         end_idx = machine_model.index(')')
         model_spec = machine_model[start_idx:end_idx]
-    
+
     # 重機名部分のみ抽出（括弧の前まで）
-    # 全角括弧と半角括弧の両方に対応
-    # 例: 「油圧ショベル（PC200）」→「油圧ショベル」
-    # 例: 「油圧ショベル(PC200)」→「油圧ショベル」
-    machine_name = machine_type
-    if '（' in machine_name:
-        machine_name = machine_name[:machine_name.index('（')]
-    elif '(' in machine_name:
-        machine_name = machine_name[:machine_name.index('(')]
-    
-    # ============================================================
-    # スタイル定義
-    # ============================================================
-    
-    # フォント
-    font_hgmincho_18 = Font(name='HG明朝E', size=18)
-    font_hgmincho_14 = Font(name='HG明朝E', size=14)
-    font_hgmincho_14_bold = Font(name='HG明朝E', size=14, bold=True)
-    font_hgmincho_16_bold_underline = Font(name='HG明朝E', size=16, bold=True, underline='single')
-    font_hgmincho_22_bold = Font(name='HG明朝E', size=22, bold=True)
-    font_hgmincho_26_bold_italic = Font(name='HG明朝E', size=26, bold=True, italic=True)
-    font_hgmincho_16 = Font(name='HG明朝E', size=16)
-    font_hgmincho_12 = Font(name='HG明朝E', size=12)
-    font_hgmincho_11 = Font(name='HG明朝E', size=11, bold=True)
-    font_hgmincho_10 = Font(name='HG明朝E', size=10)
-    font_hgmincho_9 = Font(name='HG明朝E', size=9)
-    
-    # 配置
-    align_left_center = Alignment(horizontal='left', vertical='center')
-    align_center_center = Alignment(horizontal='center', vertical='center')
-    align_left_bottom = Alignment(horizontal='left', vertical='bottom')
-    align_center_center_wrap = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    
-    # 背景色
-    fill_gray = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
-    fill_green = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
-    fill_red = PatternFill(start_color='FF6B6B', end_color='FF6B6B', fill_type='solid')
-    
-    # 罫線
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    top_border = Border(top=Side(style='thin'))
-    left_border = Border(left=Side(style='thin'))
-    bottom_border = Border(bottom=Side(style='thin'))
-    right_border = Border(right=Side(style='thin'))
-    
-    # ============================================================
-    # 列幅設定
-    # ============================================================
-    
-    # A列: 36px ≈ 5文字
-    ws.column_dimensions['A'].width = 5.0
-    
-    # B～AK列: 24px ≈ 3.3文字
-    for col_idx in range(2, 38):
-        ws.column_dimensions[get_column_letter(col_idx)].width = 3.3
-    
-    # AL列: 48px ≈ 6.7文字
-    ws.column_dimensions['AL'].width = 6.7
-    
-    # AM列以降: 32px ≈ 4.5文字
-    for col_idx in range(39, 71):
-        ws.column_dimensions[get_column_letter(col_idx)].width = 4.5
-    
-    # ============================================================
-    # 行高設定
-    # ============================================================
-    
-    # 行1～4: 24px
-    for row in range(1, 5):
-        ws.row_dimensions[row].height = 24
-    
-    # 行5: 43px
-    ws.row_dimensions[5].height = 43
-    
-    # 行6: 18px
-    ws.row_dimensions[6].height = 18
-    
-    # 行7: 31px
-    ws.row_dimensions[7].height = 31
-    
-    # 行8: 9px
-    ws.row_dimensions[8].height = 9
-    
-    # 行9～26: 32px
-    for row in range(9, 27):
-        ws.row_dimensions[row].height = 32
-    
-    # 行27: 72px
-    ws.row_dimensions[27].height = 72
-    
-    # 行28～31: 37px
-    for row in range(28, 32):
-        ws.row_dimensions[row].height = 37
-    
+    machine_name = _machine_name(machine_type)
+
+    writes = []
+    merges = []
+
     # ============================================================
-    # 行1: 工事名
+    # ヘッダー情報
     # ============================================================
-    
-    ws['A1'] = '工事名'
-    ws['A1'].font = font_hgmincho_18
-    ws['A1'].alignment = align_left_center
-    
-    # D1:E1を結合して「：」
-    ws.merge_cells('D1:E1')
-    ws['D1'] = '：'
-    ws['D1'].font = font_hgmincho_14
-    ws['D1'].alignment = align_center_center
-    
+
     # F1に工事名
     if site_name:
-        ws['F1'] = site_name
-        ws['F1'].font = font_hgmincho_18
-        ws['F1'].alignment = align_left_center
-    
-    # ============================================================
-    # 行3: 法的要求事項とヘッダー情報
-    # ============================================================
-    
-    # A3セルの関係法令を重機種類ごとに設定
-    if '油圧ショベル' in machine_type or '油圧ｼｮﾍﾞﾙ' in machine_type:
-        ws['A3'] = '　【ｸﾚｰﾝ則第７８条】'
-    elif 'ハンドガイド式' in machine_type:
-        ws['A3'] = '　【労働安全衛生法第２０条】'
-    else:
-        # ブルドーザ、不整地運搬車、コンバインドローラー、振動ローラー
-        ws['A3'] = '　【安衛則第１７０条】'
-    ws['A3'].font = font_hgmincho_14
-    ws['A3'].alignment = align_left_center
-    
-    ws['J3'] = '・★は法的要求事項'
-    ws['J3'].font = font_hgmincho_14
-    ws['J3'].alignment = align_left_center
-    
-    # AM3:AW3 → 所有会社名
-    ws.merge_cells('AM3:AW3')
-    ws['AM3'] = '所有会社名'
-    ws['AM3'].font = font_hgmincho_11
-    ws['AM3'].alignment = align_center_center
-    
-    # AX3:BD3 → 取扱責任者（点検者）
-    ws.merge_cells('AX3:BD3')
-    ws['AX3'] = '取扱責任者（点検者）'
-    ws['AX3'].font = font_hgmincho_11
-    ws['AX3'].alignment = align_center_center
-    
-    # BE3:BH3 → 型式
-    ws.merge_cells('BE3:BH3')
-    ws['BE3'] = '型式'
-    ws['BE3'].font = font_hgmincho_11
-    ws['BE3'].alignment = align_center_center
-    
-    # BI3:BL3 → 機械番号
-    ws.merge_cells('BI3:BL3')
-    ws['BI3'] = '機械番号'
-    ws['BI3'].font = font_hgmincho_11
-    ws['BI3'].alignment = align_center_center
-    
-    # BN3:BQ3 → 作業所長確認
-    ws.merge_cells('BN3:BQ3')
-    ws['BN3'] = '作業所長確認'
-    ws['BN3'].font = font_hgmincho_11
-    ws['BN3'].alignment = align_center_center
-    
-    # ============================================================
-    # 行4: 法的要求事項と型式・号機
-    # ============================================================
-    
-    # A4セルの関係法令（油圧ショベルの場合のみ記入）
-    if '油圧ショベル' in machine_type or '油圧ｼｮﾍﾞﾙ' in machine_type:
-        ws['A4'] = '　【安衛則第１７０条】'
-        ws['A4'].font = font_hgmincho_14
-        ws['A4'].alignment = align_left_center
-    
-    ws['J4'] = '・その他は点検すべき事項とみなした箇所'
-    ws['J4'].font = font_hgmincho_14
-    ws['J4'].alignment = align_left_center
-    
-    # AM4:AW5を結合（所有会社名記入欄）
-    ws.merge_cells('AM4:AW5')
-    ws['AM4'] = company_name
-    ws['AM4'].font = font_hgmincho_16
-    ws['AM4'].alignment = align_center_center
-    
-    # AX4:BD5を結合（取扱責任者（点検者）名記入欄）
-    ws.merge_cells('AX4:BD5')
-    ws['AX4'] = responsible_person
-    ws['AX4'].font = font_hgmincho_16
-    ws['AX4'].alignment = align_center_center
-    
-    # BE4:BH5を結合して型式を自動入力（中央配置）
-    ws.merge_cells('BE4:BH5')
-    ws['BE4'] = machine_model  # machine_model全体を使用（括弧内のみではない）
-    ws['BE4'].font = font_hgmincho_16
-    ws['BE4'].alignment = align_center_center
-    
-    # BI4:BL5を結合して号機番号を自動入力
-    ws.merge_cells('BI4:BL5')
-    ws['BI4'] = machine_unit
-    ws['BI4'].font = font_hgmincho_16
-    ws['BI4'].alignment = align_center_center
-    
-    # BN4:BQ5の結合は後で一括実行（行655）
-    
-    # ============================================================
+        writes.append((1, 6, site_name, font_hgmincho_18, None, align_left_center))
+
+    writes.append((4, 39, company_name, None, None, None))          # AM4: 所有会社名
+    writes.append((4, 50, responsible_person, None, None, None))    # AX4: 取扱責任者
+    writes.append((4, 57, machine_model, None, None, None))         # BE4: 型式（machine_model全体）
+    writes.append((4, 61, machine_unit, None, None, None))          # BI4: 号機
+
     # 行5: タイトル（重機名のみ、型式は除外）
-    # ============================================================
-    
-    ws['A5'] = f'{month}月度　{machine_name}　作業開始前点検表'
-    ws['A5'].font = font_hgmincho_26_bold_italic
-    ws['A5'].alignment = align_left_bottom
-    
-    # ============================================================
-    # 行7: 注意書き
-    # ============================================================
-    
-    ws['A7'] = '※点検時、作業時問わず異常を認めたときは、元請点検責任者に報告及び速やかに補修その他必要な措置を取ること'
-    ws['A7'].font = font_hgmincho_16_bold_underline
-    ws['A7'].alignment = align_left_bottom
-    
-    # ============================================================
-    # 行9: ヘッダー行
-    # ============================================================
-    
-    # A9:Q9 → 点検項目
-    ws.merge_cells('A9:Q9')
-    ws['A9'] = '点検項目'
-    ws['A9'].font = font_hgmincho_14_bold
-    ws['A9'].fill = fill_gray
-    ws['A9'].alignment = align_center_center
-    
-    # R9:AL9 → 点検ポイント
-    ws.merge_cells('R9:AL9')
-    ws['R9'] = '点検ポイント'
-    ws['R9'].font = font_hgmincho_14_bold
-    ws['R9'].fill = fill_gray
-    ws['R9'].alignment = align_center_center
-    
-    # AM9～BQ9に1～31日（11pt）
-    for day in range(1, 32):
-        col_idx = 38 + day  # AM列は39列目（38+1）
-        if col_idx <= 69:
-            cell = ws.cell(row=9, column=col_idx)
-            cell.value = str(day)
-            cell.font = font_hgmincho_11
-            cell.fill = fill_gray
-            cell.alignment = align_center_center
-    
-    # A9～BQ9の上部に罫線
-    for col_idx in range(1, 70):
-        cell = ws.cell(row=9, column=col_idx)
-        cell.border = top_border
-    
+    writes.append((5, 1, f'{month}月度　{machine_name}　作業開始前点検表', None, None, None))
+
     # ============================================================
     # 行10～23: 点検項目とデータ
     # ============================================================
-    
-    for i, item in enumerate(items[:14]):
+
+    if matrix is None:
+        matrix = report_matrix(data)
+
+    for i, item in enumerate(items[:REPORT_ITEM_COUNT]):
         row = 10 + i
-        
+
         # A列: ★マーク
         if item.get('is_required', False):
-            ws.cell(row=row, column=1).value = '★'
-            ws.cell(row=row, column=1).font = font_hgmincho_14
-            ws.cell(row=row, column=1).alignment = align_center_center
-        
+            writes.append((row, 1, '★', font_hgmincho_14, None, align_center_center))
+
         # B列: 項目名
-        ws.cell(row=row, column=2).value = item.get('name', '')
-        ws.cell(row=row, column=2).font = font_hgmincho_14
-        ws.cell(row=row, column=2).alignment = align_left_center
-        
+        writes.append((row, 2, item.get('name', ''), font_hgmincho_14, None, align_left_center))
+
         # R列: 点検ポイント
-        ws.cell(row=row, column=18).value = item.get('check_point', '')
-        ws.cell(row=row, column=18).font = font_hgmincho_14
-        ws.cell(row=row, column=18).alignment = align_left_center
-        
-        # AM列～: ⚪×データ
-        item_code = item.get('code', '')
-        for record in records:
-            day = int(record.get('day', 0))
-            results = record.get('results', {})
-            
-            if item_code in results:
-                col_idx = 38 + day
-                if col_idx <= 69:
-                    cell = ws.cell(row=row, column=col_idx)
-                    result = results[item_code]
-                    
-                    # is_goodの判定（True、true、1、'1'、'true'を良好として扱う）
-                    is_good_value = result.get('is_good')
-                    if is_good_value == True or is_good_value == 'true' or is_good_value == 1 or is_good_value == '1':
-                        cell.value = '⚪'
-                        cell.fill = fill_green
-                    elif is_good_value == False or is_good_value == 'false' or is_good_value == 0 or is_good_value == '0':
-                        cell.value = '×'
-                        cell.fill = fill_red
-                    
-                    cell.font = font_hgmincho_10
-                    cell.alignment = align_center_center
-    
+        writes.append((row, 18, item.get('check_point', ''), font_hgmincho_14, None, align_left_center))
+
+        # AM列～: ⚪×データ（点検結果の行列から）
+        for day, status in enumerate(matrix[i], start=1):
+            if status == RESULT_NONE:
+                continue
+            value, fill = _RESULT_CELLS[status]
+            if styling == STYLING_COMPACT:
+                # 塗りつぶしは条件付き書式で設定
+                fill = None
+            writes.append((row, 38 + day, value, font_hgmincho_10, fill, align_center_center))
+
     # ============================================================
-    # 行24～26: 説明と点検者
+    # 行24～26: 点検者
     # ============================================================
-    
-    ws['A24'] = '１．点検時'
-    ws['A24'].font = font_hgmincho_14
-    ws['A24'].alignment = align_left_center
-    
-    ws['I24'] = '良好…○　要調整、修理…×（使用禁止）　・該当なし…－'
-    ws['I24'].font = font_hgmincho_14
-    ws['I24'].alignment = align_left_center
-    
-    ws['B25'] = 'チェック記号'
-    ws['B25'].font = font_hgmincho_14
-    ws['B25'].alignment = align_left_center
-    
-    ws['I25'] = '調整または補修したとき…×を○で囲む'
-    ws['I25'].font = font_hgmincho_14
-    ws['I25'].alignment = align_left_center
-    
-    ws['A26'] = '２．元請点検責任者は、毎月上旬・中旬・下旬毎に１回点検状況を確認すること。'
-    ws['A26'].font = font_hgmincho_14
-    ws['A26'].alignment = align_left_center
-    
-    # AL24:AL26 → 点検者
-    ws.merge_cells('AL24:AL26')
-    ws['AL24'] = '点\n検\n者'
-    ws['AL24'].font = font_hgmincho_12
-    ws['AL24'].alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    
+
     # AM24～BQ26: 点検者名
     for record in records:
         day = int(record.get('day', 0))
         inspector = record.get('inspector_name', '')
         col_idx = 38 + day
-        
+
         if col_idx <= 69:
             # 24～26行を結合
-            start_cell = f'{get_column_letter(col_idx)}24'
-            end_cell = f'{get_column_letter(col_idx)}26'
-            ws.merge_cells(f'{start_cell}:{end_cell}')
-            
-            cell = ws[start_cell]
+            column = get_column_letter(col_idx)
+            merges.append(f'{column}24:{column}26')
+
             # 点検者名を縦書きにするため、各文字を改行で区切る
             vertical_text = '\n'.join(list(inspector))
-            cell.value = vertical_text
-            cell.font = font_hgmincho_10
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    
+            writes.append((24, col_idx, vertical_text, font_hgmincho_10, None, align_center_center_wrap))
+
     # ============================================================
     # 行27: 元請点検責任者確認欄
     # ============================================================
-    
-    # AK27:AL27
-    ws.merge_cells('AK27:AL27')
-    ws['AK27'] = '元請点検\n責任者\n確認欄'
-    ws['AK27'].font = font_hgmincho_10
-    ws['AK27'].alignment = align_center_center_wrap
-    
-    # AM27:AT27 - 元請点検責任者を記入（16pt、中央配置）
-    ws.merge_cells('AM27:AT27')
-    ws['AM27'] = prime_contractor_inspector
-    ws['AM27'].font = font_hgmincho_16
-    ws['AM27'].alignment = align_center_center
-    
-    # AU27:AV27を結合
-    ws.merge_cells('AU27:AV27')
-    
-    # AW27:BD27 - 元請点検責任者を記入（16pt、中央配置）
-    ws.merge_cells('AW27:BD27')
-    ws['AW27'] = prime_contractor_inspector
-    ws['AW27'].font = font_hgmincho_16
-    ws['AW27'].alignment = align_center_center
-    
-    # BE27:BF27を結合
-    ws.merge_cells('BE27:BF27')
-    
-    # BG27:BO27 - 元請点検責任者を記入（16pt、中央配置）
-    ws.merge_cells('BG27:BO27')
-    ws['BG27'] = prime_contractor_inspector
-    ws['BG27'].font = font_hgmincho_16
-    ws['BG27'].alignment = align_center_center
-    
-    # BP27:BQ27を結合
-    ws.merge_cells('BP27:BQ27')
-    
-    # ============================================================
-    # 行28: 補修関連ヘッダー（11pt）
-    # ============================================================
-    
-    ws.merge_cells('AK28:BE28')
-    ws['AK28'] = '補修内容'
-    ws['AK28'].font = font_hgmincho_11
-    ws['AK28'].alignment = align_center_center
-    
-    ws.merge_cells('BF28:BH28')
-    ws['BF28'] = '補修日'
-    ws['BF28'].font = font_hgmincho_11
-    ws['BF28'].alignment = align_center_center
-    
-    ws.merge_cells('BI28:BK28')
-    ws['BI28'] = '補修者'
-    ws['BI28'].font = font_hgmincho_11
-    ws['BI28'].alignment = align_center_center
-    
-    ws.merge_cells('BL28:BN28')
-    ws['BL28'] = '元請点検\n責任者'
-    ws['BL28'].font = font_hgmincho_11
-    ws['BL28'].alignment = align_center_center_wrap
-    
-    ws.merge_cells('BO28:BQ28')
-    ws['BO28'] = '作業所長'
-    ws['BO28'].font = font_hgmincho_11
-    ws['BO28'].alignment = align_center_center
-    
-    # ============================================================
-    # 行29: 補修関連データ行（セル結合）
-    # ============================================================
-    
-    ws.merge_cells('AK29:BE29')
-    ws.merge_cells('BF29:BH29')
-    ws.merge_cells('BI29:BK29')
-    ws.merge_cells('BL29:BN29')
-    ws.merge_cells('BO29:BQ29')
-    
-    # ============================================================
-    # 行30～31: 補修関連データ行（セル結合）
-    # ============================================================
-    
-    ws.merge_cells('AK30:BE30')
-    ws.merge_cells('BF30:BH30')
-    ws.merge_cells('BI30:BK30')
-    ws.merge_cells('BL30:BN30')  # 行30のBL～BN列を結合
-    ws.merge_cells('BO30:BQ30')
-    
-    ws.merge_cells('AK31:BE31')
-    ws.merge_cells('BF31:BH31')
-    ws.merge_cells('BI31:BK31')
-    ws.merge_cells('BL31:BN31')  # 行31のBL～BN列を結合
-    ws.merge_cells('BO31:BQ31')
-    
-    # ============================================================
-    # 行27～31: 重機画像エリア（A27:AJ31を結合）
-    # ============================================================
-    
-    # A27:AJ31をマージし、「※重機画像添付※」と表示
-    ws.merge_cells('A27:AJ31')
-    ws['A27'] = '※重機画像添付※'
-    ws['A27'].font = Font(name='HG明朝E', size=18, bold=True)
-    ws['A27'].alignment = align_center_center
-    
-    # ============================================================
-    # 罫線の設定（A9～BQ31の外枠）
-    # ============================================================
-    
-    # A～BQ列の行10～24の各セル上部に罫線を追加
-    for row in range(10, 25):
-        for col_idx in range(1, 70):  # A列(1)～BQ列(69)
-            cell = ws.cell(row=row, column=col_idx)
-            current_border = cell.border if cell.border else Border()
-            cell.border = Border(
-                top=Side(style='thin'),
-                left=current_border.left,
-                right=current_border.right,
-                bottom=current_border.bottom
-            )
-    
-    # A9～A31の左側に罫線
-    for row in range(9, 32):
-        ws.cell(row=row, column=1).border = Border(
-            left=Side(style='thin'),
-            top=ws.cell(row=row, column=1).border.top if ws.cell(row=row, column=1).border else None,
-            bottom=ws.cell(row=row, column=1).border.bottom if ws.cell(row=row, column=1).border else None,
-            right=ws.cell(row=row, column=1).border.right if ws.cell(row=row, column=1).border else None
-        )
-    
-    # A31～BQ31の下部に罫線
-    for col_idx in range(1, 70):
-        ws.cell(row=31, column=col_idx).border = Border(
-            bottom=Side(style='thin'),
-            left=ws.cell(row=31, column=col_idx).border.left if ws.cell(row=31, column=col_idx).border else None,
-            top=ws.cell(row=31, column=col_idx).border.top if ws.cell(row=31, column=col_idx).border else None,
-            right=ws.cell(row=31, column=col_idx).border.right if ws.cell(row=31, column=col_idx).border else None
-        )
-    
-    # BQ9～BQ31の右側に罫線
-    for row in range(9, 32):
-        ws.cell(row=row, column=69).border = Border(
-            right=Side(style='thin'),
-            left=ws.cell(row=row, column=69).border.left if ws.cell(row=row, column=69).border else None,
-            top=ws.cell(row=row, column=69).border.top if ws.cell(row=row, column=69).border else None,
-            bottom=ws.cell(row=row, column=69).border.bottom if ws.cell(row=row, column=69).border else None
-        )
-    
+
+    writes.append((27, 39, prime_contractor_inspector, None, None, None))   # AM27
+    writes.append((27, 49, prime_contractor_inspector, None, None, None))   # AW27
+    writes.append((27, 59, prime_contractor_inspector, None, None, None))   # BG27
+
     # ============================================================
-    # 追加罫線設定
+    # 行27～31: 重機画像（画像がある場合は「※重機画像添付※」を消す）
     # ============================================================
-    
-    # 1. 行10～23のA列、Q列、AL列の右側に罫線
-    for row in range(10, 24):
-        # A列(1)の右側
-        cell = ws.cell(row=row, column=1)
-        cell.border = Border(
-            left=cell.border.left if cell.border else None,
-            top=cell.border.top if cell.border else None,
-            bottom=cell.border.bottom if cell.border else None,
-            right=Side(style='thin')
-        )
-        # Q列(17)の右側
-        cell = ws.cell(row=row, column=17)
-        cell.border = Border(
-            left=cell.border.left if cell.border else None,
-            top=cell.border.top if cell.border else None,
-            bottom=cell.border.bottom if cell.border else None,
-            right=Side(style='thin')
-        )
-        # AL列(38)の右側
-        cell = ws.cell(row=row, column=38)
-        cell.border = Border(
-            left=cell.border.left if cell.border else None,
-            top=cell.border.top if cell.border else None,
-            bottom=cell.border.bottom if cell.border else None,
-            right=Side(style='thin')
+
+    if _report_image(data) is not None:
+        row, col = MACHINE_IMAGE_ANCHOR
+        writes.append((row, col, None, None, None, None))
+
+    return get_report_variant(machine_type), writes, merges
+
+
+# ============================================================
+# 集計シート（点検データの include_summary が真の場合に帳票の次に追加）
+# ============================================================
+
+_SUMMARY_HEADER_ROW = 9
+_SUMMARY_COLUMN_WIDTHS = {1: 8, 2: 36, 3: 12, 4: 12, 5: 12, 6: 14}
+
+
+def _summary_content(data, matrix):
+    """
+    集計シートの書き込み内容（点検結果の行列から集計）
+
+    Returns:
+        (row, col, value, font, fill, border, alignment) のリスト
+    """
+    statistics = result_statistics(data.get('items', [])[:REPORT_ITEM_COUNT], matrix)
+    machine_name = _machine_name(data.get('machine_type', '油圧ショベル'))
+
+    def percent(value):
+        return '-' if value is None else value
+
+    writes = [
+        (1, 1, f"{data.get('year', 2025)}年{data.get('month', 1)}月度　{machine_name}　点検集計",
+         font_hgmincho_14_bold, None, None, align_left_center),
+        (2, 1, f"型式: {data.get('machine_model', '')}　号機: {data.get('machine_unit', '')}　"
+               f"工事名: {data.get('site_name', '')}",
+         font_hgmincho_10, None, None, align_left_center),
+    ]
+
+    # 行4～7: 月間の集計
+    for row, (label, value) in enumerate((
+        ('点検日数', statistics['days_inspected']),
+        ('良好（⚪）', statistics['good']),
+        ('要修理（×）', statistics['bad']),
+        ('適合率（%）', percent(statistics['compliance'])),
+    ), start=4):
+        writes.append((row, 1, label, font_hgmincho_11, fill_gray, thin_border, align_left_center))
+        writes.append((row, 2, value, font_hgmincho_10, None, thin_border, align_center_center))
+
+    # 行9～: 項目ごとの集計
+    header = ('No', '点検項目', '点検日数', '良好（⚪）', '要修理（×）', '適合率（%）')
+    for col, label in enumerate(header, start=1):
+        writes.append((_SUMMARY_HEADER_ROW, col, label, font_hgmincho_11, fill_gray, thin_border, align_center_center))
+    for i, item in enumerate(statistics['items'], start=1):
+        row = _SUMMARY_HEADER_ROW + i
+        values = (i, item['name'], item['days_inspected'], item['good'], item['bad'], percent(item['compliance']))
+        for col, value in enumerate(values, start=1):
+            alignment = align_left_center if col == 2 else align_center_center
+            # 要修理がある項目は塗りつぶし
+            fill = fill_red if col == 5 and item['bad'] else None
+            writes.append((row, col, value, font_hgmincho_10, fill, thin_border, alignment))
+    return writes
+
+
+def _summary_sheet_title(title, used):
+    """集計シートのシート名（帳票のシート名_集計、31文字以内・重複不可）"""
+    tail = '_集計'
+    summary_title = title[:31 - len(tail)] + tail
+    suffix = 2
+    while summary_title.lower() in used:
+        numbered_tail = f'({suffix}){tail}'
+        summary_title = title[:31 - len(numbered_tail)] + numbered_tail
+        suffix += 1
+    used.add(summary_title.lower())
+    return summary_title
+
+
+# ============================================================
+# 描画エンジン: openpyxl
+# ============================================================
+
+class _CompactStyles:
+    """
+    compact書式のワークブックごとのスタイル登録表
+
+    名前付きスタイルを一度だけ登録し、書き込みに使う書式（Font・PatternFill・Alignment）の
+    インデックスもオブジェクトごとに一度だけ求める（セルごとの書式のハッシュ計算を省く）。
+    """
+
+    def __init__(self, wb):
+        self._wb = wb
+        self._ids = {}
+        # スケルトンと同じ順序で登録するため、xfIdは_compact_named_idsと一致する
+        for name, font, alignment in _COMPACT_NAMED_STYLES:
+            wb.add_named_style(NamedStyle(name=name, font=font, alignment=alignment))
+
+    def index(self, table, obj):
+        """スタイル表（'_fonts'など）でのインデックスを取得"""
+        key = (table, id(obj))
+        index = self._ids.get(key)
+        if index is None:
+            index = self._ids[key] = getattr(self._wb, table).add(obj)
+        return index
+
+
+def _write_compact_sheet(ws, writes, styles):
+    """
+    compact書式のスケルトンに可変部分を書き込む
+
+    書式はインデックスを直接設定し、書き込んだセルのみにcompact書式を適用する。
+    ⚪×の色は条件付き書式で設定する。
+    """
+    written = []
+    for row, col, value, font, fill, alignment in writes:
+        cell = ws.cell(row=row, column=col)
+        if value is not _UNCHANGED:
+            cell.value = value
+        style = cell._style
+        if not style:
+            style = cell._style = StyleArray()
+        if font is not None:
+            style.fontId = styles.index('_fonts', font)
+        if fill is not None:
+            style.fillId = styles.index('_fills', fill)
+        if alignment is not None:
+            style.alignmentId = styles.index('_alignments', alignment)
+        written.append((row, col))
+    _compact_cells(ws, dict.fromkeys(written), _compact_named_ids)
+
+    for value, fill in _RESULT_FORMATS:
+        ws.conditional_formatting.add(
+            _RESULT_RANGE, CellIsRule(operator='equal', formula=[f'"{value}"'], fill=fill)
         )
-    
-    # 2. AM～BL列(38～64)の行2、3、5の下部に罫線
-    for row in [2, 3, 5]:
-        for col_idx in range(38, 65):  # AM(38)～BL(64)
-            cell = ws.cell(row=row, column=col_idx)
-            cell.border = Border(
-                left=cell.border.left if cell.border else None,
-                top=cell.border.top if cell.border else None,
-                right=cell.border.right if cell.border else None,
-                bottom=Side(style='thin')
-            )
-    
-    # 2-0. AL2セルの下部罫線を削除
-    cell = ws.cell(row=2, column=38)
-    cell.border = Border(
-        left=cell.border.left if cell.border else None,
-        top=cell.border.top if cell.border else None,
-        right=cell.border.right if cell.border else None
+
+
+def _write_openpyxl_sheet(wb, data, title, styling=STYLING_FULL, compact_styles=None, matrix=None):
+    """スケルトンを複製したワークシートを追加し、可変部分を書き込む"""
+    variant, writes, merges = _report_content(data, styling, matrix)
+    ws = clone_report_skeleton(wb, variant, title, styling)
+
+    # 結合（スケルトンの罫線は保持）
+    for range_string in merges:
+        _merge_cells_keeping_style(ws, range_string)
+
+    image = _report_image(data)
+    if image is not None:
+        _add_openpyxl_image(ws, _get_stream_plan(variant), image)
+
+    if styling == STYLING_COMPACT:
+        _write_compact_sheet(ws, writes, compact_styles)
+        return ws
+
+    for row, col, value, font, fill, alignment in writes:
+        cell = ws.cell(row=row, column=col)
+        if value is not _UNCHANGED:
+            cell.value = value
+        if font is not None:
+            cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        if alignment is not None:
+            cell.alignment = alignment
+    return ws
+
+
+def _write_openpyxl_summary_sheet(wb, data, title, matrix):
+    """集計シートを追加"""
+    ws = wb.create_sheet(title)
+    for col, width in _SUMMARY_COLUMN_WIDTHS.items():
+        ws.column_dimensions[get_column_letter(col)].width = width
+    for row, col, value, font, fill, border, alignment in _summary_content(data, matrix):
+        cell = ws.cell(row=row, column=col, value=value)
+        cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        if border is not None:
+            cell.border = border
+        cell.alignment = alignment
+    return ws
+
+
+def _add_openpyxl_image(ws, plan, image):
+    """重機画像を画像エリアに配置（縮小済みの画像ファイルをそのまま埋め込む）"""
+    col, row, x_offset, y_offset, width, height = _image_placement(plan, image)
+    img = Image(image['path'])
+    img.width, img.height = width, height
+    img.anchor = OneCellAnchor(
+        _from=AnchorMarker(col=col - 1, colOff=pixels_to_EMU(x_offset), row=row - 1, rowOff=pixels_to_EMU(y_offset)),
+        ext=XDRPositiveSize2D(pixels_to_EMU(width), pixels_to_EMU(height)),
     )
-    
-    # 3. 行3～5のAL、AW、BD、BH、BL、BM、BQ列の右側に罫線
-    # AL=38, AW=49, BD=56, BH=60, BL=64, BM=65, BQ=69
-    border_cols = [38, 49, 56, 60, 64, 65, 69]
-    for row in range(3, 6):
-        for col_idx in border_cols:
-            cell = ws.cell(row=row, column=col_idx)
-            cell.border = Border(
-                left=cell.border.left if cell.border else None,
-                top=cell.border.top if cell.border else None,
-                bottom=cell.border.bottom if cell.border else None,
-                right=Side(style='thin')
-            )
-    
-    # 4. A～AK列(1～37)の行25、26の下部に罫線
-    for row in [25, 26]:
-        for col_idx in range(1, 38):  # A(1)～AK(37)
-            cell = ws.cell(row=row, column=col_idx)
-            cell.border = Border(
-                left=cell.border.left if cell.border else None,
-                top=cell.border.top if cell.border else None,
-                right=cell.border.right if cell.border else None,
-                bottom=Side(style='thin')
-            )
-    
-    # 5. AK～BQ列(37～69)の行27、28、29、30の下部に罫線
-    for row in [27, 28, 29, 30]:
-        for col_idx in range(37, 70):  # AK(37)～BQ(69)
-            cell = ws.cell(row=row, column=col_idx)
-            cell.border = Border(
-                left=cell.border.left if cell.border else None,
-                top=cell.border.top if cell.border else None,
-                right=cell.border.right if cell.border else None,
-                bottom=Side(style='thin')
-            )
-    
-    # 6. 行27のAL、AV、BF列の右側に罫線
-    # AL=38, AV=48, BF=58
-    for col_idx in [38, 48, 58]:
-        cell = ws.cell(row=27, column=col_idx)
-        cell.border = Border(
-            left=cell.border.left if cell.border else None,
-            top=cell.border.top if cell.border else None,
-            bottom=cell.border.bottom if cell.border else None,
-            right=Side(style='thin')
-        )
-    
-    # 7. 行28～31のBE、BH、BK、BN列の右側に罫線
-    # BE=57, BH=60, BK=63, BN=66
-    for row in range(28, 32):
-        for col_idx in [57, 60, 63, 66]:
-            cell = ws.cell(row=row, column=col_idx)
-            cell.border = Border(
-                left=cell.border.left if cell.border else None,
-                top=cell.border.top if cell.border else None,
-                bottom=cell.border.bottom if cell.border else None,
-                right=Side(style='thin')
-            )
-    
-    # ============================================================
-    # 追加修正: 罫線の追加・削除
-    # ============================================================
-    
-    # 1. 行3～5のAL列（38列）: 右側以外の罫線を削除
-    for row in range(3, 6):
-        cell = ws.cell(row=row, column=38)
-        cell.border = Border(
-            right=Side(style='thin')
-        )
-    
-    # 1-1. AL列の行3上部の罫線を削除
-    cell = ws.cell(row=3, column=38)
-    cell.border = Border(
-        right=Side(style='thin')
+    ws.add_image(img)
+
+
+class _InMemoryExcelWriter(ExcelWriter):
+    """ワークシートXMLを一時ファイルではなくメモリ上で組み立てるExcelWriter"""
+
+    def write_worksheet(self, ws):
+        ws._drawing = SpreadsheetDrawing()
+        ws._drawing.charts = ws._charts
+        ws._drawing.images = ws._images
+
+        writer = WorksheetWriter(ws, out=io.BytesIO())
+        writer.write()
+
+        ws._rels = writer._rels
+        self._archive.writestr(ws.path[1:], writer.out.getvalue())
+        self.manifest.append(ws)
+
+
+def _render_openpyxl(sheets, output_path, styling=STYLING_FULL):
+    """
+    openpyxlで帳票を生成して保存
+
+    Args:
+        sheets: (シート名, 点検データ) のリスト（全シートでスタイル表を共有）
+        output_path: 出力ファイルパスまたは書き込み可能なファイルオブジェクト
+        styling: 書式モード
+    """
+    wb = new_report_workbook()
+    compact_styles = _CompactStyles(wb) if styling == STYLING_COMPACT else None
+    used_titles = {title.lower() for title, _ in sheets}
+    for title, data in sheets:
+        matrix = report_matrix(data)
+        _write_openpyxl_sheet(wb, data, title, styling, compact_styles, matrix)
+        if data.get('include_summary'):
+            _write_openpyxl_summary_sheet(wb, data, _summary_sheet_title(title, used_titles), matrix)
+
+    # 作成・更新日時とzipのタイムスタンプを固定し、同じ入力から同一のファイルを出力
+    wb.properties.created = wb.properties.modified = datetime(*ZIP_DATE_TIME)
+    archive = DeterministicZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+    _InMemoryExcelWriter(wb, archive).save()
+
+
+# ============================================================
+# 描画エンジン: XMLストリーム
+# ============================================================
+
+def _font_key(font):
+    """openpyxlのFontをストリームライターのスタイルキーに変換"""
+    return (font.name, font.sz, bool(font.b), bool(font.i), font.u)
+
+
+def _fill_key(fill):
+    """openpyxlのPatternFillをストリームライターのスタイルキーに変換"""
+    return fill.fgColor.rgb if fill.fill_type == 'solid' else None
+
+
+def _border_key(border):
+    """openpyxlのBorderをストリームライターのスタイルキーに変換"""
+    key = tuple(
+        side.style if side is not None else None
+        for side in (border.left, border.right, border.top, border.bottom)
     )
-    
-    # 1-2. A列～Y列の行3、行4に罫線を追加
-    # A列の行3、4の左側罫線
-    for row in [3, 4]:
-        cell = ws.cell(row=row, column=1)
-        current_border = cell.border
-        cell.border = Border(
-            left=Side(style='thin'),
-            top=current_border.top if current_border else None,
-            right=current_border.right if current_border else None,
-            bottom=current_border.bottom if current_border else None
-        )
-    
-    # A～Y列の行3上部罫線
-    for col_idx in range(1, 26):  # A(1)～Y(25)
-        cell = ws.cell(row=3, column=col_idx)
-        current_border = cell.border
-        cell.border = Border(
-            left=current_border.left if current_border else None,
-            top=Side(style='thin'),
-            right=current_border.right if current_border else None,
-            bottom=current_border.bottom if current_border else None
-        )
-    
-    # A～Y列の行4下部罫線
-    for col_idx in range(1, 26):  # A(1)～Y(25)
-        cell = ws.cell(row=4, column=col_idx)
-        current_border = cell.border
-        cell.border = Border(
-            left=current_border.left if current_border else None,
-            top=current_border.top if current_border else None,
-            right=current_border.right if current_border else None,
-            bottom=Side(style='thin')
-        )
-    
-    # Y列の行3、4の右側罫線
-    for row in [3, 4]:
-        cell = ws.cell(row=row, column=25)
-        current_border = cell.border
-        cell.border = Border(
-            left=current_border.left if current_border else None,
-            top=current_border.top if current_border else None,
-            right=Side(style='thin'),
-            bottom=current_border.bottom if current_border else None
+    return key if any(key) else None
+
+
+def _alignment_key(alignment):
+    """openpyxlのAlignmentをストリームライターのスタイルキーに変換"""
+    return (alignment.horizontal, alignment.vertical, bool(alignment.wrap_text))
+
+
+def _get_stream_plan(variant):
+    """
+    ストリームエンジン用のセル表（コンパイル済みレイアウトをそのまま使用）
+
+    Returns:
+        {'cells': {(row, col): (value, font, fill, border, alignment)},
+         'col_widths': {列番号: 幅}, 'row_heights': {行番号: 高さ}, 'merges': [...]}
+    """
+    return compile_layout(variant)
+
+
+_EMPTY_STREAM_CELL = (None, None, None, None, None)
+
+
+def _apply_stream_writes(cells, writes):
+    """ストリームエンジン用のセル表に可変部分の書き込みを重ねる"""
+    for row, col, value, font, fill, alignment in writes:
+        current = cells.get((row, col), _EMPTY_STREAM_CELL)
+        cells[(row, col)] = (
+            current[0] if value is _UNCHANGED else value,
+            current[1] if font is None else _font_key(font),
+            current[2] if fill is None else _fill_key(fill),
+            current[3],
+            current[4] if alignment is None else _alignment_key(alignment),
         )
-    
-    # 2. BN～BQ列（66～69列）の行2、3の下部に罫線追加
-    for row in [2, 3]:
-        for col_idx in range(66, 70):  # BN(66)～BQ(69)
-            cell = ws.cell(row=row, column=col_idx)
-            cell.border = Border(
-                left=cell.border.left if cell.border else None,
-                top=cell.border.top if cell.border else None,
-                right=cell.border.right if cell.border else None,
-                bottom=Side(style='thin')
-            )
-    
-    # 2-1. BN～BQ列の行4と行5を結合（BN4:BQ5を1つに結合）
-    ws.merge_cells('BN4:BQ5')
-    
-    # 行5の下部に罫線を追加（BN～BQ列）
-    for col_idx in range(66, 70):  # BN(66)～BQ(69)
-        cell = ws.cell(row=5, column=col_idx)
-        current_border = cell.border
-        cell.border = Border(
-            left=current_border.left if current_border else None,
-            top=current_border.top if current_border else None,
-            right=current_border.right if current_border else None,
-            bottom=Side(style='thin')
+
+
+def _write_stream_sheet(writer, data, title, inline_cells=(), styling=STYLING_FULL, matrix=None):
+    """スケルトンのセル表に可変部分を重ねてワークシートを書き出し"""
+    variant, writes, merges = _report_content(data, styling, matrix)
+    plan = _get_stream_plan(variant)
+
+    cells = dict(plan['cells'])
+    merged = list(plan['merges'])
+    merged_set = set(merged)
+    for range_string in merges:
+        if range_string not in merged_set:
+            merged_set.add(range_string)
+            merged.append(range_string)
+
+    _apply_stream_writes(cells, writes)
+
+    conditional_formats = ()
+    if styling == STYLING_COMPACT:
+        # 値のないセルはフォント・配置を外し（罫線・塗りつぶしは保持）、書式も値もないセルは書き出さない
+        for key, (value, font, fill, border, alignment) in list(cells.items()):
+            if value is None or value == '':
+                if fill is None and border is None:
+                    del cells[key]
+                elif font is not None or alignment is not None:
+                    cells[key] = (value, None, fill, border, None)
+        conditional_formats = [
+            (_RESULT_RANGE, 'equal', f'"{value}"', _fill_key(fill)) for value, fill in _RESULT_FORMATS
+        ]
+
+    image = _report_image(data)
+    images = [(image['path'], _image_placement(plan, image))] if image is not None else ()
+
+    writer.add_sheet(
+        title, cells,
+        col_widths=plan['col_widths'],
+        row_heights=plan['row_heights'],
+        merges=merged,
+        inline_cells=inline_cells,
+        conditional_formats=conditional_formats,
+        images=images,
+    )
+
+
+def _write_stream_summary_sheet(writer, data, title, matrix):
+    """集計シートを書き出し"""
+    cells = {
+        (row, col): (
+            value,
+            _font_key(font),
+            None if fill is None else _fill_key(fill),
+            None if border is None else _border_key(border),
+            _alignment_key(alignment),
         )
-    
-    # 3. 行9のQ列（17）、AL列（38）の右側に罫線追加
-    for col_idx in [17, 38]:
-        cell = ws.cell(row=9, column=col_idx)
-        cell.border = Border(
-            left=cell.border.left if cell.border else None,
-            top=cell.border.top if cell.border else None,
-            bottom=cell.border.bottom if cell.border else None,
-            right=Side(style='thin')
+        for row, col, value, font, fill, border, alignment in _summary_content(data, matrix)
+    }
+    writer.add_sheet(title, cells, col_widths=_SUMMARY_COLUMN_WIDTHS)
+
+
+def _render_stream(sheets, output_path, styling=STYLING_FULL):
+    """
+    スタイル表を固定したXMLストリームで帳票を書き出し
+
+    Args:
+        sheets: (シート名, 点検データ) のリスト（スタイル表・共有文字列表は全シート共有）
+        output_path: 出力ファイルパスまたは書き込み可能なファイルオブジェクト
+        styling: 書式モード
+    """
+    with XlsxStreamWriter(output_path) as writer:
+        if styling == STYLING_COMPACT:
+            for name, font, alignment in _COMPACT_NAMED_STYLES:
+                writer.styles.named_style(name, _font_key(font), _alignment_key(alignment))
+        used_titles = {title.lower() for title, _ in sheets}
+        for title, data in sheets:
+            matrix = report_matrix(data)
+            _write_stream_sheet(writer, data, title, styling=styling, matrix=matrix)
+            if data.get('include_summary'):
+                _write_stream_summary_sheet(writer, data, _summary_sheet_title(title, used_titles), matrix)
+
+
+# 描画エンジン（環境変数 INSPECTION_REPORT_ENGINE で既定値を変更可能）
+ENGINE_OPENPYXL = 'openpyxl'
+ENGINE_STREAM = 'stream'
+_RENDERERS = {
+    ENGINE_OPENPYXL: _render_openpyxl,
+    ENGINE_STREAM: _render_stream,
+}
+REPORT_ENGINES = tuple(_RENDERERS)
+DEFAULT_ENGINE = os.environ.get('INSPECTION_REPORT_ENGINE', ENGINE_OPENPYXL)
+
+
+def _get_renderer(engine):
+    """描画エンジン名から描画関数を取得"""
+    engine = engine or DEFAULT_ENGINE
+    renderer = _RENDERERS.get(engine)
+    if renderer is None:
+        raise ValueError(f'未対応の描画エンジンです: {engine}')
+    return renderer
+
+
+def _get_styling(styling):
+    """書式モード名を検証（省略時はDEFAULT_STYLING）"""
+    styling = styling or DEFAULT_STYLING
+    if styling not in REPORT_STYLINGS:
+        raise ValueError(f'未対応の書式モードです: {styling}')
+    return styling
+
+
+def _render(renderer, sheets, output_path, styling):
+    """
+    描画関数で帳票を生成
+
+    output_pathがNoneの場合はメモリ上に生成してbytesを返す（ディスクへの書き込みなし）
+    """
+    if output_path is not None:
+        renderer(sheets, output_path, styling)
+        return None
+    buffer = io.BytesIO()
+    renderer(sheets, buffer, styling)
+    return buffer.getvalue()
+
+
+def _output_label(output_path, content):
+    """ログ出力用の出力先の表記"""
+    if content is not None:
+        return f'メモリ ({len(content):,} bytes)'
+    if isinstance(output_path, (str, os.PathLike)):
+        return output_path
+    return 'ファイルオブジェクト'
+
+
+def create_inspection_report(data, output_path=None, engine=None, styling=None):
+    """
+    点検帳票を生成
+
+    Args:
+        data: 点検データ（JSON形式、include_summaryが真の場合は集計シートを追加）
+        output_path: 出力ファイルパスまたは書き込み可能なファイルオブジェクト
+                     （省略時はメモリ上に生成してbytesを返す）
+        engine: 描画エンジン（'openpyxl' または 'stream'、省略時はDEFAULT_ENGINE）
+        styling: 書式モード（'full' または 'compact'、省略時はDEFAULT_STYLING）
+
+    Returns:
+        output_pathを省略した場合はXLSXのbytes、それ以外はNone
+    """
+    renderer = _get_renderer(engine)
+    content = _render(renderer, [('油圧ｼｮﾍﾞﾙ', data)], output_path, _get_styling(styling))
+    print(f'✅ Excel生成成功: {_output_label(output_path, content)}')
+    return content
+
+
+# シート名に使用できない文字
+_INVALID_SHEET_TITLE_CHARS = str.maketrans({c: '_' for c in '[]:*?/\\'})
+
+
+def _sheet_titles(payloads):
+    """
+    各点検データのシート名（型式_号機）を生成
+
+    Excelの制約（31文字以内・禁止文字・重複不可）に合わせて調整する
+    """
+    titles = []
+    used = set()
+    for data in payloads:
+        base = f"{data.get('machine_model', '') or '重機'}_{data.get('machine_unit', '')}".strip('_')
+        base = base.translate(_INVALID_SHEET_TITLE_CHARS)[:31] or '重機'
+        title = base
+        suffix = 2
+        while title.lower() in used:
+            tail = f'({suffix})'
+            title = base[:31 - len(tail)] + tail
+            suffix += 1
+        used.add(title.lower())
+        titles.append(title)
+    return titles
+
+
+def create_inspection_workbook(payloads, output_path=None, engine=None, styling=None):
+    """
+    複数の重機の点検帳票を1つのワークブック（1重機1シート）に生成
+
+    全シートでスタイル表と共有文字列表を共有するため、
+    重機ごとに個別のワークブックを生成するより軽量になる。
+
+    Args:
+        payloads: 点検データ（create_inspection_reportと同じ形式）のリスト
+        output_path: 出力ファイルパスまたは書き込み可能なファイルオブジェクト
+                     （省略時はメモリ上に生成してbytesを返す）
+        engine: 描画エンジン（'openpyxl' または 'stream'、省略時はDEFAULT_ENGINE）
+        styling: 書式モード（'full' または 'compact'、省略時はDEFAULT_STYLING）
+
+    Returns:
+        output_pathを省略した場合はXLSXのbytes、それ以外はNone
+    """
+    if not payloads:
+        raise ValueError('点検データがありません')
+
+    renderer = _get_renderer(engine)
+    content = _render(
+        renderer, list(zip(_sheet_titles(payloads), payloads)), output_path, _get_styling(styling)
+    )
+    print(f'✅ Excel一括生成成功: {_output_label(output_path, content)} ({len(payloads)}シート)')
+    return content
+
+
+# ============================================================
+# 月次帳票の差分更新
+# ============================================================
+# 点検記録の追加・更新で変わるのは、その日の列（AM～BQ列）の行10～26のみ。
+# 保存済みの月次帳票はXMLストリームで生成し、日ごとの列をzip単位で差し替える。
+# 差し替えに使うセル書式はスタイル表の先頭に固定の順序で登録しておき、
+# 文字列はインライン文字列で書き出す（styles.xml・sharedStringsは変更不要）。
+
+_DAY_ROWS = range(10, 27)
+_DAY_COLUMNS = range(39, 70)
+_DAY_CELLS = frozenset((row, col) for row in _DAY_ROWS for col in _DAY_COLUMNS)
+
+
+def _day_style_keys(plan):
+    """日ごとの列で使用するセル書式 (font, fill, border, alignment) を固定の順序で列挙"""
+    font_10 = _font_key(font_hgmincho_10)
+    center = _alignment_key(align_center_center)
+    center_wrap = _alignment_key(align_center_center_wrap)
+    green = _fill_key(fill_green)
+    red = _fill_key(fill_red)
+
+    cells = plan['cells']
+    for col in _DAY_COLUMNS:
+        for row in _DAY_ROWS:
+            _, font, fill, border, alignment = cells.get((row, col), _EMPTY_STREAM_CELL)
+            yield font, fill, border, alignment
+            if row <= 23:
+                for result_fill in (fill, green, red):
+                    yield font_10, result_fill, border, center
+            elif row == 24:
+                yield font_10, fill, border, center_wrap
+
+
+def _register_day_styles(styles, plan):
+    """日ごとの列で使用するセル書式をスタイル表の先頭に登録し、{書式: 書式番号} を返す"""
+    return {key: styles.xf(*key) for key in _day_style_keys(plan)}
+
+
+_day_style_ids = {}
+
+
+def _get_day_style_ids(variant):
+    """月次帳票の日ごとの列の {書式: 書式番号}（バリエーションごとに一度だけ計算）"""
+    style_ids = _day_style_ids.get(variant)
+    if style_ids is None:
+        style_ids = _register_day_styles(StyleTable(), _get_stream_plan(variant))
+        _day_style_ids[variant] = style_ids
+    return style_ids
+
+
+def create_monthly_report(data, output_path):
+    """
+    差分更新（update_report_days）に対応した月次帳票を生成
+
+    Args:
+        data: 点検データ（create_inspection_reportと同じ形式）
+        output_path: 出力ファイルパス
+    """
+    plan = _get_stream_plan(get_report_variant(data.get('machine_type', '油圧ショベル')))
+    with XlsxStreamWriter(output_path) as writer:
+        _register_day_styles(writer.styles, plan)
+        _write_stream_sheet(writer, data, '油圧ｼｮﾍﾞﾙ', inline_cells=_DAY_CELLS)
+    print(f'✅ 月次帳票生成成功: {output_path}')
+
+
+def update_report_days(path, data, days):
+    """
+    create_monthly_reportで生成した帳票の指定日の列のみを書き換え
+
+    Args:
+        path: 月次帳票のファイルパス
+        data: 点検データ（recordsは対象日の記録のみでよい。点検項目・重機名は生成時と同じこと）
+        days: 書き換える日のリスト
+
+    Raises:
+        ValueError: 生成時に登録していないセル書式が必要（全体を再生成すること）
+    """
+    variant, writes, merges = _report_content(data)
+    plan = _get_stream_plan(variant)
+
+    style_ids = _get_day_style_ids(variant)
+
+    columns = sorted({38 + int(day) for day in days if 39 <= 38 + int(day) <= 69})
+    cells = {
+        (row, col): plan['cells'].get((row, col), _EMPTY_STREAM_CELL)
+        for col in columns for row in _DAY_ROWS
+    }
+    _apply_stream_writes(cells, [write for write in writes if (write[0], write[1]) in cells])
+
+    cell_xmls = {}
+    for (row, col), (value, *style) in cells.items():
+        style_id = style_ids.get(tuple(style))
+        if style_id is None:
+            raise ValueError('月次帳票に登録されていないセル書式です')
+        ref = f'{get_column_letter(col)}{row}'
+        cell_xmls[ref] = cell_xml(ref, value, style_id)
+
+    # 点検者欄（行24～26）の結合は点検者がいる日のみ
+    day_merges = {f'{get_column_letter(col)}24:{get_column_letter(col)}26' for col in columns}
+    skeleton_merges = set(plan['merges'])
+    patch_sheet_cells(
+        path, 1, cell_xmls,
+        add_merges=[range_string for range_string in merges if range_string in day_merges],
+        remove_merges=[range_string for range_string in day_merges if range_string not in skeleton_merges],
+    )
+    print(f'✅ 月次帳票更新成功: {path} ({", ".join(str(day) for day in sorted(days))}日)')
+
+
+# ============================================================
+# 一括生成（NDJSON）
+# ============================================================
+# 1行1ジョブのJSON（NDJSON）を標準入力またはファイルから読み込み、
+# 起動済みのプロセスで順に帳票を生成する（インタプリタ起動・import・スケルトン構築は1回のみ）。
+# ジョブごとに1行の結果（JSON）を標準出力に書き出す。生成時のログは標準エラー出力に書き出す。
+#
+# ジョブの形式:
+#     {"id": 任意, "output": "出力パス", "data": {点検データ}}              1重機の帳票
+#     {"id": 任意, "output": "出力パス", "payloads": [{点検データ}, ...]}  1重機1シートのワークブック
+#     engine・styling は省略時はコマンドラインの指定（さらに省略時は既定値）
+#
+# 結果の形式:
+#     {"id", "line", "ok": true, "output", "bytes", "elapsed_ms"}
+#     {"id", "line", "ok": false, "error"}
+
+def _parse_batch_job(job, output_dir=None):
+    """
+    NDJSONの1行（JSONとして読み込んだもの）をジョブに変換
+
+    Returns:
+        (帳票生成関数名, 点検データ, 出力パス, engine, styling)
+
+    Raises:
+        ValueError: ジョブの形式が不正
+    """
+    if not isinstance(job, dict):
+        raise ValueError('ジョブはJSONオブジェクトで指定してください')
+
+    output = job.get('output')
+    if not output or not isinstance(output, str):
+        raise ValueError('outputがありません')
+    if output_dir:
+        output = os.path.join(output_dir, output)
+
+    if isinstance(job.get('data'), dict):
+        name, payload = 'create_inspection_report', job['data']
+    elif isinstance(job.get('payloads'), list) and job['payloads']:
+        name, payload = 'create_inspection_workbook', job['payloads']
+    else:
+        raise ValueError('dataまたはpayloadsがありません')
+    return name, payload, output, job.get('engine'), job.get('styling')
+
+
+def run_batch(lines, status_stream, workers=0, engine=None, styling=None, output_dir=None, job_timeout=None):
+    """
+    NDJSONのジョブを順に帳票生成し、ジョブごとに1行の結果を書き出す
+
+    Args:
+        lines: NDJSONの行のイテラブル（空行は無視）
+        status_stream: 結果の書き出し先
+        workers: 並列に生成するワーカープロセス数（0の場合はこのプロセスで順に生成）
+        engine: 既定の描画エンジン（ジョブのengineが優先）
+        styling: 既定の書式モード（ジョブのstylingが優先）
+        output_dir: 出力パスの基準ディレクトリ（ジョブのoutputが相対パスの場合）
+        job_timeout: 1ジョブのタイムアウト秒数（workers指定時のみ、省略時はREPORT_JOB_TIMEOUT）
+
+    Returns:
+        (成功したジョブ数, 失敗したジョブ数)
+    """
+    from render_pool import run_render_batch
+
+    status_lock = threading.Lock()
+    counts = [0, 0]
+
+    def write_status(status):
+        with status_lock:
+            counts[0 if status['ok'] else 1] += 1
+            status_stream.write(json.dumps(status, ensure_ascii=False) + '\n')
+            status_stream.flush()
+
+    def process(render, entry):
+        line_number, line = entry
+        status = {'id': None, 'line': line_number}
+        start = time.perf_counter()
+        try:
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f'JSONとして読み込めません: {e}')
+            if isinstance(job, dict):
+                status['id'] = job.get('id')
+            name, payload, output, job_engine, job_styling = _parse_batch_job(job, output_dir)
+            directory = os.path.dirname(output)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            render(name, payload, output, job_engine or engine, job_styling or styling)
+            status.update(ok=True, output=output, bytes=os.path.getsize(output))
+        except Exception as e:
+            status.update(ok=False, error=str(e) or type(e).__name__)
+        status['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        write_status(status)
+
+    jobs = ((line_number, line) for line_number, line in enumerate(lines, start=1) if line.strip())
+    run_render_batch(jobs, process, workers, job_timeout)
+    return tuple(counts)
+
+
+def batch_main(argv):
+    """一括生成モードのコマンドライン（--batch）"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='excel_generator_advanced.py --batch',
+        description='NDJSON（1行1ジョブ）から帳票を一括生成',
+    )
+    parser.add_argument('input', nargs='?', default='-', help='ジョブのNDJSONファイル（省略時・-は標準入力）')
+    parser.add_argument('--workers', type=int, default=0, help='並列に生成するワーカープロセス数（既定: 0=このプロセスで順に生成）')
+    parser.add_argument('--engine', choices=REPORT_ENGINES, help='既定の描画エンジン')
+    parser.add_argument('--styling', choices=REPORT_STYLINGS, help='既定の書式モード')
+    parser.add_argument('--output-dir', help='相対パスのoutputの基準ディレクトリ')
+    parser.add_argument('--timeout', type=float, help='1ジョブのタイムアウト秒数（--workers指定時）')
+    args = parser.parse_args(argv)
+
+    # 標準出力は結果専用にし、ログ（ワーカープロセスを含む）は標準エラー出力へ
+    sys.stdout.flush()
+    status_stream = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    start = time.perf_counter()
+    if args.input == '-':
+        succeeded, failed = run_batch(
+            sys.stdin, status_stream, args.workers, args.engine, args.styling, args.output_dir, args.timeout
         )
-    
-    # 4. AM～BP列（38～68列）の行9～26の右側に罫線追加
-    for row in range(9, 27):
-        for col_idx in range(38, 69):  # AM(38)～BP(68)
-            cell = ws.cell(row=row, column=col_idx)
-            cell.border = Border(
-                left=cell.border.left if cell.border else None,
-                top=cell.border.top if cell.border else None,
-                bottom=cell.border.bottom if cell.border else None,
-                right=Side(style='thin')
+    else:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            succeeded, failed = run_batch(
+                f, status_stream, args.workers, args.engine, args.styling, args.output_dir, args.timeout
             )
-    
-    # 5. 行24～26のAL列（38）の左右両側に罫線追加
-    for row in range(24, 27):
-        cell = ws.cell(row=row, column=38)
-        cell.border = Border(
-            left=Side(style='thin'),
-            top=cell.border.top if cell.border else None,
-            bottom=cell.border.bottom if cell.border else None,
-            right=Side(style='thin')
-        )
-    
-    # 6. 行26のAL～BQ列（38～69列）の下部に罫線追加
-    for col_idx in range(38, 70):  # AL(38)～BQ(69)
-        cell = ws.cell(row=26, column=col_idx)
-        cell.border = Border(
-            left=cell.border.left if cell.border else None,
-            top=cell.border.top if cell.border else None,
-            right=cell.border.right if cell.border else None,
-            bottom=Side(style='thin')
-        )
-    
-    # 6-1. G列（7列）の行24、25の右側に罫線追加
-    for row in [24, 25]:
-        cell = ws.cell(row=row, column=7)
-        current_border = cell.border
-        cell.border = Border(
-            left=current_border.left if current_border else None,
-            top=current_border.top if current_border else None,
-            bottom=current_border.bottom if current_border else None,
-            right=Side(style='thin')
-        )
-    
-    # 7. AJ列（10列）の行27～31の右側に罫線追加
-    # A27:AJ31がマージされているため、AJ列の各行に直接罫線を設定
-    for row in range(27, 32):
-        # AJ列 = 10列目に右側罫線を追加
-        cell = ws.cell(row=row, column=10)
-        # 現在の罫線を保持しながら右側罫線を追加
-        current_border = cell.border
-        cell.border = Border(
-            left=current_border.left if current_border else None,
-            top=current_border.top if current_border else None,
-            bottom=current_border.bottom if current_border else None,
-            right=Side(style='thin')
-        )
-    
-    # ============================================================
-    # 最終罫線調整: AJ列の行27～31の右側罫線（マージセル対応）
-    # ============================================================
-    
-    # J列の行27～31の右側罫線を削除
-    for row in range(27, 32):
-        cell = ws.cell(row=row, column=10)  # J列 = 10列目
-        current_border = cell.border if cell.border else Border()
-        cell.border = Border(
-            left=current_border.left,
-            top=current_border.top,
-            bottom=current_border.bottom
-        )
-    
-    # AJ列の行27～31の右側に罫線を追加
-    for row in range(27, 32):
-        cell = ws.cell(row=row, column=36)  # AJ列 = 36列目
-        current_border = cell.border if cell.border else Border()
-        cell.border = Border(
-            left=current_border.left,
-            top=current_border.top,
-            bottom=current_border.bottom,
-            right=Side(style='thin')
-        )
-    
-    # ============================================================
-    # ファイル保存
-    # ============================================================
-    
-    wb.save(output_path)
-    print(f'✅ Excel生成成功: {output_path}')
+    status_stream.close()
+    print(f'📊 一括生成完了: 成功 {succeeded}件 / 失敗 {failed}件 ({time.perf_counter() - start:.1f}秒)',
+          file=sys.stderr)
+    return 1 if failed else 0
 
 
 if __name__ == '__main__':
+    # 一括生成モード: python excel_generator_advanced.py --batch [jobs.ndjson] [--workers N]
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        sys.exit(batch_main(sys.argv[2:]))
+
     # コマンドライン引数からデータを取得
     if len(sys.argv) < 3:
-        print('Usage: python excel_generator_advanced.py <json_data> <output_path>')
+        print('Usage: python excel_generator_advanced.py <json_data> <output_path> [engine] [styling]')
+        print('       python excel_generator_advanced.py --batch [jobs.ndjson|-] [--workers N] [--engine E] [--styling S]')
         sys.exit(1)
-    
+
     json_data = sys.argv[1]
     output_path = sys.argv[2]
-    
+    engine = sys.argv[3] if len(sys.argv) > 3 else None
+    styling = sys.argv[4] if len(sys.argv) > 4 else None
+
     # JSONデータをパース
     data = json.loads(json_data)
-    
+
     # Excel生成
-    create_inspection_report(data, output_path)
+    create_inspection_report(data, output_path, engine, styling)
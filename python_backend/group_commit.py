@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Group Commit - 点検記録の書き込みのグループコミット
+同時に届いた書き込み（点検記録の作成・更新）を1つの書き込みスレッドでまとめ、
+1回のトランザクション（1回のfsync）でコミットする。
+
+- 書き込みは最初の1件から最大 GROUP_COMMIT_MAX_DELAY_MS 待つか、GROUP_COMMIT_MAX_BATCH 件たまった時点でコミット
+- 1件ごとにSAVEPOINTを設定するため、失敗した書き込み（主キーの重複など）はその1件のみ取り消される
+- 呼び出し元はコミット（synchronous = GROUP_COMMIT_SYNCHRONOUS）の完了後に結果を受け取る
+- 呼び出し元は最大 GROUP_COMMIT_TIMEOUT 秒待ち、超えた場合は GroupCommitTimeout（APIは503）
+- 書き込みスレッドで予期しないエラーが起きた場合は、そのまとまりの書き込みを失敗として返し、接続を開き直して続行する
+- 書き込みスレッドの接続は synchronous を変更するため、プールには返却せずに閉じる
+
+設定（環境変数）:
+    GROUP_COMMIT_ENABLED        グループコミットを使用するか（'0'で書き込みごとにコミット）
+    GROUP_COMMIT_MAX_BATCH      1回のトランザクションにまとめる書き込みの上限（既定: 64）
+    GROUP_COMMIT_MAX_DELAY_MS   最初の書き込みからコミットまでの最大待ち時間（ミリ秒、既定: 5）
+    GROUP_COMMIT_SYNCHRONOUS    書き込みスレッドの接続の PRAGMA synchronous（既定: FULL、コミットごとにfsync）
+    GROUP_COMMIT_TIMEOUT        呼び出し元がコミットの完了を待つ上限（秒、既定: 30）
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', '1') != '0'
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get('GROUP_COMMIT_MAX_DELAY_MS', 5))
+GROUP_COMMIT_SYNCHRONOUS = os.environ.get('GROUP_COMMIT_SYNCHRONOUS', 'FULL')
+GROUP_COMMIT_TIMEOUT = float(os.environ.get('GROUP_COMMIT_TIMEOUT', 30))
+
+
+class GroupCommitTimeout(Exception):
+    """書き込みがタイムアウト以内にコミットされなかった"""
+
+    def __init__(self):
+        super().__init__('書き込みが混み合っています。しばらくしてから再度お試しください')
+
+
+class GroupCommitWriter:
+    """書き込みをまとめてコミットする書き込みスレッド"""
+
+    def __init__(self, get_db, db_lock, max_batch=GROUP_COMMIT_MAX_BATCH, max_delay_ms=GROUP_COMMIT_MAX_DELAY_MS,
+                 enabled=GROUP_COMMIT_ENABLED, timeout=GROUP_COMMIT_TIMEOUT):
+        """
+        Args:
+            get_db: データベース接続を返す関数
+            db_lock: データベースの書き込み用ロック（他の書き込みとの直列化）
+            max_batch: 1回のトランザクションにまとめる書き込みの上限
+            max_delay_ms: 最初の書き込みからコミットまでの最大待ち時間（ミリ秒）
+            enabled: Falseの場合は呼び出し元のスレッドで書き込みごとにコミット
+            timeout: 呼び出し元がコミットの完了を待つ上限（秒）
+        """
+        self._get_db = get_db
+        self._db_lock = db_lock
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.enabled = enabled
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._started = False
+        # 件数（呼び出し元のスレッドと書き込みスレッドから更新するため _stats_lock の中で更新）
+        self.stats = {'commits': 0, 'operations': 0, 'timeouts': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+
+    def submit(self, operation):
+        """
+        書き込みを実行し、コミットの完了後に結果を返す
+
+        Args:
+            operation: 書き込み処理（カーソルを受け取り、結果を返す関数）。
+                       コミットは行わないこと。例外を送出した場合はその書き込みのみ取り消される
+
+        Returns:
+            operation の戻り値
+
+        Raises:
+            GroupCommitTimeout: timeout 秒以内にコミットされなかった
+                （実行前の書き込みは取り消す。実行中だった書き込みはその後コミットされる場合がある）
+            operation が送出した例外、またはコミットに失敗した場合の例外
+        """
+        if not self.enabled:
+            with self._db_lock:
+                conn = self._get_db()
+                try:
+                    result = operation(conn.cursor())
+                    conn.commit()
+                finally:
+                    conn.close()
+            return result
+
+        self._start()
+        future = Future()
+        self._queue.put((operation, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._count(timeouts=1)
+            raise GroupCommitTimeout()
+
+    def _count(self, **counts):
+        """件数を加算"""
+        with self._stats_lock:
+            for name, count in counts.items():
+                self.stats[name] += count
+
+    def _start(self):
+        """書き込みスレッドを起動（最初の書き込み時に一度だけ）"""
+        if self._started:
+            return
+        with self._start_lock:
+            if not self._started:
+                threading.Thread(target=self._run_forever, daemon=True).start()
+                self._started = True
+
+    def _connect(self):
+        """書き込みスレッド専用の接続（コミットごとにfsyncする、close() ではなく _discard() で閉じる）"""
+        conn = self._get_db()
+        try:
+            conn.execute(f'PRAGMA synchronous = {GROUP_COMMIT_SYNCHRONOUS}')
+        except Exception:
+            self._discard(conn)
+            raise
+        return conn
+
+    @staticmethod
+    def _discard(conn):
+        """書き込みスレッドの接続を閉じる（synchronous を変更した接続をプールに返却しない）"""
+        try:
+            sqlite3.Connection.close(conn)
+        except Exception:
+            pass
+
+    def _collect(self):
+        """最初の書き込みから max_delay 秒または max_batch 件までの書き込みを取り出す"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_forever(self):
+        conn = None
+        while True:
+            batch = self._collect()
+            try:
+                if conn is None:
+                    conn = self._connect()
+                self._commit(conn, batch)
+            except Exception as e:
+                # 書き込みスレッドは停止させず、まとまりの書き込みを失敗として返して接続を開き直す
+                print(f'❌ グループコミットエラー（{len(batch)}件）: {e}')
+                self._count(errors=1)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                if conn is not None:
+                    self._discard(conn)
+                    conn = None
+
+    def _commit(self, conn, batch):
+        """
+        まとめた書き込みを1回のトランザクションで実行してコミット
+
+        Raises:
+            トランザクションの開始・コミットに失敗した場合の例外（まとまりの書き込みはすべて取り消される）
+        """
+        # 呼び出し元がタイムアウトで取り消した書き込みは実行しない
+        batch = [(operation, future) for operation, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        outcomes = []
+        with self._db_lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = conn.cursor()
+                for operation, future in batch:
+                    conn.execute('SAVEPOINT group_commit_operation')
+                    try:
+                        outcomes.append((future, operation(cursor), None))
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO group_commit_operation')
+                        outcomes.append((future, None, e))
+                    conn.execute('RELEASE group_commit_operation')
+                conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+
+        self._count(commits=1, operations=len(batch))
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
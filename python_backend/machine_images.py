@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Machine Images - 重機画像の保存と帳票用サムネイル
+帳票の重機画像エリア（A27:AJ31）に埋め込む画像を管理する。
+
+- アップロードされた画像は内容のハッシュ（SHA-256）をキーに保存する（同じ画像は1つだけ保存）
+- 画像エリアに収まる大きさのサムネイル（JPEG）は保存時に一度だけ生成する
+- 帳票の生成時はサムネイルのファイルをそのまま埋め込む（原寸画像のデコード・縮小は行わない）
+- 画像が登録されていない重機は、機種ごとの既定画像（assets/images）を使用する
+
+設定（環境変数）:
+    MACHINE_IMAGE_ASSET_DIR  既定画像のディレクトリ（既定: assets/images）
+    MACHINE_IMAGE_SCALE      サムネイルの解像度（画面表示の何倍か、既定: 2）
+    MACHINE_IMAGE_QUALITY    サムネイルのJPEG品質（既定: 85）
+    MACHINE_IMAGE_MAX_MB     アップロード画像の上限サイズ（MB、既定: 20）
+    MACHINE_IMAGE_DIRS       帳票に埋め込める画像のディレクトリ（os.pathsep区切り、MachineImageStoreの作成時に追加）
+"""
+
+import hashlib
+import io
+import os
+import threading
+from contextlib import closing
+from datetime import datetime
+
+from PIL import Image as PILImage, ImageOps
+
+from report_layout import (
+    compile_layout, area_pixels, VARIANT_GENERAL, MACHINE_IMAGE_AREA, MACHINE_IMAGE_PADDING,
+)
+
+MACHINE_IMAGE_ASSET_DIR = os.environ.get(
+    'MACHINE_IMAGE_ASSET_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'images'),
+)
+MACHINE_IMAGE_SCALE = float(os.environ.get('MACHINE_IMAGE_SCALE', 2))
+MACHINE_IMAGE_QUALITY = int(os.environ.get('MACHINE_IMAGE_QUALITY', 85))
+MACHINE_IMAGE_MAX_MB = int(os.environ.get('MACHINE_IMAGE_MAX_MB', 20))
+
+# 機種名に含まれる語 → 既定画像（MACHINE_IMAGE_ASSET_DIRのファイル名）
+MACHINE_TYPE_IMAGES = (
+    ('ショベル', 'excavator.png'),
+    ('excavator', 'excavator.png'),
+    ('ブルドーザ', 'bulldozer.png'),
+    ('bulldozer', 'bulldozer.png'),
+)
+
+
+def create_machine_images_table(cursor):
+    """重機ごとの画像（画像ハッシュ）のテーブルを作成"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS machine_images (
+            machine_id TEXT PRIMARY KEY,
+            image_hash TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+
+
+def image_dirs():
+    """帳票に埋め込める画像のディレクトリ（既定画像のディレクトリと重機画像の保存先）"""
+    registered = [path for path in os.environ.get('MACHINE_IMAGE_DIRS', '').split(os.pathsep) if path]
+    return [os.path.realpath(MACHINE_IMAGE_ASSET_DIR)] + registered
+
+
+def register_image_dir(path):
+    """
+    帳票に埋め込める画像のディレクトリを追加
+
+    環境変数に保存するため、以降にspawnで起動する帳票生成ワーカーにも引き継がれる
+    """
+    path = os.path.realpath(path)
+    registered = [path for path in os.environ.get('MACHINE_IMAGE_DIRS', '').split(os.pathsep) if path]
+    if path not in registered:
+        os.environ['MACHINE_IMAGE_DIRS'] = os.pathsep.join(registered + [path])
+
+
+def is_allowed_image_path(path):
+    """画像ファイルが帳票に埋め込める画像のディレクトリ内にあるか（シンボリックリンクは解決して判定）"""
+    real_path = os.path.realpath(path)
+    return any(os.path.commonpath([real_path, directory]) == directory for directory in image_dirs())
+
+
+def thumbnail_size():
+    """サムネイルの最大サイズ（画像エリアから余白を除いた大きさ × MACHINE_IMAGE_SCALE、px）"""
+    _, _, width, height = area_pixels(compile_layout(VARIANT_GENERAL), MACHINE_IMAGE_AREA)
+    return (
+        int((width - 2 * MACHINE_IMAGE_PADDING) * MACHINE_IMAGE_SCALE),
+        int((height - 2 * MACHINE_IMAGE_PADDING) * MACHINE_IMAGE_SCALE),
+    )
+
+
+def _write_file(path, data):
+    """一時ファイルを経由してファイルを書き込み"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def _make_thumbnail(data, size):
+    """
+    画像を枠に収まる大きさに縮小したJPEG（縦横比は保持、拡大はしない）
+
+    Returns:
+        (JPEGのbytes, 幅, 高さ)
+
+    Raises:
+        ValueError: 画像として読み込めない
+    """
+    try:
+        with PILImage.open(io.BytesIO(data)) as image:
+            # JPEGは縮小デコード（回転後の縦横に関わらず収まるよう長辺で指定）
+            image.draft('RGB', (max(size), max(size)))
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ('RGBA', 'LA', 'P'):
+                # 透過部分は白で塗りつぶす
+                image = image.convert('RGBA')
+                background = PILImage.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.thumbnail(size, PILImage.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=MACHINE_IMAGE_QUALITY, optimize=True)
+            return buffer.getvalue(), image.width, image.height
+    except (OSError, SyntaxError, PILImage.DecompressionBombError) as e:
+        raise ValueError(f'画像を読み込めません: {e}')
+
+
+class MachineImageStore:
+    """
+    重機画像の保存先（内容のハッシュで重複を排除）
+
+    保存先のディレクトリ構成:
+        originals/<ハッシュの先頭2文字>/<ハッシュ><拡張子>            元の画像
+        thumbnails/<ハッシュの先頭2文字>/<ハッシュ>_<幅>x<高さ>.jpg   帳票用サムネイル（最大サイズごと）
+    """
+
+    def __init__(self, get_db, db_lock, store_dir, asset_dir=MACHINE_IMAGE_ASSET_DIR):
+        """
+        Args:
+            get_db: データベース接続を返す関数（row_factory = sqlite3.Row）
+            db_lock: データベース操作用のロック
+            store_dir: 画像ファイルの保存先ディレクトリ
+            asset_dir: 機種ごとの既定画像のディレクトリ
+        """
+        self._get_db = get_db
+        self._db_lock = db_lock
+        self.store_dir = store_dir
+        self.asset_dir = asset_dir
+        self._size = thumbnail_size()
+        # サムネイルの生成用ロック（データベースのロックは取得しない）
+        self._lock = threading.Lock()
+        # {画像ハッシュ: 帳票用の画像情報}
+        self._thumbnails = {}
+        # {既定画像のパス: (更新日時, 画像ハッシュ)}
+        self._assets = {}
+        os.makedirs(store_dir, exist_ok=True)
+        register_image_dir(store_dir)
+        register_image_dir(asset_dir)
+
+    def _path(self, kind, image_hash, name):
+        return os.path.join(self.store_dir, kind, image_hash[:2], name)
+
+    def _original_path(self, image_hash):
+        """保存済みの元の画像のパス（未保存の場合はNone）"""
+        directory = os.path.join(self.store_dir, 'originals', image_hash[:2])
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith(image_hash) and not name.endswith('.tmp'):
+                    return os.path.join(directory, name)
+        return None
+
+    def _thumbnail(self, image_hash, data=None):
+        """
+        画像ハッシュのサムネイル情報（初回のみサムネイルを生成、以降はメモリ上の情報を返す）
+
+        Args:
+            image_hash: 画像ハッシュ
+            data: 元の画像（省略時は保存済みの元の画像から生成）
+
+        Returns:
+            {'path': サムネイルのパス, 'width': 幅, 'height': 高さ}、元の画像がない場合はNone
+        """
+        image = self._thumbnails.get(image_hash)
+        if image is not None:
+            return image
+
+        with self._lock:
+            image = self._thumbnails.get(image_hash)
+            if image is not None:
+                return image
+
+            width, height = self._size
+            path = self._path('thumbnails', image_hash, f'{image_hash}_{width}x{height}.jpg')
+            if os.path.exists(path):
+                # 生成済み（ヘッダーから大きさのみ取得）
+                with PILImage.open(path) as thumbnail:
+                    size = thumbnail.size
+            else:
+                if data is None:
+                    original_path = self._original_path(image_hash)
+                    if original_path is None:
+                        return None
+                    with open(original_path, 'rb') as f:
+                        data = f.read()
+                thumbnail, *size = _make_thumbnail(data, self._size)
+                _write_file(path, thumbnail)
+                print(f'✅ 重機画像サムネイル生成: {image_hash[:12]} ({size[0]}x{size[1]})')
+
+            image = self._thumbnails[image_hash] = {'path': path, 'width': size[0], 'height': size[1]}
+            return image
+
+    def _store(self, data, extension):
+        """
+        画像を保存してサムネイルを生成（保存済みの画像は何もしない）
+
+        Returns:
+            (画像ハッシュ, 帳票用の画像情報)
+        """
+        image_hash = hashlib.sha256(data).hexdigest()
+        image = self._thumbnail(image_hash, data)
+        if self._original_path(image_hash) is None:
+            _write_file(self._path('originals', image_hash, f'{image_hash}{extension}'), data)
+        return image_hash, image
+
+    def save(self, machine_id, data, filename=''):
+        """
+        重機の画像を登録（同じ内容の画像は保存済みのファイルを共有）
+
+        Args:
+            machine_id: 重機ID
+            data: 画像ファイルの内容
+            filename: 元のファイル名（拡張子のみ使用）
+
+        Returns:
+            {'machineId', 'imageHash', 'width', 'height'}（width/heightはサムネイルの大きさ）
+
+        Raises:
+            ValueError: 画像が大きすぎる、または画像として読み込めない
+        """
+        if not data:
+            raise ValueError('画像がありません')
+        if len(data) > MACHINE_IMAGE_MAX_MB * 1024 * 1024:
+            raise ValueError(f'画像が大きすぎます（上限 {MACHINE_IMAGE_MAX_MB}MB）')
+
+        extension = os.path.splitext(filename or '')[1].lower()
+        if not extension[1:].isalnum() or len(extension) > 6:
+            extension = ''
+        image_hash, image = self._store(data, extension)
+
+        with self._db_lock:
+            with closing(self._get_db()) as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO machine_images (machine_id, image_hash, updated_at) VALUES (?, ?, ?)',
+                    (machine_id, image_hash, datetime.now().isoformat())
+                )
+                conn.commit()
+        return {'machineId': machine_id, 'imageHash': image_hash, 'width': image['width'], 'height': image['height']}
+
+    def delete(self, machine_id):
+        """
+        重機の画像の登録を解除（画像ファイルは他の重機と共有している場合があるため残す）
+
+        Returns:
+            登録を解除した場合True
+        """
+        with self._db_lock:
+            with closing(self._get_db()) as conn:
+                cursor = conn.execute('DELETE FROM machine_images WHERE machine_id = ?', (machine_id,))
+                deleted = cursor.rowcount > 0
+                conn.commit()
+        return deleted
+
+    def _asset_image(self, machine_type):
+        """機種の既定画像（assets/images）の帳票用画像情報（初回のみサムネイルを生成）"""
+        for keyword, name in MACHINE_TYPE_IMAGES:
+            if keyword in (machine_type or ''):
+                path = os.path.join(self.asset_dir, name)
+                break
+        else:
+            return None
+
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._assets.get(path)
+        if cached is not None and cached[0] == mtime:
+            return self._thumbnails.get(cached[1])
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        image_hash, image = self._store(data, os.path.splitext(path)[1].lower())
+        self._assets[path] = (mtime, image_hash)
+        return image
+
+    def preload_assets(self):
+        """全機種の既定画像のサムネイルを準備（サーバー起動時）"""
+        for keyword, _ in MACHINE_TYPE_IMAGES:
+            try:
+                self._asset_image(keyword)
+            except Exception as e:
+                print(f'⚠️ 既定の重機画像を読み込めません: {keyword}: {e}')
+
+    def machine_image(self, conn, machine_id):
+        """
+        重機に登録された画像のサムネイル情報（未登録の場合はNone）
+
+        Args:
+            conn: データベース接続（呼び出し元でdb_lockを取得済みのもの）
+        """
+        row = conn.execute(
+            'SELECT image_hash FROM machine_images WHERE machine_id = ?', (machine_id,)
+        ).fetchone()
+        return self._thumbnail(row['image_hash']) if row else None
+
+    def report_image(self, conn=None, machine_id=None, machine_type=''):
+        """
+        帳票に埋め込む画像（点検データの machine_image）
+
+        重機の画像が登録されていればそのサムネイル、なければ機種の既定画像のサムネイル
+
+        Args:
+            conn: データベース接続（machine_idを指定する場合、呼び出し元でdb_lockを取得済みのもの）
+            machine_id: 重機ID
+            machine_type: 機種名
+
+        Returns:
+            {'path': サムネイルのパス, 'width': 幅, 'height': 高さ}、画像がない場合はNone
+        """
+        image = None
+        if conn is not None and machine_id:
+            image = self.machine_image(conn, machine_id)
+        return image or self._asset_image(machine_type)
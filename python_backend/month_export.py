@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Month Export - 月末の帳票一括出力
+対象月に点検記録のある全重機の帳票を、現場・重機ごとのファイルとして出力する。
+
+出力先のディレクトリ構成:
+    <出力先>/<現場名>/<重機ID>.xlsx（または .pdf）
+    <出力先>/export_manifest.json   出力済みファイルと入力（点検データ）のハッシュ
+
+- 帳票の生成はRenderPoolのワーカープロセスで並列に実行する（既定: CPUコア数）
+- 点検データのハッシュがマニフェストと一致し、ファイルが存在する帳票は生成しない
+- 1件生成するごとにマニフェストを保存するため、中断しても再実行で続きから出力できる
+- 帳票は一時ファイルに生成してから置き換える（中断時に壊れたファイルを残さない）
+
+使い方:
+    python month_export.py <db_path> <年> <月> <出力先> [--workers N] [--format xlsx|pdf] [--force]
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from report_data import build_report_payload, month_date_range
+
+EXPORT_MANIFEST_NAME = 'export_manifest.json'
+EXPORT_FORMATS = ('xlsx', 'pdf')
+
+# 現場名が未設定の点検記録の出力先ディレクトリ名
+NO_SITE_DIR = '現場未設定'
+
+# ファイル名に使用できない文字
+_UNSAFE_NAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def _safe_name(name, default):
+    """現場名・重機IDをファイル名・ディレクトリ名として使える文字列に変換"""
+    name = _UNSAFE_NAME.sub('_', str(name or '')).strip().strip('.')
+    return name or default
+
+
+def _input_hash(payload, fmt, engine, styling):
+    """帳票の入力（点検データ・出力形式）のハッシュ"""
+    canonical = json.dumps(
+        {'payload': payload, 'format': fmt, 'engine': engine, 'styling': styling},
+        ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str,
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def load_manifest(output_dir):
+    """マニフェスト（{'files': {相対パス: {...}}}）を読み込み（存在しない・壊れている場合は空）"""
+    path = os.path.join(output_dir, EXPORT_MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('files'), dict):
+        return {'files': {}}
+    return manifest
+
+
+def _save_manifest(output_dir, manifest):
+    """マニフェストを保存（一時ファイルに書き出してから置き換え）"""
+    path = os.path.join(output_dir, EXPORT_MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _export_targets(conn, year, month):
+    """対象月に点検記録のある (現場名, 重機ID) を現場名・重機IDの順に取得"""
+    start, end = month_date_range(year, month)
+    cursor = conn.execute('''
+        SELECT DISTINCT COALESCE(site_name, '') AS site_name, machine_id FROM inspection_records
+        WHERE inspection_date >= ? AND inspection_date < ?
+        ORDER BY 1, 2
+    ''', (start, end))
+    return cursor.fetchall()
+
+
+def _export_jobs(conn, year, month, fmt, engine, styling, image_store=None):
+    """
+    出力する帳票を1件ずつ組み立て
+
+    Yields:
+        (相対パス, 点検データ, 入力のハッシュ)
+    """
+    for target in _export_targets(conn, year, month):
+        site_name, machine_id = target['site_name'], target['machine_id']
+        payload = build_report_payload(
+            conn, machine_id, year, month, site_name=site_name or None, image_store=image_store,
+        )
+        relpath = os.path.join(
+            _safe_name(site_name, NO_SITE_DIR), _safe_name(machine_id, 'machine') + '.' + fmt,
+        )
+        yield relpath, payload, _input_hash(payload, fmt, engine, styling)
+
+
+def export_month(conn, year, month, output_dir, workers=None, fmt='xlsx', engine=None, styling=None,
+                 force=False, image_store=None, job_timeout=None):
+    """
+    対象月の全重機の帳票を出力（入力の変わっていない帳票は生成しない）
+
+    Args:
+        conn: データベース接続（row_factory = sqlite3.Row）
+        year, month: 対象年月
+        output_dir: 出力先ディレクトリ
+        workers: 並列に生成するワーカープロセス数（省略時はCPUコア数、0の場合はこのプロセスで順に生成）
+        fmt: 出力形式（'xlsx' / 'pdf'）
+        engine, styling: Excel帳票の描画エンジン・書式モード（省略時は既定値）
+        force: Trueの場合はマニフェストに関わらず全件を生成
+        image_store: 重機画像の保存先（MachineImageStore、省略時は重機画像なし）
+        job_timeout: 1件のタイムアウト秒数（workers指定時のみ、省略時はREPORT_JOB_TIMEOUT）
+
+    Returns:
+        {'generated': 生成した件数, 'skipped': 入力が変わらず生成しなかった件数,
+         'failed': 失敗した件数, 'errors': {相対パス: エラー内容}}
+    """
+    from render_pool import run_render_batch
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'未対応の出力形式です: {fmt}')
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    manifest.update(year=year, month=month)
+    files = manifest['files']
+    manifest_lock = threading.Lock()
+    summary = {'generated': 0, 'skipped': 0, 'failed': 0, 'errors': {}}
+
+    def process(render, job):
+        relpath, payload, input_hash = job
+        path = os.path.join(output_dir, relpath)
+        tmp_path = '.part'.join(os.path.splitext(path))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if fmt == 'pdf':
+                render('create_inspection_pdf', payload, tmp_path)
+            else:
+                render('create_inspection_report', payload, tmp_path, engine, styling)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            message = str(e) or type(e).__name__
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with manifest_lock:
+                summary['failed'] += 1
+                summary['errors'][relpath] = message
+            print(f'❌ 帳票出力エラー: {relpath}: {message}')
+            return
+
+        with manifest_lock:
+            files[relpath] = {
+                'input_hash': input_hash,
+                'bytes': os.path.getsize(path),
+                'updated_at': datetime.now().isoformat(),
+            }
+            _save_manifest(output_dir, manifest)
+            summary['generated'] += 1
+
+    def is_current(relpath, input_hash):
+        entry = files.get(relpath)
+        return (
+            not force and entry is not None and entry.get('input_hash') == input_hash
+            and os.path.exists(os.path.join(output_dir, relpath))
+        )
+
+    def pending_jobs():
+        # 点検データの組み立てはワーカー数分だけ先行（全重機分をメモリに載せない）
+        for relpath, payload, input_hash in _export_jobs(conn, year, month, fmt, engine, styling, image_store):
+            if is_current(relpath, input_hash):
+                with manifest_lock:
+                    summary['skipped'] += 1
+            else:
+                yield relpath, payload, input_hash
+
+    try:
+        run_render_batch(pending_jobs(), process, workers, job_timeout)
+    finally:
+        with manifest_lock:
+            _save_manifest(output_dir, manifest)
+    return summary
+
+
+def _open_image_store(conn, db_path, images_dir=None):
+    """重機画像の保存先（machine_imagesテーブルがないデータベースの場合はNone）"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'machine_images'"
+    ).fetchone()
+    if not row:
+        return None
+
+    from machine_images import MachineImageStore
+
+    store_dir = images_dir or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'machine_images')
+    # 画像の登録は行わないため、データベース接続を返す関数は不要
+    return MachineImageStore(None, threading.Lock(), store_dir)
+
+
+def main(argv):
+    """月末の帳票一括出力のコマンドライン"""
+    import argparse
+
+    from excel_generator_advanced import REPORT_ENGINES, REPORT_STYLINGS
+
+    parser = argparse.ArgumentParser(
+        prog='month_export.py',
+        description='対象月に点検記録のある全重機の帳票を現場・重機ごとに出力',
+    )
+    parser.add_argument('db_path', help='データベースファイル')
+    parser.add_argument('year', type=int, help='対象年')
+    parser.add_argument('month', type=int, help='対象月')
+    parser.add_argument('output_dir', help='出力先ディレクトリ')
+    parser.add_argument('--workers', type=int, help='並列に生成するワーカープロセス数（既定: CPUコア数、0=このプロセスで順に生成）')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='xlsx', help='出力形式（既定: xlsx）')
+    parser.add_argument('--engine', choices=REPORT_ENGINES, help='Excel帳票の描画エンジン')
+    parser.add_argument('--styling', choices=REPORT_STYLINGS, help='Excel帳票の書式モード')
+    parser.add_argument('--images', help='重機画像の保存先ディレクトリ（既定: データベースと同じ場所のmachine_images）')
+    parser.add_argument('--timeout', type=float, help='1件のタイムアウト秒数')
+    parser.add_argument('--force', action='store_true', help='入力が変わっていない帳票も生成し直す')
+    args = parser.parse_args(argv)
+
+    if not 1 <= args.month <= 12:
+        parser.error('月は1〜12で指定してください')
+
+    # 読み取り専用で開く（サーバーの稼働中でも実行できる）
+    conn = sqlite3.connect(f'file:{os.path.abspath(args.db_path)}?mode=ro', uri=True)
+    conn.row_factory = sqlite3.Row
+    start = time.perf_counter()
+    try:
+        summary = export_month(
+            conn, args.year, args.month, args.output_dir,
+            workers=args.workers, fmt=args.format, engine=args.engine, styling=args.styling,
+            force=args.force, image_store=_open_image_store(conn, args.db_path, args.images),
+            job_timeout=args.timeout,
+        )
+    finally:
+        conn.close()
+    print(f"📊 帳票一括出力完了: {args.year}年{args.month}月 生成 {summary['generated']}件 / "
+          f"変更なし {summary['skipped']}件 / 失敗 {summary['failed']}件 "
+          f"({time.perf_counter() - start:.1f}秒)")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Monthly Reports - 重機・月ごとの保存済み帳票
+重機・対象月ごとに最新の帳票を保存し、点検記録の追加・更新・削除時は
+変更のあった日の列のみを差し替える（update_report_days）。
+帳票の取得は保存済みファイルの読み出しのみで済む。
+
+点検記録の変更の反映は書き込みスレッドで行う（リクエストの処理はデータベースのコミットのみ）。
+反映待ちの変更は重機・月ごとに日をまとめ、帳票の取得時は反映待ちの日を先に反映する。
+
+重機情報・点検項目・現場名・重機画像（帳票の日ごとの列以外）が変わった場合は全体を再生成する。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+
+from excel_generator_advanced import create_monthly_report, update_report_days
+from report_data import build_report_payload, month_date_range
+
+MONTHLY_REPORT_UPDATE_DELAY_MS = float(os.environ.get('MONTHLY_REPORT_UPDATE_DELAY_MS', 200))
+
+
+def create_monthly_reports_table(cursor):
+    """保存済み帳票テーブルを作成"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS monthly_reports (
+            machine_id TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            header_hash TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            etag TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (machine_id, year, month)
+        )
+    ''')
+
+
+def _header_hash(payload):
+    """帳票の日ごとの列以外（重機情報・点検項目など）のハッシュ"""
+    header = {key: value for key, value in payload.items() if key != 'records'}
+    canonical = json.dumps(header, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _file_etag(path):
+    """ファイル内容のハッシュ（ETag）"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _record_month_day(inspection_date):
+    """inspection_date（ISO 8601文字列）から (年, 月, 日) を取得"""
+    return int(inspection_date[0:4]), int(inspection_date[5:7]), int(inspection_date[8:10])
+
+
+class MonthlyReportStore:
+    """重機・月ごとの保存済み帳票"""
+
+    def __init__(self, get_db, db_lock, store_dir, image_store=None, update_delay_ms=MONTHLY_REPORT_UPDATE_DELAY_MS):
+        """
+        Args:
+            get_db: データベース接続を返す関数（row_factory = sqlite3.Row）
+            db_lock: データベース操作用のロック
+            store_dir: 帳票ファイルの保存先ディレクトリ
+            image_store: 重機画像の保存先（MachineImageStore、省略時は重機画像なし）
+            update_delay_ms: 最初の変更から反映までの待ち時間（ミリ秒）
+        """
+        self._get_db = get_db
+        self._db_lock = db_lock
+        self.store_dir = store_dir
+        self._image_store = image_store
+        self.update_delay = update_delay_ms / 1000
+        # 帳票ファイルの書き換え用ロック（反映待ちの変更の取り出しもこのロックの中で行う）
+        self._file_lock = threading.Lock()
+        # 反映待ちの変更 {(重機ID, 年, 月): 変更のあった日のset}
+        self._pending = {}
+        self._pending_changed = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._started = False
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _file_path(self, machine_id, year, month):
+        name = hashlib.sha256(str(machine_id).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.store_dir, f'{name}_{year:04d}{month:02d}.xlsx')
+
+    def _load(self, machine_id, year, month):
+        """データベースから帳票の点検データと保存済み帳票の情報を取得（読み取りのみのためロックは不要）"""
+        start, end = month_date_range(year, month)
+        with closing(self._get_db()) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM inspection_records
+                WHERE machine_id = ? AND inspection_date >= ? AND inspection_date < ?
+                ORDER BY inspection_date, created_at
+            ''', (machine_id, start, end))
+            rows = cursor.fetchall()
+
+            # 現場名は最新の点検記録のもの
+            site_names = [row['site_name'] for row in rows if row['site_name']]
+            payload = build_report_payload(
+                conn, machine_id, year, month,
+                overrides={'site_name': site_names[-1] if site_names else ''}, rows=rows,
+                image_store=self._image_store,
+            )
+
+            cursor.execute(
+                'SELECT * FROM monthly_reports WHERE machine_id = ? AND year = ? AND month = ?',
+                (machine_id, year, month)
+            )
+            stored = cursor.fetchone()
+        return payload, stored
+
+    def _save(self, machine_id, year, month, header_hash, file_path):
+        etag = _file_etag(file_path)
+        with self._db_lock:
+            with closing(self._get_db()) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO monthly_reports
+                    (machine_id, year, month, header_hash, file_path, etag, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (machine_id, year, month, header_hash, file_path, etag, datetime.now().isoformat()))
+                conn.commit()
+        return etag
+
+    def _build(self, machine_id, year, month, payload):
+        """帳票全体を生成して保存"""
+        file_path = self._file_path(machine_id, year, month)
+        temp_path = f'{file_path}.tmp'
+        create_monthly_report(payload, temp_path)
+        os.replace(temp_path, file_path)
+        return file_path, self._save(machine_id, year, month, _header_hash(payload), file_path)
+
+    def get(self, machine_id, year, month):
+        """
+        保存済み帳票を取得（未生成の場合は生成）
+
+        Returns:
+            (ファイルパス, ETag, 点検データ)。点検記録がない場合は (None, None, 点検データ)
+        """
+        with self._file_lock:
+            # 反映待ちの変更があれば先に反映
+            days = self._take_pending((machine_id, year, month))
+            if days:
+                self._apply_days(machine_id, year, month, days)
+            payload, stored = self._load(machine_id, year, month)
+            if not payload['records']:
+                return None, None, payload
+            if stored and stored['header_hash'] == _header_hash(payload) and os.path.exists(stored['file_path']):
+                return stored['file_path'], stored['etag'], payload
+            file_path, etag = self._build(machine_id, year, month, payload)
+            return file_path, etag, payload
+
+    def records_changed(self, changes):
+        """
+        点検記録の変更を反映待ちに追加（保存済みの重機・月のみ、反映は書き込みスレッドで行う）
+
+        Args:
+            changes: 変更のあった (重機ID, inspection_date) のリスト
+        """
+        days_by_month = {}
+        for machine_id, inspection_date in changes:
+            if not machine_id or not inspection_date:
+                continue
+            try:
+                year, month, day = _record_month_day(inspection_date)
+            except ValueError:
+                continue
+            days_by_month.setdefault((machine_id, year, month), set()).add(day)
+        if not days_by_month:
+            return
+
+        self._start()
+        with self._pending_changed:
+            for key, days in days_by_month.items():
+                self._pending.setdefault(key, set()).update(days)
+            self._pending_changed.notify()
+
+    def flush(self):
+        """反映待ちの変更をすべて呼び出し元のスレッドで反映"""
+        while True:
+            with self._pending_changed:
+                if not self._pending:
+                    return
+                key = next(iter(self._pending))
+            self._update_pending(key)
+
+    def _take_pending(self, key):
+        """反映待ちの変更を取り出す（_file_lock を取得した状態で呼び出すこと）"""
+        with self._pending_changed:
+            return self._pending.pop(key, None)
+
+    def _start(self):
+        """書き込みスレッドを起動（最初の変更時に一度だけ）"""
+        if self._started:
+            return
+        with self._start_lock:
+            if not self._started:
+                threading.Thread(target=self._run_forever, daemon=True).start()
+                self._started = True
+
+    def _run_forever(self):
+        while True:
+            with self._pending_changed:
+                while not self._pending:
+                    self._pending_changed.wait()
+            # 続けて届く同じ月の変更をまとめて反映
+            time.sleep(self.update_delay)
+            self.flush()
+
+    def _update_pending(self, key):
+        with self._file_lock:
+            days = self._take_pending(key)
+            if not days:
+                return
+            machine_id, year, month = key
+            try:
+                self._apply_days(machine_id, year, month, days)
+            except Exception as e:
+                print(f'❌ 月次帳票更新エラー: {machine_id} {year}年{month}月: {e}')
+
+    def _apply_days(self, machine_id, year, month, days):
+        """変更のあった日の列を保存済み帳票に反映（_file_lock を取得した状態で呼び出すこと）"""
+        payload, stored = self._load(machine_id, year, month)
+        if not stored or not os.path.exists(stored['file_path']):
+            # 未生成の帳票は取得時に生成
+            return
+
+        header_hash = _header_hash(payload)
+        if stored['header_hash'] != header_hash:
+            self._build(machine_id, year, month, payload)
+            return
+
+        day_payload = dict(payload)
+        day_payload['records'] = [record for record in payload['records'] if record['day'] in days]
+        try:
+            update_report_days(stored['file_path'], day_payload, days)
+        except ValueError:
+            # 差し替えできない書式の場合は全体を再生成
+            self._build(machine_id, year, month, payload)
+            return
+        self._save(machine_id, year, month, header_hash, stored['file_path'])
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF Report - 点検帳票のPDF出力
+Excelを経由せずに、点検帳票（A3横）をPDFとして直接描画する。
+
+帳票のレイアウトはExcel帳票と同じ宣言的レイアウト（report_layout）、可変部分は
+Excel帳票と同じ書き込み内容（excel_generator_advancedの_report_content）から描画するため、
+列幅・行高・結合・罫線・文言はExcel帳票と一致する。
+
+- 静的部分（固定文言・罫線・塗りつぶし）は帳票バリエーションごとにページテンプレート
+  （Form XObject）として一度だけ描画してキャッシュし、全ページ・全重機で共有する
+- ページごとに描画するのは可変部分（ヘッダー値・⚪×・点検者・重機画像など）のみ
+- 重機画像は帳票用に縮小済みのJPEGをデコードせずにそのまま埋め込む（同じ画像はPDFごとに1つ）
+
+設定（環境変数）:
+    INSPECTION_PDF_FONT        埋め込むTrueTypeフォント（.ttf/.ttc）のパス
+                               （未指定の場合はPDFビューアの日本語フォント（平成明朝）で表示）
+    INSPECTION_PDF_FONT_INDEX  .ttcの場合のフォント番号（既定: 0）
+"""
+
+import os
+import threading
+from datetime import date, datetime
+
+from openpyxl.utils import range_boundaries
+
+from excel_generator_advanced import _report_content, _report_image, _apply_stream_writes, _EMPTY_STREAM_CELL
+from pdf_writer import PdfWriter, Canvas, CidFontFace, TrueTypeFontFace, JpegImage
+from report_layout import (
+    compile_layout, column_pixels, area_pixels, fit_image,
+    DEFAULT_ROW_HEIGHT, MACHINE_IMAGE_AREA, MACHINE_IMAGE_ANCHOR,
+)
+
+PDF_MIMETYPE = 'application/pdf'
+
+INSPECTION_PDF_FONT = os.environ.get('INSPECTION_PDF_FONT', '')
+INSPECTION_PDF_FONT_INDEX = int(os.environ.get('INSPECTION_PDF_FONT_INDEX', 0))
+
+# 用紙（A3横、pt）と余白（10mm）
+PAGE_WIDTH = 1190.55
+PAGE_HEIGHT = 841.89
+PAGE_MARGIN = 28.35
+
+# フォント未指定のセルの書式（Excelの既定: 11pt）
+_DEFAULT_FONT = (None, 11, False, False, None)
+_DEFAULT_ALIGNMENT = (None, None, False)
+
+# セル内の余白（px）・行の高さ（フォントサイズ比）・ベースラインの位置（フォントサイズ比）
+_CELL_PADDING = 2
+_LINE_HEIGHT = 1.2
+_EM_ASCENT = 0.88
+
+# PDFの日本語フォントにない文字の置き換え
+_PDF_CHAR_REPLACEMENTS = str.maketrans({'⚪': '○'})
+
+_font_face = None
+_page_templates = {}
+# {画像ファイルのパス: JpegImage}（帳票用の画像はファイル名に内容のハッシュを含むため、パスごとに一度だけ読み込む）
+_images = {}
+_IMAGE_CACHE_SIZE = 64
+_template_lock = threading.Lock()
+
+
+def get_font_face():
+    """帳票の描画に使うフォント（初回のみ読み込み）"""
+    global _font_face
+    if _font_face is None:
+        with _template_lock:
+            if _font_face is None:
+                if INSPECTION_PDF_FONT:
+                    _font_face = TrueTypeFontFace(INSPECTION_PDF_FONT, INSPECTION_PDF_FONT_INDEX)
+                    print(f'✅ PDFフォント読み込み: {_font_face.font_name}')
+                else:
+                    _font_face = CidFontFace('HeiseiMin-W3')
+    return _font_face
+
+
+# ============================================================
+# ページの座標
+# ============================================================
+
+def _column_points(width):
+    """Excelの列幅（文字数）をptに変換"""
+    return column_pixels(width) * 0.75
+
+
+class _PageGeometry:
+    """レイアウトのセル位置をPDFの座標に変換（印刷範囲を用紙に収まるよう縮小）"""
+
+    def __init__(self, layout):
+        max_row = max(row for row, _ in layout['cells'])
+        max_col = max(col for _, col in layout['cells'])
+
+        self.col_x = [0.0]
+        for col in range(1, max_col + 1):
+            self.col_x.append(self.col_x[-1] + _column_points(layout['col_widths'].get(col)))
+        self.row_y = [0.0]
+        for row in range(1, max_row + 1):
+            self.row_y.append(self.row_y[-1] + layout['row_heights'].get(row, DEFAULT_ROW_HEIGHT))
+
+        available_width = PAGE_WIDTH - 2 * PAGE_MARGIN
+        available_height = PAGE_HEIGHT - 2 * PAGE_MARGIN
+        self.scale = min(available_width / self.col_x[-1], available_height / self.row_y[-1])
+        self.left = PAGE_MARGIN + (available_width - self.col_x[-1] * self.scale) / 2
+        self.top = PAGE_HEIGHT - PAGE_MARGIN
+
+    def x(self, col_boundary):
+        """列の境界（0=左端）のx座標"""
+        return self.left + self.col_x[col_boundary] * self.scale
+
+    def y(self, row_boundary):
+        """行の境界（0=上端）のy座標"""
+        return self.top - self.row_y[row_boundary] * self.scale
+
+    def pixel_rect(self, x, y, width, height):
+        """シート上の位置・大きさ（px、A1の左上が原点）の矩形 (x, y, 幅, 高さ)"""
+        scale = 0.75 * self.scale
+        return self.left + x * scale, self.top - (y + height) * scale, width * scale, height * scale
+
+    def rect(self, min_row, min_col, max_row, max_col):
+        """セル範囲の矩形 (x, y, 幅, 高さ)"""
+        x = self.x(min_col - 1)
+        y = self.y(max_row)
+        return x, y, self.x(max_col) - x, self.y(min_row - 1) - y
+
+
+def _merge_bounds(ranges):
+    """結合セル範囲から {左上のセル: (min_row, min_col, max_row, max_col)} と {セル: 範囲} を作成"""
+    anchors = {}
+    members = {}
+    for range_string in ranges:
+        min_col, min_row, max_col, max_row = range_boundaries(range_string)
+        bounds = (min_row, min_col, max_row, max_col)
+        anchors[(min_row, min_col)] = bounds
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                members[(row, col)] = bounds
+    return anchors, members
+
+
+# ============================================================
+# 描画
+# ============================================================
+
+def _display_text(value):
+    """セルの値を表示用の文字列に変換"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return f'{value.year}/{value.month}/{value.day}'
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).translate(_PDF_CHAR_REPLACEMENTS)
+
+
+def _wrap_line(face, line, size, width):
+    """1行の文字列をセル幅で折り返し（文字単位）"""
+    lines = []
+    current = ''
+    for char in line:
+        if current and face.width(current + char) * size / 1000 > width:
+            lines.append(current)
+            current = char
+        else:
+            current += char
+    lines.append(current)
+    return lines
+
+
+def _draw_text(canvas, face, value, font, alignment, rect, scale):
+    """セル（または結合セル）の矩形内に値を描画（Excelの配置に合わせる）"""
+    text = _display_text(value)
+    if not text:
+        return
+    _, size, bold, italic, underline = font or _DEFAULT_FONT
+    size = (size or _DEFAULT_FONT[1]) * scale
+    horizontal, vertical, wrap_text = alignment or _DEFAULT_ALIGNMENT
+    x, y, width, height = rect
+    padding = _CELL_PADDING * scale
+
+    lines = text.split('\n')
+    if wrap_text:
+        lines = [wrapped for line in lines for wrapped in _wrap_line(face, line, size, width - 2 * padding)]
+
+    line_height = size * _LINE_HEIGHT
+    block = line_height * len(lines)
+    if vertical == 'top':
+        block_top = y + height - padding
+    elif vertical == 'center':
+        block_top = y + (height + block) / 2
+    else:
+        block_top = y + padding + block
+
+    if horizontal is None or horizontal == 'general':
+        horizontal = 'right' if isinstance(value, (int, float)) and not isinstance(value, bool) else 'left'
+
+    for index, line in enumerate(lines):
+        line_width = face.width(line) * size / 1000
+        if horizontal == 'center':
+            line_x = x + (width - line_width) / 2
+        elif horizontal == 'right':
+            line_x = x + width - padding - line_width
+        else:
+            line_x = x + padding
+        baseline = block_top - line_height * index - (line_height - size) / 2 - size * _EM_ASCENT
+        canvas.text(face, size, line_x, baseline, line, bold=bold, italic=italic, underline=bool(underline))
+
+
+def _border_segments(cells, members):
+    """
+    罫線を線分にまとめる（結合セルの内側の辺は描画しない）
+
+    Returns:
+        [(向き, 境界の位置, 開始, 終了, 線種)]
+        向き'h'は横線（境界=行の境界、開始・終了=列の境界）、'v'は縦線
+    """
+    edges = {}
+    for (row, col), (_, _, _, border, _) in cells.items():
+        if border is None:
+            continue
+        bounds = members.get((row, col))
+        left, right, top, bottom = border
+        for style, orientation, boundary, start, interior in (
+            (left, 'v', col - 1, row - 1, bounds and col > bounds[1]),
+            (right, 'v', col, row - 1, bounds and col < bounds[3]),
+            (top, 'h', row - 1, col - 1, bounds and row > bounds[0]),
+            (bottom, 'h', row, col - 1, bounds and row < bounds[2]),
+        ):
+            if style and not interior:
+                edges.setdefault((orientation, boundary, style), set()).add(start)
+
+    # 同じ線種で連続する辺は1本の線分にまとめる
+    segments = []
+    for (orientation, boundary, style), starts in sorted(edges.items()):
+        starts = sorted(starts)
+        begin = previous = starts[0]
+        for start in starts[1:]:
+            if start != previous + 1:
+                segments.append((orientation, boundary, begin, previous + 1, style))
+                begin = start
+            previous = start
+        segments.append((orientation, boundary, begin, previous + 1, style))
+    return segments
+
+
+def _build_page_templates(variant):
+    """
+    帳票バリエーションの静的部分を描画
+
+    Returns:
+        (座標, 背景（塗りつぶし）, 前景（罫線・固定文言）)
+        可変部分の塗りつぶしは背景と前景の間に描画する（罫線を塗りつぶしで隠さない）
+    """
+    layout = compile_layout(variant)
+    geometry = _PageGeometry(layout)
+    anchors, members = _merge_bounds(layout['merges'])
+    face = get_font_face()
+
+    background = Canvas(size=(PAGE_WIDTH, PAGE_HEIGHT))
+    foreground = Canvas(size=(PAGE_WIDTH, PAGE_HEIGHT))
+
+    for (row, col), (value, font, fill, border, alignment) in sorted(layout['cells'].items()):
+        if fill is not None:
+            background.fill_rect(*geometry.rect(row, col, row, col), fill)
+
+    for orientation, boundary, start, end, style in _border_segments(layout['cells'], members):
+        if orientation == 'h':
+            y = geometry.y(boundary)
+            foreground.line(geometry.x(start), y, geometry.x(end), y, style)
+        else:
+            x = geometry.x(boundary)
+            foreground.line(x, geometry.y(start), x, geometry.y(end), style)
+
+    for (row, col), (value, font, fill, border, alignment) in sorted(layout['cells'].items()):
+        # 重機画像エリアの文言は画像がない場合のみ（ページごとに描画）
+        if value is None or (row, col) in layout['merged_cells'] or (row, col) == MACHINE_IMAGE_ANCHOR:
+            continue
+        bounds = anchors.get((row, col), (row, col, row, col))
+        _draw_text(foreground, face, value, font, alignment, geometry.rect(*bounds), geometry.scale)
+
+    return geometry, background, foreground
+
+
+def get_page_templates(variant):
+    """帳票バリエーションのページテンプレート（初回のみ描画してキャッシュ）"""
+    templates = _page_templates.get(variant)
+    if templates is None:
+        # フォントの読み込みは別のロックを取るため先に済ませる
+        get_font_face()
+        with _template_lock:
+            templates = _page_templates.get(variant)
+            if templates is None:
+                templates = _page_templates[variant] = _build_page_templates(variant)
+    return templates
+
+
+def _jpeg_image(path):
+    """重機画像（帳票用に縮小済みのJPEG）を読み込み"""
+    image = _images.get(path)
+    if image is None:
+        if len(_images) >= _IMAGE_CACHE_SIZE:
+            _images.clear()
+        image = _images[path] = JpegImage(path)
+    return image
+
+
+def _draw_report_page(writer, data):
+    """点検データ1件分のページを追加"""
+    variant, writes, merges = _report_content(data)
+    layout = compile_layout(variant)
+    geometry, background, foreground = get_page_templates(variant)
+    anchors, _ = _merge_bounds(list(layout['merges']) + list(merges))
+    face = get_font_face()
+
+    # 可変部分のセル（スケルトンの書式に書き込みを重ねる）
+    static_cells = layout['cells']
+    cells = {MACHINE_IMAGE_ANCHOR: static_cells[MACHINE_IMAGE_ANCHOR]}
+    for row, col, *_ in writes:
+        cells[(row, col)] = static_cells.get((row, col), _EMPTY_STREAM_CELL)
+    _apply_stream_writes(cells, writes)
+
+    canvas = Canvas()
+    canvas.draw_form(background)
+    for (row, col), (_, _, fill, _, _) in sorted(cells.items()):
+        if fill is not None and fill != static_cells.get((row, col), _EMPTY_STREAM_CELL)[2]:
+            canvas.fill_rect(*geometry.rect(*anchors.get((row, col), (row, col, row, col))), fill)
+    image = _report_image(data)
+    if image is not None:
+        x, y, width, height = fit_image(
+            area_pixels(layout, MACHINE_IMAGE_AREA), image['width'], image['height']
+        )
+        canvas.draw_image(_jpeg_image(image['path']), *geometry.pixel_rect(x, y, width, height))
+    canvas.draw_form(foreground)
+    for (row, col), (value, font, _, _, alignment) in sorted(cells.items()):
+        bounds = anchors.get((row, col), (row, col, row, col))
+        _draw_text(canvas, face, value, font, alignment, geometry.rect(*bounds), geometry.scale)
+
+    writer.add_page(canvas, PAGE_WIDTH, PAGE_HEIGHT)
+
+
+def _render_pdf(payloads, output_path, title):
+    """点検データごとに1ページのPDFを出力（output_pathがNoneの場合はbytesを返す）"""
+    writer = PdfWriter()
+    for data in payloads:
+        _draw_report_page(writer, data)
+    content = writer.to_bytes(title)
+
+    if output_path is None:
+        return content
+    if hasattr(output_path, 'write'):
+        output_path.write(content)
+    else:
+        with open(output_path, 'wb') as f:
+            f.write(content)
+    return None
+
+
+def _document_title(data):
+    return f"点検表_{data.get('machine_model', '')}_{data.get('machine_unit', '')}_{data.get('year')}年{data.get('month')}月"
+
+
+def create_inspection_pdf(data, output_path=None):
+    """
+    点検帳票をPDFで生成（A3横1ページ）
+
+    Args:
+        data: 点検データ（create_inspection_reportと同じ形式）
+        output_path: 出力ファイルパスまたは書き込み可能なファイルオブジェクト
+                     （省略時はメモリ上に生成してbytesを返す）
+
+    Returns:
+        output_pathを省略した場合はPDFのbytes、それ以外はNone
+    """
+    content = _render_pdf([data], output_path, _document_title(data))
+    print(f'✅ PDF生成成功: {output_path if output_path is not None else f"{len(content):,} bytes"}')
+    return content
+
+
+def create_inspection_pdf_document(payloads, output_path=None):
+    """
+    複数重機の点検帳票を1つのPDFで生成（1重機1ページ、一括印刷用）
+
+    Args:
+        payloads: 点検データのリスト
+        output_path: 出力ファイルパスまたは書き込み可能なファイルオブジェクト
+                     （省略時はメモリ上に生成してbytesを返す）
+
+    Returns:
+        output_pathを省略した場合はPDFのbytes、それ以外はNone
+    """
+    if not payloads:
+        raise ValueError('点検データがありません')
+    title = _document_title(payloads[0]) if len(payloads) == 1 else f"点検表_{payloads[0].get('year')}年{payloads[0].get('month')}月"
+    content = _render_pdf(payloads, output_path, title)
+    print(f'✅ PDF一括生成成功: {len(payloads)}台')
+    return content
+
+
+# ============================================================
+# コマンドライン
+# ============================================================
+
+if __name__ == '__main__':
+    import json
+    import sys
+
+    if len(sys.argv) < 3:
+        print('Usage: python pdf_report.py <json_file> <output_path>')
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if isinstance(data, list):
+        create_inspection_pdf_document(data, sys.argv[2])
+    else:
+        create_inspection_pdf(data, sys.argv[2])
@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF Writer
+外部ライブラリを使わずにPDFを書き出す軽量PDFライター（帳票の描画に必要な機能のみ）
+
+- Canvas: ページ・ページテンプレートの描画内容（塗りつぶし・線・文字・画像）
+- ページテンプレート（Form XObject）: 一度描画したCanvasを複数ページで共有する
+- 日本語フォント:
+    CidFontFace:      Adobe-Japan1の標準フォント（埋め込みなし、PDFビューアのフォントで表示）
+    TrueTypeFontFace: TrueTypeフォント（.ttf/.ttc）を埋め込み（使用した文字のサブセット）
+- 画像: JpegImage（JPEGをデコードせずにそのまま埋め込む、同じ画像はPDFごとに一度だけ書き出す）
+
+ストリームはFlate圧縮し、作成日時などは含めない（同じ内容から同一のPDFを出力する）。
+"""
+
+import hashlib
+import os
+import re
+import struct
+import zlib
+
+# 線種 → (線幅, 破線パターン)
+LINE_STYLES = {
+    'hair': (0.25, ()),
+    'thin': (0.5, ()),
+    'medium': (1.0, ()),
+    'thick': (1.5, ()),
+    'double': (1.0, ()),
+    'dotted': (0.5, (1, 1)),
+    'dashed': (0.5, (3, 2)),
+    'dashDot': (0.5, (3, 1, 1, 1)),
+    'dashDotDot': (0.5, (3, 1, 1, 1, 1, 1)),
+    'mediumDashed': (1.0, (3, 2)),
+    'mediumDashDot': (1.0, (3, 1, 1, 1)),
+    'mediumDashDotDot': (1.0, (3, 1, 1, 1, 1, 1)),
+    'slantDashDot': (1.0, (3, 1, 1, 1)),
+}
+
+
+def _number(value):
+    """PDFの数値表記（小数点以下3桁、末尾の0は省略）"""
+    text = f'{value:.3f}'.rstrip('0').rstrip('.')
+    return '0' if text in ('', '-0') else text
+
+
+def _checksum(data):
+    """TrueTypeのテーブルのチェックサム（長さは4の倍数）"""
+    return sum(struct.unpack(f'>{len(data) // 4}I', data)) & 0xffffffff
+
+
+def _rgb(color):
+    """'RRGGBB' または 'AARRGGBB' をPDFの色（0～1）に変換"""
+    color = color[-6:]
+    return ' '.join(_number(int(color[i:i + 2], 16) / 255) for i in (0, 2, 4))
+
+
+# ============================================================
+# フォント
+# ============================================================
+
+class CidFontFace:
+    """
+    Adobe-Japan1の標準CIDフォント（埋め込みなし）
+
+    文字コードはUniJIS-UCS2-HW-H（UCS-2、英数字・半角カナは半角幅）で指定する。
+    """
+
+    # 標準フォントのフォント情報
+    _DESCRIPTORS = {
+        'HeiseiMin-W3': '/Flags 6 /FontBBox [-123 -257 1001 910] /ItalicAngle 0 '
+                        '/Ascent 723 /Descent -241 /CapHeight 709 /StemV 69',
+        'HeiseiKakuGo-W5': '/Flags 4 /FontBBox [-92 -250 1010 922] /ItalicAngle 0 '
+                           '/Ascent 752 /Descent -221 /CapHeight 737 /StemV 114',
+    }
+
+    def __init__(self, base_font='HeiseiMin-W3'):
+        if base_font not in self._DESCRIPTORS:
+            raise ValueError(f'未対応のフォントです: {base_font}')
+        self.base_font = base_font
+        self.ascent = 0.723 if base_font == 'HeiseiMin-W3' else 0.752
+
+    @staticmethod
+    def _char_width(char):
+        code = ord(char)
+        return 500 if 0x20 <= code <= 0x7e or 0xff61 <= code <= 0xff9f else 1000
+
+    def width(self, text):
+        """文字列の幅（1/1000 em単位）"""
+        return sum(self._char_width(char) for char in text)
+
+    def encode(self, text):
+        """文字列をPDFの16進文字列に変換（基本多言語面以外の文字は「〓」）"""
+        return '<' + ''.join(
+            f'{ord(char):04X}' if ord(char) <= 0xffff else '3013' for char in text
+        ) + '>'
+
+    def write(self, writer, chars):
+        """フォントの付属オブジェクトを書き出してType0フォントの辞書を返す"""
+        descriptor = writer.add(
+            f'<< /Type /FontDescriptor /FontName /{self.base_font} '
+            f'{self._DESCRIPTORS[self.base_font]} >>'
+        )
+        cid_font = writer.add(
+            f'<< /Type /Font /Subtype /CIDFontType0 /BaseFont /{self.base_font} '
+            f'/CIDSystemInfo << /Registry (Adobe) /Ordering (Japan1) /Supplement 2 >> '
+            f'/FontDescriptor {descriptor} 0 R /DW 1000 /W [231 389 500] >>'
+        )
+        return (
+            f'<< /Type /Font /Subtype /Type0 /BaseFont /{self.base_font} '
+            f'/Encoding /UniJIS-UCS2-HW-H /DescendantFonts [{cid_font} 0 R] >>'
+        )
+
+
+class TrueTypeFontFace:
+    """
+    埋め込み用のTrueTypeフォント
+
+    フォントファイルは一度だけ解析し、PDFごとに使用した文字のグリフのみを残したサブセット
+    （グリフ番号は元のまま）を埋め込む。文字コードはグリフ番号（Identity-H）で指定する。
+
+    Raises:
+        ValueError: TrueTypeアウトライン以外のフォント（CFFのOpenTypeなど）
+    """
+
+    # サブセットに含めるテーブル（PDFのFontFile2に必要なもの）
+    _SUBSET_TABLES = ('cvt ', 'fpgm', 'glyf', 'head', 'hhea', 'hmtx', 'loca', 'maxp', 'prep')
+
+    def __init__(self, path, index=0):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        offset = 0
+        if data[:4] == b'ttcf':
+            offset = struct.unpack_from('>I', data, 12 + 4 * index)[0]
+        if data[offset:offset + 4] not in (b'\x00\x01\x00\x00', b'true'):
+            raise ValueError(f'TrueTypeアウトラインのフォントのみ対応しています: {path}')
+
+        num_tables = struct.unpack_from('>H', data, offset + 4)[0]
+        self._tables = {}
+        for i in range(num_tables):
+            tag, _, table_offset, length = struct.unpack_from('>4sIII', data, offset + 12 + 16 * i)
+            self._tables[tag.decode('latin-1')] = data[table_offset:table_offset + length]
+
+        head = self._tables['head']
+        self.units_per_em = struct.unpack_from('>H', head, 18)[0]
+        self.bbox = struct.unpack_from('>4h', head, 36)
+        long_loca = struct.unpack_from('>h', head, 50)[0] == 1
+
+        hhea = self._tables['hhea']
+        ascent, descent = struct.unpack_from('>hh', hhea, 4)
+        number_of_hmetrics = struct.unpack_from('>H', hhea, 34)[0]
+        self.num_glyphs = struct.unpack_from('>H', self._tables['maxp'], 4)[0]
+        self.ascent = ascent / self.units_per_em
+        self._descent = descent
+
+        # グリフの送り幅（1/1000 em単位）
+        hmtx = self._tables['hmtx']
+        advances = [struct.unpack_from('>H', hmtx, 4 * i)[0] for i in range(number_of_hmetrics)]
+        advances.extend([advances[-1]] * (self.num_glyphs - number_of_hmetrics))
+        self._widths = [round(advance * 1000 / self.units_per_em) for advance in advances]
+
+        # グリフの位置
+        loca = self._tables['loca']
+        if long_loca:
+            self._loca = list(struct.unpack_from(f'>{self.num_glyphs + 1}I', loca))
+        else:
+            self._loca = [value * 2 for value in struct.unpack_from(f'>{self.num_glyphs + 1}H', loca)]
+
+        self._cmap = self._parse_cmap(self._tables['cmap'])
+        self.font_name = self._postscript_name() or re.sub(
+            r'[^A-Za-z0-9-]', '', os.path.splitext(os.path.basename(path))[0]
+        ) or 'EmbeddedFont'
+
+    @staticmethod
+    def _parse_cmap(cmap):
+        """cmapテーブルから文字コード→グリフ番号の対応表を作成（形式4・12）"""
+        subtables = {}
+        for i in range(struct.unpack_from('>H', cmap, 2)[0]):
+            platform, encoding, offset = struct.unpack_from('>HHI', cmap, 4 + 8 * i)
+            subtables[(platform, encoding)] = offset
+
+        for key in ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3), (0, 1), (0, 0)):
+            offset = subtables.get(key)
+            if offset is None:
+                continue
+            table_format = struct.unpack_from('>H', cmap, offset)[0]
+            mapping = {}
+            if table_format == 12:
+                groups = struct.unpack_from('>I', cmap, offset + 12)[0]
+                for i in range(groups):
+                    start, end, glyph = struct.unpack_from('>III', cmap, offset + 16 + 12 * i)
+                    for code in range(start, end + 1):
+                        mapping[code] = glyph + code - start
+                return mapping
+            if table_format == 4:
+                segments = struct.unpack_from('>H', cmap, offset + 6)[0] // 2
+                ends = struct.unpack_from(f'>{segments}H', cmap, offset + 14)
+                starts = struct.unpack_from(f'>{segments}H', cmap, offset + 16 + 2 * segments)
+                deltas = struct.unpack_from(f'>{segments}h', cmap, offset + 16 + 4 * segments)
+                range_offsets_at = offset + 16 + 6 * segments
+                range_offsets = struct.unpack_from(f'>{segments}H', cmap, range_offsets_at)
+                for i in range(segments):
+                    for code in range(starts[i], ends[i] + 1):
+                        if code == 0xffff:
+                            continue
+                        if range_offsets[i] == 0:
+                            glyph = (code + deltas[i]) & 0xffff
+                        else:
+                            at = range_offsets_at + 2 * i + range_offsets[i] + 2 * (code - starts[i])
+                            glyph = struct.unpack_from('>H', cmap, at)[0]
+                            if glyph:
+                                glyph = (glyph + deltas[i]) & 0xffff
+                        if glyph:
+                            mapping[code] = glyph
+                return mapping
+        raise ValueError('対応する文字コード表（cmap）がありません')
+
+    def _postscript_name(self):
+        """nameテーブルのPostScript名（nameID 6）"""
+        table = self._tables.get('name')
+        if not table:
+            return None
+        count, string_offset = struct.unpack_from('>HH', table, 2)
+        for i in range(count):
+            platform, _, _, name_id, length, offset = struct.unpack_from('>6H', table, 6 + 12 * i)
+            if name_id != 6:
+                continue
+            raw = table[string_offset + offset:string_offset + offset + length]
+            name = raw.decode('utf-16-be' if platform in (0, 3) else 'latin-1', 'ignore')
+            name = re.sub(r'[^A-Za-z0-9-]', '', name)
+            if name:
+                return name
+        return None
+
+    def width(self, text):
+        """文字列の幅（1/1000 em単位）"""
+        cmap = self._cmap
+        return sum(self._widths[cmap.get(ord(char), 0)] for char in text)
+
+    def encode(self, text):
+        """文字列をPDFの16進文字列（グリフ番号）に変換"""
+        cmap = self._cmap
+        return '<' + ''.join(f'{cmap.get(ord(char), 0):04X}' for char in text) + '>'
+
+    def _glyph(self, glyph):
+        return self._tables['glyf'][self._loca[glyph]:self._loca[glyph + 1]]
+
+    def _subset_glyphs(self, glyphs):
+        """複合グリフの部品を含めた使用グリフの集合"""
+        pending = list(glyphs)
+        used = set(pending)
+        while pending:
+            data = self._glyph(pending.pop())
+            if len(data) < 10 or struct.unpack_from('>h', data, 0)[0] >= 0:
+                continue
+            offset = 10
+            while True:
+                flags, component = struct.unpack_from('>HH', data, offset)
+                if component not in used:
+                    used.add(component)
+                    pending.append(component)
+                offset += 4 + (4 if flags & 0x0001 else 2)
+                if flags & 0x0008:
+                    offset += 2
+                elif flags & 0x0040:
+                    offset += 4
+                elif flags & 0x0080:
+                    offset += 8
+                if not flags & 0x0020:
+                    break
+        return used
+
+    def _subset_font(self, glyphs):
+        """使用グリフ以外を空にしたフォントファイル（グリフ番号は元のまま）"""
+        glyf = bytearray()
+        loca = []
+        for glyph in range(self.num_glyphs):
+            loca.append(len(glyf))
+            if glyph in glyphs:
+                glyf += self._glyph(glyph)
+                glyf += b'\0' * (-len(glyf) % 4)
+        loca.append(len(glyf))
+
+        tables = {tag: self._tables[tag] for tag in self._SUBSET_TABLES if tag in self._tables}
+        tables['glyf'] = bytes(glyf)
+        tables['loca'] = struct.pack(f'>{len(loca)}I', *loca)
+        head = bytearray(tables['head'])
+        head[8:12] = b'\0\0\0\0'       # checkSumAdjustment
+        head[50:52] = b'\0\1'          # indexToLocFormat（long）
+        tables['head'] = bytes(head)
+
+        tags = sorted(tables)
+        entry_selector = max(i for i in range(16) if 2 ** i <= len(tags))
+        search_range = 16 * 2 ** entry_selector
+        header = struct.pack(
+            '>IHHHH', 0x00010000, len(tags), search_range, entry_selector, len(tags) * 16 - search_range
+        )
+        directory = b''
+        body = b''
+        offset = len(header) + 16 * len(tags)
+        head_offset = 0
+        for tag in tags:
+            table = tables[tag]
+            if tag == 'head':
+                head_offset = offset + len(body)
+            padded = table + b'\0' * (-len(table) % 4)
+            directory += struct.pack('>4sIII', tag.encode('latin-1'), _checksum(padded), offset + len(body), len(table))
+            body += padded
+
+        font = bytearray(header + directory + body)
+        font[head_offset + 8:head_offset + 12] = struct.pack('>I', (0xB1B0AFBA - _checksum(font)) & 0xffffffff)
+        return bytes(font)
+
+    def _to_unicode(self, chars):
+        """テキスト抽出用のToUnicode CMap"""
+        pairs = sorted({
+            (self._cmap[ord(char)], char) for char in chars
+            if ord(char) in self._cmap and ord(char) <= 0xffff
+        })
+        lines = [
+            '/CIDInit /ProcSet findresource begin',
+            '12 dict begin',
+            'begincmap',
+            '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def',
+            '/CMapName /Adobe-Identity-UCS def',
+            '/CMapType 2 def',
+            '1 begincodespacerange',
+            '<0000> <FFFF>',
+            'endcodespacerange',
+        ]
+        for start in range(0, len(pairs), 100):
+            chunk = pairs[start:start + 100]
+            lines.append(f'{len(chunk)} beginbfchar')
+            lines.extend(f'<{glyph:04X}> <{ord(char):04X}>' for glyph, char in chunk)
+            lines.append('endbfchar')
+        lines.extend([
+            'endcmap',
+            'CMapName currentdict /CMap defineresource pop',
+            'end',
+            'end',
+        ])
+        return '\n'.join(lines).encode('ascii')
+
+    def write(self, writer, chars):
+        """サブセットを埋め込んだフォントの付属オブジェクトを書き出してType0フォントの辞書を返す"""
+        glyphs = self._subset_glyphs({0} | {self._cmap.get(ord(char), 0) for char in chars})
+        tag = ''.join(
+            chr(ord('A') + byte % 26)
+            for byte in hashlib.sha256(repr(sorted(glyphs)).encode('ascii')).digest()[:6]
+        )
+        name = f'{tag}+{self.font_name}'
+
+        font_data = self._subset_font(glyphs)
+        font_file = writer.add_stream(font_data, f'/Length1 {len(font_data)}')
+        scale = 1000 / self.units_per_em
+        bbox = ' '.join(str(round(value * scale)) for value in self.bbox)
+        descriptor = writer.add(
+            f'<< /Type /FontDescriptor /FontName /{name} /Flags 4 /FontBBox [{bbox}] /ItalicAngle 0 '
+            f'/Ascent {round(self.ascent * 1000)} /Descent {round(self._descent * scale)} '
+            f'/CapHeight {round(self.ascent * 1000)} /StemV 80 /FontFile2 {font_file} 0 R >>'
+        )
+        widths = ' '.join(f'{glyph} [{self._widths[glyph]}]' for glyph in sorted(glyphs))
+        cid_font = writer.add(
+            f'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{name} '
+            f'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> '
+            f'/FontDescriptor {descriptor} 0 R /DW 1000 /W [{widths}] /CIDToGIDMap /Identity >>'
+        )
+        to_unicode = writer.add_stream(self._to_unicode(chars))
+        return (
+            f'<< /Type /Font /Subtype /Type0 /BaseFont /{name} /Encoding /Identity-H '
+            f'/DescendantFonts [{cid_font} 0 R] /ToUnicode {to_unicode} 0 R >>'
+        )
+
+
+# ============================================================
+# 画像
+# ============================================================
+
+class JpegImage:
+    """JPEG画像（DCTDecodeでそのまま埋め込む）"""
+
+    # 成分数 → 色空間
+    _COLOR_SPACES = {1: '/DeviceGray', 3: '/DeviceRGB', 4: '/DeviceCMYK'}
+    # フレームヘッダー（SOF）のマーカー（DHT・JPG・DACを除くC0～CF）
+    _SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        self.width, self.height, components = self._frame_header(self.data)
+        if components not in self._COLOR_SPACES:
+            raise ValueError(f'未対応のJPEGです: {path}')
+        self.color_space = self._COLOR_SPACES[components]
+
+    @classmethod
+    def _frame_header(cls, data):
+        """マーカーを順に読み、フレームヘッダーから (幅, 高さ, 成分数) を取得"""
+        if data[:2] != b'\xff\xd8':
+            raise ValueError('JPEGではありません')
+        offset = 2
+        while offset + 4 <= len(data):
+            if data[offset] != 0xFF:
+                break
+            marker = data[offset + 1]
+            if marker == 0xFF:
+                offset += 1
+                continue
+            length = struct.unpack_from('>H', data, offset + 2)[0]
+            if marker in cls._SOF_MARKERS:
+                height, width, components = struct.unpack_from('>HHB', data, offset + 5)
+                return width, height, components
+            offset += 2 + length
+        raise ValueError('JPEGのフレームヘッダーがありません')
+
+    def write(self, writer):
+        """画像XObjectを書き出してオブジェクト番号を返す"""
+        # Adobe形式のCMYK JPEGは反転して格納されている
+        decode = ' /Decode [1 0 1 0 1 0 1 0]' if self.color_space == '/DeviceCMYK' else ''
+        header = (
+            f'<< /Type /XObject /Subtype /Image /Width {self.width} /Height {self.height} '
+            f'/ColorSpace {self.color_space} /BitsPerComponent 8{decode} /Filter /DCTDecode '
+            f'/Length {len(self.data)} >>\nstream\n'
+        ).encode('latin-1')
+        return writer.add(header + self.data + b'\nendstream')
+
+
+# ============================================================
+# 描画内容
+# ============================================================
+
+class Canvas:
+    """
+    ページまたはページテンプレートの描画内容（座標はPDFの座標系、単位はpt）
+
+    使用したフォントと文字を記録し、PDFへの書き出し時にフォントのサブセットに反映する。
+    ページテンプレートとして使う場合はsize（幅, 高さ）を指定する。
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self._ops = []
+        self.fonts = {}
+        self.forms = {}
+        self.images = {}
+        self._content = None
+
+    def fill_rect(self, x, y, width, height, color):
+        """矩形を塗りつぶし（color: 'RRGGBB'）"""
+        self._ops.append(
+            f'{_rgb(color)} rg {_number(x)} {_number(y)} {_number(width)} {_number(height)} re f'
+        )
+
+    def line(self, x1, y1, x2, y2, style='thin'):
+        """線を描画（style: Excelの罫線の線種）"""
+        width, dash = LINE_STYLES.get(style, LINE_STYLES['thin'])
+        pattern = ' '.join(str(value) for value in dash)
+        self._ops.append(
+            f'0 G {_number(width)} w [{pattern}] 0 d '
+            f'{_number(x1)} {_number(y1)} m {_number(x2)} {_number(y2)} l S'
+        )
+
+    def text(self, face, size, x, y, text, bold=False, italic=False, underline=False, color=None):
+        """
+        文字列を描画（x, y: 左端のベースライン位置）
+
+        太字は輪郭線の重ね描き、斜体は傾斜変換で表現する
+        """
+        if not text:
+            return
+        name = self.fonts.setdefault(face, [f'F{len(self.fonts) + 1}', set()])
+        name[1].update(text)
+        color = _rgb(color) if color else '0 0 0'
+        mode = f'2 Tr {_number(size * 0.03)} w ' if bold else '0 Tr '
+        matrix = f'1 0 {0.2 if italic else 0} 1 {_number(x)} {_number(y)} Tm'
+        self._ops.append(
+            f'BT {color} rg {color} RG {mode}/{name[0]} {_number(size)} Tf '
+            f'{matrix} {face.encode(text)} Tj ET'
+        )
+        if underline:
+            width = face.width(text) * size / 1000
+            self._ops.append(
+                f'{color} RG {_number(size * 0.05)} w [] 0 d '
+                f'{_number(x)} {_number(y - size * 0.12)} m {_number(x + width)} {_number(y - size * 0.12)} l S'
+            )
+
+    def draw_form(self, form):
+        """ページテンプレート（Canvas）を描画"""
+        name = self.forms.setdefault(form, f'X{len(self.forms) + 1}')
+        self._ops.append(f'/{name} Do')
+
+    def draw_image(self, image, x, y, width, height):
+        """画像（JpegImage）を矩形に描画"""
+        name = self.images.setdefault(image, f'Im{len(self.images) + 1}')
+        self._ops.append(
+            f'q {_number(width)} 0 0 {_number(height)} {_number(x)} {_number(y)} cm /{name} Do Q'
+        )
+
+    def save(self):
+        self._ops.append('q')
+
+    def restore(self):
+        self._ops.append('Q')
+
+    def content(self):
+        """描画内容のストリーム（Flate圧縮済み、テンプレートとして共有する場合は一度だけ圧縮）"""
+        if self._content is None:
+            self._content = zlib.compress('\n'.join(self._ops).encode('latin-1'))
+        return self._content
+
+
+# ============================================================
+# PDF
+# ============================================================
+
+class PdfWriter:
+    """
+    PDFの書き出し
+
+    オブジェクトはメモリ上に保持し、to_bytes()で相互参照表と合わせて書き出す。
+    フォントは全ページの使用文字を集計して最後に書き出す。
+    """
+
+    def __init__(self):
+        self._objects = [None]
+        self._pages = []
+        self._pages_ref = self._reserve()
+        self._forms = {}
+        self._fonts = {}
+        self._images = {}
+
+    def _reserve(self):
+        self._objects.append(None)
+        return len(self._objects) - 1
+
+    def add(self, body):
+        """オブジェクトを追加してオブジェクト番号を返す"""
+        self._objects.append(body.encode('latin-1') if isinstance(body, str) else body)
+        return len(self._objects) - 1
+
+    def add_stream(self, data, entries='', compressed=False):
+        """ストリームオブジェクトを追加（未圧縮のデータはFlate圧縮する）"""
+        if not compressed:
+            data = zlib.compress(data)
+        header = f'<< /Length {len(data)} /Filter /FlateDecode {entries}>>\nstream\n'.encode('latin-1')
+        return self.add(header + data + b'\nendstream')
+
+    def _font_ref(self, face, chars):
+        entry = self._fonts.get(face)
+        if entry is None:
+            entry = self._fonts[face] = [self._reserve(), set()]
+        entry[1].update(chars)
+        return entry[0]
+
+    def _resources(self, canvas):
+        fonts = ' '.join(
+            f'/{name} {self._font_ref(face, chars)} 0 R' for face, (name, chars) in canvas.fonts.items()
+        )
+        xobjects = [f'/{name} {self._form_ref(form)} 0 R' for form, name in canvas.forms.items()]
+        xobjects.extend(f'/{name} {self._image_ref(image)} 0 R' for image, name in canvas.images.items())
+        return f'/Resources << /Font << {fonts} >> /XObject << {" ".join(xobjects)} >> >>'
+
+    def _image_ref(self, image):
+        """画像のオブジェクト番号（PDFごとに一度だけ書き出す）"""
+        ref = self._images.get(image)
+        if ref is None:
+            ref = self._images[image] = image.write(self)
+        return ref
+
+    def _form_ref(self, form):
+        """ページテンプレートのオブジェクト番号（PDFごとに一度だけ書き出す）"""
+        ref = self._forms.get(form)
+        if ref is None:
+            width, height = form.size
+            ref = self._forms[form] = self.add_stream(
+                form.content(),
+                f'/Type /XObject /Subtype /Form /BBox [0 0 {_number(width)} {_number(height)}] '
+                f'{self._resources(form)} ',
+                compressed=True,
+            )
+        return ref
+
+    def add_page(self, canvas, width, height):
+        """Canvasの描画内容を1ページとして追加"""
+        content = self.add_stream(canvas.content(), compressed=True)
+        self._pages.append(self.add(
+            f'<< /Type /Page /Parent {self._pages_ref} 0 R '
+            f'/MediaBox [0 0 {_number(width)} {_number(height)}] '
+            f'{self._resources(canvas)} /Contents {content} 0 R >>'
+        ))
+
+    def to_bytes(self, title=None):
+        """PDF全体をbytesで出力"""
+        for face, (ref, chars) in self._fonts.items():
+            self._objects[ref] = face.write(self, chars).encode('latin-1')
+
+        kids = ' '.join(f'{page} 0 R' for page in self._pages)
+        self._objects[self._pages_ref] = (
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>'.encode('latin-1')
+        )
+        catalog = self.add(f'<< /Type /Catalog /Pages {self._pages_ref} 0 R >>')
+        info = None
+        if title:
+            info = self.add(f'<< /Title <FEFF{title.encode("utf-16-be").hex().upper()}> >>')
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(self._objects[1:], start=1):
+            offsets.append(len(output))
+            output += f'{number} 0 obj\n'.encode('latin-1') + body + b'\nendobj\n'
+        xref = len(output)
+        output += f'xref\n0 {len(self._objects)}\n0000000000 65535 f \n'.encode('latin-1')
+        for offset in offsets:
+            output += f'{offset:010d} 00000 n \n'.encode('latin-1')
+        trailer = f'<< /Size {len(self._objects)} /Root {catalog} 0 R'
+        if info:
+            trailer += f' /Info {info} 0 R'
+        output += f'trailer\n{trailer} >>\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1')
+        return bytes(output)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Record Query - 点検記録の絞り込み・ページ分割取得
+GET /api/records の絞り込み条件（重機・現場・点検者・点検日の範囲）と
+キーセットページネーション（inspection_date, created_at, id の降順）を扱う。
+
+- 並び順のキーの最後の値をカーソル（不透明な文字列）として返し、次のページはその続きから取得する
+- OFFSETを使わないため、何ページ目でも取得にかかる時間はページの大きさに比例する
+
+/api/sync の差分同期（端末の点検記録のマージ、変更番号 change_seq 以降の変更・削除の取得）も扱う。
+
+設定（環境変数）:
+    RECORDS_PAGE_MAX   1ページの最大件数（既定: 500）
+"""
+
+import base64
+import json
+import os
+from datetime import datetime
+
+RECORDS_PAGE_MAX = int(os.environ.get('RECORDS_PAGE_MAX', 500))
+
+# クエリパラメータ → 完全一致で絞り込む列
+RECORD_FILTERS = {
+    'machineId': 'machine_id',
+    'siteName': 'site_name',
+    'inspectorName': 'inspector_name',
+}
+
+
+def record_to_dict(row):
+    """inspection_recordsの行をAPIの点検記録に変換"""
+    return {
+        'id': row['id'],
+        'machineId': row['machine_id'],
+        'siteName': row['site_name'],
+        'inspectorName': row['inspector_name'],
+        'inspectionDate': row['inspection_date'],
+        'results': json.loads(row['results']),
+        'createdAt': row['created_at'],
+        'updatedAt': row['updated_at'],
+        'changeSeq': row['change_seq'],
+    }
+
+
+def encode_cursor(row):
+    """ページの最後の行から次のページのカーソルを作成"""
+    key = [row['inspection_date'], row['created_at'], row['id']]
+    raw = json.dumps(key, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    カーソルから並び順のキー (inspection_date, created_at, id) を取得
+
+    Raises:
+        ValueError: カーソルが不正
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('cursorが不正です')
+    if not isinstance(key, list) or len(key) != 3 or not all(isinstance(value, str) for value in key):
+        raise ValueError('cursorが不正です')
+    return key
+
+
+def parse_record_query(args):
+    """
+    クエリパラメータから絞り込み条件とページ分割の指定を取得
+
+    Args:
+        args: クエリパラメータ（request.args）
+            machineId / siteName / inspectorName: 完全一致で絞り込み
+            dateFrom: 点検日の開始（inspection_date >= dateFrom）
+            dateTo: 点検日の終了（inspection_date < dateTo、例: 月の絞り込みは翌月1日）
+            limit: 1ページの件数（省略時はページ分割なし）
+            cursor: 前のページの nextCursor
+
+    Returns:
+        (絞り込み条件の辞書, 1ページの件数またはNone, カーソルのキーまたはNone)
+
+    Raises:
+        ValueError: limit・cursorが不正
+    """
+    filters = {param: args.get(param) for param in (*RECORD_FILTERS, 'dateFrom', 'dateTo') if args.get(param)}
+
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limitは整数で指定してください')
+        if not 1 <= limit <= RECORDS_PAGE_MAX:
+            raise ValueError(f'limitは1〜{RECORDS_PAGE_MAX}で指定してください')
+
+    cursor = args.get('cursor')
+    if cursor:
+        if limit is None:
+            raise ValueError('cursorはlimitと合わせて指定してください')
+        cursor = decode_cursor(cursor)
+    return filters, limit, cursor or None
+
+
+def query_records(conn, filters=None, limit=None, cursor=None):
+    """
+    点検記録を絞り込んで取得（inspection_date, created_at, id の降順）
+
+    Args:
+        conn: データベース接続（row_factory = sqlite3.Row）
+        filters: 絞り込み条件（parse_record_queryの戻り値）
+        limit: 1ページの件数（Noneの場合は全件）
+        cursor: 前のページの最後の行のキー（decode_cursorの戻り値）
+
+    Returns:
+        (inspection_recordsの行のリスト, 次のページのカーソルまたはNone)
+    """
+    filters = filters or {}
+    conditions = []
+    params = []
+    for param, column in RECORD_FILTERS.items():
+        if param in filters:
+            conditions.append(f'{column} = ?')
+            params.append(filters[param])
+    if 'dateFrom' in filters:
+        conditions.append('inspection_date >= ?')
+        params.append(filters['dateFrom'])
+    if 'dateTo' in filters:
+        conditions.append('inspection_date < ?')
+        params.append(filters['dateTo'])
+    if cursor:
+        conditions.append('(inspection_date, created_at, id) < (?, ?, ?)')
+        params.extend(cursor)
+
+    query = 'SELECT * FROM inspection_records'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY inspection_date DESC, created_at DESC, id DESC'
+    if limit is None:
+        return conn.execute(query, params).fetchall(), None
+
+    # 1件多く取得して次のページの有無を判定
+    query += ' LIMIT ?'
+    params.append(limit + 1)
+    rows = conn.execute(query, params).fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
+
+
+def current_sequence(conn):
+    """最新の変更番号（書き込みのたびにトリガーで1ずつ増える）"""
+    row = conn.execute('SELECT value FROM sync_sequence WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+
+def parse_since(value):
+    """
+    差分同期の since（前回の同期で返した cursor）を取得
+
+    Raises:
+        ValueError: sinceが不正
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError('sinceは0以上の整数で指定してください')
+    try:
+        since = int(value)
+    except ValueError:
+        raise ValueError('sinceは0以上の整数で指定してください')
+    if since < 0:
+        raise ValueError('sinceは0以上の整数で指定してください')
+    return since
+
+
+def changes_since(conn, since):
+    """
+    変更番号 since より後に作成・更新された点検記録と削除された点検記録のIDを取得
+
+    先に最新の変更番号を読み、その番号までの変更を返す（読み取り中にコミットされた変更は次回の同期で返る）。
+    since が最新の変更番号より大きい場合（データベースの復元など）は全件を返す
+
+    Returns:
+        (inspection_recordsの行のリスト, 削除された点検記録のIDのリスト, 次回の since, 全件かどうか)
+    """
+    cursor_value = current_sequence(conn)
+    if since > cursor_value:
+        since = 0
+    rows = conn.execute(
+        'SELECT * FROM inspection_records WHERE change_seq > ? AND change_seq <= ? ORDER BY change_seq',
+        (since, cursor_value)
+    ).fetchall()
+    deleted = []
+    if since:
+        deleted = [
+            row['id'] for row in conn.execute(
+                'SELECT id FROM record_tombstones WHERE change_seq > ? AND change_seq <= ? ORDER BY change_seq',
+                (since, cursor_value)
+            )
+        ]
+    return rows, deleted, cursor_value, since == 0
+
+
+def parse_base_seq(value):
+    """
+    端末の点検記録の baseSeq（端末が最後に受け取ったその記録の changeSeq）を取得
+
+    Returns:
+        baseSeq、省略時はNone
+
+    Raises:
+        ValueError: baseSeqが0以上の整数でない（文字列・真偽値を含む）
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError('baseSeqは0以上の整数で指定してください')
+    return value
+
+
+def merge_sync_records(cursor, records):
+    """
+    端末の点検記録をマージ（/api/sync、書き込み用ロックの中のトランザクションで呼び出すこと）
+
+    baseSeq（端末が最後に受け取ったその記録の changeSeq）を指定した記録は、
+    サーバー側でその後に変更・削除されていなければ反映し、されていれば競合とする。
+    baseSeq がない場合は updatedAt で比較する（ローカルが新しい場合のみ更新）
+
+    Returns:
+        ({'created': 作成件数, 'updated': 更新件数, 'conflicts': 競合件数}, 変更のあった (重機ID, inspection_date) のリスト)
+
+    Raises:
+        ValueError: baseSeqが不正な記録がある（書き込み前に全件を検証する）
+    """
+    base_seqs = [parse_base_seq(record.get('baseSeq')) for record in records]
+    sync_result = {'created': 0, 'updated': 0, 'conflicts': 0}
+    changes = []
+
+    for record, base_seq in zip(records, base_seqs):
+        # 既存レコードのチェック
+        cursor.execute(
+            'SELECT updated_at, machine_id, inspection_date, change_seq FROM inspection_records WHERE id = ?',
+            (record['id'],)
+        )
+        row = cursor.fetchone()
+
+        now = datetime.now().isoformat()
+
+        if not row:
+            if base_seq is not None:
+                # 端末が受け取った後にサーバーで削除された記録は復活させない
+                cursor.execute('SELECT change_seq FROM record_tombstones WHERE id = ?', (record['id'],))
+                tombstone = cursor.fetchone()
+                if tombstone and tombstone['change_seq'] > base_seq:
+                    sync_result['conflicts'] += 1
+                    continue
+
+            # 新規作成
+            cursor.execute('''
+                INSERT INTO inspection_records
+                (id, machine_id, site_name, inspector_name, inspection_date, results, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                record['id'],
+                record['machineId'],
+                record.get('siteName', ''),
+                record['inspectorName'],
+                record['inspectionDate'],
+                json.dumps(record['results'], ensure_ascii=False),
+                record.get('createdAt', now),
+                record.get('updatedAt', now)
+            ))
+            sync_result['created'] += 1
+            changes.append((record['machineId'], record['inspectionDate']))
+        else:
+            local_updated_at = record.get('updatedAt', '')
+            if base_seq is not None:
+                # 変更番号で比較（端末が受け取った後にサーバーで変更されていなければ反映）
+                apply = row['change_seq'] is not None and row['change_seq'] <= base_seq
+                local_updated_at = local_updated_at or now
+            else:
+                # 更新日時で比較（ローカルが新しい場合のみ更新）
+                apply = local_updated_at > row['updated_at']
+
+            if apply:
+                cursor.execute('''
+                    UPDATE inspection_records
+                    SET machine_id = ?, site_name = ?, inspector_name = ?,
+                        inspection_date = ?, results = ?, updated_at = ?
+                    WHERE id = ?
+                ''', (
+                    record['machineId'],
+                    record.get('siteName', ''),
+                    record['inspectorName'],
+                    record['inspectionDate'],
+                    json.dumps(record['results'], ensure_ascii=False),
+                    local_updated_at,
+                    record['id']
+                ))
+                sync_result['updated'] += 1
+                changes.append((row['machine_id'], row['inspection_date']))
+                changes.append((record['machineId'], record['inspectionDate']))
+            else:
+                sync_result['conflicts'] += 1
+    return sync_result, changes
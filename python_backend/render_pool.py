@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Render Pool - 帳票生成用プロセスプール
+openpyxlによる帳票生成をFlaskのスレッドから切り離し、ワーカープロセスで実行する。
+生成中もGILを占有しないため、同期・マスタデータAPIの応答が遅れない。
+
+- 待ち行列は上限付き（満杯時はRenderQueueFullを送出 → 503 + Retry-After）
+- ジョブごとのタイムアウト（ワーカーへの送信後から計測し、超過したワーカーは強制終了して再起動）
+- 空きワーカー待ちは別のタイムアウト（待ちがタイムアウトしてもワーカーは終了しない）
+- 一定件数のジョブを処理したワーカーは再起動（メモリ肥大化の防止）
+- 一括生成のコマンドライン（--batch・month_export.py）は run_render_batch でジョブをワーカーに振り分ける
+
+設定（環境変数）:
+    REPORT_POOL_ENABLED      プロセスプールを使用するか（'0'でインライン実行）
+    REPORT_WORKERS           ワーカープロセス数（既定: CPUコア数）
+    REPORT_QUEUE_SIZE        実行待ちジョブの上限（既定: ワーカー数×2）
+    REPORT_JOB_TIMEOUT       ジョブのタイムアウト秒数（既定: 60）
+    REPORT_QUEUE_TIMEOUT     空きワーカー待ちのタイムアウト秒数（既定: REPORT_JOB_TIMEOUT）
+    REPORT_WORKER_MAX_JOBS   ワーカーを再起動するまでのジョブ数（既定: 200）
+    REPORT_RETRY_AFTER       待ち行列満杯時のRetry-After秒数（既定: 5）
+"""
+
+import importlib
+import multiprocessing
+import os
+import queue
+import threading
+import traceback
+
+REPORT_POOL_ENABLED = os.environ.get('REPORT_POOL_ENABLED', '1') != '0'
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', os.cpu_count() or 1))
+REPORT_QUEUE_SIZE = int(os.environ.get('REPORT_QUEUE_SIZE', REPORT_WORKERS * 2))
+REPORT_JOB_TIMEOUT = float(os.environ.get('REPORT_JOB_TIMEOUT', 60))
+REPORT_QUEUE_TIMEOUT = float(os.environ.get('REPORT_QUEUE_TIMEOUT', REPORT_JOB_TIMEOUT))
+REPORT_WORKER_MAX_JOBS = int(os.environ.get('REPORT_WORKER_MAX_JOBS', 200))
+REPORT_RETRY_AFTER = int(os.environ.get('REPORT_RETRY_AFTER', 5))
+
+# ワーカーで実行を許可する帳票生成関数（関数名 → モジュール名）
+RENDER_FUNCTIONS = {
+    'create_inspection_report': 'excel_generator_advanced',
+    'create_inspection_workbook': 'excel_generator_advanced',
+    'create_inspection_pdf': 'pdf_report',
+    'create_inspection_pdf_document': 'pdf_report',
+}
+
+
+class RenderQueueFull(Exception):
+    """帳票生成の待ち行列が満杯"""
+
+    def __init__(self, retry_after=REPORT_RETRY_AFTER):
+        super().__init__('帳票生成の待ち行列が満杯です')
+        self.retry_after = retry_after
+
+
+class RenderTimeout(Exception):
+    """帳票生成がタイムアウト"""
+
+
+class RenderError(Exception):
+    """ワーカーでの帳票生成に失敗"""
+
+    def __init__(self, message, error_type=None):
+        """
+        Args:
+            message: エラー内容（ワーカーでの例外の内容。トレースバックは含まない）
+            error_type: ワーカーで発生した例外のクラス名
+        """
+        super().__init__(message)
+        self.error_type = error_type
+
+
+def _resolve_function(module_name, name):
+    """モジュール名・関数名から関数を取得"""
+    return getattr(importlib.import_module(module_name), name)
+
+
+def _render_function(name):
+    """帳票生成関数名から関数を取得"""
+    if name not in RENDER_FUNCTIONS:
+        raise ValueError(f'未対応の帳票生成関数です: {name}')
+    return _resolve_function(RENDER_FUNCTIONS[name], name)
+
+
+def _worker_main(conn):
+    """ワーカープロセスのメインループ"""
+    import excel_generator_advanced as generator
+
+    # スケルトンはワーカー起動時に一度だけ構築
+    generator.preload_report_skeletons()
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+
+        # 関数は親プロセスでRENDER_FUNCTIONSから解決済み
+        module_name, name, args, kwargs = message
+        try:
+            result = _resolve_function(module_name, name)(*args, **kwargs)
+            conn.send((True, result))
+        except Exception as e:
+            # トレースバックはワーカーの標準エラー出力のみ（呼び出し元には例外のクラス名と内容を返す）
+            traceback.print_exc()
+            conn.send((False, (type(e).__name__, str(e))))
+
+
+class _Worker:
+    """ワーカープロセスと通信用パイプ"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+
+    def stop(self):
+        """ワーカーを終了（応答しない場合は強制終了）"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        """ワーカーを強制終了"""
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class RenderPool:
+    """上限付き待ち行列を持つ帳票生成プロセスプール"""
+
+    def __init__(self, workers=REPORT_WORKERS, queue_size=REPORT_QUEUE_SIZE,
+                 job_timeout=REPORT_JOB_TIMEOUT, max_jobs_per_worker=REPORT_WORKER_MAX_JOBS,
+                 queue_timeout=REPORT_QUEUE_TIMEOUT):
+        """
+        Args:
+            workers: ワーカープロセス数
+            queue_size: 実行待ちジョブの上限
+            job_timeout: ジョブのタイムアウト秒数（ワーカーへの送信後から計測）
+            max_jobs_per_worker: ワーカーを再起動するまでのジョブ数
+            queue_timeout: 空きワーカー待ちのタイムアウト秒数
+        """
+        self.workers = max(1, workers)
+        self.job_timeout = job_timeout
+        self.queue_timeout = queue_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._context = multiprocessing.get_context('spawn')
+        # 実行中＋実行待ちのジョブ数の上限
+        self._slots = threading.BoundedSemaphore(self.workers + max(0, queue_size))
+        self._idle = queue.Queue()
+        self._closed = False
+        for _ in range(self.workers):
+            self._idle.put(_Worker(self._context))
+
+    def render(self, name, *args, **kwargs):
+        """
+        ワーカーで帳票生成関数を実行し、戻り値を返す
+
+        Args:
+            name: 帳票生成関数名（RENDER_FUNCTIONSのいずれか）
+
+        Raises:
+            RenderQueueFull: 待ち行列が満杯
+            RenderTimeout: 空きワーカー待ちまたは生成がタイムアウト
+            RenderError: ワーカーでの生成に失敗
+        """
+        if name not in RENDER_FUNCTIONS:
+            raise ValueError(f'未対応の帳票生成関数です: {name}')
+        if self._closed:
+            raise RenderError('帳票生成プールは停止しています')
+        if not self._slots.acquire(blocking=False):
+            raise RenderQueueFull()
+
+        try:
+            try:
+                worker = self._idle.get(timeout=self.queue_timeout)
+            except queue.Empty:
+                raise RenderTimeout('空きワーカー待ちがタイムアウトしました')
+
+            try:
+                try:
+                    worker.conn.send((RENDER_FUNCTIONS[name], name, args, kwargs))
+                    # 実行のタイムアウトは送信後から（空きワーカー待ちの時間は含めない）
+                    finished = worker.conn.poll(self.job_timeout)
+                    if finished:
+                        ok, result = worker.conn.recv()
+                except (EOFError, OSError):
+                    # ワーカーが異常終了した場合は入れ替え
+                    worker.kill()
+                    worker = _Worker(self._context)
+                    raise RenderError('帳票生成ワーカーが異常終了しました')
+
+                if not finished:
+                    # タイムアウトしたワーカーは強制終了して入れ替え
+                    worker.kill()
+                    worker = _Worker(self._context)
+                    raise RenderTimeout(f'帳票生成が{self.job_timeout:g}秒以内に完了しませんでした')
+
+                worker.jobs_done += 1
+                if worker.jobs_done >= self.max_jobs_per_worker:
+                    # 一定件数を処理したワーカーは再起動
+                    worker.stop()
+                    worker = _Worker(self._context)
+
+                if not ok:
+                    error_type, message = result
+                    raise RenderError(message or error_type, error_type)
+                return result
+            finally:
+                self._idle.put(worker)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        """全ワーカーを終了"""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """共有の帳票生成プールを取得（初回呼び出し時にワーカーを起動）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RenderPool()
+    return _pool
+
+
+def run_render_job(name, *args, **kwargs):
+    """
+    帳票生成関数を実行（プロセスプール無効時は呼び出し元スレッドで実行）
+
+    Args:
+        name: 帳票生成関数名（RENDER_FUNCTIONSのいずれか）
+    """
+    if not REPORT_POOL_ENABLED:
+        return _render_function(name)(*args, **kwargs)
+    return get_render_pool().render(name, *args, **kwargs)
+
+
+def run_render_batch(jobs, process, workers=0, job_timeout=None):
+    """
+    ジョブを順に帳票生成（一括生成のコマンドライン用、workers指定時はワーカープロセスで並列に生成）
+
+    Args:
+        jobs: ジョブのイテラブル（読み込みはワーカー数分だけ先行し、ジョブ全体をメモリに載せない）
+        process: ジョブごとに呼び出す関数 process(render, job)。
+                 render(name, *args) で帳票生成関数（RENDER_FUNCTIONSのいずれか）を実行する。
+                 workers指定時は複数のスレッドから呼び出される
+        workers: 並列に生成するワーカープロセス数（0の場合はこのプロセスで順に生成）
+        job_timeout: 1ジョブのタイムアウト秒数（workers指定時のみ、省略時はREPORT_JOB_TIMEOUT）
+    """
+    if workers <= 0:
+        import excel_generator_advanced
+
+        excel_generator_advanced.preload_report_skeletons()
+
+        def render(name, *args):
+            return _render_function(name)(*args)
+
+        for job in jobs:
+            process(render, job)
+        return
+
+    pool = RenderPool(workers=workers, queue_size=0, job_timeout=job_timeout or REPORT_JOB_TIMEOUT)
+    pending = queue.Queue(maxsize=workers)
+
+    def consume():
+        while True:
+            job = pending.get()
+            if job is None:
+                break
+            process(pool.render, job)
+
+    threads = [threading.Thread(target=consume, daemon=True) for _ in range(workers)]
+    try:
+        for thread in threads:
+            thread.start()
+        try:
+            for job in jobs:
+                pending.put(job)
+        finally:
+            for _ in threads:
+                pending.put(None)
+            for thread in threads:
+                thread.join()
+    finally:
+        pool.shutdown()
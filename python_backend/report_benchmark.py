@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Report Benchmark - 帳票生成のベンチマーク
+帳票生成（create_inspection_report・generate_excel_from_template・PDF出力）の
+処理時間・メモリ使用量・出力サイズを計測し、履歴ファイル（JSON）に記録する。
+コミット間で結果を比較して性能の劣化を検出する。
+
+計測対象:
+    - 点検データの形: 空（記録なし）・通常（平日のみ・未点検あり）・満載（31日×14項目）
+    - 帳票バリエーション: 油圧ショベル・ハンドガイド式・その他（関係法令の記載ごと）
+    - 生成方法: 描画エンジン×書式モード、テンプレート方式（openpyxl・zip）、PDF
+    - 一括出力: 1シートと複数シートのワークブック・PDF
+
+計測項目:
+    wall_ms       処理時間（ミリ秒、繰り返しの最小値と中央値）
+    peak_kb       生成中のPythonのメモリ確保量のピーク（tracemalloc、KB）
+    output_bytes  出力ファイルのサイズ
+    styles        セル書式の数（XLSXのcellXfs、PDFはNone）
+    max_rss_kb    実行全体のプロセスの最大RSS（KB、実行ごとに1つ）
+
+使用方法:
+    python report_benchmark.py run [--repeat N] [--filter 文字列] [--label ラベル]
+    python report_benchmark.py compare [基準] [比較対象] [--threshold %]
+    python report_benchmark.py list
+
+    基準・比較対象は履歴の番号（負数は末尾から）またはコミットID（省略時は直前と最新）
+
+設定（環境変数）:
+    REPORT_BENCHMARK_HISTORY   履歴ファイルのパス（既定: benchmark_history.json）
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime
+
+from excel_generator_advanced import (
+    create_inspection_report, create_inspection_workbook, REPORT_ENGINES, REPORT_STYLINGS,
+)
+from pdf_report import create_inspection_pdf, create_inspection_pdf_document
+from report_layout import VARIANT_EXCAVATOR, VARIANT_HAND_GUIDED, VARIANT_GENERAL
+
+# テンプレート方式の生成スクリプト（backend/）
+_BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+if _BACKEND_DIR not in sys.path:
+    sys.path.insert(0, _BACKEND_DIR)
+from generate_excel_from_template import generate_excel_from_template, FILL_MODES  # noqa: E402
+
+REPORT_BENCHMARK_HISTORY = os.environ.get(
+    'REPORT_BENCHMARK_HISTORY',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_history.json'),
+)
+
+# 一括出力のシート数
+BATCH_SIZES = (1, 10)
+
+# 比較時に劣化とみなす処理時間の増加率（%）
+DEFAULT_THRESHOLD = 10.0
+
+
+# ============================================================
+# 点検データ
+# ============================================================
+
+# 帳票バリエーション → 重機種類（型式）
+VARIANT_MACHINES = {
+    VARIANT_EXCAVATOR: '油圧ショベル（PC200）',
+    VARIANT_HAND_GUIDED: 'ハンドガイド式除草機（HR-661）',
+    VARIANT_GENERAL: 'ブルドーザ（D3）',
+}
+
+INSPECTORS = ('大須賀 久敬', '山田太郎', '佐藤一郎')
+
+ITEM_COUNT = 14
+
+
+def _items():
+    """点検項目（14項目、先頭4項目が必須）"""
+    return [
+        {'code': f'H{i + 1}', 'name': f'点検項目{i + 1}', 'check_point': f'点検ポイント{i + 1}', 'is_required': i < 4}
+        for i in range(ITEM_COUNT)
+    ]
+
+
+def _record(day, items, rng, skip_rate=0.0):
+    """1日分の点検記録（両方の生成方法の形式: is_good・isGood）"""
+    results = {}
+    for item in items:
+        if rng.random() < skip_rate:
+            continue
+        is_good = rng.random() >= 0.1
+        results[item['code']] = {'is_good': is_good, 'isGood': is_good}
+    return {'day': day, 'inspector_name': rng.choice(INSPECTORS), 'results': results}
+
+
+def make_payload(variant, shape, seed=0, year=2025, month=1):
+    """
+    ベンチマーク用の点検データ（同じ引数からは同じデータ）
+
+    Args:
+        variant: 帳票バリエーション
+        shape: 'empty'（記録なし）・'typical'（平日のみ、1割未点検）・'full'（31日×14項目）
+        seed: 乱数のシード（一括出力で重機ごとに変える）
+    """
+    rng = random.Random(f'{variant}:{shape}:{seed}')
+    items = _items()
+    if shape == 'empty':
+        records = []
+    elif shape == 'typical':
+        records = [
+            _record(day, items, rng, skip_rate=0.1)
+            for day in range(1, 32)
+            if datetime(year, month, day).weekday() < 5
+        ]
+    elif shape == 'full':
+        records = [_record(day, items, rng) for day in range(1, 32)]
+    else:
+        raise ValueError(f'未対応の点検データの形です: {shape}')
+
+    machine = VARIANT_MACHINES[variant]
+    return {
+        'machine_type': machine,
+        'machine_model': machine,
+        'machine_unit': f'{seed + 1}号機',
+        'site_name': '○○道路改良工事',
+        'company_name': '株式会社サンプル建機',
+        'responsible_person': '田中次郎',
+        'prime_contractor_inspector': '鈴木三郎',
+        'year': year,
+        'month': month,
+        'records': records,
+        'items': items,
+    }
+
+
+PAYLOAD_SHAPES = ('empty', 'typical', 'full')
+
+
+# ============================================================
+# 計測ケース
+# ============================================================
+
+def _template_report(data, mode):
+    content = generate_excel_from_template(None, None, data, mode)
+    if content is None:
+        raise RuntimeError('テンプレート方式の帳票生成に失敗しました')
+    return content
+
+
+def benchmark_cases():
+    """
+    計測ケースの一覧
+
+    Returns:
+        [(ケース名, 帳票を生成してbytesを返す関数)]
+    """
+    cases = []
+
+    # 1重機の帳票
+    for variant in VARIANT_MACHINES:
+        for shape in PAYLOAD_SHAPES:
+            data = make_payload(variant, shape)
+            prefix = f'single/{variant}/{shape}'
+            for engine in REPORT_ENGINES:
+                for styling in REPORT_STYLINGS:
+                    cases.append((
+                        f'{prefix}/{engine}-{styling}',
+                        lambda data=data, engine=engine, styling=styling:
+                            create_inspection_report(data, engine=engine, styling=styling),
+                    ))
+            for mode in FILL_MODES:
+                cases.append((
+                    f'{prefix}/template-{mode}',
+                    lambda data=data, mode=mode: _template_report(data, mode),
+                ))
+            cases.append((f'{prefix}/pdf', lambda data=data: create_inspection_pdf(data)))
+
+    # 一括出力（通常の点検データ、バリエーションを順に混在）
+    variants = list(VARIANT_MACHINES)
+    for size in BATCH_SIZES:
+        payloads = [make_payload(variants[i % len(variants)], 'typical', seed=i) for i in range(size)]
+        prefix = f'batch/{size}'
+        for engine in REPORT_ENGINES:
+            for styling in REPORT_STYLINGS:
+                cases.append((
+                    f'{prefix}/{engine}-{styling}',
+                    lambda payloads=payloads, engine=engine, styling=styling:
+                        create_inspection_workbook(payloads, engine=engine, styling=styling),
+                ))
+        cases.append((f'{prefix}/pdf', lambda payloads=payloads: create_inspection_pdf_document(payloads)))
+
+    return cases
+
+
+_CELL_XFS = re.compile(rb'<cellXfs\s+count="(\d+)"')
+
+
+def count_styles(content):
+    """XLSXのセル書式（cellXfs）の数（XLSX以外はNone）"""
+    if not content.startswith(b'PK'):
+        return None
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        match = _CELL_XFS.search(archive.read('xl/styles.xml'))
+    return int(match.group(1)) if match else None
+
+
+def _quiet_call(func):
+    """生成関数を実行（ログ出力は抑制）"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func()
+
+
+def measure(func, repeat=5):
+    """
+    1ケースを計測
+
+    1回目（キャッシュの準備）は計測から除外し、処理時間はrepeat回の最小値と中央値。
+    メモリのピークはtracemalloc有効時の処理時間が不正確になるため別の1回で計測する。
+    """
+    content = _quiet_call(func)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _quiet_call(func)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        _quiet_call(func)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_ms': round(min(timings), 3),
+        'wall_ms_median': round(statistics.median(timings), 3),
+        'peak_kb': round(peak / 1024, 1),
+        'output_bytes': len(content),
+        'styles': count_styles(content),
+    }
+
+
+# ============================================================
+# 履歴ファイル
+# ============================================================
+
+def _git_revision():
+    """現在のコミットID（未コミットの変更がある場合は末尾に+dirty）"""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=repo_dir, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=repo_dir, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}+dirty' if dirty else commit
+
+
+def load_history(path=REPORT_BENCHMARK_HISTORY):
+    """履歴ファイルを読み込み（ない場合は空のリスト）"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(history, path=REPORT_BENCHMARK_HISTORY):
+    """履歴ファイルを保存（一時ファイルを経由）"""
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+
+def run_benchmarks(repeat=5, pattern=None, label=None):
+    """
+    全ケース（patternを含むケースのみ）を計測
+
+    Returns:
+        履歴の1件分 {'commit', 'timestamp', 'label', 'python', 'platform', 'repeat', 'max_rss_kb', 'results'}
+    """
+    results = {}
+    for name, func in benchmark_cases():
+        if pattern and pattern not in name:
+            continue
+        result = results[name] = measure(func, repeat)
+        print(
+            f"  {name:<44} {result['wall_ms']:>9.1f} ms {result['peak_kb']:>10.0f} KB "
+            f"{result['output_bytes']:>9,} bytes  styles={result['styles']}"
+        )
+
+    return {
+        'commit': _git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'label': label,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        # Linuxではru_maxrssはKB単位
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'results': results,
+    }
+
+
+def _find_entry(history, ref):
+    """履歴の番号またはコミットIDから履歴を取得"""
+    try:
+        return history[int(ref)]
+    except ValueError:
+        pass
+    except IndexError:
+        raise ValueError(f'履歴の番号が範囲外です: {ref}')
+    for entry in reversed(history):
+        if (entry.get('commit') or '').startswith(ref):
+            return entry
+    raise ValueError(f'履歴にコミットがありません: {ref}')
+
+
+def _percent(base, head):
+    if not base:
+        return None
+    return (head - base) / base * 100
+
+
+def compare_entries(base, head, threshold=DEFAULT_THRESHOLD):
+    """
+    2件の履歴を比較して表示
+
+    Returns:
+        処理時間がthreshold%を超えて増加したケース名のリスト
+    """
+    print(f"📊 基準: {base.get('commit')} ({base.get('timestamp')})  比較対象: {head.get('commit')} ({head.get('timestamp')})")
+    print(f"{'ケース':<46} {'基準ms':>9} {'比較ms':>9} {'増減':>8} {'メモリ増減':>10} {'サイズ増減':>10} {'書式数':>9}")
+
+    regressions = []
+    for name, result in head['results'].items():
+        base_result = base['results'].get(name)
+        if base_result is None:
+            print(f"  {name:<44} {'-':>9} {result['wall_ms']:>9.1f}  (新規)")
+            continue
+
+        time_change = _percent(base_result['wall_ms'], result['wall_ms'])
+        peak_change = _percent(base_result['peak_kb'], result['peak_kb'])
+        size_change = _percent(base_result['output_bytes'], result['output_bytes'])
+        styles = '' if result['styles'] is None else f"{base_result['styles']}→{result['styles']}"
+        mark = ''
+        if time_change is not None and time_change > threshold:
+            regressions.append(name)
+            mark = ' ⚠️'
+        print(
+            f"  {name:<44} {base_result['wall_ms']:>9.1f} {result['wall_ms']:>9.1f} "
+            f"{_format_percent(time_change):>8} {_format_percent(peak_change):>10} "
+            f"{_format_percent(size_change):>10} {styles:>9}{mark}"
+        )
+
+    missing = [name for name in base['results'] if name not in head['results']]
+    if missing:
+        print(f'  比較対象で計測されていないケース: {len(missing)}件')
+
+    if regressions:
+        print(f'⚠️ 処理時間が{threshold:g}%以上増加: {len(regressions)}件')
+    else:
+        print('✅ 処理時間の劣化なし')
+    return regressions
+
+
+def _format_percent(value):
+    return '-' if value is None else f'{value:+.1f}%'
+
+
+# ============================================================
+# コマンドライン
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='帳票生成のベンチマーク')
+    parser.add_argument('--history', default=REPORT_BENCHMARK_HISTORY, help='履歴ファイルのパス')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='計測して履歴に追加')
+    run_parser.add_argument('--repeat', type=int, default=5, help='計測の繰り返し回数')
+    run_parser.add_argument('--filter', help='ケース名に含まれる文字列（例: batch/、/full/）')
+    run_parser.add_argument('--label', help='履歴に記録するラベル')
+    run_parser.add_argument('--no-save', action='store_true', help='履歴に追加しない')
+
+    compare_parser = commands.add_parser('compare', help='2件の履歴を比較')
+    compare_parser.add_argument('base', nargs='?', default='-2', help='基準（履歴の番号またはコミットID）')
+    compare_parser.add_argument('head', nargs='?', default='-1', help='比較対象（履歴の番号またはコミットID）')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='劣化とみなす増加率（%%）')
+
+    commands.add_parser('list', help='履歴の一覧')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        print(f'📊 帳票生成ベンチマーク（繰り返し: {args.repeat}回）')
+        entry = run_benchmarks(args.repeat, args.filter, args.label)
+        if not entry['results']:
+            print(f'❌ 該当するケースがありません: {args.filter}')
+            return 1
+        print(f"💾 最大RSS: {entry['max_rss_kb']:,} KB")
+        if not args.no_save:
+            history = load_history(args.history)
+            history.append(entry)
+            save_history(history, args.history)
+            print(f"✅ 履歴に追加: {args.history} (#{len(history) - 1}, {entry['commit']})")
+        return 0
+
+    history = load_history(args.history)
+    if args.command == 'list':
+        for index, entry in enumerate(history):
+            label = f" {entry['label']}" if entry.get('label') else ''
+            print(f"  #{index} {entry.get('commit')} {entry['timestamp']} ケース数={len(entry['results'])}{label}")
+        return 0
+
+    try:
+        base = _find_entry(history, args.base)
+        head = _find_entry(history, args.head)
+    except ValueError as e:
+        print(f'❌ {e}')
+        return 1
+    return 1 if compare_entries(base, head, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Report Cache - 生成済み帳票のキャッシュ
+正規化したリクエスト（点検データ・描画エンジン・書式モード）のハッシュをキーに、
+生成済みの帳票ファイル（Excel・PDF）をディスクに保存する。
+帳票の出力は決定的（同じ入力から同一のファイル）なため、キーをそのままETagとして使用できる。
+
+- キーには帳票生成モジュールのソースとライブラリのバージョンのハッシュを含める（変更後は古いキャッシュを使用しない）
+
+- 直近に使用した帳票はメモリ上に保持し、リクエスト処理中のディスクI/Oを避ける
+- ディスクへの書き込みはバックグラウンドスレッドで行う（再起動後も引き継ぐ）
+- 容量上限を超えた場合は最も長く使われていないものから削除（LRU）
+- ディスク上の最終使用時刻はファイルの更新日時で管理
+
+設定（環境変数）:
+    REPORT_CACHE_ENABLED     キャッシュを使用するか（'0'で無効）
+    REPORT_CACHE_MAX_MB      ディスク上のキャッシュの容量上限（MB、既定: 256）
+    REPORT_CACHE_MEMORY_MB   メモリ上のキャッシュの容量上限（MB、既定: 32）
+"""
+
+import hashlib
+import importlib.metadata
+import json
+import os
+import queue
+import tempfile
+import threading
+from collections import OrderedDict
+
+REPORT_CACHE_ENABLED = os.environ.get('REPORT_CACHE_ENABLED', '1') != '0'
+REPORT_CACHE_MAX_MB = int(os.environ.get('REPORT_CACHE_MAX_MB', 256))
+REPORT_CACHE_MEMORY_MB = int(os.environ.get('REPORT_CACHE_MEMORY_MB', 32))
+
+# 帳票の出力を決めるモジュール（python_backend内）とライブラリ
+REPORT_SOURCE_MODULES = ('excel_generator_advanced', 'xlsx_stream_writer', 'report_layout', 'pdf_report', 'pdf_writer')
+REPORT_LIBRARIES = ('openpyxl', 'Pillow')
+
+# キャッシュするファイルの形式（拡張子）
+REPORT_CACHE_SUFFIXES = ('.xlsx', '.pdf')
+
+
+def _generator_version():
+    """帳票生成モジュールのソースとライブラリのバージョンのハッシュ"""
+    digest = hashlib.sha256()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in REPORT_SOURCE_MODULES:
+        with open(os.path.join(base_dir, f'{name}.py'), 'rb') as f:
+            digest.update(f.read())
+    for name in REPORT_LIBRARIES:
+        try:
+            digest.update(f'{name}=={importlib.metadata.version(name)}'.encode('utf-8'))
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    return digest.hexdigest()[:16]
+
+
+# 帳票の出力が変わった場合に変わる（古いキャッシュ・ETagを無効化）
+REPORT_CACHE_VERSION = _generator_version()
+
+
+def report_cache_key(kind, payload, engine, styling='full'):
+    """
+    リクエストを正規化してキャッシュキー（SHA-256）を生成
+
+    Args:
+        kind: 帳票生成関数名（create_inspection_report など）
+        payload: 点検データ（またはそのリスト）
+        engine: 描画エンジン名（省略時は既定のエンジン名を渡すこと）
+        styling: 書式モード名（省略時は既定の書式モード名を渡すこと）
+    """
+    canonical = json.dumps(
+        [REPORT_CACHE_VERSION, kind, engine, styling, payload],
+        ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str,
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ReportCache:
+    """容量上限付きの帳票キャッシュ（メモリ＋ディスク、LRU）"""
+
+    def __init__(self, cache_dir, max_bytes=REPORT_CACHE_MAX_MB * 1024 * 1024,
+                 memory_bytes=REPORT_CACHE_MEMORY_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._lock = threading.Lock()
+        # ディスク上のキー → ファイルサイズ（古い順）
+        self._entries = OrderedDict()
+        self._total = 0
+        # メモリ上のキー → 内容（古い順）
+        self._memory = OrderedDict()
+        self._memory_total = 0
+        self._pending = queue.Queue()
+        self._writer = None
+
+        os.makedirs(cache_dir, exist_ok=True)
+        files = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            key, suffix = os.path.splitext(name)
+            try:
+                if suffix in REPORT_CACHE_SUFFIXES:
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, key, suffix, stat.st_size))
+                elif suffix == '.tmp':
+                    # 書き込み途中で終了した一時ファイル
+                    os.remove(path)
+            except FileNotFoundError:
+                # 一覧の取得後に削除された（同じディレクトリを使う別のプロセスの置き換え・削除）
+                pass
+        for _, key, suffix, size in sorted(files):
+            self._entries[key] = (size, suffix)
+            self._total += size
+
+    def path_for(self, key, suffix):
+        """キーに対応するファイルパス"""
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def get(self, key):
+        """
+        キャッシュ済みの帳票（bytes）を取得（未登録の場合はNone）
+
+        メモリ上にない場合はディスクから読み込み、メモリ上に保持する
+        """
+        with self._lock:
+            content = self._memory.get(key)
+            if content is not None:
+                self._memory.move_to_end(key)
+                return content
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            _, suffix = self._entries[key]
+
+        path = self.path_for(key, suffix)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                if key in self._entries:
+                    self._total -= self._entries.pop(key)[0]
+            return None
+
+        with self._lock:
+            self._remember(key, content)
+        return content
+
+    def put(self, key, content, suffix='.xlsx'):
+        """
+        生成した帳票（bytes）をキャッシュに登録
+
+        メモリ上に登録し、ディスクへはバックグラウンドで書き込む
+
+        Args:
+            suffix: ファイルの形式（REPORT_CACHE_SUFFIXESのいずれか）
+        """
+        if suffix not in REPORT_CACHE_SUFFIXES:
+            raise ValueError(f'未対応のファイル形式です: {suffix}')
+        with self._lock:
+            self._remember(key, content)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_forever, daemon=True)
+                self._writer.start()
+        self._pending.put((key, content, suffix))
+
+    def flush(self):
+        """ディスクへの書き込み待ちがなくなるまで待機"""
+        self._pending.join()
+
+    def _remember(self, key, content):
+        """メモリ上に登録（容量上限を超えた分は古い順に破棄）"""
+        if key in self._memory:
+            self._memory_total -= len(self._memory.pop(key))
+        self._memory[key] = content
+        self._memory_total += len(content)
+        while self._memory_total > self.memory_bytes and len(self._memory) > 1:
+            _, old = self._memory.popitem(last=False)
+            self._memory_total -= len(old)
+
+    def _write_forever(self):
+        while True:
+            key, content, suffix = self._pending.get()
+            try:
+                self._write(key, content, suffix)
+            except Exception as e:
+                print(f'❌ 帳票キャッシュ書き込みエラー: {e}')
+            finally:
+                self._pending.task_done()
+
+    def _write(self, key, content, suffix):
+        """ディスクに書き込み（容量上限を超えた分は古い順に削除）"""
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        with self._lock:
+            if key in self._entries:
+                size, old_suffix = self._entries.pop(key)
+                self._total -= size
+                if old_suffix != suffix:
+                    _remove_file(self.path_for(key, old_suffix))
+            os.replace(temp_path, self.path_for(key, suffix))
+            self._entries[key] = (len(content), suffix)
+            self._total += len(content)
+            self._evict()
+
+    def _evict(self):
+        """容量上限を超えた分を古い順に削除（直前に登録したファイルは残す）"""
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            key, (size, suffix) = self._entries.popitem(last=False)
+            self._total -= size
+            _remove_file(self.path_for(key, suffix))
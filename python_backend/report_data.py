@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Report Data - 帳票生成用データの組み立て
+inspection_recordsテーブルから、create_inspection_reportに渡す
+点検データ（records / items）をサーバー側で組み立てる
+"""
+
+import json
+
+
+def month_date_range(year, month):
+    """
+    対象月のinspection_date範囲（開始日以上・終了日未満）を取得
+
+    inspection_dateはISO 8601文字列のため、文字列比較で範囲検索できる
+    """
+    start = f'{year:04d}-{month:02d}-01'
+    if month == 12:
+        end = f'{year + 1:04d}-01-01'
+    else:
+        end = f'{year:04d}-{month + 1:02d}-01'
+    return start, end
+
+
+def _is_good(result):
+    """点検結果（isGood / is_good）を取得"""
+    if 'isGood' in result:
+        return result['isGood']
+    return result.get('is_good')
+
+
+def _report_record(row):
+    """inspection_recordsの行を帳票用の記録（day / inspector_name / results）に変換"""
+    results = json.loads(row['results'])
+    return {
+        'day': int(row['inspection_date'][8:10]),
+        'inspector_name': row['inspector_name'],
+        'results': {
+            code: {'is_good': _is_good(result)}
+            for code, result in results.items()
+            if isinstance(result, dict)
+        },
+    }
+
+
+def _items_from_records(records):
+    """点検項目が不明な場合、記録に含まれる項目コードから点検項目を作成"""
+    items = []
+    seen = set()
+    for record in records:
+        for code in record['results']:
+            if code not in seen:
+                seen.add(code)
+                items.append({'code': code, 'name': code, 'check_point': '', 'is_required': False})
+    return items
+
+
+def _machine_info(cursor, machine_id):
+    """machinesテーブルから重機情報を取得（未登録の場合は空）"""
+    cursor.execute('SELECT * FROM machines WHERE id = ?', (machine_id,))
+    row = cursor.fetchone()
+    if not row:
+        return {}
+
+    try:
+        extra = json.loads(row['data']) if row['data'] else {}
+    except ValueError:
+        extra = {}
+
+    info = {
+        'machine_type': row['type'],
+        'machine_model': row['model'],
+        'machine_unit': row['unit_number'],
+    }
+    items = extra.get('items') or extra.get('inspectionItems')
+    if items:
+        info['items'] = [
+            {
+                'code': item.get('code', ''),
+                'name': item.get('name', ''),
+                'check_point': item.get('check_point', item.get('checkPoint', '')),
+                'is_required': item.get('is_required', item.get('isRequired', False)),
+            }
+            for item in items
+        ]
+    return info
+
+
+def build_report_payload(conn, machine_id, year, month, site_name=None, overrides=None, rows=None,
+                         image_store=None):
+    """
+    1重機・1か月分の点検データをデータベースから組み立て
+
+    Args:
+        conn: データベース接続（row_factory = sqlite3.Row）
+        machine_id: 重機ID
+        year, month: 対象年月
+        site_name: 現場名（指定時はその現場の記録のみ）
+        overrides: 重機情報・会社名などの上書き値（リクエストで指定された値）
+        rows: 取得済みのinspection_records行（省略時はデータベースから取得）
+        image_store: 重機画像の保存先（MachineImageStore、省略時は重機画像なし）
+
+    Returns:
+        create_inspection_reportに渡す点検データ
+    """
+    cursor = conn.cursor()
+
+    if rows is None:
+        start, end = month_date_range(year, month)
+        query = '''
+            SELECT * FROM inspection_records
+            WHERE machine_id = ? AND inspection_date >= ? AND inspection_date < ?
+        '''
+        params = [machine_id, start, end]
+        if site_name:
+            query += ' AND site_name = ?'
+            params.append(site_name)
+        query += ' ORDER BY inspection_date, created_at'
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+    records = [_report_record(row) for row in rows]
+
+    payload = {
+        'machine_type': '',
+        'machine_model': '',
+        'machine_unit': '',
+        'site_name': site_name or '',
+        'company_name': '',
+        'responsible_person': '',
+        'prime_contractor_inspector': '',
+        'month': month,
+        'year': year,
+    }
+    payload.update(_machine_info(cursor, machine_id))
+    payload.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    payload['records'] = records
+    if not payload.get('items'):
+        payload['items'] = _items_from_records(records)
+    if image_store is not None:
+        payload['machine_image'] = image_store.report_image(conn, machine_id, payload['machine_type'])
+    return payload
+
+
+def build_site_payloads(conn, site_name, year, month, common=None, machines=None, image_store=None):
+    """
+    現場・対象月の全重機分の点検データを組み立て（重機IDの順）
+
+    Args:
+        conn: データベース接続（row_factory = sqlite3.Row）
+        site_name: 現場名
+        year, month: 対象年月
+        common: 全重機共通の値（会社名・責任者など）
+        machines: 重機IDごとの上書き値（重機名・型式・号機・点検項目など）
+        image_store: 重機画像の保存先（MachineImageStore、省略時は重機画像なし）
+
+    Returns:
+        点検データのリスト
+    """
+    start, end = month_date_range(year, month)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT * FROM inspection_records
+        WHERE site_name = ? AND inspection_date >= ? AND inspection_date < ?
+        ORDER BY machine_id, inspection_date, created_at
+    ''', (site_name, start, end))
+
+    rows_by_machine = {}
+    for row in cursor.fetchall():
+        rows_by_machine.setdefault(row['machine_id'], []).append(row)
+
+    payloads = []
+    for machine_id, rows in rows_by_machine.items():
+        overrides = dict(common or {})
+        overrides.update((machines or {}).get(machine_id, {}))
+        payloads.append(build_report_payload(
+            conn, machine_id, year, month,
+            site_name=site_name, overrides=overrides, rows=rows, image_store=image_store,
+        ))
+    return payloads
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Report Jobs - 帳票生成ジョブ（非同期実行）
+月末の一括出力などの重い帳票生成をバックグラウンドで実行する。
+ジョブの状態はinspection_recordsと同じデータベースのreport_jobsテーブルに保存し、
+サーバー再起動後も未完了のジョブを再開できる。
+
+状態遷移: queued → running → done / failed
+
+設定（環境変数）:
+    REPORT_JOB_THREADS          同時に実行するジョブ数（既定: 2）
+    REPORT_JOB_RETENTION_DAYS   完了したジョブと生成ファイルの保持日数（既定: 7）
+    REPORT_JOB_CLEANUP_INTERVAL 保持期間を過ぎたジョブを削除する間隔（秒、既定: 3600）
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from render_pool import run_render_job, RenderQueueFull
+
+REPORT_JOB_THREADS = int(os.environ.get('REPORT_JOB_THREADS', 2))
+REPORT_JOB_RETENTION_DAYS = int(os.environ.get('REPORT_JOB_RETENTION_DAYS', 7))
+REPORT_JOB_CLEANUP_INTERVAL = float(os.environ.get('REPORT_JOB_CLEANUP_INTERVAL', 3600))
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def create_report_jobs_table(cursor):
+    """帳票生成ジョブテーブルを作成"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            progress INTEGER NOT NULL DEFAULT 0,
+            request TEXT NOT NULL,
+            engine TEXT,
+            styling TEXT,
+            file_path TEXT,
+            download_name TEXT,
+            etag TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+    ''')
+
+    # 旧バージョンで作成したテーブルに列を追加
+    cursor.execute('PRAGMA table_info(report_jobs)')
+    columns = [row[1] for row in cursor.fetchall()]
+    for column in ('styling', 'etag'):
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE report_jobs ADD COLUMN {column} TEXT')
+
+
+def _job_to_dict(row):
+    """report_jobsの行をAPIレスポンス形式に変換"""
+    return {
+        'id': row['id'],
+        'status': row['status'],
+        'progress': row['progress'],
+        'downloadName': row['download_name'],
+        'etag': row['etag'],
+        'error': row['error'],
+        'createdAt': row['created_at'],
+        'updatedAt': row['updated_at'],
+        'finishedAt': row['finished_at'],
+    }
+
+
+def _render_without_etag(function_name, argument, output_path, engine, styling):
+    run_render_job(function_name, argument, output_path, engine, styling)
+    return None
+
+
+class ReportJobManager:
+    """帳票生成ジョブの登録・実行・状態管理"""
+
+    def __init__(self, get_db, db_lock, job_dir, resolve_request, render=None, threads=REPORT_JOB_THREADS,
+                 cleanup_interval=REPORT_JOB_CLEANUP_INTERVAL):
+        """
+        Args:
+            get_db: データベース接続を返す関数（row_factory = sqlite3.Row）
+            db_lock: データベース操作用のロック
+            job_dir: 生成ファイルの保存先ディレクトリ
+            resolve_request: リクエストから (帳票生成関数名, 引数, ダウンロード用ファイル名) を返す関数
+            render: (帳票生成関数名, 引数, 出力パス, 描画エンジン, 書式モード) を受け取り帳票を生成してETagを返す関数
+                    （省略時は帳票生成プールで生成し、ETagなし）
+            threads: 同時に実行するジョブ数
+            cleanup_interval: 保持期間を過ぎたジョブと生成ファイルを削除する間隔（秒）
+        """
+        self._get_db = get_db
+        self._db_lock = db_lock
+        self.job_dir = job_dir
+        self._resolve_request = resolve_request
+        self._render = render or _render_without_etag
+        self._threads = max(1, threads)
+        self.cleanup_interval = cleanup_interval
+        self._queue = queue.Queue()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    # ============================================================
+    # データベース操作
+    # ============================================================
+
+    def _execute(self, sql, params=()):
+        with self._db_lock:
+            with closing(self._get_db()) as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                conn.commit()
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = datetime.now().isoformat()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        self._execute(f'UPDATE report_jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def _fetch(self, job_id):
+        with closing(self._get_db()) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM report_jobs WHERE id = ?', (job_id,))
+            row = cursor.fetchone()
+        return row
+
+    # ============================================================
+    # ジョブの登録・参照
+    # ============================================================
+
+    def start(self):
+        """
+        ジョブ実行スレッドを起動（複数回呼び出しても一度だけ起動）
+
+        前回終了時に実行中だったジョブは待ち状態に戻して再実行する。
+        保持期間を過ぎたジョブは起動時と、その後 cleanup_interval 秒ごとに削除する
+        """
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            os.makedirs(self.job_dir, exist_ok=True)
+            self._cleanup()
+
+            with self._db_lock:
+                with closing(self._get_db()) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        'UPDATE report_jobs SET status = ?, progress = 0 WHERE status = ?',
+                        (STATUS_QUEUED, STATUS_RUNNING)
+                    )
+                    conn.commit()
+                    cursor.execute(
+                        'SELECT id FROM report_jobs WHERE status = ? ORDER BY created_at',
+                        (STATUS_QUEUED,)
+                    )
+                    pending = [row['id'] for row in cursor.fetchall()]
+
+            for job_id in pending:
+                self._queue.put(job_id)
+            for _ in range(self._threads):
+                threading.Thread(target=self._run_forever, daemon=True).start()
+            threading.Thread(target=self._cleanup_forever, daemon=True).start()
+            self._started = True
+            if pending:
+                print(f'🔄 未完了の帳票生成ジョブを再開: {len(pending)}件')
+
+    def submit(self, request_data, engine=None, styling=None):
+        """ジョブを登録し、ジョブ情報を返す"""
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        self._execute('''
+            INSERT INTO report_jobs (id, status, progress, request, engine, styling, created_at, updated_at)
+            VALUES (?, ?, 0, ?, ?, ?, ?, ?)
+        ''', (job_id, STATUS_QUEUED, json.dumps(request_data, ensure_ascii=False), engine, styling, now, now))
+        self._queue.put(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """ジョブ情報を取得（存在しない場合はNone）"""
+        row = self._fetch(job_id)
+        return _job_to_dict(row) if row else None
+
+    def get_file(self, job_id):
+        """
+        完了したジョブの生成ファイルを取得
+
+        Returns:
+            (ジョブ情報, ファイルパス)。未完了の場合ファイルパスはNone、存在しない場合は(None, None)
+        """
+        row = self._fetch(job_id)
+        if not row:
+            return None, None
+        if row['status'] != STATUS_DONE or not row['file_path'] or not os.path.exists(row['file_path']):
+            return _job_to_dict(row), None
+        return _job_to_dict(row), row['file_path']
+
+    # ============================================================
+    # ジョブの実行
+    # ============================================================
+
+    def _run_forever(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception:
+                traceback.print_exc()
+
+    def _run(self, job_id):
+        row = self._fetch(job_id)
+        if not row or row['status'] != STATUS_QUEUED:
+            return
+
+        self._update(job_id, status=STATUS_RUNNING, progress=10)
+        try:
+            request_data = json.loads(row['request'])
+            function_name, argument, download_name = self._resolve_request(request_data)
+            self._update(job_id, progress=30, download_name=download_name)
+
+            output_path = os.path.join(self.job_dir, f'{job_id}.xlsx')
+            while True:
+                try:
+                    etag = self._render(function_name, argument, output_path, row['engine'], row['styling'])
+                    break
+                except RenderQueueFull as e:
+                    # 帳票生成プールが混雑している場合は待ってから再試行
+                    time.sleep(e.retry_after)
+
+            self._update(
+                job_id, status=STATUS_DONE, progress=100, file_path=output_path,
+                etag=etag, finished_at=datetime.now().isoformat()
+            )
+            print(f'✅ 帳票生成ジョブ完了: {job_id}')
+        except Exception as e:
+            print(f'❌ 帳票生成ジョブエラー: {job_id}: {e}')
+            self._update(job_id, status=STATUS_FAILED, error=str(e), finished_at=datetime.now().isoformat())
+
+    def _cleanup_forever(self):
+        """cleanup_interval 秒ごとに保持期間を過ぎたジョブを削除（起動中のサーバーでもジョブが溜まらない）"""
+        while True:
+            time.sleep(self.cleanup_interval)
+            try:
+                self._cleanup()
+            except Exception:
+                traceback.print_exc()
+
+    def _cleanup(self):
+        """保持期間を過ぎたジョブと生成ファイルを削除"""
+        threshold = (datetime.now() - timedelta(days=REPORT_JOB_RETENTION_DAYS)).isoformat()
+        with self._db_lock:
+            with closing(self._get_db()) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'SELECT id, file_path FROM report_jobs WHERE finished_at IS NOT NULL AND finished_at < ?',
+                    (threshold,)
+                )
+                expired = cursor.fetchall()
+                for row in expired:
+                    if row['file_path']:
+                        try:
+                            os.remove(row['file_path'])
+                        except FileNotFoundError:
+                            pass
+                    cursor.execute('DELETE FROM report_jobs WHERE id = ?', (row['id'],))
+                conn.commit()
+        if expired:
+            print(f'🗑️  期限切れの帳票生成ジョブを削除: {len(expired)}件')
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Report Layout - 点検帳票の静的レイアウト（宣言的定義）
+列幅・行高・結合・固定文言・罫線・関係法令の記載（重機種別ごと）をデータとして定義し、
+compile_layout()でセルごとの書式表（描画プラン）にコンパイルする。
+
+罫線は (範囲, 線を引く辺) の和集合として定義するため、定義の順序に依存せず、
+各セルの罫線はコンパイル時に一度だけ決まる。
+描画プランはopenpyxlのスケルトン構築とXMLストリームエンジンの両方で使用する。
+
+スタイルはxlsx_stream_writerと同じハッシュ可能なタプルで指定する:
+    font:      (name, size, bold, italic, underline)
+    fill:      塗りつぶし色のRGB（パターンはsolid）
+    border:    (left, right, top, bottom) の各線種
+    alignment: (horizontal, vertical, wrap_text)
+"""
+
+import threading
+
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.cell import coordinate_from_string, range_boundaries
+
+# ============================================================
+# 帳票バリエーション
+# ============================================================
+
+# 関係法令の記載（A3/A4セル）による帳票バリエーション
+VARIANT_EXCAVATOR = 'excavator'      # 油圧ショベル: A3=ｸﾚｰﾝ則第７８条, A4=安衛則第１７０条
+VARIANT_HAND_GUIDED = 'hand_guided'  # ハンドガイド式: A3=労働安全衛生法第２０条
+VARIANT_GENERAL = 'general'          # その他: A3=安衛則第１７０条
+REPORT_VARIANTS = (VARIANT_EXCAVATOR, VARIANT_HAND_GUIDED, VARIANT_GENERAL)
+
+# ============================================================
+# スタイル
+# ============================================================
+
+FONT_NAME = 'HG明朝E'
+
+FONT_18 = (FONT_NAME, 18, False, False, None)
+FONT_18_BOLD = (FONT_NAME, 18, True, False, None)
+FONT_14 = (FONT_NAME, 14, False, False, None)
+FONT_14_BOLD = (FONT_NAME, 14, True, False, None)
+FONT_16_BOLD_UNDERLINE = (FONT_NAME, 16, True, False, 'single')
+FONT_26_BOLD_ITALIC = (FONT_NAME, 26, True, True, None)
+FONT_16 = (FONT_NAME, 16, False, False, None)
+FONT_12 = (FONT_NAME, 12, False, False, None)
+FONT_11_BOLD = (FONT_NAME, 11, True, False, None)
+FONT_10 = (FONT_NAME, 10, False, False, None)
+
+LEFT_CENTER = ('left', 'center', False)
+CENTER_CENTER = ('center', 'center', False)
+LEFT_BOTTOM = ('left', 'bottom', False)
+CENTER_CENTER_WRAP = ('center', 'center', True)
+
+FILL_GRAY = '00D3D3D3'
+
+# 罫線の辺（borderタプルの位置）
+LEFT, RIGHT, TOP, BOTTOM = 'left', 'right', 'top', 'bottom'
+_SIDES = (LEFT, RIGHT, TOP, BOTTOM)
+
+# ============================================================
+# 列幅・行高
+# ============================================================
+
+# (開始列, 終了列, 幅)
+COLUMN_WIDTHS = (
+    ('A', 'A', 5.0),      # 36px ≈ 5文字
+    ('B', 'AK', 3.3),     # 24px ≈ 3.3文字
+    ('AL', 'AL', 6.7),    # 48px ≈ 6.7文字
+    ('AM', 'BR', 4.5),    # 32px ≈ 4.5文字
+)
+
+# (開始行, 終了行, 高さ)
+ROW_HEIGHTS = (
+    (1, 4, 24),
+    (5, 5, 43),
+    (6, 6, 18),
+    (7, 7, 31),
+    (8, 8, 9),
+    (9, 26, 32),
+    (27, 27, 72),
+    (28, 31, 37),
+)
+
+# 列幅・行高の既定値（Excelの既定: 64px・15pt）
+DEFAULT_COLUMN_PIXELS = 64
+DEFAULT_ROW_HEIGHT = 15
+
+# ============================================================
+# 重機画像
+# ============================================================
+
+# 重機画像の枠（結合セル、画像がない場合は「※重機画像添付※」と表示）
+MACHINE_IMAGE_AREA = 'A27:AJ31'
+MACHINE_IMAGE_ANCHOR = (27, 1)  # 枠の左上のセル (row, col)
+# 枠内の余白（px）
+MACHINE_IMAGE_PADDING = 6
+
+# ============================================================
+# 結合セル
+# ============================================================
+
+MERGES = (
+    # 行1: 工事名の「：」
+    'D1:E1',
+    # 行3～5: 所有会社名・取扱責任者・型式・機械番号・作業所長確認
+    'AM3:AW3', 'AX3:BD3', 'BE3:BH3', 'BI3:BL3', 'BN3:BQ3',
+    'AM4:AW5', 'AX4:BD5', 'BE4:BH5', 'BI4:BL5', 'BN4:BQ5',
+    # 行9: ヘッダー
+    'A9:Q9', 'R9:AL9',
+    # 行24～26: 点検者
+    'AL24:AL26',
+    # 行27: 元請点検責任者確認欄
+    'AK27:AL27', 'AM27:AT27', 'AU27:AV27', 'AW27:BD27', 'BE27:BF27', 'BG27:BO27', 'BP27:BQ27',
+    # 行28～31: 補修関連
+    'AK28:BE28', 'BF28:BH28', 'BI28:BK28', 'BL28:BN28', 'BO28:BQ28',
+    'AK29:BE29', 'BF29:BH29', 'BI29:BK29', 'BL29:BN29', 'BO29:BQ29',
+    'AK30:BE30', 'BF30:BH30', 'BI30:BK30', 'BL30:BN30', 'BO30:BQ30',
+    'AK31:BE31', 'BF31:BH31', 'BI31:BK31', 'BL31:BN31', 'BO31:BQ31',
+    # 行27～31: 重機画像エリア
+    MACHINE_IMAGE_AREA,
+)
+
+# ============================================================
+# 固定文言・書式
+# ============================================================
+
+# (セル, 値, フォント, 配置, 塗りつぶし)
+# 値がNoneのセルは記入欄（値はリクエストごとに書き込む）
+TEXTS = (
+    # 行1: 工事名
+    ('A1', '工事名', FONT_18, LEFT_CENTER, None),
+    ('D1', '：', FONT_14, CENTER_CENTER, None),
+
+    # 行3: 法的要求事項とヘッダー情報
+    ('J3', '・★は法的要求事項', FONT_14, LEFT_CENTER, None),
+    ('AM3', '所有会社名', FONT_11_BOLD, CENTER_CENTER, None),
+    ('AX3', '取扱責任者（点検者）', FONT_11_BOLD, CENTER_CENTER, None),
+    ('BE3', '型式', FONT_11_BOLD, CENTER_CENTER, None),
+    ('BI3', '機械番号', FONT_11_BOLD, CENTER_CENTER, None),
+    ('BN3', '作業所長確認', FONT_11_BOLD, CENTER_CENTER, None),
+
+    # 行4: 所有会社名・取扱責任者（点検者）・型式・号機の記入欄
+    ('J4', '・その他は点検すべき事項とみなした箇所', FONT_14, LEFT_CENTER, None),
+    ('AM4', None, FONT_16, CENTER_CENTER, None),
+    ('AX4', None, FONT_16, CENTER_CENTER, None),
+    ('BE4', None, FONT_16, CENTER_CENTER, None),
+    ('BI4', None, FONT_16, CENTER_CENTER, None),
+
+    # 行5: タイトル
+    ('A5', None, FONT_26_BOLD_ITALIC, LEFT_BOTTOM, None),
+
+    # 行7: 注意書き
+    ('A7', '※点検時、作業時問わず異常を認めたときは、元請点検責任者に報告及び速やかに補修その他必要な措置を取ること',
+     FONT_16_BOLD_UNDERLINE, LEFT_BOTTOM, None),
+
+    # 行9: ヘッダー行（AM9～BQ9の日付はDAY_HEADER_*）
+    ('A9', '点検項目', FONT_14_BOLD, CENTER_CENTER, FILL_GRAY),
+    ('R9', '点検ポイント', FONT_14_BOLD, CENTER_CENTER, FILL_GRAY),
+
+    # 行24～26: 説明と点検者
+    ('A24', '１．点検時', FONT_14, LEFT_CENTER, None),
+    ('I24', '良好…○　要調整、修理…×（使用禁止）　・該当なし…－', FONT_14, LEFT_CENTER, None),
+    ('B25', 'チェック記号', FONT_14, LEFT_CENTER, None),
+    ('I25', '調整または補修したとき…×を○で囲む', FONT_14, LEFT_CENTER, None),
+    ('A26', '２．元請点検責任者は、毎月上旬・中旬・下旬毎に１回点検状況を確認すること。', FONT_14, LEFT_CENTER, None),
+    ('AL24', '点\n検\n者', FONT_12, CENTER_CENTER_WRAP, None),
+
+    # 行27: 元請点検責任者確認欄
+    ('AK27', '元請点検\n責任者\n確認欄', FONT_10, CENTER_CENTER_WRAP, None),
+    ('AM27', None, FONT_16, CENTER_CENTER, None),
+    ('AW27', None, FONT_16, CENTER_CENTER, None),
+    ('BG27', None, FONT_16, CENTER_CENTER, None),
+
+    # 行28: 補修関連ヘッダー
+    ('AK28', '補修内容', FONT_11_BOLD, CENTER_CENTER, None),
+    ('BF28', '補修日', FONT_11_BOLD, CENTER_CENTER, None),
+    ('BI28', '補修者', FONT_11_BOLD, CENTER_CENTER, None),
+    ('BL28', '元請点検\n責任者', FONT_11_BOLD, CENTER_CENTER_WRAP, None),
+    ('BO28', '作業所長', FONT_11_BOLD, CENTER_CENTER, None),
+
+    # 行27～31: 重機画像エリア
+    ('A27', '※重機画像添付※', FONT_18_BOLD, CENTER_CENTER, None),
+)
+
+# 行9: AM～BQ列に1～31日
+DAY_HEADER_ROW = 9
+DAY_HEADER_FIRST_COLUMN = 39  # AM列
+DAY_HEADER_STYLE = (FONT_11_BOLD, CENTER_CENTER, FILL_GRAY)
+
+# 関係法令の記載（A3/A4セル）
+LEGAL_TEXTS = {
+    VARIANT_EXCAVATOR: (('A3', '　【ｸﾚｰﾝ則第７８条】'), ('A4', '　【安衛則第１７０条】')),
+    VARIANT_HAND_GUIDED: (('A3', '　【労働安全衛生法第２０条】'),),
+    # ブルドーザ、不整地運搬車、コンバインドローラー、振動ローラー
+    VARIANT_GENERAL: (('A3', '　【安衛則第１７０条】'),),
+}
+LEGAL_TEXT_STYLE = (FONT_14, LEFT_CENTER)
+
+# ============================================================
+# 罫線
+# ============================================================
+
+# (範囲, 線を引く辺)（線種はすべてthin）
+BORDERS = (
+    # 外枠（A9～BQ31）
+    ('A9:A31', (LEFT,)),
+    ('BQ9:BQ31', (RIGHT,)),
+    ('A31:BQ31', (BOTTOM,)),
+
+    # 行3～4: 関係法令欄（A～Y列）
+    ('A3:A4', (LEFT,)),
+    ('A3:Y3', (TOP,)),
+    ('A4:Y4', (BOTTOM,)),
+    ('Y3:Y4', (RIGHT,)),
+
+    # 行2～5: 所有会社名～作業所長確認欄
+    ('AM2:BL3', (BOTTOM,)),
+    ('AM5:BL5', (BOTTOM,)),
+    ('BN2:BQ3', (BOTTOM,)),
+    ('BN5:BQ5', (BOTTOM,)),
+    ('AL3:AL5', (RIGHT,)),
+    ('AW3:AW5', (RIGHT,)),
+    ('BD3:BD5', (RIGHT,)),
+    ('BH3:BH5', (RIGHT,)),
+    ('BL3:BM5', (RIGHT,)),
+    ('BQ3:BQ5', (RIGHT,)),
+
+    # 行9～24: 点検項目の行区切り
+    ('A9:BQ24', (TOP,)),
+
+    # 行9～23: 点検項目・点検ポイントの列区切り
+    ('A10:A23', (RIGHT,)),
+    ('Q9:Q23', (RIGHT,)),
+
+    # 行9～26: 日付の列区切り（AL～BP列）
+    ('AL9:BP26', (RIGHT,)),
+
+    # 行24～26: 説明欄・点検者
+    ('G24:G25', (RIGHT,)),
+    ('A25:AK26', (BOTTOM,)),
+    ('AL24:AL26', (LEFT,)),
+    ('AL26:BQ26', (BOTTOM,)),
+
+    # 行27～31: 元請点検責任者確認欄・補修関連
+    ('AK27:BQ30', (BOTTOM,)),
+    ('AL27', (RIGHT,)),
+    ('AV27', (RIGHT,)),
+    ('BF27', (RIGHT,)),
+    ('BE28:BE31', (RIGHT,)),
+    ('BH28:BH31', (RIGHT,)),
+    ('BK28:BK31', (RIGHT,)),
+    ('BN28:BN31', (RIGHT,)),
+
+    # 行27～31: 重機画像エリアの右端
+    ('AJ27:AJ31', (RIGHT,)),
+)
+
+# ============================================================
+# コンパイル
+# ============================================================
+
+_EMPTY_CELL = (None, None, None, None, None)
+
+_compile_lock = threading.Lock()
+_compiled = {}
+
+
+def _cell_index(ref):
+    """'AM10'形式のセル番地を (row, col) に変換"""
+    column, row = coordinate_from_string(ref)
+    return row, column_index_from_string(column)
+
+
+def _range_cells(range_string):
+    """セル範囲内の (row, col) を列挙"""
+    min_col, min_row, max_col, max_row = range_boundaries(range_string)
+    for row in range(min_row, max_row + 1):
+        for col in range(min_col, max_col + 1):
+            yield row, col
+
+
+def _compile(variant):
+    texts = list(TEXTS)
+    font, alignment = LEGAL_TEXT_STYLE
+    texts.extend((ref, value, font, alignment, None) for ref, value in LEGAL_TEXTS[variant])
+    font, alignment, fill = DAY_HEADER_STYLE
+    texts.extend(
+        ((DAY_HEADER_ROW, DAY_HEADER_FIRST_COLUMN + day - 1), str(day), font, alignment, fill)
+        for day in range(1, 32)
+    )
+
+    cells = {}
+    for ref, value, font, alignment, fill in texts:
+        key = _cell_index(ref) if isinstance(ref, str) else ref
+        cells[key] = (value, font, fill, None, alignment)
+
+    # 結合セル（左上以外）は値なし
+    merged_cells = set()
+    for range_string in MERGES:
+        first = True
+        for key in _range_cells(range_string):
+            if not first:
+                merged_cells.add(key)
+                cells.setdefault(key, _EMPTY_CELL)
+            first = False
+
+    # 罫線（辺ごとの和集合）
+    sides = {}
+    for range_string, edges in BORDERS:
+        for key in _range_cells(range_string):
+            sides.setdefault(key, set()).update(edges)
+    for key, edges in sides.items():
+        value, font, fill, _, alignment = cells.get(key, _EMPTY_CELL)
+        border = tuple('thin' if side in edges else None for side in _SIDES)
+        cells[key] = (value, font, fill, border, alignment)
+
+    col_widths = {}
+    for first, last, width in COLUMN_WIDTHS:
+        for col in range(column_index_from_string(first), column_index_from_string(last) + 1):
+            col_widths[col] = width
+    row_heights = {}
+    for first, last, height in ROW_HEIGHTS:
+        for row in range(first, last + 1):
+            row_heights[row] = height
+
+    return {
+        'cells': cells,
+        'merged_cells': frozenset(merged_cells),
+        'col_widths': col_widths,
+        'row_heights': row_heights,
+        'merges': list(MERGES),
+    }
+
+
+def column_pixels(width):
+    """列幅（文字数）を画面上のピクセル数に変換（Noneは既定の列幅）"""
+    return int(width * 7 + 0.5) if width is not None else DEFAULT_COLUMN_PIXELS
+
+
+def row_pixels(height):
+    """行高（pt）を画面上のピクセル数に変換（Noneは既定の行高）"""
+    return (height if height is not None else DEFAULT_ROW_HEIGHT) * 4 / 3
+
+
+def area_pixels(plan, range_string):
+    """セル範囲のシート上の位置と大きさ (x, y, 幅, 高さ)（px、A1の左上が原点）"""
+    min_col, min_row, max_col, max_row = range_boundaries(range_string)
+    widths = [column_pixels(plan['col_widths'].get(col)) for col in range(1, max_col + 1)]
+    heights = [row_pixels(plan['row_heights'].get(row)) for row in range(1, max_row + 1)]
+    return (
+        sum(widths[:min_col - 1]), sum(heights[:min_row - 1]),
+        sum(widths[min_col - 1:]), sum(heights[min_row - 1:]),
+    )
+
+
+def fit_image(area, image_width, image_height, padding=MACHINE_IMAGE_PADDING):
+    """
+    画像を縦横比を保ったまま枠（余白を除く）に収まる大きさに縮小し、枠の中央に配置
+
+    Args:
+        area: 枠の (x, y, 幅, 高さ)
+        image_width, image_height: 画像の大きさ（縦横比のみ使用）
+
+    Returns:
+        画像の (x, y, 幅, 高さ)（areaと同じ単位）
+    """
+    x, y, width, height = area
+    scale = min((width - 2 * padding) / image_width, (height - 2 * padding) / image_height)
+    fitted_width = image_width * scale
+    fitted_height = image_height * scale
+    return x + (width - fitted_width) / 2, y + (height - fitted_height) / 2, fitted_width, fitted_height
+
+
+def pixel_position(plan, x, y):
+    """
+    シート上の位置（px）を含むセルとセル内の位置に変換
+
+    Returns:
+        (列, 行, セルの左端からのx, セルの上端からのy)
+    """
+    col = 1
+    width = column_pixels(plan['col_widths'].get(col))
+    while x >= width:
+        x -= width
+        col += 1
+        width = column_pixels(plan['col_widths'].get(col))
+    row = 1
+    height = row_pixels(plan['row_heights'].get(row))
+    while y >= height:
+        y -= height
+        row += 1
+        height = row_pixels(plan['row_heights'].get(row))
+    return col, row, x, y
+
+
+def compile_layout(variant):
+    """
+    帳票バリエーションのレイアウトを描画プランにコンパイル（バリエーションごとに一度だけ）
+
+    Returns:
+        {'cells': {(row, col): (value, font, fill, border, alignment)},
+         'merged_cells': 結合セル（左上以外）の (row, col) の集合,
+         'col_widths': {列番号: 幅}, 'row_heights': {行番号: 高さ}, 'merges': [...]}
+    """
+    plan = _compiled.get(variant)
+    if plan is None:
+        if variant not in LEGAL_TEXTS:
+            raise ValueError(f'未対応の帳票バリエーションです: {variant}')
+        with _compile_lock:
+            plan = _compiled.get(variant)
+            if plan is None:
+                plan = _compiled[variant] = _compile(variant)
+    return plan
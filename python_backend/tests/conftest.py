@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+python_backend のテスト共通設定
+python_backend のモジュールを直接インポートできるようにし、テスト用のデータベースを用意する。
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_migrations import migrate  # noqa: E402
+
+# 移行前のスキーマ（sort_order の列追加前の master_data を含む）
+BASE_SCHEMA = (
+    '''
+    CREATE TABLE inspection_records (
+        id TEXT PRIMARY KEY,
+        machine_id TEXT NOT NULL,
+        site_name TEXT,
+        inspector_name TEXT NOT NULL,
+        inspection_date TEXT NOT NULL,
+        results TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE master_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data_type TEXT NOT NULL,
+        name TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        UNIQUE(data_type, name)
+    )
+    ''',
+)
+
+
+def insert_record(conn, record_id, inspection_date='2025-06-01', created_at='2025-06-01T09:00:00',
+                  machine_id='m1', site_name='現場A', inspector_name='点検者A', updated_at=None):
+    """点検記録を1件追加（コミットは行わない）"""
+    conn.execute(
+        'INSERT INTO inspection_records '
+        '(id, machine_id, site_name, inspector_name, inspection_date, results, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        (record_id, machine_id, site_name, inspector_name, inspection_date, '{}', created_at,
+         updated_at or created_at)
+    )
+
+
+@pytest.fixture
+def base_db(tmp_path):
+    """移行前のスキーマのデータベース"""
+    path = str(tmp_path / 'inspection_db.sqlite')
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    for sql in BASE_SCHEMA:
+        conn.execute(sql)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def db(base_db):
+    """最新のスキーマに移行済みのデータベース"""
+    migrate(base_db)
+    return base_db
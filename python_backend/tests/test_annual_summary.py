@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""annual_summary のテスト（集計件数・ワークブックの内容）"""
+
+import io
+import json
+
+from openpyxl import load_workbook
+
+from annual_summary import create_annual_summary
+
+
+def _add(db, record_id, machine_id, inspection_date, results, site_name='現場A'):
+    db.execute(
+        'INSERT INTO inspection_records '
+        '(id, machine_id, site_name, inspector_name, inspection_date, results, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        (record_id, machine_id, site_name, '点検者A', inspection_date, json.dumps(results),
+         inspection_date, inspection_date)
+    )
+
+
+def _summary_db(db):
+    db.execute('''
+        CREATE TABLE machines (
+            id TEXT PRIMARY KEY, type TEXT NOT NULL, model TEXT NOT NULL, unit_number TEXT NOT NULL,
+            data TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL
+        )
+    ''')
+    db.execute("INSERT INTO machines VALUES ('m1', '油圧ショベル', 'PC200', '1号機', '{}', '', '')")
+    _add(db, 'a', 'm1', '2025-01-10', {'A1': {'isGood': True}, 'A2': {'isGood': False}})
+    _add(db, 'b', 'm1', '2025-01-11', {'A1': {'is_good': 'false'}, 'A2': {'isGood': True}})
+    _add(db, 'c', 'm1', '2025-03-01', {'A1': {'isGood': 1}})
+    _add(db, 'd', 'm2', '2025-02-01', {'B1': {'isGood': 0}}, site_name='現場B')
+    _add(db, 'old', 'm1', '2024-12-31', {'A1': {'isGood': False}})
+    db.commit()
+    return db
+
+
+def test_counts_are_final_and_match_sheets(db, capsys):
+    _summary_db(db)
+    output = io.BytesIO()
+    counts = create_annual_summary(db, 2025, output)
+
+    assert counts == {'machines': 2, 'items': 3}
+    # 出力は呼び出し元が行う
+    assert capsys.readouterr().out == ''
+
+    workbook = load_workbook(io.BytesIO(output.getvalue()))
+    summary = workbook['年間集計']
+    assert [summary.cell(row, 1).value for row in (6, 7)] == ['m1', 'm2']
+    assert [summary.cell(6, col).value for col in range(2, 5)] == ['油圧ショベル', 'PC200', '1号機']
+    # 1月: 点検日数2・要修理2（A1・A2が各1日）、3月: 点検日数1・要修理0
+    assert (summary.cell(6, 5).value, summary.cell(6, 6).value) == (2, 2)
+    assert (summary.cell(6, 9).value, summary.cell(6, 10).value) == (1, 0)
+    assert summary.cell(8, 1).value is None
+    assert workbook['項目別'].max_row - 4 == counts['items']
+
+
+def test_site_filter_and_empty_year(db):
+    _summary_db(db)
+    assert create_annual_summary(db, 2025, io.BytesIO(), site_name='現場B') == {'machines': 1, 'items': 1}
+    assert create_annual_summary(db, 2030, io.BytesIO()) == {'machines': 0, 'items': 0}
+    # 集計の一時テーブルは残らない
+    assert db.execute("SELECT COUNT(*) FROM sqlite_temp_master").fetchone()[0] == 0
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""db_migrations のテスト（移行の適用・実行計画・差分同期のトリガー）"""
+
+import pytest
+
+from conftest import insert_record
+from db_migrations import (
+    MIGRATIONS, QUERY_PLAN_CHECKS, SCHEMA_VERSION, check_query_plans, migrate, query_plan, schema_copy,
+    schema_version,
+)
+
+
+def test_migrate_reaches_latest_version(base_db):
+    assert schema_version(base_db) == 0
+    applied = migrate(base_db)
+    assert applied == [version for version, _, _ in MIGRATIONS]
+    assert schema_version(base_db) == SCHEMA_VERSION
+
+
+def test_migrate_is_idempotent(base_db):
+    migrate(base_db)
+    schema = base_db.execute('SELECT type, name, sql FROM sqlite_master ORDER BY name').fetchall()
+    assert migrate(base_db) == []
+    assert schema_version(base_db) == SCHEMA_VERSION
+    assert base_db.execute('SELECT type, name, sql FROM sqlite_master ORDER BY name').fetchall() == schema
+
+
+def test_migrate_numbers_existing_records(base_db):
+    insert_record(base_db, 'b', updated_at='2025-06-02T00:00:00')
+    insert_record(base_db, 'a', updated_at='2025-06-01T00:00:00')
+    base_db.commit()
+    migrate(base_db)
+    rows = base_db.execute('SELECT id, change_seq FROM inspection_records ORDER BY change_seq').fetchall()
+    assert [(row['id'], row['change_seq']) for row in rows] == [('a', 1), ('b', 2)]
+    assert base_db.execute('SELECT value FROM sync_sequence').fetchone()[0] == 2
+
+
+def test_failed_migration_is_rolled_back(base_db, monkeypatch):
+    def broken(cursor):
+        cursor.execute('CREATE TABLE half_applied (id INTEGER)')
+        raise RuntimeError('移行失敗')
+
+    monkeypatch.setattr('db_migrations.MIGRATIONS', MIGRATIONS[:1] + ((2, '失敗する移行', broken),))
+    with pytest.raises(RuntimeError):
+        migrate(base_db)
+    assert schema_version(base_db) == 1
+    assert base_db.execute("SELECT name FROM sqlite_master WHERE name = 'half_applied'").fetchone() is None
+
+
+def test_query_plans_use_declared_indexes(db):
+    assert check_query_plans(schema_copy(db)) == []
+
+
+@pytest.mark.parametrize('description, sql, params, index', QUERY_PLAN_CHECKS, ids=[c[0] for c in QUERY_PLAN_CHECKS])
+def test_each_query_plan_hits_index(db, description, sql, params, index):
+    plan = query_plan(schema_copy(db), sql, params)
+    assert any(f'INDEX {index}' in detail for detail in plan), plan
+
+
+def test_query_plan_check_detects_missing_index(db):
+    copy = schema_copy(db)
+    copy.execute('DROP INDEX idx_inspection_records_site_name')
+    failed = [description for description, _ in check_query_plans(copy)]
+    assert '現場の点検記録数（現場の削除）' in failed
+
+
+def test_change_seq_triggers_on_insert_and_update(db):
+    insert_record(db, 'a')
+    insert_record(db, 'b')
+    db.commit()
+    seqs = dict(db.execute('SELECT id, change_seq FROM inspection_records').fetchall())
+    assert seqs == {'a': 1, 'b': 2}
+
+    db.execute("UPDATE inspection_records SET results = '{\"1\": \"○\"}' WHERE id = 'a'")
+    db.commit()
+    assert db.execute("SELECT change_seq FROM inspection_records WHERE id = 'a'").fetchone()[0] == 3
+    assert db.execute('SELECT value FROM sync_sequence').fetchone()[0] == 3
+
+
+def test_delete_records_tombstone_and_reinsert_clears_it(db):
+    insert_record(db, 'a')
+    db.commit()
+    db.execute("DELETE FROM inspection_records WHERE id = 'a'")
+    db.commit()
+    tombstone = db.execute("SELECT change_seq FROM record_tombstones WHERE id = 'a'").fetchone()
+    assert tombstone is not None and tombstone[0] == 2
+
+    insert_record(db, 'a')
+    db.commit()
+    assert db.execute("SELECT COUNT(*) FROM record_tombstones WHERE id = 'a'").fetchone()[0] == 0
+    assert db.execute("SELECT change_seq FROM inspection_records WHERE id = 'a'").fetchone()[0] == 3
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""record_query の差分同期のテスト（since・baseSeq・削除記録・cursor）"""
+
+import pytest
+
+from conftest import insert_record
+from record_query import changes_since, current_sequence, merge_sync_records, parse_base_seq, parse_since
+
+
+def _local(record_id, base_seq=None, updated_at=None, inspection_date='2025-06-01'):
+    record = {
+        'id': record_id,
+        'machineId': 'm1',
+        'siteName': '現場A',
+        'inspectorName': '点検者B',
+        'inspectionDate': inspection_date,
+        'results': {'1': '○'},
+    }
+    if base_seq is not None:
+        record['baseSeq'] = base_seq
+    if updated_at is not None:
+        record['updatedAt'] = updated_at
+    return record
+
+
+def _merge(db, records):
+    result = merge_sync_records(db.cursor(), records)
+    db.commit()
+    return result
+
+
+def _seq(db, record_id):
+    return db.execute('SELECT change_seq FROM inspection_records WHERE id = ?', (record_id,)).fetchone()[0]
+
+
+@pytest.mark.parametrize('value, expected', [(0, 0), (12, 12), ('7', 7)])
+def test_parse_since_accepts_non_negative_integers(value, expected):
+    assert parse_since(value) == expected
+
+
+@pytest.mark.parametrize('value', [-1, '-3', 'abc', '', True, 1.5, None, [1]])
+def test_parse_since_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_since(value)
+
+
+def test_full_sync_returns_all_records_without_tombstones(db):
+    insert_record(db, 'a')
+    insert_record(db, 'b')
+    db.execute("DELETE FROM inspection_records WHERE id = 'b'")
+    db.commit()
+
+    rows, deleted, cursor, full = changes_since(db, 0)
+    assert [row['id'] for row in rows] == ['a']
+    assert deleted == []
+    assert cursor == current_sequence(db) == 3
+    assert full is True
+
+
+def test_changes_since_returns_only_later_changes_in_order(db):
+    insert_record(db, 'a')
+    insert_record(db, 'b')
+    db.commit()
+    _, _, cursor, _ = changes_since(db, 0)
+
+    db.execute("UPDATE inspection_records SET results = '{\"2\": \"×\"}' WHERE id = 'b'")
+    insert_record(db, 'c')
+    db.execute("UPDATE inspection_records SET results = '{\"3\": \"○\"}' WHERE id = 'a'")
+    db.commit()
+
+    rows, deleted, next_cursor, full = changes_since(db, cursor)
+    assert [row['id'] for row in rows] == ['b', 'c', 'a']
+    assert deleted == []
+    assert full is False
+    assert next_cursor == cursor + 3
+
+    assert changes_since(db, next_cursor)[:2] == ([], [])
+
+
+def test_delete_is_returned_as_tombstone(db):
+    insert_record(db, 'a')
+    insert_record(db, 'b')
+    db.commit()
+    _, _, cursor, _ = changes_since(db, 0)
+
+    db.execute("DELETE FROM inspection_records WHERE id = 'a'")
+    db.commit()
+    rows, deleted, next_cursor, full = changes_since(db, cursor)
+    assert rows == []
+    assert deleted == ['a']
+    assert next_cursor > cursor and full is False
+
+    # 削除後に同じIDで作成された記録は削除記録から外れる
+    insert_record(db, 'a')
+    db.commit()
+    rows, deleted, _, _ = changes_since(db, cursor)
+    assert [row['id'] for row in rows] == ['a']
+    assert deleted == []
+
+
+def test_cursor_is_monotonic(db):
+    cursors = [changes_since(db, 0)[2]]
+    for i in range(3):
+        insert_record(db, f'r{i}')
+        db.commit()
+        db.execute('UPDATE inspection_records SET updated_at = ? WHERE id = ?', (f'2025-06-0{i + 2}', f'r{i}'))
+        db.commit()
+        db.execute('DELETE FROM inspection_records WHERE id = ?', (f'r{i}',))
+        db.commit()
+        cursors.append(changes_since(db, cursors[-1])[2])
+    assert cursors == sorted(set(cursors))
+    # 変更のない場合は cursor は変わらない
+    assert changes_since(db, cursors[-1])[2] == cursors[-1]
+
+
+def test_since_ahead_of_server_falls_back_to_full_sync(db):
+    insert_record(db, 'a')
+    db.commit()
+    rows, deleted, cursor, full = changes_since(db, 99)
+    assert [row['id'] for row in rows] == ['a']
+    assert deleted == [] and cursor == 1 and full is True
+
+
+def test_merge_creates_new_records(db):
+    result, changes = _merge(db, [_local('new')])
+    assert result == {'created': 1, 'updated': 0, 'conflicts': 0}
+    assert changes == [('m1', '2025-06-01')]
+    assert _seq(db, 'new') == 1
+
+
+def test_merge_applies_update_when_base_seq_is_current(db):
+    insert_record(db, 'a')
+    db.commit()
+    result, changes = _merge(db, [_local('a', base_seq=_seq(db, 'a'), inspection_date='2025-06-02')])
+    assert result == {'created': 0, 'updated': 1, 'conflicts': 0}
+    assert changes == [('m1', '2025-06-01'), ('m1', '2025-06-02')]
+    row = db.execute("SELECT inspector_name, change_seq FROM inspection_records WHERE id = 'a'").fetchone()
+    assert row['inspector_name'] == '点検者B' and row['change_seq'] == 2
+
+
+def test_merge_conflicts_when_server_changed_after_base_seq(db):
+    insert_record(db, 'a')
+    db.commit()
+    base_seq = _seq(db, 'a')
+    db.execute("UPDATE inspection_records SET inspector_name = 'サーバー' WHERE id = 'a'")
+    db.commit()
+
+    # 端末の更新日時が新しくても、変更番号で競合と判定する
+    result, changes = _merge(db, [_local('a', base_seq=base_seq, updated_at='2099-01-01T00:00:00')])
+    assert result == {'created': 0, 'updated': 0, 'conflicts': 1}
+    assert changes == []
+    assert db.execute("SELECT inspector_name FROM inspection_records WHERE id = 'a'").fetchone()[0] == 'サーバー'
+
+
+def test_merge_does_not_resurrect_records_deleted_after_base_seq(db):
+    insert_record(db, 'a')
+    db.commit()
+    base_seq = _seq(db, 'a')
+    db.execute("DELETE FROM inspection_records WHERE id = 'a'")
+    db.commit()
+
+    result, _ = _merge(db, [_local('a', base_seq=base_seq)])
+    assert result == {'created': 0, 'updated': 0, 'conflicts': 1}
+    assert db.execute("SELECT COUNT(*) FROM inspection_records WHERE id = 'a'").fetchone()[0] == 0
+
+    # 削除を受け取った後の端末が作成し直した記録は反映する
+    tombstone_seq = db.execute("SELECT change_seq FROM record_tombstones WHERE id = 'a'").fetchone()[0]
+    result, _ = _merge(db, [_local('a', base_seq=tombstone_seq)])
+    assert result == {'created': 1, 'updated': 0, 'conflicts': 0}
+
+
+def test_merge_without_base_seq_compares_updated_at(db):
+    insert_record(db, 'a', updated_at='2025-06-10T00:00:00')
+    db.commit()
+    older, _ = _merge(db, [_local('a', updated_at='2025-06-09T00:00:00')])
+    newer, _ = _merge(db, [_local('a', updated_at='2025-06-11T00:00:00')])
+    assert older == {'created': 0, 'updated': 0, 'conflicts': 1}
+    assert newer == {'created': 0, 'updated': 1, 'conflicts': 0}
+    assert db.execute("SELECT updated_at FROM inspection_records WHERE id = 'a'").fetchone()[0] == '2025-06-11T00:00:00'
+
+
+@pytest.mark.parametrize('value, expected', [(None, None), (0, 0), (5, 5)])
+def test_parse_base_seq_accepts_non_negative_integers(value, expected):
+    assert parse_base_seq(value) == expected
+
+
+@pytest.mark.parametrize('value', ['1', True, False, -1, 1.0, [1]])
+def test_parse_base_seq_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_base_seq(value)
+
+
+@pytest.mark.parametrize('base_seq', ['1', True])
+def test_merge_rejects_invalid_base_seq_before_writing(db, base_seq):
+    insert_record(db, 'a', updated_at='2025-06-01T00:00:00')
+    db.commit()
+    seq = _seq(db, 'a')
+
+    with pytest.raises(ValueError):
+        _merge(db, [_local('new'), _local('a', base_seq=base_seq)])
+
+    # 検証は書き込み前のため、同じまとまりの新規の記録も作成されない
+    assert db.execute("SELECT COUNT(*) FROM inspection_records WHERE id = 'new'").fetchone()[0] == 0
+    assert _seq(db, 'a') == seq
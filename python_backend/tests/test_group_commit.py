@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""group_commit のテスト（書き込みごとのSAVEPOINT・タイムアウト・書き込みスレッドのエラー処理）"""
+
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from db_pool import ConnectionPool
+from group_commit import GroupCommitTimeout, GroupCommitWriter
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'group_commit.sqlite'))
+    conn = pool.get()
+    conn.execute('CREATE TABLE items (id TEXT PRIMARY KEY, value INTEGER)')
+    conn.commit()
+    conn.close()
+    yield pool
+    pool.close_all()
+
+
+def _insert(item_id, value=0):
+    def operation(cursor):
+        cursor.execute('INSERT INTO items (id, value) VALUES (?, ?)', (item_id, value))
+        return item_id
+    return operation
+
+
+def _item_ids(pool):
+    conn = pool.get()
+    try:
+        return sorted(row['id'] for row in conn.execute('SELECT id FROM items'))
+    finally:
+        conn.close()
+
+
+def _submit_all(writer, operations):
+    """書き込みを同時に送信し、(結果, 例外) のリストを返す"""
+    def submit(operation):
+        try:
+            return writer.submit(operation), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(len(operations)) as executor:
+        return list(executor.map(submit, operations))
+
+
+def test_concurrent_writes_share_one_commit(pool):
+    writer = GroupCommitWriter(pool.get, pool.write_lock, max_delay_ms=200)
+    results = _submit_all(writer, [_insert(f'id{i}') for i in range(8)])
+    assert [result for result, _ in results] == [f'id{i}' for i in range(8)]
+    assert writer.stats['operations'] == 8
+    assert writer.stats['commits'] < 8
+    assert _item_ids(pool) == [f'id{i}' for i in range(8)]
+
+
+def test_failing_operation_is_rolled_back_alone(pool):
+    def partial_then_fail(cursor):
+        cursor.execute("INSERT INTO items (id, value) VALUES ('partial', 1)")
+        raise ValueError('途中で失敗')
+
+    writer = GroupCommitWriter(pool.get, pool.write_lock, max_delay_ms=200)
+    results = _submit_all(writer, [_insert('a'), partial_then_fail, _insert('a'), _insert('b')])
+
+    assert results[0] == ('a', None)
+    assert isinstance(results[1][1], ValueError)
+    assert isinstance(results[2][1], sqlite3.IntegrityError)
+    assert results[3] == ('b', None)
+    assert writer.stats['commits'] == 1
+    assert _item_ids(pool) == ['a', 'b']
+
+
+def test_submit_times_out_and_cancels_queued_write(pool):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(cursor):
+        started.set()
+        release.wait(5)
+        cursor.execute("INSERT INTO items (id, value) VALUES ('slow', 1)")
+        return 'slow'
+
+    writer = GroupCommitWriter(pool.get, pool.write_lock, max_delay_ms=0, timeout=0.2)
+    slow_result = []
+    thread = threading.Thread(target=lambda: slow_result.extend(_submit_all(writer, [slow])))
+    thread.start()
+    assert started.wait(5)
+
+    # 書き込みスレッドが実行中の間に待ち行列でタイムアウトした書き込みは実行されない
+    with pytest.raises(GroupCommitTimeout):
+        writer.submit(_insert('cancelled'))
+    release.set()
+    thread.join(5)
+
+    # 実行中にタイムアウトした書き込みはそのままコミットされる
+    assert isinstance(slow_result[0][1], GroupCommitTimeout)
+    assert writer.submit(_insert('after')) == 'after'
+    assert writer.stats['timeouts'] == 2
+    assert _item_ids(pool) == ['after', 'slow']
+
+
+def test_writer_thread_survives_connection_errors(pool):
+    calls = []
+
+    def flaky_get_db():
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError('unable to open database file')
+        return pool.get()
+
+    writer = GroupCommitWriter(flaky_get_db, pool.write_lock)
+    with pytest.raises(sqlite3.OperationalError):
+        writer.submit(_insert('first'))
+    assert writer.submit(_insert('second')) == 'second'
+    assert writer.stats['errors'] == 1
+    assert _item_ids(pool) == ['second']
+
+
+def test_writer_connection_is_not_returned_to_pool(pool, monkeypatch):
+    writer = GroupCommitWriter(pool.get, pool.write_lock)
+    assert writer.submit(_insert('first')) == 'first'
+
+    def failing_commit(conn, batch):
+        raise sqlite3.OperationalError('disk I/O error')
+
+    monkeypatch.setattr(writer, '_commit', failing_commit)
+    with pytest.raises(sqlite3.OperationalError):
+        writer.submit(_insert('second'))
+    assert writer.stats['errors'] == 1
+
+    # synchronous = FULL の書き込みスレッドの接続はプールに戻らない（プールの接続は NORMAL のまま）
+    connections = [pool.get() for _ in range(pool.stats()['idle'] + 1)]
+    try:
+        assert [conn.execute('PRAGMA synchronous').fetchone()[0] for conn in connections] == [1] * len(connections)
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+def test_disabled_writer_commits_in_caller_thread(pool):
+    writer = GroupCommitWriter(pool.get, pool.write_lock, enabled=False)
+    assert writer.submit(_insert('a')) == 'a'
+    with pytest.raises(sqlite3.IntegrityError):
+        writer.submit(_insert('a'))
+    assert _item_ids(pool) == ['a']
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""monthly_reports のテスト（点検記録の変更の反映待ち・まとめての反映）"""
+
+import threading
+import time
+
+from monthly_reports import MonthlyReportStore
+
+
+def _store(tmp_path, monkeypatch, update_delay_ms=60000):
+    store = MonthlyReportStore(None, threading.Lock(), str(tmp_path / 'monthly_reports'),
+                               update_delay_ms=update_delay_ms)
+    applied = []
+    monkeypatch.setattr(store, '_apply_days', lambda *args: applied.append(args))
+    monkeypatch.setattr(store, '_load', lambda machine_id, year, month: ({'records': []}, None))
+    return store, applied
+
+
+def test_records_changed_coalesces_days_by_month(tmp_path, monkeypatch):
+    store, applied = _store(tmp_path, monkeypatch)
+    store.records_changed([('m1', '2025-06-01'), ('m1', '2025-06-03T10:00:00'), ('m2', '2025-06-01')])
+    store.records_changed([('m1', '2025-06-01'), ('m1', '2025-07-02'), (None, '2025-06-01'), ('m1', 'bad')])
+    assert applied == []
+
+    store.flush()
+    assert sorted(applied) == [
+        ('m1', 2025, 6, {1, 3}),
+        ('m1', 2025, 7, {2}),
+        ('m2', 2025, 6, {1}),
+    ]
+    store.flush()
+    assert len(applied) == 3
+
+
+def test_get_applies_pending_days_for_its_month_first(tmp_path, monkeypatch):
+    store, applied = _store(tmp_path, monkeypatch)
+    store.records_changed([('m1', '2025-06-01'), ('m2', '2025-06-02')])
+
+    assert store.get('m1', 2025, 6) == (None, None, {'records': []})
+    assert applied == [('m1', 2025, 6, {1})]
+
+    store.flush()
+    assert applied == [('m1', 2025, 6, {1}), ('m2', 2025, 6, {2})]
+
+
+def test_background_thread_applies_changes(tmp_path, monkeypatch):
+    store, applied = _store(tmp_path, monkeypatch, update_delay_ms=10)
+    store.records_changed([('m1', '2025-06-01')])
+    deadline = time.monotonic() + 5
+    while not applied and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert applied == [('m1', 2025, 6, {1})]
+
+
+def test_failed_update_does_not_stop_the_worker(tmp_path, monkeypatch):
+    store, applied = _store(tmp_path, monkeypatch, update_delay_ms=10)
+
+    def apply_days(machine_id, year, month, days):
+        if machine_id == 'broken':
+            raise RuntimeError('帳票の更新に失敗')
+        applied.append((machine_id, year, month, days))
+
+    monkeypatch.setattr(store, '_apply_days', apply_days)
+    store.records_changed([('broken', '2025-06-01')])
+    store.records_changed([('m1', '2025-06-01')])
+    deadline = time.monotonic() + 5
+    while not applied and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert applied == [('m1', 2025, 6, {1})]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""record_query のテスト（絞り込み・キーセットページネーション・カーソル）"""
+
+import base64
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from conftest import insert_record
+from record_query import RECORDS_PAGE_MAX, decode_cursor, encode_cursor, parse_record_query, query_records
+
+
+def _all_pages(db, limit, filters=None):
+    pages, cursor = [], None
+    while True:
+        rows, next_cursor = query_records(db, filters, limit, cursor and decode_cursor(cursor))
+        pages.append([row['id'] for row in rows])
+        if next_cursor is None:
+            return pages
+        cursor = next_cursor
+
+
+def test_cursor_round_trip():
+    row = {'inspection_date': '2025-06-01', 'created_at': '2025-06-01T09:00:00', 'id': '点検/1+='}
+    cursor = encode_cursor(row)
+    assert '=' not in cursor and '+' not in cursor and '/' not in cursor
+    assert decode_cursor(cursor) == ['2025-06-01', '2025-06-01T09:00:00', '点検/1+=']
+
+
+@pytest.mark.parametrize('cursor', [
+    '!!!',
+    base64.urlsafe_b64encode(b'not json').decode(),
+    base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+    base64.urlsafe_b64encode(b'["2025-06-01", "x"]').decode(),
+    base64.urlsafe_b64encode(b'["2025-06-01", "x", 3]').decode(),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'abc', '1.5', str(RECORDS_PAGE_MAX + 1)])
+def test_invalid_limit_is_rejected(limit):
+    with pytest.raises(ValueError):
+        parse_record_query(MultiDict({'limit': limit}))
+
+
+def test_cursor_requires_limit():
+    cursor = encode_cursor({'inspection_date': 'd', 'created_at': 'c', 'id': 'i'})
+    with pytest.raises(ValueError):
+        parse_record_query(MultiDict({'cursor': cursor}))
+
+
+def test_parse_record_query_collects_filters():
+    filters, limit, cursor = parse_record_query(MultiDict({
+        'machineId': 'm1', 'siteName': '', 'inspectorName': '点検者A',
+        'dateFrom': '2025-06-01', 'dateTo': '2025-07-01', 'limit': '50', 'unknown': 'x',
+    }))
+    assert filters == {'machineId': 'm1', 'inspectorName': '点検者A', 'dateFrom': '2025-06-01', 'dateTo': '2025-07-01'}
+    assert limit == 50 and cursor is None
+
+
+def test_pages_cover_all_rows_in_order(db):
+    for day in range(1, 8):
+        insert_record(db, f'r{day}', inspection_date=f'2025-06-0{day}', created_at=f'2025-06-0{day}T09:00:00')
+    db.commit()
+
+    pages = _all_pages(db, 3)
+    assert pages == [['r7', 'r6', 'r5'], ['r4', 'r3', 'r2'], ['r1']]
+    rows, next_cursor = query_records(db)
+    assert [row['id'] for row in rows] == sum(pages, []) and next_cursor is None
+
+
+def test_last_full_page_has_no_next_cursor(db):
+    for i in range(4):
+        insert_record(db, f'r{i}', created_at=f'2025-06-01T0{i}:00:00')
+    db.commit()
+    assert _all_pages(db, 2) == [['r3', 'r2'], ['r1', 'r0']]
+
+
+def test_ties_on_date_and_created_at_are_broken_by_id(db):
+    for record_id in ('b', 'd', 'a', 'c', 'e'):
+        insert_record(db, record_id, inspection_date='2025-06-01', created_at='2025-06-01T09:00:00')
+    db.commit()
+    assert _all_pages(db, 2) == [['e', 'd'], ['c', 'b'], ['a']]
+
+
+def test_filters_apply_across_pages(db):
+    for i in range(6):
+        insert_record(db, f'r{i}', machine_id='m1' if i % 2 else 'm2', inspection_date=f'2025-06-0{i + 1}')
+    insert_record(db, 'july', machine_id='m1', inspection_date='2025-07-01')
+    db.commit()
+
+    filters = {'machineId': 'm1', 'dateFrom': '2025-06-01', 'dateTo': '2025-07-01'}
+    assert _all_pages(db, 2, filters) == [['r5', 'r3'], ['r1']]
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""帳票生成プロセスプールのテスト（タイムアウト・ワーカーの再起動・待ち行列の満杯）"""
+
+import threading
+import time
+
+import pytest
+
+import render_pool
+from render_pool import RenderError, RenderPool, RenderQueueFull, RenderTimeout, REPORT_RETRY_AFTER, run_render_batch
+from report_benchmark import VARIANT_MACHINES, make_payload
+
+
+def _payload():
+    return make_payload(sorted(VARIANT_MACHINES)[0], 'typical')
+
+
+def sleep_job(seconds):
+    """ワーカーで実行する時間のかかるジョブ（テスト用）"""
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def sleep_function(monkeypatch):
+    """ワーカーで sleep_job を実行できるようにする（ワーカーはこのモジュールをインポートして実行）"""
+    monkeypatch.setitem(render_pool.RENDER_FUNCTIONS, 'sleep_job', __name__)
+    return 'sleep_job'
+
+
+def _worker_pids(pool):
+    """空きワーカーのプロセスID（テストでは全ワーカーが空いている時に呼ぶ）"""
+    return [worker.process.pid for worker in list(pool._idle.queue)]
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def factory(**kwargs):
+        kwargs.setdefault('workers', 1)
+        kwargs.setdefault('queue_size', 0)
+        pool = RenderPool(**kwargs)
+        pools.append(pool)
+        return pool
+
+    yield factory
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_render_returns_report(make_pool):
+    pool = make_pool()
+    content = pool.render('create_inspection_report', _payload())
+    assert content[:2] == b'PK'
+
+
+def test_unknown_function_is_rejected(make_pool):
+    pool = make_pool()
+    with pytest.raises(ValueError):
+        pool.render('open', '/etc/passwd')
+
+
+def test_render_error_keeps_worker(make_pool):
+    pool = make_pool()
+    pids = _worker_pids(pool)
+    with pytest.raises(RenderError) as excinfo:
+        pool.render('create_inspection_report', None)
+    # 呼び出し元には例外のクラス名と内容のみ（ワーカーのトレースバック・ファイルパスは含まない）
+    assert excinfo.value.error_type
+    assert 'Traceback' not in str(excinfo.value)
+    assert '.py' not in str(excinfo.value)
+    assert _worker_pids(pool) == pids
+    assert pool.render('create_inspection_report', _payload())[:2] == b'PK'
+
+
+def test_timeout_replaces_worker(make_pool):
+    pool = make_pool(job_timeout=0.001)
+    pids = _worker_pids(pool)
+    with pytest.raises(RenderTimeout):
+        pool.render('create_inspection_report', _payload())
+
+    # タイムアウトしたワーカーは強制終了され、新しいワーカーで続行できる
+    new_pids = _worker_pids(pool)
+    assert len(new_pids) == 1
+    assert new_pids != pids
+    pool.job_timeout = 60
+    assert pool.render('create_inspection_report', _payload())[:2] == b'PK'
+
+
+def test_render_error_message_is_worker_exception(make_pool, sleep_function):
+    pool = make_pool()
+    with pytest.raises(RenderError) as excinfo:
+        pool.render(sleep_function, -1)
+    assert excinfo.value.error_type == 'ValueError'
+    assert str(excinfo.value) == 'sleep length must be non-negative'
+
+
+def test_queue_wait_not_counted_in_job_timeout(make_pool, sleep_function):
+    pool = make_pool(queue_size=1, job_timeout=1.0)
+    # ワーカーの起動（スケルトンの構築）を済ませておく
+    pool.job_timeout = 60
+    assert pool.render(sleep_function, 0) == 0
+    pool.job_timeout = 1.0
+    pids = _worker_pids(pool)
+
+    # 2件目は1件目の完了まで空きワーカーを待つが、実行時間はタイムアウト以内
+    results = []
+    errors = []
+
+    def run():
+        try:
+            results.append(pool.render(sleep_function, 0.6))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert results == [0.6, 0.6]
+    assert _worker_pids(pool) == pids
+
+
+def test_queue_wait_timeout_keeps_worker(make_pool, sleep_function):
+    pool = make_pool(queue_size=1, job_timeout=60, queue_timeout=0.2)
+    assert pool.render(sleep_function, 0) == 0
+    pids = _worker_pids(pool)
+
+    thread = threading.Thread(target=pool.render, args=(sleep_function, 0.6))
+    thread.start()
+    time.sleep(0.1)
+    with pytest.raises(RenderTimeout):
+        pool.render(sleep_function, 0)
+    thread.join()
+
+    # 空きワーカー待ちのタイムアウトでは実行中のワーカーを終了しない
+    assert _worker_pids(pool) == pids
+
+
+def test_worker_recycled_after_max_jobs(make_pool):
+    pool = make_pool(max_jobs_per_worker=2)
+    pids = _worker_pids(pool)
+
+    pool.render('create_inspection_report', _payload())
+    assert _worker_pids(pool) == pids
+
+    pool.render('create_inspection_report', _payload())
+    recycled = _worker_pids(pool)
+    assert recycled != pids
+    assert pool.render('create_inspection_report', _payload())[:2] == b'PK'
+    assert _worker_pids(pool) == recycled
+
+
+def test_queue_full_when_slots_exhausted(make_pool):
+    pool = make_pool()
+    # 実行中＋実行待ちの上限（ワーカー1・待ち行列0）を使い切った状態
+    assert pool._slots.acquire(blocking=False)
+    try:
+        with pytest.raises(RenderQueueFull) as excinfo:
+            pool.render('create_inspection_report', _payload())
+        assert excinfo.value.retry_after == REPORT_RETRY_AFTER
+    finally:
+        pool._slots.release()
+
+    # 空きができれば受け付ける
+    assert pool.render('create_inspection_report', _payload())[:2] == b'PK'
+
+
+def test_shutdown_rejects_new_jobs(make_pool):
+    pool = make_pool()
+    pool.shutdown()
+    with pytest.raises(RenderError):
+        pool.render('create_inspection_report', _payload())
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_run_render_batch_processes_every_job(sleep_function, workers):
+    results = []
+    lock = threading.Lock()
+
+    def process(render, job):
+        result = render(sleep_function, job)
+        with lock:
+            results.append(result)
+
+    run_render_batch(iter([0, 0.01, 0.02, 0.03, 0.04]), process, workers)
+    assert sorted(results) == [0, 0.01, 0.02, 0.03, 0.04]
+
+
+def test_run_render_batch_reports_worker_errors_to_process(sleep_function):
+    errors = []
+
+    def process(render, job):
+        try:
+            render(sleep_function, job)
+        except RenderError as e:
+            errors.append(str(e))
+
+    run_render_batch([-1], process, workers=1)
+    assert errors == ['sleep length must be non-negative']
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""report_cache のテスト（キャッシュキー・ファイル形式・容量上限）"""
+
+import os
+
+import pytest
+
+import report_cache
+from report_cache import ReportCache, report_cache_key
+
+
+def test_cache_key_depends_on_generator_version(monkeypatch):
+    payload = {'machine_type': '油圧ショベル', 'records': []}
+    key = report_cache_key('create_inspection_report', payload, 'openpyxl')
+    assert key == report_cache_key('create_inspection_report', dict(payload), 'openpyxl')
+    assert key != report_cache_key('create_inspection_pdf', payload, 'openpyxl')
+
+    monkeypatch.setattr(report_cache, 'REPORT_CACHE_VERSION', 'changed')
+    assert key != report_cache_key('create_inspection_report', payload, 'openpyxl')
+
+
+def test_generator_version_changes_with_source(tmp_path, monkeypatch):
+    for name in report_cache.REPORT_SOURCE_MODULES:
+        (tmp_path / f'{name}.py').write_text('# v1\n')
+    monkeypatch.setattr(report_cache, '__file__', str(tmp_path / 'report_cache.py'))
+    version = report_cache._generator_version()
+    (tmp_path / 'pdf_writer.py').write_text('# v2\n')
+    assert report_cache._generator_version() != version
+
+
+def test_entries_keep_their_format_on_disk(tmp_path):
+    cache = ReportCache(str(tmp_path))
+    cache.put('xlsxkey', b'PK-xlsx')
+    cache.put('pdfkey', b'%PDF-', '.pdf')
+    cache.flush()
+    assert sorted(os.listdir(tmp_path)) == ['pdfkey.pdf', 'xlsxkey.xlsx']
+
+    reloaded = ReportCache(str(tmp_path))
+    assert reloaded.get('pdfkey') == b'%PDF-'
+    assert reloaded.get('xlsxkey') == b'PK-xlsx'
+    assert reloaded.get('missing') is None
+
+
+def test_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        ReportCache(str(tmp_path)).put('key', b'data', '.zip')
+
+
+def test_evicts_oldest_files_over_limit(tmp_path):
+    cache = ReportCache(str(tmp_path), max_bytes=10, memory_bytes=10)
+    cache.put('a', b'12345', '.pdf')
+    cache.put('b', b'12345')
+    cache.put('c', b'12345', '.pdf')
+    cache.flush()
+    assert sorted(os.listdir(tmp_path)) == ['b.xlsx', 'c.pdf']
+    assert cache.get('a') is None
+
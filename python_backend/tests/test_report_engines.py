@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""描画エンジンのテスト（XMLストリームエンジンの出力がopenpyxlエンジンと同じセル・書式になるか）"""
+
+import io
+import threading
+
+import pytest
+from openpyxl import load_workbook
+
+from machine_images import MachineImageStore
+from excel_generator_advanced import ENGINE_OPENPYXL, ENGINE_STREAM, REPORT_STYLINGS, create_inspection_report
+from report_benchmark import PAYLOAD_SHAPES, VARIANT_MACHINES, make_payload
+
+
+def _color(color):
+    return None if color is None else (color.type, color.rgb if color.type == 'rgb' else color.value)
+
+
+def _cell_state(cell):
+    """比較するセルの値と書式"""
+    font, fill, border, alignment = cell.font, cell.fill, cell.border, cell.alignment
+    return (
+        cell.value,
+        cell.number_format,
+        (font.name, font.sz, font.b, font.i, font.u, _color(font.color)),
+        (fill.fill_type, _color(fill.fgColor)) if fill.fill_type else None,
+        tuple(
+            (side.style, _color(side.color)) if side is not None and side.style else None
+            for side in (border.left, border.right, border.top, border.bottom)
+        ),
+        (alignment.horizontal, alignment.vertical, alignment.wrap_text, alignment.shrink_to_fit),
+    )
+
+
+def _sheet_state(ws):
+    cells = {
+        cell.coordinate: _cell_state(cell)
+        for row in ws.iter_rows() for cell in row
+        if cell.value is not None or cell.has_style
+    }
+    return {
+        'cells': cells,
+        'merged': sorted(str(merged) for merged in ws.merged_cells.ranges),
+        'widths': {key: dim.width for key, dim in ws.column_dimensions.items() if dim.customWidth},
+        'heights': {key: dim.height for key, dim in ws.row_dimensions.items() if dim.height is not None},
+        'images': [(image.anchor._from.col, image.anchor._from.row, image.width, image.height) for image in ws._images],
+        'conditional': sorted(
+            (str(formatting.sqref), rule.type, rule.operator, tuple(rule.formula or ()))
+            for formatting in ws.conditional_formatting for rule in formatting.rules
+        ),
+        'print': (ws.page_setup.orientation, ws.page_setup.paperSize, ws.print_area),
+    }
+
+
+def _workbook_state(content):
+    workbook = load_workbook(io.BytesIO(content))
+    return {ws.title: _sheet_state(ws) for ws in workbook.worksheets}
+
+
+def _assert_same(data, styling):
+    expected = _workbook_state(create_inspection_report(data, engine=ENGINE_OPENPYXL, styling=styling))
+    actual = _workbook_state(create_inspection_report(data, engine=ENGINE_STREAM, styling=styling))
+    assert list(actual) == list(expected)
+    for title in expected:
+        for key in ('merged', 'widths', 'heights', 'images', 'conditional', 'print'):
+            assert actual[title][key] == expected[title][key], (title, key)
+        differing = [
+            (coordinate, expected[title]['cells'].get(coordinate), actual[title]['cells'].get(coordinate))
+            for coordinate in sorted(set(expected[title]['cells']) | set(actual[title]['cells']))
+            if expected[title]['cells'].get(coordinate) != actual[title]['cells'].get(coordinate)
+        ]
+        assert differing[:5] == [], title
+
+
+@pytest.mark.parametrize('styling', REPORT_STYLINGS)
+@pytest.mark.parametrize('shape', PAYLOAD_SHAPES)
+@pytest.mark.parametrize('variant', sorted(VARIANT_MACHINES))
+def test_stream_engine_matches_openpyxl_engine(variant, shape, styling):
+    _assert_same(make_payload(variant, shape), styling)
+
+
+@pytest.mark.parametrize('styling', REPORT_STYLINGS)
+def test_stream_engine_matches_with_summary_sheet(styling):
+    data = make_payload(sorted(VARIANT_MACHINES)[0], 'typical')
+    data['include_summary'] = True
+    _assert_same(data, styling)
+
+
+@pytest.mark.parametrize('styling', REPORT_STYLINGS)
+def test_stream_engine_matches_with_machine_image(tmp_path, styling):
+    data = make_payload(sorted(VARIANT_MACHINES)[0], 'typical')
+    store = MachineImageStore(None, threading.Lock(), str(tmp_path / 'machine_images'))
+    data['machine_image'] = store.report_image(None, None, data['machine_type'])
+    assert data['machine_image'] is not None
+    _assert_same(data, styling)
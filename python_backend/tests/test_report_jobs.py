@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""report_jobs のテスト（保持期間を過ぎたジョブと生成ファイルの削除）"""
+
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from db_pool import ConnectionPool
+from report_jobs import REPORT_JOB_RETENTION_DAYS, STATUS_DONE, ReportJobManager, create_report_jobs_table
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'report_jobs.sqlite'))
+    conn = pool.get()
+    create_report_jobs_table(conn.cursor())
+    conn.commit()
+    conn.close()
+    yield pool
+    pool.close_all()
+
+
+def _manager(pool, tmp_path, cleanup_interval=3600):
+    return ReportJobManager(
+        pool.get, pool.write_lock, str(tmp_path / 'jobs'),
+        resolve_request=lambda data: ('create_inspection_report', data, 'report.xlsx'),
+        render=lambda *args: None,
+        threads=1,
+        cleanup_interval=cleanup_interval,
+    )
+
+
+def _insert_done_job(pool, manager, job_id, days_ago):
+    """完了済みのジョブと生成ファイルを追加"""
+    path = os.path.join(manager.job_dir, f'{job_id}.xlsx')
+    with open(path, 'wb') as f:
+        f.write(b'PK')
+    finished_at = (datetime.now() - timedelta(days=days_ago)).isoformat()
+    conn = pool.get()
+    try:
+        conn.execute('''
+            INSERT INTO report_jobs (id, status, progress, request, file_path, created_at, updated_at, finished_at)
+            VALUES (?, ?, 100, '{}', ?, ?, ?, ?)
+        ''', (job_id, STATUS_DONE, path, finished_at, finished_at, finished_at))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _job_ids(pool):
+    conn = pool.get()
+    try:
+        return sorted(row['id'] for row in conn.execute('SELECT id FROM report_jobs'))
+    finally:
+        conn.close()
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_start_removes_expired_jobs(pool, tmp_path):
+    manager = _manager(pool, tmp_path)
+    (tmp_path / 'jobs').mkdir()
+    _insert_done_job(pool, manager, 'expired', REPORT_JOB_RETENTION_DAYS + 1)
+    _insert_done_job(pool, manager, 'recent', 0)
+
+    manager.start()
+    assert _job_ids(pool) == ['recent']
+    assert not (tmp_path / 'jobs' / 'expired.xlsx').exists()
+    assert (tmp_path / 'jobs' / 'recent.xlsx').exists()
+
+
+def test_expired_jobs_are_removed_while_running(pool, tmp_path):
+    manager = _manager(pool, tmp_path, cleanup_interval=0.05)
+    manager.start()
+
+    # 起動後に保持期間を過ぎたジョブも、再起動を待たずに削除される
+    _insert_done_job(pool, manager, 'expired', REPORT_JOB_RETENTION_DAYS + 1)
+    _insert_done_job(pool, manager, 'recent', 0)
+    assert _wait_until(lambda: _job_ids(pool) == ['recent'])
+    assert not (tmp_path / 'jobs' / 'expired.xlsx').exists()
+    assert (tmp_path / 'jobs' / 'recent.xlsx').exists()
+
+
+def test_cleanup_ignores_missing_files(pool, tmp_path):
+    manager = _manager(pool, tmp_path)
+    (tmp_path / 'jobs').mkdir()
+    _insert_done_job(pool, manager, 'expired', REPORT_JOB_RETENTION_DAYS + 1)
+    (tmp_path / 'jobs' / 'expired.xlsx').unlink()
+
+    manager.start()
+    assert _job_ids(pool) == []
@@ -7,13 +7,31 @@ FlutterアプリとExcel APIを同一オリジンで提供する統合サーバ
 
 from flask import Flask, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
+import io
 import json
 import os
-import tempfile
 import sqlite3
+import tempfile
 import threading
+from contextlib import closing
 from datetime import datetime
-from excel_generator_advanced import create_inspection_report
+from excel_generator_advanced import (
+    preload_report_skeletons, REPORT_ENGINES, DEFAULT_ENGINE, REPORT_STYLINGS, DEFAULT_STYLING,
+)
+from render_pool import run_render_job, get_render_pool, RenderQueueFull, RenderTimeout, REPORT_POOL_ENABLED
+from report_data import build_report_payload, build_site_payloads
+from pdf_report import PDF_MIMETYPE
+from report_jobs import ReportJobManager, create_report_jobs_table
+from report_cache import ReportCache, report_cache_key, REPORT_CACHE_ENABLED
+from monthly_reports import MonthlyReportStore, create_monthly_reports_table
+from machine_images import MachineImageStore, create_machine_images_table
+from annual_summary import create_annual_summary
+from db_pool import ConnectionPool
+from db_migrations import migrate
+from group_commit import GroupCommitWriter, GroupCommitTimeout
+from record_query import (
+    parse_record_query, query_records, record_to_dict, parse_since, changes_since, current_sequence, merge_sync_records,
+)
 
 app = Flask(__name__)
 CORS(app)
@@ -21,8 +39,9 @@ CORS(app)
 # データベースファイルのパス
 DB_PATH = '/home/user/flutter_app/python_backend/inspection_db.sqlite'
 
-# スレッドセーフなデータベース接続
-db_lock = threading.Lock()
+# データベース接続プール（WALモード、読み取りは並行、書き込みのみ db_lock で直列化）
+db_pool = ConnectionPool(DB_PATH)
+db_lock = db_pool.write_lock
 
 def init_database():
     """データベースの初期化"""
@@ -64,32 +83,153 @@ def init_database():
                 data_type TEXT NOT NULL,
                 name TEXT NOT NULL,
                 created_at TEXT NOT NULL,
+                sort_order INTEGER DEFAULT 9999,
                 UNIQUE(data_type, name)
             )
         ''')
         
+        # 帳票生成ジョブテーブル
+        create_report_jobs_table(cursor)
+        
+        # 重機・月ごとの保存済み帳票テーブル
+        create_monthly_reports_table(cursor)
+        
+        # 重機画像テーブル
+        create_machine_images_table(cursor)
+        
         # 初期マスタデータの投入をスキップ（ユーザーがCSVで管理）
         print('✅ Master data initialization skipped (user manages via CSV)')
         
         conn.commit()
+        
+        # スキーマの移行（インデックスなど、適用済みの移行は何もしない）
+        migrate(conn)
         conn.close()
         print('✅ Database initialized')
 
-# アプリ起動時にデータベース初期化
-init_database()
-
 def get_db():
-    """データベース接続を取得"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """データベース接続をプールから取得（close() でプールに返却）"""
+    return db_pool.get()
 
 # エイリアス（マスタデータAPI用）
 get_db_connection = get_db
 
+# 点検記録の作成・更新（同時に届いた書き込みを1回のトランザクションでコミット）
+record_writer = GroupCommitWriter(get_db, db_lock)
+
 # Flutter Web静的ファイルのパス
 FLUTTER_WEB_DIR = '/home/user/flutter_app/build/web'
 
+# ============================================================
+# 生成済み帳票のキャッシュ
+# ============================================================
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# 出力形式（?format=） → (MIMEタイプ, 拡張子, 単一帳票の生成関数名, 一括生成の生成関数名)
+REPORT_FORMATS = {
+    'xlsx': (XLSX_MIMETYPE, 'xlsx', 'create_inspection_report', 'create_inspection_workbook'),
+    'pdf': (PDF_MIMETYPE, 'pdf', 'create_inspection_pdf', 'create_inspection_pdf_document'),
+}
+PDF_RENDER_FUNCTIONS = ('create_inspection_pdf', 'create_inspection_pdf_document')
+
+# 生成済み帳票のキャッシュ（データベースと同じディレクトリに保存、init_server() で作成）
+report_cache = None
+
+def report_etag(kind, payload, engine, styling=None):
+    """帳票のETag（正規化したリクエストのハッシュ）"""
+    return report_cache_key(kind, payload, engine or DEFAULT_ENGINE, styling or DEFAULT_STYLING)
+
+def render_report(kind, payload, engine, styling=None):
+    """
+    帳票をメモリ上に生成（キャッシュ済みの場合は生成を省略）
+    
+    Args:
+        kind: 帳票生成関数名（REPORT_FORMATSのいずれか）
+        payload: 点検データ（またはそのリスト）
+        engine: 描画エンジン（PDFでは使用しない）
+        styling: 書式モード（PDFでは使用しない）
+    
+    Returns:
+        (XLSXまたはPDFのbytes, ETag)
+    """
+    etag = report_etag(kind, payload, engine, styling)
+    
+    if report_cache is not None:
+        content = report_cache.get(etag)
+        if content is not None:
+            print(f'📦 キャッシュ済みの帳票を使用: {etag[:12]}')
+            return content, etag
+    
+    # 帳票生成プロセスプールで生成し、bytesで受け取る
+    if kind in PDF_RENDER_FUNCTIONS:
+        content = run_render_job(kind, payload, None)
+    else:
+        content = run_render_job(kind, payload, None, engine, styling)
+    if report_cache is not None:
+        report_cache.put(etag, content, '.pdf' if kind in PDF_RENDER_FUNCTIONS else '.xlsx')
+    return content, etag
+
+def render_report_job(kind, payload, output_path, engine, styling=None):
+    """帳票生成ジョブ用（出力先へ生成してETagを返す）"""
+    content, etag = render_report(kind, payload, engine, styling)
+    with open(output_path, 'wb') as f:
+        f.write(content)
+    return etag
+
+def is_not_modified(etag):
+    """If-None-Matchが帳票のETagと一致するか"""
+    return request.if_none_match.contains_weak(etag)
+
+def not_modified_response(etag):
+    """304 Not Modified レスポンス"""
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+def send_report(source, download_name, etag, mimetype=XLSX_MIMETYPE):
+    """
+    帳票をETag付きで返す（GETではIf-None-Matchに応じて304）
+    
+    Args:
+        source: XLSX（またはPDF）のbytes、または保存済みファイルのパス
+        mimetype: 帳票のMIMEタイプ
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    response = send_file(
+        source,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=download_name,
+        etag=etag or True,
+    )
+    # CORSヘッダーを追加
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    response.headers.add('Access-Control-Expose-Headers', 'ETag, Content-Disposition')
+    return response
+
+# 重機画像（帳票用サムネイルは登録時に一度だけ生成、機種ごとの既定画像は起動時に準備、init_server() で作成）
+machine_image_store = None
+
+def attach_machine_images(payloads):
+    """
+    点検データに帳票用の重機画像（machine_image）を設定
+    
+    machine_id を含む場合はその重機の登録画像、なければ機種の既定画像を使用する
+    （リクエストで指定された machine_image は使用しない）
+    """
+    with closing(get_db()) as conn:
+        for data in payloads:
+            if isinstance(data, dict):
+                data['machine_image'] = machine_image_store.report_image(
+                    conn, data.get('machine_id'), data.get('machine_type', '')
+                )
+
+# 重機・月ごとの保存済み帳票（点検記録の変更時は変更のあった日の列のみ更新、init_server() で作成）
+monthly_reports = None
+
 # ============================================================
 # Excel API エンドポイント
 # ============================================================
@@ -100,7 +240,7 @@ def generate_excel():
     Excel生成API
     
     OPTIONS: プリフライトリクエスト対応
-    POST: Excel生成
+    POST: Excel生成（?format=pdf の場合はPDF）
     """
     if request.method == 'OPTIONS':
         # CORSプリフライトリクエストに対応
@@ -117,49 +257,526 @@ def generate_excel():
         if not data:
             return jsonify({'error': 'リクエストボディが空です'}), 400
         
+        # 描画エンジン（?engine=stream でXMLストリームエンジンを使用）
+        engine = request.args.get('engine')
+        if engine and engine not in REPORT_ENGINES:
+            return jsonify({'error': f'未対応の描画エンジンです: {engine}'}), 400
+        
+        # 書式モード（?styling=compact で名前付きスタイル・条件付き書式を使用）
+        styling = request.args.get('styling')
+        if styling and styling not in REPORT_STYLINGS:
+            return jsonify({'error': f'未対応の書式モードです: {styling}'}), 400
+        
+        # 出力形式（?format=pdf でPDFを出力）
+        output_format = report_output_format()
+        if output_format is None:
+            return jsonify({'error': f'未対応の出力形式です: {request.args.get("format")}'}), 400
+        mimetype, extension, kind, batch_kind = output_format
+        if mimetype == PDF_MIMETYPE:
+            # PDFは描画エンジン・書式モードによらず同じ内容
+            engine = styling = None
+        
         print('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
         print('📊 Excel生成APIリクエスト受信')
         print(f'   重機: {data.get("machine_model")} {data.get("machine_unit")}')
         print(f'   対象月: {data.get("year")}年{data.get("month")}月')
         print('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
         
-        # 一時ファイルパスを生成
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'inspection_report_{timestamp}.xlsx'
-        output_path = os.path.join(tempfile.gettempdir(), filename)
+        # 重機画像（machine_id指定時は登録画像、それ以外は機種の既定画像）
+        attach_machine_images([data])
+        
+        # 同じ帳票を取得済みの場合は生成を省略
+        etag = report_etag(kind, data, engine, styling)
+        if is_not_modified(etag):
+            print('✅ 帳票は変更されていません (304)')
+            return not_modified_response(etag)
         
-        # Excel生成
-        create_inspection_report(data, output_path)
+        # Excel生成（キャッシュ済みの場合は省略、帳票生成プロセスプールでメモリ上に生成）
+        content, etag = render_report(kind, data, engine, styling)
         
-        # ファイルが生成されたか確認
-        if not os.path.exists(output_path):
+        # 生成されたか確認
+        if not content:
             return jsonify({'error': 'Excelファイルの生成に失敗しました'}), 500
         
-        print(f'✅ Excel生成成功: {output_path}')
+        print(f'✅ Excel生成成功: {len(content):,} bytes')
         
-        # ダウンロード用ファイル名
-        machine_info = f"{data.get('machine_model', '重機')}_{data.get('machine_unit', '')}".replace('/', '_').replace('（', '').replace('）', '')
-        download_filename = f"点検表_{machine_info}_{data.get('year')}年{data.get('month')}月.xlsx"
+        # Excelファイルを返す（メモリ上の内容をそのまま送信）
+        return send_report(content, report_download_name(data, extension), etag, mimetype)
         
-        # Excelファイルを返す
-        response = send_file(
-            output_path,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=download_filename
-        )
+    except RenderQueueFull as e:
+        # 待ち行列が満杯の場合は再試行を促す
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    except RenderTimeout as e:
+        print(f'❌ Excel生成APIエラー: {e}')
+        return jsonify({'error': str(e)}), 504
+    except Exception as e:
+        print(f'❌ Excel生成APIエラー: {e}')
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+def report_output_format():
+    """
+    出力形式（?format=xlsx|pdf、既定はxlsx）を取得
+    
+    Returns:
+        (MIMEタイプ, 拡張子, 単一帳票の生成関数名, 一括生成の生成関数名)、未対応の形式の場合はNone
+    """
+    return REPORT_FORMATS.get(request.args.get('format') or 'xlsx')
+
+def report_download_name(data, extension='xlsx'):
+    """単一帳票のダウンロード用ファイル名を生成"""
+    machine_info = f"{data.get('machine_model', '重機')}_{data.get('machine_unit', '')}".replace('/', '_').replace('（', '').replace('）', '')
+    return f"点検表_{machine_info}_{data.get('year')}年{data.get('month')}月.{extension}"
+
+def resolve_batch_request(data, extension='xlsx'):
+    """
+    一括生成リクエストから点検データのリストとダウンロード用ファイル名を取得
+    
+    リクエストボディ（いずれかの形式）:
+    1. 点検データのリスト
+       {"payloads": [<generate-excelと同じ形式>, ...]}
+    2. 現場・対象月（点検記録はデータベースから取得）
+       {
+           "site_name": "工事名", "year": 2025, "month": 6,
+           "company_name": "...", "responsible_person": "...", "prime_contractor_inspector": "...",
+           "machines": {"<重機ID>": {"machine_type": "...", "machine_model": "...", "machine_unit": "...", "items": [...]}},
+           "include_summary": true  # 省略可（各重機の帳票の次に集計シートを追加）
+       }
+    
+    Raises:
+        ValueError: リクエストの形式が不正
+    """
+    if 'payloads' in data:
+        payloads = data['payloads']
+        if not isinstance(payloads, list):
+            raise ValueError('payloads はリストで指定してください')
+        attach_machine_images(payloads)
+        download_label = '一括'
+    else:
+        site_name = data.get('site_name', '')
+        if not site_name or not data.get('year') or not data.get('month'):
+            raise ValueError('site_name, year, month または payloads を指定してください')
         
-        # CORSヘッダーを追加
+        year = int(data['year'])
+        month = int(data['month'])
+        common = {
+            key: data[key]
+            for key in ('company_name', 'responsible_person', 'prime_contractor_inspector')
+            if key in data
+        }
+        with closing(get_db()) as conn:
+            payloads = build_site_payloads(
+                conn, site_name, year, month, common, data.get('machines'), image_store=machine_image_store,
+            )
+        if data.get('include_summary'):
+            for payload in payloads:
+                payload['include_summary'] = True
+        download_label = site_name.replace('/', '_')
+    
+    if payloads:
+        year = payloads[0].get('year')
+        month = payloads[0].get('month')
+    else:
+        year = data.get('year')
+        month = data.get('month')
+    download_filename = f"点検表_{download_label}_{year}年{month}月.{extension}"
+    return payloads, download_filename
+
+@app.route('/api/generate-excel/batch', methods=['POST', 'OPTIONS'])
+def generate_excel_batch():
+    """
+    Excel一括生成API（1重機1シートのワークブック）
+    
+    OPTIONS: プリフライトリクエスト対応
+    POST: Excel一括生成（リクエスト形式は resolve_batch_request を参照、?format=pdf の場合は1重機1ページのPDF）
+    """
+    if request.method == 'OPTIONS':
+        # CORSプリフライトリクエストに対応
+        response = jsonify({'status': 'ok'})
         response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        return response, 200
+    
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'リクエストボディが空です'}), 400
+        
+        engine = request.args.get('engine')
+        if engine and engine not in REPORT_ENGINES:
+            return jsonify({'error': f'未対応の描画エンジンです: {engine}'}), 400
+        
+        styling = request.args.get('styling')
+        if styling and styling not in REPORT_STYLINGS:
+            return jsonify({'error': f'未対応の書式モードです: {styling}'}), 400
+        
+        output_format = report_output_format()
+        if output_format is None:
+            return jsonify({'error': f'未対応の出力形式です: {request.args.get("format")}'}), 400
+        mimetype, extension, kind, batch_kind = output_format
+        if mimetype == PDF_MIMETYPE:
+            # PDFは描画エンジン・書式モードによらず同じ内容
+            engine = styling = None
+        
+        try:
+            payloads, download_filename = resolve_batch_request(data, extension)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not payloads:
+            return jsonify({'error': '対象の点検記録がありません'}), 404
+        
+        print('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+        print('📊 Excel一括生成APIリクエスト受信')
+        print(f'   重機数: {len(payloads)}台')
+        print('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+        
+        etag = report_etag(batch_kind, payloads, engine, styling)
+        if is_not_modified(etag):
+            print('✅ 帳票は変更されていません (304)')
+            return not_modified_response(etag)
+        
+        # Excel生成（キャッシュ済みの場合は省略、帳票生成プロセスプールでメモリ上に生成）
+        content, etag = render_report(batch_kind, payloads, engine, styling)
         
-        return response
+        return send_report(content, download_filename, etag, mimetype)
         
+    except RenderQueueFull as e:
+        # 待ち行列が満杯の場合は再試行を促す
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    except RenderTimeout as e:
+        print(f'❌ Excel一括生成APIエラー: {e}')
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
-        print(f'❌ Excel生成APIエラー: {e}')
+        print(f'❌ Excel一括生成APIエラー: {e}')
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+# 帳票のヘッダー項目（データベースにないため、必要に応じてクエリパラメータで指定）
+REPORT_HEADER_PARAMS = (
+    'company_name', 'responsible_person', 'prime_contractor_inspector',
+    'machine_type', 'machine_model', 'machine_unit',
+)
+
+@app.route('/api/reports/<machine_id>/<int:year>/<int:month>', methods=['GET'])
+def get_machine_report(machine_id, year, month):
+    """
+    重機・対象月の点検帳票を取得（点検記録・点検項目はデータベースから組み立て）
+    
+    クエリパラメータ（いずれも省略可）:
+        site_name: 現場名（指定時はその現場の点検記録のみ）
+        engine: 描画エンジン
+        styling: 書式モード
+        format: 出力形式（xlsx / pdf）
+        summary: 1の場合は集計シートを追加（xlsxのみ）
+        company_name, responsible_person, prime_contractor_inspector,
+        machine_type, machine_model, machine_unit: 帳票のヘッダー項目
+    
+    パラメータを省略した場合（xlsx）は保存済みの月次帳票を返す（ファイルの読み出しのみ）
+    """
+    try:
+        if not 1 <= month <= 12:
+            return jsonify({'error': f'対象月が不正です: {month}'}), 400
+        
+        engine = request.args.get('engine')
+        if engine and engine not in REPORT_ENGINES:
+            return jsonify({'error': f'未対応の描画エンジンです: {engine}'}), 400
+        
+        styling = request.args.get('styling')
+        if styling and styling not in REPORT_STYLINGS:
+            return jsonify({'error': f'未対応の書式モードです: {styling}'}), 400
+        
+        output_format = report_output_format()
+        if output_format is None:
+            return jsonify({'error': f'未対応の出力形式です: {request.args.get("format")}'}), 400
+        mimetype, extension, kind, batch_kind = output_format
+        if mimetype == PDF_MIMETYPE:
+            # PDFは描画エンジン・書式モードによらず同じ内容
+            engine = styling = None
+        
+        site_name = request.args.get('site_name') or None
+        overrides = {key: request.args[key] for key in REPORT_HEADER_PARAMS if key in request.args}
+        
+        summary = request.args.get('summary') == '1'
+        
+        if mimetype == XLSX_MIMETYPE and not site_name and not engine and not styling and not overrides and not summary:
+            # 保存済みの月次帳票（点検記録の変更時に差分更新済み）
+            file_path, etag, payload = monthly_reports.get(machine_id, year, month)
+            if not payload['records']:
+                return jsonify({'error': '対象の点検記録がありません'}), 404
+            return send_report(file_path, report_download_name(payload), etag)
+        
+        with closing(get_db()) as conn:
+            payload = build_report_payload(
+                conn, machine_id, year, month,
+                site_name=site_name, overrides=overrides, image_store=machine_image_store,
+            )
+        if summary:
+            payload['include_summary'] = True
+        
+        if not payload['records']:
+            return jsonify({'error': '対象の点検記録がありません'}), 404
+        
+        etag = report_etag(kind, payload, engine, styling)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        content, etag = render_report(kind, payload, engine, styling)
+        return send_report(content, report_download_name(payload, extension), etag, mimetype)
+        
+    except RenderQueueFull as e:
+        # 待ち行列が満杯の場合は再試行を促す
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    except RenderTimeout as e:
+        print(f'❌ 帳票取得エラー: {e}')
+        return jsonify({'error': str(e)}), 504
+    except Exception as e:
+        print(f'❌ 帳票取得エラー: {e}')
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/reports/annual/<int:year>', methods=['GET'])
+def get_annual_summary(year):
+    """
+    年間点検集計を取得（重機×月の点検日数・要修理件数、重機×点検項目×月の要修理日数）
+    
+    クエリパラメータ（省略可）:
+        site_name: 現場名（指定時はその現場の点検記録のみ）
+    
+    集計はSQLで行い、ワークブックは一時ファイルへ行ごとにストリーム書き出しする
+    """
+    try:
+        site_name = request.args.get('site_name') or None
+        output = tempfile.TemporaryFile()
+        try:
+            with closing(get_db()) as conn:
+                counts = create_annual_summary(conn, year, output, site_name)
+        except Exception:
+            output.close()
+            raise
+        
+        if not counts['machines']:
+            output.close()
+            return jsonify({'error': '対象の点検記録がありません'}), 404
+        
+        print(f"✅ 年間点検集計生成成功: {year}年 重機{counts['machines']}台 / {counts['items']}項目")
+        output.seek(0)
+        label = f"_{site_name.replace('/', '_')}" if site_name else ''
+        return send_report(output, f'年間点検集計{label}_{year}年.xlsx', None)
+        
+    except Exception as e:
+        print(f'❌ 年間点検集計エラー: {e}')
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+def resolve_report_job(data):
+    """
+    帳票生成ジョブのリクエストから (帳票生成関数名, 引数, ダウンロード用ファイル名) を取得
+    
+    records を含む場合は単一帳票、それ以外は一括生成（resolve_batch_request を参照）
+    """
+    if 'records' in data:
+        attach_machine_images([data])
+        return 'create_inspection_report', data, report_download_name(data)
+    payloads, download_filename = resolve_batch_request(data)
+    if not payloads:
+        raise ValueError('対象の点検記録がありません')
+    return 'create_inspection_workbook', payloads, download_filename
+
+# 帳票生成ジョブ（生成ファイルはデータベースと同じディレクトリに保存、init_server() で作成）
+report_jobs = None
+
+# ============================================================
+# サーバー初期化
+# ============================================================
+
+_server_init_lock = threading.Lock()
+_server_initialized = False
+
+def create_stores():
+    """帳票のキャッシュ・重機画像・保存済み帳票・帳票生成ジョブを作成（データベースと同じディレクトリに保存）"""
+    global report_cache, machine_image_store, monthly_reports, report_jobs
+    base_dir = os.path.dirname(DB_PATH)
+    if REPORT_CACHE_ENABLED:
+        report_cache = ReportCache(os.path.join(base_dir, 'report_cache'))
+    machine_image_store = MachineImageStore(get_db, db_lock, os.path.join(base_dir, 'machine_images'))
+    monthly_reports = MonthlyReportStore(
+        get_db, db_lock, os.path.join(base_dir, 'monthly_reports'), image_store=machine_image_store,
+    )
+    report_jobs = ReportJobManager(
+        get_db, db_lock,
+        os.path.join(base_dir, 'report_jobs'),
+        resolve_report_job,
+        render=render_report_job,
+    )
+
+def init_server():
+    """
+    データベース初期化・保存先の作成・帳票スケルトン・重機の既定画像の準備（複数回呼び出しても一度だけ実行）
+    
+    モジュールの読み込み時には実行しない（帳票生成ワーカーはspawnでこのモジュールを読み込み直すため、
+    キャッシュの一時ファイルの削除などの保存先の初期化をワーカーで行わない）
+    """
+    global _server_initialized
+    if _server_initialized:
+        return
+    with _server_init_lock:
+        if _server_initialized:
+            return
+        init_database()
+        create_stores()
+        # 帳票スケルトンを事前構築（リクエストごとのレイアウト構築を省略）
+        preload_report_skeletons()
+        machine_image_store.preload_assets()
+        _server_initialized = True
+
+@app.before_request
+def start_report_jobs():
+    """最初のリクエスト時にサーバーを初期化し、ジョブ実行スレッドを起動"""
+    init_server()
+    report_jobs.start()
+
+@app.route('/api/report-jobs', methods=['POST', 'OPTIONS'])
+def create_report_job():
+    """
+    帳票生成ジョブ登録API
+    
+    OPTIONS: プリフライトリクエスト対応
+    POST: ジョブを登録してジョブIDを返す（202）
+          リクエストボディは /api/generate-excel または /api/generate-excel/batch と同じ形式
+    """
+    if request.method == 'OPTIONS':
+        # CORSプリフライトリクエストに対応
+        response = jsonify({'status': 'ok'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        return response, 200
+    
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'リクエストボディが空です'}), 400
+        
+        engine = request.args.get('engine')
+        if engine and engine not in REPORT_ENGINES:
+            return jsonify({'error': f'未対応の描画エンジンです: {engine}'}), 400
+        
+        styling = request.args.get('styling')
+        if styling and styling not in REPORT_STYLINGS:
+            return jsonify({'error': f'未対応の書式モードです: {styling}'}), 400
+        
+        if 'records' not in data and 'payloads' not in data:
+            if not data.get('site_name') or not data.get('year') or not data.get('month'):
+                return jsonify({'error': 'records, payloads または site_name, year, month を指定してください'}), 400
+        
+        job = report_jobs.submit(data, engine, styling)
+        print(f'📊 帳票生成ジョブ登録: {job["id"]}')
+        
+        response = jsonify(job)
+        response.headers['Location'] = f'/api/report-jobs/{job["id"]}'
+        return response, 202
+        
+    except Exception as e:
+        print(f'❌ 帳票生成ジョブ登録エラー: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/report-jobs/<job_id>', methods=['GET'])
+def get_report_job(job_id):
+    """帳票生成ジョブの状態・進捗を取得"""
+    try:
+        job = report_jobs.get(job_id)
+        if not job:
+            return jsonify({'error': 'ジョブが見つかりません'}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        print(f'❌ 帳票生成ジョブ取得エラー: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/report-jobs/<job_id>/file', methods=['GET'])
+def get_report_job_file(job_id):
+    """完了した帳票生成ジョブのExcelファイルを取得"""
+    try:
+        job, file_path = report_jobs.get_file(job_id)
+        if not job:
+            return jsonify({'error': 'ジョブが見つかりません'}), 404
+        if not file_path:
+            # 未完了（または失敗）の場合は状態を返す
+            return jsonify(job), 409
+        
+        return send_report(file_path, job['downloadName'], job['etag'])
+    except Exception as e:
+        print(f'❌ 帳票生成ジョブ取得エラー: {e}')
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================
+# 重機画像API
+# ============================================================
+
+@app.route('/api/machines/<machine_id>/image', methods=['GET', 'PUT', 'DELETE', 'OPTIONS'])
+def manage_machine_image(machine_id):
+    """
+    重機画像API（帳票の重機画像エリアに埋め込む画像）
+    
+    GET: 帳票用サムネイルを取得（未登録の場合は404）
+    PUT: 画像を登録（multipart/form-data の image、またはリクエストボディに画像ファイル）
+         同じ内容の画像は保存済みのファイルとサムネイルを共有する
+    DELETE: 登録を解除（帳票は機種の既定画像に戻る）
+    """
+    if request.method == 'OPTIONS':
+        response = jsonify({'status': 'ok'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+        response.headers.add('Access-Control-Allow-Methods', 'GET, PUT, DELETE, OPTIONS')
+        return response, 200
+    
+    try:
+        if request.method == 'GET':
+            with closing(get_db()) as conn:
+                image = machine_image_store.machine_image(conn, machine_id)
+            if image is None:
+                return jsonify({'error': '重機画像が登録されていません'}), 404
+            response = send_file(image['path'], mimetype='image/jpeg', etag=True, max_age=3600)
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response
+        
+        elif request.method == 'PUT':
+            upload = request.files.get('image')
+            if upload is not None:
+                content, filename = upload.read(), upload.filename
+            else:
+                content, filename = request.get_data(), ''
+            try:
+                result = machine_image_store.save(machine_id, content, filename)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            print(f'✅ 重機画像登録: {machine_id} ({result["imageHash"][:12]})')
+            return jsonify(result), 200
+        
+        elif request.method == 'DELETE':
+            if not machine_image_store.delete(machine_id):
+                return jsonify({'error': '重機画像が登録されていません'}), 404
+            print(f'✅ 重機画像削除: {machine_id}')
+            return jsonify({'message': 'Machine image deleted', 'machineId': machine_id}), 200
+    
+    except Exception as e:
+        print(f'❌ 重機画像APIエラー: {e}')
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """ヘルスチェックエンドポイント"""
@@ -171,33 +788,32 @@ def health_check():
 
 @app.route('/api/records', methods=['GET'])
 def get_all_records():
-    """すべての点検記録を取得"""
+    """
+    点検記録を取得（inspection_date, created_at, id の降順）
+    
+    クエリパラメータ（省略可）:
+        machineId / siteName / inspectorName: 完全一致で絞り込み
+        dateFrom: 点検日の開始（inspection_date >= dateFrom）
+        dateTo: 点検日の終了（inspection_date < dateTo）
+        limit: 1ページの件数（指定時はレスポンスの nextCursor で次のページを取得、最後のページはnull）
+        cursor: 前のページの nextCursor
+    
+    パラメータを省略した場合は全件を返す
+    """
     try:
-        with db_lock:
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM inspection_records 
-                ORDER BY inspection_date DESC, created_at DESC
-            ''')
-            rows = cursor.fetchall()
-            conn.close()
-        
-        records = []
-        for row in rows:
-            record = {
-                'id': row['id'],
-                'machineId': row['machine_id'],
-                'siteName': row['site_name'],
-                'inspectorName': row['inspector_name'],
-                'inspectionDate': row['inspection_date'],
-                'results': json.loads(row['results']),
-                'createdAt': row['created_at'],
-                'updatedAt': row['updated_at']
-            }
-            records.append(record)
-        
-        return jsonify({'records': records, 'count': len(records)}), 200
+        try:
+            filters, limit, page_cursor = parse_record_query(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        with closing(get_db()) as conn:
+            rows, next_cursor = query_records(conn, filters, limit, page_cursor)
+        
+        records = [record_to_dict(row) for row in rows]
+        response = {'records': records, 'count': len(records)}
+        if limit is not None:
+            response['nextCursor'] = next_cursor
+        return jsonify(response), 200
         
     except Exception as e:
         print(f'❌ 点検記録取得エラー: {e}')
@@ -207,28 +823,15 @@ def get_all_records():
 def get_record(record_id):
     """特定の点検記録を取得"""
     try:
-        with db_lock:
-            conn = get_db()
+        with closing(get_db()) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM inspection_records WHERE id = ?', (record_id,))
             row = cursor.fetchone()
-            conn.close()
         
         if not row:
             return jsonify({'error': 'Record not found'}), 404
         
-        record = {
-            'id': row['id'],
-            'machineId': row['machine_id'],
-            'siteName': row['site_name'],
-            'inspectorName': row['inspector_name'],
-            'inspectionDate': row['inspection_date'],
-            'results': json.loads(row['results']),
-            'createdAt': row['created_at'],
-            'updatedAt': row['updated_at']
-        }
-        
-        return jsonify(record), 200
+        return jsonify(record_to_dict(row)), 200
         
     except Exception as e:
         print(f'❌ 点検記録取得エラー: {e}')
@@ -255,9 +858,7 @@ def create_record():
         
         now = datetime.now().isoformat()
         
-        with db_lock:
-            conn = get_db()
-            cursor = conn.cursor()
+        def insert(cursor):
             cursor.execute('''
                 INSERT INTO inspection_records 
                 (id, machine_id, site_name, inspector_name, inspection_date, results, created_at, updated_at)
@@ -272,14 +873,18 @@ def create_record():
                 now,
                 now
             ))
-            conn.commit()
-            conn.close()
+        
+        record_writer.submit(insert)
         
         print(f'✅ 点検記録作成: {data["id"]}')
+        monthly_reports.records_changed([(data['machineId'], data['inspectionDate'])])
         return jsonify({'message': 'Record created', 'id': data['id']}), 201
         
     except sqlite3.IntegrityError:
         return jsonify({'error': 'Record already exists'}), 409
+    except GroupCommitTimeout as e:
+        # 書き込みが混み合っている場合は再試行を促す
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         print(f'❌ 点検記録作成エラー: {e}')
         return jsonify({'error': str(e)}), 500
@@ -298,15 +903,12 @@ def update_record(record_id):
         data = request.get_json()
         now = datetime.now().isoformat()
         
-        with db_lock:
-            conn = get_db()
-            cursor = conn.cursor()
-            
+        def update(cursor):
             # 既存レコードの確認
             cursor.execute('SELECT * FROM inspection_records WHERE id = ?', (record_id,))
-            if not cursor.fetchone():
-                conn.close()
-                return jsonify({'error': 'Record not found'}), 404
+            existing = cursor.fetchone()
+            if not existing:
+                return None
             
             # 更新
             cursor.execute('''
@@ -323,12 +925,22 @@ def update_record(record_id):
                 now,
                 record_id
             ))
-            conn.commit()
-            conn.close()
+            return existing
+        
+        existing = record_writer.submit(update)
+        if not existing:
+            return jsonify({'error': 'Record not found'}), 404
         
         print(f'✅ 点検記録更新: {record_id}')
+        monthly_reports.records_changed([
+            (existing['machine_id'], existing['inspection_date']),
+            (data.get('machineId'), data.get('inspectionDate')),
+        ])
         return jsonify({'message': 'Record updated', 'id': record_id}), 200
         
+    except GroupCommitTimeout as e:
+        # 書き込みが混み合っている場合は再試行を促す
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         print(f'❌ 点検記録更新エラー: {e}')
         return jsonify({'error': str(e)}), 500
@@ -344,18 +956,20 @@ def delete_record(record_id):
         return response, 200
     
     try:
-        with db_lock:
-            conn = get_db()
+        # 書き込み用ロックの中でトランザクションを実行（例外時はロールバック）
+        with closing(get_db()) as conn, db_lock, conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT machine_id, inspection_date FROM inspection_records WHERE id = ?', (record_id,))
+            existing = cursor.fetchone()
             cursor.execute('DELETE FROM inspection_records WHERE id = ?', (record_id,))
             deleted_count = cursor.rowcount
             conn.commit()
-            conn.close()
         
         if deleted_count == 0:
             return jsonify({'error': 'Record not found'}), 404
         
         print(f'✅ 点検記録削除: {record_id}')
+        monthly_reports.records_changed([(existing['machine_id'], existing['inspection_date'])])
         return jsonify({'message': 'Record deleted', 'id': record_id}), 200
         
     except Exception as e:
@@ -364,7 +978,22 @@ def delete_record(record_id):
 
 @app.route('/api/sync', methods=['POST', 'OPTIONS'])
 def sync_data():
-    """データ同期（ローカルとクラウドのマージ）"""
+    """
+    データ同期（ローカルとクラウドのマージ）
+    
+    リクエスト:
+        records: 端末の点検記録（baseSeq: 端末が最後に受け取ったその記録の changeSeq、新規の記録は省略）
+        since: 前回の同期で返した cursor（指定時はそれ以降の変更のみを返す、省略時は全件）
+    
+    baseSeq を指定した記録は、サーバー側でその後に変更・削除されていなければ反映し、
+    されていれば競合とする（baseSeq がない場合は従来どおり updatedAt で比較）
+    
+    レスポンス:
+        records: since 以降に作成・更新された点検記録（since 省略時は全件）
+        deleted: since 以降に削除された点検記録のID
+        cursor: 次回の since
+        full: records が全件かどうか
+    """
     if request.method == 'OPTIONS':
         response = jsonify({'status': 'ok'})
         response.headers.add('Access-Control-Allow-Origin', '*')
@@ -375,95 +1004,45 @@ def sync_data():
     try:
         data = request.get_json()
         local_records = data.get('records', [])
+        try:
+            since = parse_since(data['since']) if data.get('since') is not None else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        with db_lock:
-            conn = get_db()
-            cursor = conn.cursor()
-            
-            sync_result = {
-                'created': 0,
-                'updated': 0,
-                'conflicts': 0
-            }
-            
-            for record in local_records:
-                # 既存レコードのチェック
-                cursor.execute('SELECT updated_at FROM inspection_records WHERE id = ?', (record['id'],))
-                row = cursor.fetchone()
-                
-                now = datetime.now().isoformat()
-                
-                if not row:
-                    # 新規作成
-                    cursor.execute('''
-                        INSERT INTO inspection_records 
-                        (id, machine_id, site_name, inspector_name, inspection_date, results, created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        record['id'],
-                        record['machineId'],
-                        record.get('siteName', ''),
-                        record['inspectorName'],
-                        record['inspectionDate'],
-                        json.dumps(record['results'], ensure_ascii=False),
-                        record.get('createdAt', now),
-                        record.get('updatedAt', now)
-                    ))
-                    sync_result['created'] += 1
-                else:
-                    # 更新日時で比較
-                    server_updated_at = row['updated_at']
-                    local_updated_at = record.get('updatedAt', '')
-                    
-                    if local_updated_at > server_updated_at:
-                        # ローカルが新しい場合のみ更新
-                        cursor.execute('''
-                            UPDATE inspection_records 
-                            SET machine_id = ?, site_name = ?, inspector_name = ?, 
-                                inspection_date = ?, results = ?, updated_at = ?
-                            WHERE id = ?
-                        ''', (
-                            record['machineId'],
-                            record.get('siteName', ''),
-                            record['inspectorName'],
-                            record['inspectionDate'],
-                            json.dumps(record['results'], ensure_ascii=False),
-                            local_updated_at,
-                            record['id']
-                        ))
-                        sync_result['updated'] += 1
-                    else:
-                        sync_result['conflicts'] += 1
-            
-            conn.commit()
+        with closing(get_db()) as conn:
+            # 書き込み用ロックの中でトランザクションを実行（例外時はロールバック）
+            try:
+                with db_lock, conn:
+                    cursor = conn.cursor()
+                    sync_result, changes = merge_sync_records(cursor, local_records)
+                    conn.commit()
+            except ValueError as e:
+                # baseSeqが不正（書き込み前に検証するため、何も反映されない）
+                return jsonify({'error': str(e)}), 400
             
-            # 全レコードを返す
-            cursor.execute('SELECT * FROM inspection_records ORDER BY inspection_date DESC')
-            rows = cursor.fetchall()
-            conn.close()
-        
-        records = []
-        for row in rows:
-            record = {
-                'id': row['id'],
-                'machineId': row['machine_id'],
-                'siteName': row['site_name'],
-                'inspectorName': row['inspector_name'],
-                'inspectionDate': row['inspection_date'],
-                'results': json.loads(row['results']),
-                'createdAt': row['created_at'],
-                'updatedAt': row['updated_at']
-            }
-            records.append(record)
-        
-        print(f'✅ データ同期完了: 作成={sync_result["created"]}, 更新={sync_result["updated"]}, 競合={sync_result["conflicts"]}')
+            # since 以降の変更（省略時は全件）を返す（書き込みのロックは解放済み）
+            if since is None:
+                next_cursor = current_sequence(conn)
+                rows, _ = query_records(conn)
+                deleted, full = [], True
+            else:
+                rows, deleted, next_cursor, full = changes_since(conn, since)
+        
+        records = [record_to_dict(row) for row in rows]
+        
+        print(f'✅ データ同期完了: 作成={sync_result["created"]}, 更新={sync_result["updated"]}, 競合={sync_result["conflicts"]}, '
+              f'返却={len(records)}件 (since={since})')
+        monthly_reports.records_changed(changes)
         
         return jsonify({
             'message': 'Sync completed',
             'result': sync_result,
-            'records': records
+            'records': records,
+            'deleted': deleted,
+            'cursor': next_cursor,
+            'full': full
         }), 200
-        
+    
     except Exception as e:
         print(f'❌ データ同期エラー: {e}')
         import traceback
@@ -479,81 +1058,80 @@ def sync_data():
 def manage_sites():
     """現場名のCRUD操作"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if request.method == 'GET':
-            # 現場名一覧取得（master_dataからのみ取得、sort_order順）
-            # inspection_recordsからは取得しない（削除したマスタが復活するのを防ぐため）
-            cursor.execute('SELECT name FROM master_data WHERE data_type = "site" ORDER BY sort_order, name')
-            sites = [row['name'] for row in cursor.fetchall()]
-            
-            conn.close()
-            return jsonify({'sites': sites}), 200
-        
-        elif request.method == 'POST':
-            # 現場名追加（master_dataテーブルに保存、sort_orderは最大値+1）
-            data = request.get_json()
-            site_name = data.get('siteName', '').strip()
-            if not site_name:
-                return jsonify({'error': 'Site name is required'}), 400
-            
-            # 最大のsort_orderを取得
-            cursor.execute('SELECT MAX(sort_order) FROM master_data WHERE data_type = "site"')
-            max_order = cursor.fetchone()[0]
-            new_order = (max_order + 1) if max_order else 1
-            
-            now = datetime.now().isoformat()
-            cursor.execute(
-                'INSERT OR IGNORE INTO master_data (data_type, name, created_at, sort_order) VALUES (?, ?, ?, ?)',
-                ('site', site_name, now, new_order)
-            )
-            conn.commit()
-            conn.close()
+        with closing(get_db_connection()) as conn:
+            cursor = conn.cursor()
             
-            print(f'✅ 現場追加: {site_name} (sort_order: {new_order})')
-            return jsonify({'message': 'Site added', 'siteName': site_name}), 201
-        
-        elif request.method == 'DELETE':
-            # 現場名削除（master_dataと関連レコードを削除）
-            data = request.get_json()
-            site_name = data.get('siteName', '').strip()
-            if not site_name:
-                return jsonify({'error': 'Site name is required'}), 400
+            if request.method == 'GET':
+                # 現場名一覧取得（master_dataからのみ取得、sort_order順）
+                # inspection_recordsからは取得しない（削除したマスタが復活するのを防ぐため）
+                cursor.execute('SELECT name FROM master_data WHERE data_type = "site" ORDER BY sort_order, name')
+                sites = [row['name'] for row in cursor.fetchall()]
             
-            print(f'🔍 現場削除開始: {site_name}', flush=True)
+                return jsonify({'sites': sites}), 200
             
-            # 削除前の点検記録数を確認
-            cursor.execute('SELECT COUNT(*) FROM inspection_records WHERE site_name = ?', (site_name,))
-            before_count = cursor.fetchone()[0]
-            print(f'   削除対象の点検記録数: {before_count}件', flush=True)
+            elif request.method == 'POST':
+                # 現場名追加（master_dataテーブルに保存、sort_orderは最大値+1）
+                data = request.get_json()
+                site_name = data.get('siteName', '').strip()
+                if not site_name:
+                    return jsonify({'error': 'Site name is required'}), 400
             
-            # master_dataから削除
-            cursor.execute('DELETE FROM master_data WHERE data_type = "site" AND name = ?', (site_name,))
-            master_deleted = cursor.rowcount
-            print(f'   master_data削除: {master_deleted}件', flush=True)
+                # 書き込み用ロックの中でトランザクションを実行（例外時はロールバック）
+                with db_lock, conn:
+                    # 最大のsort_orderを取得（同時の追加で重複しないようロックの中で取得）
+                    cursor.execute('SELECT MAX(sort_order) FROM master_data WHERE data_type = "site"')
+                    max_order = cursor.fetchone()[0]
+                    new_order = (max_order + 1) if max_order else 1
             
-            # 関連する点検記録も削除（完全一致のみ）
-            cursor.execute('DELETE FROM inspection_records WHERE site_name = ?', (site_name,))
-            records_deleted = cursor.rowcount
-            print(f'   inspection_records削除: {records_deleted}件', flush=True)
+                    now = datetime.now().isoformat()
+                    cursor.execute(
+                        'INSERT OR IGNORE INTO master_data (data_type, name, created_at, sort_order) VALUES (?, ?, ?, ?)',
+                        ('site', site_name, now, new_order)
+                    )
+                    conn.commit()
             
-            conn.commit()
+                print(f'✅ 現場追加: {site_name} (sort_order: {new_order})')
+                return jsonify({'message': 'Site added', 'siteName': site_name}), 201
+            
+            elif request.method == 'DELETE':
+                # 現場名削除（master_dataと関連レコードを削除）
+                data = request.get_json()
+                site_name = data.get('siteName', '').strip()
+                if not site_name:
+                    return jsonify({'error': 'Site name is required'}), 400
+            
+                print(f'🔍 現場削除開始: {site_name}', flush=True)
+            
+                with db_lock, conn:
+                    # 削除前の点検記録数を確認
+                    cursor.execute('SELECT COUNT(*) FROM inspection_records WHERE site_name = ?', (site_name,))
+                    before_count = cursor.fetchone()[0]
+                    print(f'   削除対象の点検記録数: {before_count}件', flush=True)
             
-            # 削除後の確認
-            cursor.execute('SELECT COUNT(*) FROM inspection_records WHERE site_name = ?', (site_name,))
-            after_count = cursor.fetchone()[0]
-            print(f'   削除後の残存レコード数: {after_count}件', flush=True)
+                    # master_dataから削除
+                    cursor.execute('DELETE FROM master_data WHERE data_type = "site" AND name = ?', (site_name,))
+                    master_deleted = cursor.rowcount
+                    print(f'   master_data削除: {master_deleted}件', flush=True)
             
-            conn.close()
+                    # 関連する点検記録も削除（完全一致のみ）
+                    cursor.execute('DELETE FROM inspection_records WHERE site_name = ?', (site_name,))
+                    records_deleted = cursor.rowcount
+                    print(f'   inspection_records削除: {records_deleted}件', flush=True)
             
-            print(f'✅ 現場削除完了: {site_name} (マスタ: {master_deleted}件, 点検記録: {records_deleted}件)', flush=True)
-            return jsonify({
-                'message': 'Site deleted', 
-                'deletedMaster': master_deleted,
-                'deletedRecords': records_deleted,
-                'siteName': site_name
-            }), 200
+                    conn.commit()
+            
+                # 削除後の確認
+                cursor.execute('SELECT COUNT(*) FROM inspection_records WHERE site_name = ?', (site_name,))
+                after_count = cursor.fetchone()[0]
+                print(f'   削除後の残存レコード数: {after_count}件', flush=True)
+            
+                print(f'✅ 現場削除完了: {site_name} (マスタ: {master_deleted}件, 点検記録: {records_deleted}件)', flush=True)
+                return jsonify({
+                    'message': 'Site deleted', 
+                    'deletedMaster': master_deleted,
+                    'deletedRecords': records_deleted,
+                    'siteName': site_name
+                }), 200
     
     except Exception as e:
         print(f'❌ 現場名管理エラー: {e}')
@@ -564,55 +1142,55 @@ def manage_sites():
 def manage_inspectors():
     """点検者名のCRUD操作"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if request.method == 'GET':
-            # 点検者名一覧取得（master_dataからのみ取得、inspection_recordsは参照しない）
-            cursor.execute('SELECT name FROM master_data WHERE data_type = "inspector" ORDER BY sort_order, name')
-            inspectors = [row['name'] for row in cursor.fetchall()]
-            
-            conn.close()
-            return jsonify({'inspectors': inspectors}), 200
-        
-        elif request.method == 'POST':
-            # 点検者名追加（master_dataテーブルに保存、sort_orderは最大値+1）
-            data = request.get_json()
-            inspector_name = data.get('inspectorName', '').strip()
-            if not inspector_name:
-                return jsonify({'error': 'Inspector name is required'}), 400
-            
-            # 最大のsort_orderを取得
-            cursor.execute('SELECT MAX(sort_order) FROM master_data WHERE data_type = "inspector"')
-            max_order = cursor.fetchone()[0]
-            new_order = (max_order + 1) if max_order else 1
-            
-            now = datetime.now().isoformat()
-            cursor.execute(
-                'INSERT OR IGNORE INTO master_data (data_type, name, created_at, sort_order) VALUES (?, ?, ?, ?)',
-                ('inspector', inspector_name, now, new_order)
-            )
-            conn.commit()
-            conn.close()
+        with closing(get_db_connection()) as conn:
+            cursor = conn.cursor()
             
-            print(f'✅ 点検者追加: {inspector_name} (sort_order: {new_order})')
-            return jsonify({'message': 'Inspector added', 'inspectorName': inspector_name}), 201
-        
-        elif request.method == 'DELETE':
-            # 点検者名削除（master_dataからのみ削除、inspection_recordsは保持）
-            data = request.get_json()
-            inspector_name = data.get('inspectorName', '').strip()
-            if not inspector_name:
-                return jsonify({'error': 'Inspector name is required'}), 400
+            if request.method == 'GET':
+                # 点検者名一覧取得（master_dataからのみ取得、inspection_recordsは参照しない）
+                cursor.execute('SELECT name FROM master_data WHERE data_type = "inspector" ORDER BY sort_order, name')
+                inspectors = [row['name'] for row in cursor.fetchall()]
             
-            # master_dataから削除（点検記録は削除しない）
-            cursor.execute('DELETE FROM master_data WHERE data_type = "inspector" AND name = ?', (inspector_name,))
+                return jsonify({'inspectors': inspectors}), 200
             
-            conn.commit()
-            conn.close()
+            elif request.method == 'POST':
+                # 点検者名追加（master_dataテーブルに保存、sort_orderは最大値+1）
+                data = request.get_json()
+                inspector_name = data.get('inspectorName', '').strip()
+                if not inspector_name:
+                    return jsonify({'error': 'Inspector name is required'}), 400
+            
+                # 書き込み用ロックの中でトランザクションを実行（例外時はロールバック）
+                with db_lock, conn:
+                    # 最大のsort_orderを取得（同時の追加で重複しないようロックの中で取得）
+                    cursor.execute('SELECT MAX(sort_order) FROM master_data WHERE data_type = "inspector"')
+                    max_order = cursor.fetchone()[0]
+                    new_order = (max_order + 1) if max_order else 1
+            
+                    now = datetime.now().isoformat()
+                    cursor.execute(
+                        'INSERT OR IGNORE INTO master_data (data_type, name, created_at, sort_order) VALUES (?, ?, ?, ?)',
+                        ('inspector', inspector_name, now, new_order)
+                    )
+                    conn.commit()
+            
+                print(f'✅ 点検者追加: {inspector_name} (sort_order: {new_order})')
+                return jsonify({'message': 'Inspector added', 'inspectorName': inspector_name}), 201
+            
+            elif request.method == 'DELETE':
+                # 点検者名削除（master_dataからのみ削除、inspection_recordsは保持）
+                data = request.get_json()
+                inspector_name = data.get('inspectorName', '').strip()
+                if not inspector_name:
+                    return jsonify({'error': 'Inspector name is required'}), 400
+            
+                with db_lock, conn:
+                    # master_dataから削除（点検記録は削除しない）
+                    cursor.execute('DELETE FROM master_data WHERE data_type = "inspector" AND name = ?', (inspector_name,))
+            
+                    conn.commit()
             
-            print(f'✅ 点検者削除: {inspector_name}')
-            return jsonify({'message': 'Inspector deleted'}), 200
+                print(f'✅ 点検者削除: {inspector_name}')
+                return jsonify({'message': 'Inspector deleted'}), 200
     
     except Exception as e:
         print(f'❌ 点検者名管理エラー: {e}')
@@ -623,53 +1201,53 @@ def manage_inspectors():
 def manage_companies():
     """所有会社名のCRUD操作"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if request.method == 'GET':
-            # 所有会社名一覧取得（master_dataからsort_order順）
-            cursor.execute('SELECT name FROM master_data WHERE data_type = "company" ORDER BY sort_order, name')
-            companies = [row['name'] for row in cursor.fetchall()]
-            conn.close()
-            return jsonify({'companies': companies}), 200
-        
-        elif request.method == 'POST':
-            # 所有会社名追加（master_dataテーブルに保存、sort_orderは最大値+1）
-            data = request.get_json()
-            company_name = data.get('companyName', '').strip()
-            if not company_name:
-                return jsonify({'error': 'Company name is required'}), 400
-            
-            # 最大のsort_orderを取得
-            cursor.execute('SELECT MAX(sort_order) FROM master_data WHERE data_type = "company"')
-            max_order = cursor.fetchone()[0]
-            new_order = (max_order + 1) if max_order else 1
-            
-            now = datetime.now().isoformat()
-            cursor.execute(
-                'INSERT OR IGNORE INTO master_data (data_type, name, created_at, sort_order) VALUES (?, ?, ?, ?)',
-                ('company', company_name, now, new_order)
-            )
-            conn.commit()
-            conn.close()
+        with closing(get_db_connection()) as conn:
+            cursor = conn.cursor()
             
-            print(f'✅ 会社追加: {company_name} (sort_order: {new_order})')
-            return jsonify({'message': 'Company added', 'companyName': company_name}), 201
-        
-        elif request.method == 'DELETE':
-            # 所有会社名削除（master_dataから削除）
-            data = request.get_json()
-            company_name = data.get('companyName', '').strip()
-            if not company_name:
-                return jsonify({'error': 'Company name is required'}), 400
+            if request.method == 'GET':
+                # 所有会社名一覧取得（master_dataからsort_order順）
+                cursor.execute('SELECT name FROM master_data WHERE data_type = "company" ORDER BY sort_order, name')
+                companies = [row['name'] for row in cursor.fetchall()]
+                return jsonify({'companies': companies}), 200
             
-            cursor.execute('DELETE FROM master_data WHERE data_type = "company" AND name = ?', (company_name,))
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
+            elif request.method == 'POST':
+                # 所有会社名追加（master_dataテーブルに保存、sort_orderは最大値+1）
+                data = request.get_json()
+                company_name = data.get('companyName', '').strip()
+                if not company_name:
+                    return jsonify({'error': 'Company name is required'}), 400
+            
+                # 書き込み用ロックの中でトランザクションを実行（例外時はロールバック）
+                with db_lock, conn:
+                    # 最大のsort_orderを取得（同時の追加で重複しないようロックの中で取得）
+                    cursor.execute('SELECT MAX(sort_order) FROM master_data WHERE data_type = "company"')
+                    max_order = cursor.fetchone()[0]
+                    new_order = (max_order + 1) if max_order else 1
+            
+                    now = datetime.now().isoformat()
+                    cursor.execute(
+                        'INSERT OR IGNORE INTO master_data (data_type, name, created_at, sort_order) VALUES (?, ?, ?, ?)',
+                        ('company', company_name, now, new_order)
+                    )
+                    conn.commit()
             
-            print(f'✅ 会社削除: {company_name}')
-            return jsonify({'message': 'Company deleted'}), 200
+                print(f'✅ 会社追加: {company_name} (sort_order: {new_order})')
+                return jsonify({'message': 'Company added', 'companyName': company_name}), 201
+            
+            elif request.method == 'DELETE':
+                # 所有会社名削除（master_dataから削除）
+                data = request.get_json()
+                company_name = data.get('companyName', '').strip()
+                if not company_name:
+                    return jsonify({'error': 'Company name is required'}), 400
+            
+                with db_lock, conn:
+                    cursor.execute('DELETE FROM master_data WHERE data_type = "company" AND name = ?', (company_name,))
+                    deleted_count = cursor.rowcount
+                    conn.commit()
+            
+                print(f'✅ 会社削除: {company_name}')
+                return jsonify({'message': 'Company deleted'}), 200
     
     except Exception as e:
         print(f'❌ 所有会社名管理エラー: {e}')
@@ -701,12 +1279,23 @@ def serve_flutter(path):
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    init_server()
+    # 帳票生成ワーカーを事前起動
+    if REPORT_POOL_ENABLED:
+        get_render_pool()
+    report_jobs.start()
+    
     print('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
     print('🚀 Unified Server起動')
     print('   ポート: 5060')
     print('   機能:')
     print('     - Flutter Web配信')
     print('     - Excel API (/api/generate-excel)')
+    print('     - Excel一括生成API (/api/generate-excel/batch)')
+    print('     - 帳票取得API (/api/reports/<重機ID>/<年>/<月>)')
+    print('     - 年間点検集計API (/api/reports/annual/<年>)')
+    print('     - 帳票生成ジョブAPI (/api/report-jobs)')
+    print('     - 重機画像API (/api/machines/<重機ID>/image)')
     print('     - データベースAPI (/api/records, /api/sync)')
     print('     - ヘルスチェック (/api/health)')
     print('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
@@ -3,6 +3,7 @@ sys.path.insert(0, '.')
 from unified_server import *
 
 if __name__ == '__main__':
+    init_server()
     print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
     print("🚀 Unified Server起動 (ポート8080)")
     print("   ポート: 8080")
@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XLSX Stream Writer
+openpyxlのオブジェクトモデルを使わず、ワークシートXML・styles.xml・
+sharedStringsを直接zipへストリーム書き出しする軽量XLSXライター
+
+スタイルは以下のハッシュ可能なタプルで指定する（Noneは既定値）:
+    font:      (name, size, bold, italic, underline)
+    fill:      塗りつぶし色のRGB（パターンはsolid）
+    border:    (left, right, top, bottom) の各線種（'thin'など）
+    alignment: (horizontal, vertical, wrap_text)
+
+名前付きスタイル（StyleTable.named_style）と条件付き書式（add_sheetのconditional_formats）、
+画像の配置（add_sheetのimages、同じ画像ファイルはブック内で1つだけ格納）にも対応する。
+行数の多い表は add_sheet_rows で行ごとに書き出せる（全セルをメモリ上に保持しない）。
+"""
+
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+from openpyxl.utils import get_column_letter
+
+# zipエントリの固定タイムスタンプ（出力を決定的にするため）
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+XMLNS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+XMLNS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XMLNS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+XMLNS_DRAWING = 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing'
+XMLNS_DRAWING_MAIN = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# XMLで使用できない制御文字
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# 画像の拡張子 → Content-Type
+_IMAGE_CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+}
+
+# 1pxあたりのEMU（DrawingMLの座標単位）
+_EMU_PER_PIXEL = 9525
+
+# 既定フォント（openpyxlと同じCalibri 11pt）
+_DEFAULT_FONT_XML = (
+    '<font><name val="Calibri"/><family val="2"/><color theme="1"/>'
+    '<sz val="11"/><scheme val="minor"/></font>'
+)
+
+
+class DeterministicZipFile(zipfile.ZipFile):
+    """
+    全エントリを固定タイムスタンプで書き込むZipFile
+
+    openpyxlのExcelWriterに渡すことで、同じ内容のブックから
+    バイト単位で同一のXLSXを出力する
+    """
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        if not isinstance(zinfo_or_arcname, zipfile.ZipInfo):
+            zinfo_or_arcname = zipfile.ZipInfo(zinfo_or_arcname, date_time=ZIP_DATE_TIME)
+            zinfo_or_arcname.compress_type = self.compression
+            zinfo_or_arcname.external_attr = 0o600 << 16
+        super().writestr(zinfo_or_arcname, data, compress_type, compresslevel)
+
+    def write(self, filename, arcname=None, compress_type=None, compresslevel=None):
+        with open(filename, 'rb') as f:
+            data = f.read()
+        self.writestr(arcname or os.path.basename(filename), data, compress_type, compresslevel)
+
+
+def _text(value):
+    """XMLテキストとしてエスケープ"""
+    return escape(_ILLEGAL_XML_CHARS.sub('', value))
+
+
+def _format_number(value):
+    """数値をXMLの値表記に変換"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def cell_xml(ref, value, style_id=0, shared_strings=None):
+    """
+    セル要素（<c>）のXMLを生成
+
+    Args:
+        ref: セル番地（'AM10'形式）
+        value: 値（None・空文字列は値なし）
+        style_id: セル書式（StyleTable.xf()の戻り値）
+        shared_strings: 共有文字列表（Noneの場合、文字列はインライン文字列）
+    """
+    s_attr = f' s="{style_id}"' if style_id else ''
+    if value is None or value == '':
+        return f'<c r="{ref}"{s_attr}/>'
+    if isinstance(value, str):
+        if shared_strings is None:
+            return f'<c r="{ref}"{s_attr} t="inlineStr"><is><t xml:space="preserve">{_text(value)}</t></is></c>'
+        return f'<c r="{ref}"{s_attr} t="s"><v>{shared_strings.add(value)}</v></c>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{s_attr} t="b"><v>{int(value)}</v></c>'
+    return f'<c r="{ref}"{s_attr} t="n"><v>{_format_number(value)}</v></c>'
+
+
+class _Interned:
+    """値→インデックスの登録表（登録順にインデックスを割り当て）"""
+
+    def __init__(self, initial=()):
+        self.values = []
+        self._index = {}
+        for value in initial:
+            self.add(value)
+
+    def add(self, value):
+        index = self._index.get(value)
+        if index is None:
+            index = len(self.values)
+            self._index[value] = index
+            self.values.append(value)
+        return index
+
+    def __len__(self):
+        return len(self.values)
+
+
+class StyleTable:
+    """
+    ワークブック共有のスタイル表
+
+    フォント・塗りつぶし・罫線は既知の少数の組み合わせのみのため、
+    cellXfsも含めて登録順に固定インデックスを割り当てる。
+    """
+
+    def __init__(self):
+        self.fonts = _Interned([None])
+        self.fills = _Interned([None, 'gray125'])
+        self.borders = _Interned([None])
+        self.xfs = _Interned([(0, 0, 0, None, 0)])
+        # 名前付きスタイル (name, fontId, alignment)（cellStyleXfsの1番目以降）
+        self.named_styles = []
+        self._named_xf_ids = {}
+        # 条件付き書式の書式（塗りつぶし色）
+        self.dxfs = _Interned()
+
+    def named_style(self, name, font=None, alignment=None):
+        """
+        名前付きスタイルを登録し、cellStyleXfsのインデックスを返す
+
+        登録後は同じフォント・配置のセル書式がこの名前付きスタイルを参照する
+        """
+        key = (font, alignment)
+        xf_id = self._named_xf_ids.get(key)
+        if xf_id is None:
+            self.named_styles.append((name, self.fonts.add(font), alignment))
+            xf_id = self._named_xf_ids[key] = len(self.named_styles)
+        return xf_id
+
+    def dxf(self, fill):
+        """条件付き書式の書式（dxfId）を取得"""
+        return self.dxfs.add(fill)
+
+    def xf(self, font=None, fill=None, border=None, alignment=None):
+        """スタイルの組み合わせに対応するセル書式（s属性）を取得"""
+        key = (
+            self.fonts.add(font),
+            self.fills.add(fill),
+            self.borders.add(border),
+            alignment,
+            self._named_xf_ids.get((font, alignment), 0),
+        )
+        return self.xfs.add(key)
+
+    def to_xml(self):
+        parts = [XML_DECLARATION, f'<styleSheet xmlns="{XMLNS_MAIN}">']
+
+        parts.append(f'<fonts count="{len(self.fonts)}">')
+        for font in self.fonts.values:
+            parts.append(_DEFAULT_FONT_XML if font is None else self._font_xml(font))
+        parts.append('</fonts>')
+
+        parts.append(f'<fills count="{len(self.fills)}">')
+        for fill in self.fills.values:
+            if fill is None:
+                parts.append('<fill><patternFill/></fill>')
+            elif fill == 'gray125':
+                parts.append('<fill><patternFill patternType="gray125"/></fill>')
+            else:
+                parts.append(
+                    f'<fill><patternFill patternType="solid"><fgColor rgb="{fill}"/>'
+                    f'<bgColor rgb="{fill}"/></patternFill></fill>'
+                )
+        parts.append('</fills>')
+
+        parts.append(f'<borders count="{len(self.borders)}">')
+        for border in self.borders.values:
+            parts.append(self._border_xml(border))
+        parts.append('</borders>')
+
+        parts.append(f'<cellStyleXfs count="{len(self.named_styles) + 1}">')
+        parts.append('<xf numFmtId="0" fontId="0" fillId="0" borderId="0"/>')
+        for _, font_id, alignment in self.named_styles:
+            attrs = f'numFmtId="0" fontId="{font_id}" fillId="0" borderId="0" applyFont="1"'
+            if alignment is None:
+                parts.append(f'<xf {attrs}/>')
+            else:
+                parts.append(f'<xf {attrs} applyAlignment="1">{self._alignment_xml(alignment)}</xf>')
+        parts.append('</cellStyleXfs>')
+
+        parts.append(f'<cellXfs count="{len(self.xfs)}">')
+        for font_id, fill_id, border_id, alignment, xf_id in self.xfs.values:
+            attrs = f'numFmtId="0" fontId="{font_id}" fillId="{fill_id}" borderId="{border_id}" xfId="{xf_id}"'
+            if font_id:
+                attrs += ' applyFont="1"'
+            if fill_id:
+                attrs += ' applyFill="1"'
+            if border_id:
+                attrs += ' applyBorder="1"'
+            if alignment is None:
+                parts.append(f'<xf {attrs}/>')
+            else:
+                parts.append(f'<xf {attrs} applyAlignment="1">{self._alignment_xml(alignment)}</xf>')
+        parts.append('</cellXfs>')
+
+        parts.append(f'<cellStyles count="{len(self.named_styles) + 1}">')
+        parts.append('<cellStyle name="Normal" xfId="0" builtinId="0"/>')
+        for xf_id, (name, _, _) in enumerate(self.named_styles, start=1):
+            parts.append(f'<cellStyle name={quoteattr(name)} xfId="{xf_id}"/>')
+        parts.append('</cellStyles>')
+
+        parts.append(f'<dxfs count="{len(self.dxfs)}">')
+        for fill in self.dxfs.values:
+            parts.append(
+                f'<dxf><fill><patternFill patternType="solid"><fgColor rgb="{fill}"/>'
+                f'<bgColor rgb="{fill}"/></patternFill></fill></dxf>'
+            )
+        parts.append('</dxfs>')
+
+        parts.append(
+            '<tableStyles count="0" defaultTableStyle="TableStyleMedium9" defaultPivotStyle="PivotStyleLight16"/>'
+            '</styleSheet>'
+        )
+        return ''.join(parts)
+
+    @staticmethod
+    def _font_xml(font):
+        name, size, bold, italic, underline = font
+        parts = ['<font>', f'<name val={quoteattr(name)}/>']
+        if bold:
+            parts.append('<b val="1"/>')
+        if italic:
+            parts.append('<i val="1"/>')
+        if underline:
+            parts.append(f'<u val="{underline}"/>')
+        parts.append(f'<sz val="{_format_number(size)}"/>')
+        parts.append('</font>')
+        return ''.join(parts)
+
+    @staticmethod
+    def _border_xml(border):
+        if border is None:
+            return '<border><left/><right/><top/><bottom/><diagonal/></border>'
+        parts = ['<border>']
+        for name, style in zip(('left', 'right', 'top', 'bottom'), border):
+            parts.append(f'<{name} style="{style}"/>' if style else f'<{name}/>')
+        parts.append('<diagonal/></border>')
+        return ''.join(parts)
+
+    @staticmethod
+    def _alignment_xml(alignment):
+        horizontal, vertical, wrap_text = alignment
+        attrs = ''
+        if horizontal:
+            attrs += f' horizontal="{horizontal}"'
+        if vertical:
+            attrs += f' vertical="{vertical}"'
+        if wrap_text:
+            attrs += ' wrapText="1"'
+        return f'<alignment{attrs}/>'
+
+
+class SharedStrings:
+    """ワークブック共有の共有文字列表"""
+
+    def __init__(self):
+        self._strings = _Interned()
+
+    def add(self, value):
+        return self._strings.add(value)
+
+    def to_xml(self):
+        count = len(self._strings)
+        parts = [XML_DECLARATION, f'<sst xmlns="{XMLNS_MAIN}" uniqueCount="{count}">']
+        for value in self._strings.values:
+            parts.append(f'<si><t xml:space="preserve">{_text(value)}</t></si>')
+        parts.append('</sst>')
+        return ''.join(parts)
+
+
+class XlsxStreamWriter:
+    """
+    XLSXをzipへ直接ストリーム書き出しするライター
+
+    使用例:
+        with XlsxStreamWriter(output_path) as writer:
+            writer.add_sheet('Sheet1', cells, col_widths={1: 5.0})
+    """
+
+    def __init__(self, output):
+        """
+        Args:
+            output: 出力ファイルパスまたは書き込み可能なファイルオブジェクト
+        """
+        self._zip = zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED)
+        self.styles = StyleTable()
+        self.shared_strings = SharedStrings()
+        self._sheet_titles = []
+        # {画像ファイルのパス: zip内のパス}
+        self._media = {}
+        # 画像を配置したワークシートの番号
+        self._drawing_sheets = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+
+    def _open_entry(self, name):
+        info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        return self._zip.open(info, 'w')
+
+    def _write_entry(self, name, xml):
+        with self._open_entry(name) as stream:
+            stream.write(xml.encode('utf-8'))
+
+    def _add_media(self, path):
+        """画像ファイルをzipへ格納（格納済みの画像は再利用）し、zip内のパスを返す"""
+        name = self._media.get(path)
+        if name is None:
+            extension = os.path.splitext(path)[1].lower().lstrip('.')
+            if extension not in _IMAGE_CONTENT_TYPES:
+                raise ValueError(f'未対応の画像形式です: {path}')
+            name = self._media[path] = f'xl/media/image{len(self._media) + 1}.{extension}'
+            info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_STORED
+            with open(path, 'rb') as source, self._zip.open(info, 'w') as stream:
+                stream.write(source.read())
+        return name
+
+    def _write_drawing(self, index, images):
+        """ワークシートの画像配置（drawing）と関連付けを書き出し"""
+        anchors = []
+        rels = []
+        for number, (path, (col, row, x_offset, y_offset, width, height)) in enumerate(images, start=1):
+            media = self._add_media(path)
+            rels.append(
+                f'<Relationship Id="rId{number}" Type="{XMLNS_REL}/image" Target="/{media}"/>'
+            )
+            anchors.append(
+                '<xdr:oneCellAnchor>'
+                f'<xdr:from><xdr:col>{col - 1}</xdr:col><xdr:colOff>{round(x_offset * _EMU_PER_PIXEL)}</xdr:colOff>'
+                f'<xdr:row>{row - 1}</xdr:row><xdr:rowOff>{round(y_offset * _EMU_PER_PIXEL)}</xdr:rowOff></xdr:from>'
+                f'<xdr:ext cx="{round(width * _EMU_PER_PIXEL)}" cy="{round(height * _EMU_PER_PIXEL)}"/>'
+                f'<xdr:pic><xdr:nvPicPr><xdr:cNvPr id="{number}" name="Image {number}"/>'
+                '<xdr:cNvPicPr><a:picLocks noChangeAspect="1"/></xdr:cNvPicPr></xdr:nvPicPr>'
+                f'<xdr:blipFill><a:blip r:embed="rId{number}"/><a:stretch><a:fillRect/></a:stretch></xdr:blipFill>'
+                '<xdr:spPr><a:prstGeom prst="rect"><a:avLst/></a:prstGeom></xdr:spPr></xdr:pic>'
+                '<xdr:clientData/></xdr:oneCellAnchor>'
+            )
+
+        self._drawing_sheets.append(index)
+        self._write_entry(f'xl/drawings/drawing{index}.xml', (
+            f'{XML_DECLARATION}<xdr:wsDr xmlns:xdr="{XMLNS_DRAWING}" xmlns:a="{XMLNS_DRAWING_MAIN}" '
+            f'xmlns:r="{XMLNS_REL}">{"".join(anchors)}</xdr:wsDr>'
+        ))
+        self._write_entry(
+            f'xl/drawings/_rels/drawing{index}.xml.rels',
+            f'{XML_DECLARATION}<Relationships xmlns="{XMLNS_PKG_REL}">{"".join(rels)}</Relationships>'
+        )
+        self._write_entry(f'xl/worksheets/_rels/sheet{index}.xml.rels', (
+            f'{XML_DECLARATION}<Relationships xmlns="{XMLNS_PKG_REL}">'
+            f'<Relationship Id="rId1" Type="{XMLNS_REL}/drawing" Target="/xl/drawings/drawing{index}.xml"/>'
+            '</Relationships>'
+        ))
+
+    def add_sheet(self, title, cells, col_widths=None, row_heights=None, merges=(), inline_cells=(),
+                  conditional_formats=(), images=()):
+        """
+        ワークシートを書き出し
+
+        Args:
+            title: シート名
+            cells: {(row, col): (value, font, fill, border, alignment)}
+            col_widths: {列番号: 幅}
+            row_heights: {行番号: 高さ}
+            merges: 結合セル範囲（'A1:B2'形式）のリスト
+            inline_cells: 文字列をインライン文字列で書き出すセル (row, col) の集合
+                          （patch_sheet_cellsで後から書き換えるセル）
+            conditional_formats: 条件付き書式 (範囲, 演算子, 数式, 塗りつぶし色) のリスト
+                                 （例: ('AM10:BQ23', 'equal', '"×"', 'FFFF6B6B')）
+            images: 配置する画像 (ファイルパス, (列, 行, セル内のx, セル内のy, 幅, 高さ)) のリスト
+                    （位置・大きさはpx、画像ファイルはそのまま格納する）
+        """
+        col_widths = col_widths or {}
+        row_heights = row_heights or {}
+        styles = self.styles
+        shared_strings = self.shared_strings
+        index = len(self._sheet_titles) + 1
+        self._sheet_titles.append(title)
+
+        # 行ごとにセルをまとめる（スタイルのみの行も含める）
+        rows = {row: [] for row in row_heights}
+        for (row, col) in cells:
+            rows.setdefault(row, []).append(col)
+
+        if cells:
+            max_row = max(row for row, _ in cells)
+            max_col = max(col for _, col in cells)
+            dimension = f'A1:{get_column_letter(max_col)}{max_row}'
+        else:
+            dimension = 'A1'
+
+        with self._open_entry(f'xl/worksheets/sheet{index}.xml') as stream:
+            head = [
+                XML_DECLARATION,
+                f'<worksheet xmlns="{XMLNS_MAIN}" xmlns:r="{XMLNS_REL}">',
+                '<sheetPr><outlinePr summaryBelow="1" summaryRight="1"/><pageSetUpPr/></sheetPr>',
+                f'<dimension ref="{dimension}"/>',
+                '<sheetViews><sheetView workbookViewId="0">'
+                '<selection activeCell="A1" sqref="A1"/></sheetView></sheetViews>',
+                '<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/>',
+            ]
+
+            # 列幅（openpyxlと同様に1列ずつ出力）
+            if col_widths:
+                head.append('<cols>')
+                for col in sorted(col_widths):
+                    head.append(
+                        f'<col min="{col}" max="{col}" width="{_format_number(col_widths[col])}" customWidth="1"/>'
+                    )
+                head.append('</cols>')
+
+            head.append('<sheetData>')
+            stream.write(''.join(head).encode('utf-8'))
+
+            for row in sorted(rows):
+                parts = [f'<row r="{row}"']
+                height = row_heights.get(row)
+                if height is not None:
+                    parts.append(f' ht="{_format_number(height)}" customHeight="1"')
+                parts.append('>')
+                for col in sorted(rows[row]):
+                    value, font, fill, border, alignment = cells[(row, col)]
+                    parts.append(cell_xml(
+                        f'{get_column_letter(col)}{row}', value,
+                        styles.xf(font, fill, border, alignment),
+                        None if (row, col) in inline_cells else shared_strings,
+                    ))
+                parts.append('</row>')
+                stream.write(''.join(parts).encode('utf-8'))
+
+            tail = ['</sheetData>']
+            if merges:
+                tail.append(f'<mergeCells count="{len(merges)}">')
+                tail.extend(f'<mergeCell ref="{ref}"/>' for ref in merges)
+                tail.append('</mergeCells>')
+            ranges = {}
+            for sqref, operator, formula, fill in conditional_formats:
+                ranges.setdefault(sqref, []).append((operator, formula, fill))
+            priority = 0
+            for sqref, rules in ranges.items():
+                tail.append(f'<conditionalFormatting sqref="{sqref}">')
+                for operator, formula, fill in rules:
+                    priority += 1
+                    tail.append(
+                        f'<cfRule type="cellIs" dxfId="{styles.dxf(fill)}" priority="{priority}" '
+                        f'operator="{operator}"><formula>{_text(formula)}</formula></cfRule>'
+                    )
+                tail.append('</conditionalFormatting>')
+            tail.append(
+                '<pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5"/>'
+            )
+            if images:
+                tail.append('<drawing r:id="rId1"/>')
+            tail.append('</worksheet>')
+            stream.write(''.join(tail).encode('utf-8'))
+
+        if images:
+            self._write_drawing(index, images)
+
+    def add_sheet_rows(self, title, rows, col_widths=None, merges=(), freeze_rows=0):
+        """
+        ワークシートを行ごとにストリーム書き出し（全セルをメモリ上に保持しない）
+
+        行数が多い集計表など、行を順に生成しながら書き出す場合に使用する。
+        文字列はインライン文字列で書き出す（行数に応じて共有文字列表が大きくならない）。
+
+        Args:
+            title: シート名
+            rows: (row, [(col, value, (font, fill, border, alignment)), ...]) のイテラブル
+                  （行番号・列番号の昇順）
+            col_widths: {列番号: 幅}
+            merges: 結合セル範囲（'A1:B2'形式）のリスト
+            freeze_rows: スクロールしても表示したままにする先頭の行数
+        """
+        col_widths = col_widths or {}
+        styles = self.styles
+        index = len(self._sheet_titles) + 1
+        self._sheet_titles.append(title)
+
+        with self._open_entry(f'xl/worksheets/sheet{index}.xml') as stream:
+            if freeze_rows:
+                top_left = f'A{freeze_rows + 1}'
+                sheet_view = (
+                    f'<pane ySplit="{freeze_rows}" topLeftCell="{top_left}" activePane="bottomLeft" state="frozen"/>'
+                    f'<selection pane="bottomLeft" activeCell="{top_left}" sqref="{top_left}"/>'
+                )
+            else:
+                sheet_view = '<selection activeCell="A1" sqref="A1"/>'
+            head = [
+                XML_DECLARATION,
+                f'<worksheet xmlns="{XMLNS_MAIN}" xmlns:r="{XMLNS_REL}">',
+                '<sheetPr><outlinePr summaryBelow="1" summaryRight="1"/><pageSetUpPr/></sheetPr>',
+                f'<sheetViews><sheetView workbookViewId="0">{sheet_view}</sheetView></sheetViews>',
+                '<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/>',
+            ]
+            if col_widths:
+                head.append('<cols>')
+                for col in sorted(col_widths):
+                    head.append(
+                        f'<col min="{col}" max="{col}" width="{_format_number(col_widths[col])}" customWidth="1"/>'
+                    )
+                head.append('</cols>')
+            head.append('<sheetData>')
+            stream.write(''.join(head).encode('utf-8'))
+
+            for row, row_cells in rows:
+                parts = [f'<row r="{row}">']
+                for col, value, style in row_cells:
+                    parts.append(cell_xml(f'{get_column_letter(col)}{row}', value, styles.xf(*style)))
+                parts.append('</row>')
+                stream.write(''.join(parts).encode('utf-8'))
+
+            tail = ['</sheetData>']
+            if merges:
+                tail.append(f'<mergeCells count="{len(merges)}">')
+                tail.extend(f'<mergeCell ref="{ref}"/>' for ref in merges)
+                tail.append('</mergeCells>')
+            tail.append(
+                '<pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5"/>'
+                '</worksheet>'
+            )
+            stream.write(''.join(tail).encode('utf-8'))
+
+    def close(self):
+        """共有パーツ（スタイル・共有文字列・ブック定義）を書き出してzipを閉じる"""
+        sheet_count = len(self._sheet_titles)
+
+        self._write_entry('xl/styles.xml', self.styles.to_xml())
+        self._write_entry('xl/sharedStrings.xml', self.shared_strings.to_xml())
+
+        sheets = ''.join(
+            f'<sheet name={quoteattr(_ILLEGAL_XML_CHARS.sub("", title))} sheetId="{i}" r:id="rId{i}"/>'
+            for i, title in enumerate(self._sheet_titles, start=1)
+        )
+        self._write_entry('xl/workbook.xml', (
+            f'{XML_DECLARATION}<workbook xmlns="{XMLNS_MAIN}" xmlns:r="{XMLNS_REL}">'
+            '<workbookPr/><bookViews><workbookView activeTab="0"/></bookViews>'
+            f'<sheets>{sheets}</sheets><calcPr calcId="124519" fullCalcOnLoad="1"/></workbook>'
+        ))
+
+        rels = ''.join(
+            f'<Relationship Id="rId{i}" Type="{XMLNS_REL}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, sheet_count + 1)
+        )
+        rels += (
+            f'<Relationship Id="rId{sheet_count + 1}" Type="{XMLNS_REL}/styles" Target="styles.xml"/>'
+            f'<Relationship Id="rId{sheet_count + 2}" Type="{XMLNS_REL}/sharedStrings" Target="sharedStrings.xml"/>'
+        )
+        self._write_entry(
+            'xl/_rels/workbook.xml.rels',
+            f'{XML_DECLARATION}<Relationships xmlns="{XMLNS_PKG_REL}">{rels}</Relationships>'
+        )
+
+        self._write_entry('_rels/.rels', (
+            f'{XML_DECLARATION}<Relationships xmlns="{XMLNS_PKG_REL}">'
+            f'<Relationship Id="rId1" Type="{XMLNS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+
+        content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml'
+        overrides = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="{content_type}.worksheet+xml"/>'
+            for i in range(1, sheet_count + 1)
+        )
+        overrides += ''.join(
+            f'<Override PartName="/xl/drawings/drawing{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.drawing+xml"/>'
+            for i in self._drawing_sheets
+        )
+        media_types = ''.join(
+            f'<Default Extension="{extension}" ContentType="{_IMAGE_CONTENT_TYPES[extension]}"/>'
+            for extension in sorted({name.rsplit('.', 1)[1] for name in self._media.values()})
+        )
+        self._write_entry('[Content_Types].xml', (
+            f'{XML_DECLARATION}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'{media_types}'
+            f'<Override PartName="/xl/workbook.xml" ContentType="{content_type}.sheet.main+xml"/>'
+            f'{overrides}'
+            f'<Override PartName="/xl/styles.xml" ContentType="{content_type}.styles+xml"/>'
+            f'<Override PartName="/xl/sharedStrings.xml" ContentType="{content_type}.sharedStrings+xml"/>'
+            '</Types>'
+        ))
+
+        self._zip.close()
+
+
+def patch_sheet_cells(path, sheet_index, cells, add_merges=(), remove_merges=()):
+    """
+    XlsxStreamWriterで書き出したXLSXのセルをzip単位で差し替え
+
+    対象ワークシートのXMLのみを書き換え、他のエントリはそのままコピーする。
+    差し替えるセルの文字列はインライン文字列で渡すこと（共有文字列表は変更しない）。
+
+    Args:
+        path: XLSXファイルパス（一時ファイルを経由して置き換える）
+        sheet_index: ワークシート番号（1から）
+        cells: {セル番地: cell_xml()で生成したXML}（既存のセルのみ）
+        add_merges: 追加する結合セル範囲
+        remove_merges: 削除する結合セル範囲
+
+    Raises:
+        KeyError: 差し替え対象のセルがワークシートに存在しない
+    """
+    sheet_name = f'xl/worksheets/sheet{sheet_index}.xml'
+    with zipfile.ZipFile(path) as source:
+        xml = source.read(sheet_name).decode('utf-8')
+
+        # セルの差し替え（位置の降順に置換して、前方の位置をずらさない）
+        spans = []
+        for ref, new_xml in cells.items():
+            start = xml.find(f'<c r="{ref}"')
+            if start < 0:
+                raise KeyError(ref)
+            head_end = xml.index('>', start)
+            if xml[head_end - 1] == '/':
+                end = head_end + 1
+            else:
+                end = xml.index('</c>', head_end) + len('</c>')
+            spans.append((start, end, new_xml))
+        parts = []
+        position = len(xml)
+        for start, end, new_xml in sorted(spans, reverse=True):
+            parts.append(xml[end:position])
+            parts.append(new_xml)
+            position = start
+        parts.append(xml[:position])
+        xml = ''.join(reversed(parts))
+
+        # 結合セルの更新
+        if add_merges or remove_merges:
+            start = xml.find('<mergeCells')
+            if start >= 0:
+                end = xml.index('</mergeCells>', start) + len('</mergeCells>')
+                merges = re.findall(r'<mergeCell ref="([^"]+)"/>', xml[start:end])
+            else:
+                start = end = xml.index('</sheetData>') + len('</sheetData>')
+                merges = []
+            removed = set(remove_merges)
+            merges = [ref for ref in merges if ref not in removed]
+            merges.extend(ref for ref in add_merges if ref not in merges)
+            merge_xml = ''
+            if merges:
+                merge_xml = f'<mergeCells count="{len(merges)}">' + ''.join(
+                    f'<mergeCell ref="{ref}"/>' for ref in merges
+                ) + '</mergeCells>'
+            xml = xml[:start] + merge_xml + xml[end:]
+
+        temp_path = f'{path}.tmp'
+        with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED) as target:
+            for info in source.infolist():
+                data = xml.encode('utf-8') if info.filename == sheet_name else source.read(info)
+                entry = zipfile.ZipInfo(info.filename, date_time=ZIP_DATE_TIME)
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                target.writestr(entry, data)
+    os.replace(temp_path, path)